@@ -3,7 +3,7 @@ API router for Marie Knowledge System v1
 """
 
 from fastapi import APIRouter
-from app.api.v1.endpoints import laboratories, concepts, sources, search, notebook
+from app.api.v1.endpoints import laboratories, concepts, sources, search, notebook, graph, reviews
 
 api_router = APIRouter()
 
@@ -37,3 +37,15 @@ api_router.include_router(
     prefix="/notebook", 
     tags=["notebook"]
 )
+
+api_router.include_router(
+    graph.router, 
+    prefix="/graph", 
+    tags=["graph"]
+)
+
+api_router.include_router(
+    reviews.router, 
+    prefix="/reviews", 
+    tags=["reviews"]
+)
@@ -0,0 +1,158 @@
+"""
+Concept endpoints for Marie Knowledge System
+"""
+
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Union
+
+from app.core.database import get_db, get_read_db
+from app.models.concept import Concept
+from app.models.laboratory import Laboratory
+from app.models.source import Source
+from app.models.tag import Tag
+from app.schemas.concept import ConceptCreate, ConceptDetailResponse, ConceptResponse, ConceptUpdate
+from app.schemas.pagination import Page
+from app.services.counters import counter_buffer
+from app.services.llm import LLMUnavailable, summarize
+from app.services.load_plans import with_plan
+from app.services.pagination import InvalidPageRequest, fetch_page, parse_fields
+from app.services.reindex import reindex_worker
+from app.services.response_cache import invalidate_on_commit, response_cache
+
+router = APIRouter()
+
+
+async def _get_concept_or_404(db: AsyncSession, concept_id: int, shape: str = "concept_detail") -> Concept:
+    concept = await db.scalar(
+        with_plan(select(Concept).where(Concept.id == concept_id), shape)
+        .execution_options(populate_existing=True)
+    )
+    if not concept:
+        raise HTTPException(status_code=404, detail="Concept not found")
+    return concept
+
+
+async def _load_tags(db: AsyncSession, tag_ids: List[int]) -> List[Tag]:
+    if not tag_ids:
+        return []
+    tags = (await db.scalars(select(Tag).where(Tag.id.in_(tag_ids)))).all()
+    missing = set(tag_ids) - {tag.id for tag in tags}
+    if missing:
+        raise HTTPException(status_code=404, detail=f"Tags not found: {sorted(missing)}")
+    return list(tags)
+
+
+async def _check_references(db: AsyncSession, laboratory_id: Optional[int] = None, source_id: Optional[int] = None):
+    if laboratory_id is not None and not await db.get(Laboratory, laboratory_id):
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+    if source_id is not None and not await db.get(Source, source_id):
+        raise HTTPException(status_code=404, detail="Source not found")
+
+
+ConceptPage = Union[Page[ConceptResponse], Page[Dict[str, Any]]]
+
+
+@router.get("/", response_model=ConceptPage)
+async def get_concepts(
+    request: Request,
+    laboratory_id: int,
+    tag_id: Optional[int] = None,
+    include_inactive: bool = False,
+    sort: str = Query("created", description="created or importance, newest/highest first"),
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,title,mastery_level"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    List a laboratory's concepts, one keyset page at a time. Without
+    ``fields`` each concept comes with its tags and source.
+    """
+    stmt = select(Concept).where(Concept.laboratory_id == laboratory_id)
+    if not include_inactive:
+        stmt = stmt.where(Concept.is_active == True)
+    if tag_id is not None:
+        stmt = stmt.where(Concept.tags.any(Tag.id == tag_id))
+
+    async def produce():
+        try:
+            return await fetch_page(
+                db, stmt, Concept, sort=sort, cursor=cursor, limit=limit,
+                fields=parse_fields(Concept, fields), plan="concept_list",
+            )
+        except InvalidPageRequest as e:
+            raise HTTPException(status_code=400, detail=str(e))
+
+    # Items embed their tags and source
+    tags = [f"concepts:{laboratory_id}", f"sources:{laboratory_id}", "tags"]
+    return await response_cache.respond(request, tags, produce, ConceptPage)
+
+
+@router.post("/", response_model=ConceptDetailResponse)
+async def create_concept(concept: ConceptCreate, db: AsyncSession = Depends(get_db)):
+    """Create a concept; its embedding is computed in the background"""
+    await _check_references(db, concept.laboratory_id, concept.source_id)
+    db_concept = Concept(
+        **concept.dict(exclude={"tag_ids"}),
+        zettel_id=datetime.utcnow().strftime("%Y%m%d%H%M%S%f"),
+        tags=await _load_tags(db, concept.tag_ids),
+    )
+    db.add(db_concept)
+    await db.commit()
+    counter_buffer.increment("tag_usage", set(concept.tag_ids))
+    reindex_worker.notify()
+    return await _get_concept_or_404(db, db_concept.id)
+
+
+@router.get("/{concept_id}", response_model=ConceptDetailResponse)
+async def get_concept(concept_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Get a concept with its tags, source and relationships"""
+    return await _get_concept_or_404(db, concept_id)
+
+
+@router.put("/{concept_id}", response_model=ConceptDetailResponse)
+async def update_concept(concept_id: int, concept_update: ConceptUpdate, db: AsyncSession = Depends(get_db)):
+    """Update a concept"""
+    concept = await _get_concept_or_404(db, concept_id)
+    changes = concept_update.dict(exclude_unset=True)
+    await _check_references(db, source_id=changes.get("source_id"))
+
+    tag_ids = changes.pop("tag_ids", None)
+    added_tag_ids = set()
+    if tag_ids is not None:
+        added_tag_ids = set(tag_ids) - {tag.id for tag in concept.tags}
+        concept.tags = await _load_tags(db, tag_ids)
+        # Collection changes don't reach the commit hooks
+        invalidate_on_commit(db.sync_session, f"concepts:{concept.laboratory_id}")
+    for field, value in changes.items():
+        setattr(concept, field, value)
+
+    await db.commit()
+    counter_buffer.increment("tag_usage", added_tag_ids)
+    reindex_worker.notify()
+    return await _get_concept_or_404(db, concept_id)
+
+
+@router.post("/{concept_id}/summarize", response_model=ConceptDetailResponse)
+async def summarize_concept(concept_id: int, db: AsyncSession = Depends(get_db)):
+    """Generate the concept's summary with the laboratory's lightweight model"""
+    concept = await _get_concept_or_404(db, concept_id)
+    laboratory = await db.get(Laboratory, concept.laboratory_id)
+    try:
+        concept.summary = await summarize(f"{concept.title}\n\n{concept.content}", "concept_summary", laboratory)
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    await db.commit()
+    return await _get_concept_or_404(db, concept_id)
+
+
+@router.delete("/{concept_id}")
+async def delete_concept(concept_id: int, db: AsyncSession = Depends(get_db)):
+    """Soft delete a concept"""
+    concept = await _get_concept_or_404(db, concept_id, "concept_list")
+    concept.is_active = False
+    await db.commit()
+    return {"message": "Concept deleted successfully"}
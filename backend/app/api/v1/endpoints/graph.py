@@ -0,0 +1,291 @@
+"""
+Knowledge graph endpoints for Marie Knowledge System
+"""
+
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db, get_read_db
+from app.models.cluster import ConceptCluster
+from app.models.concept import Concept
+from app.models.laboratory import Laboratory
+from app.models.relationships import RelationshipType
+from app.services.clustering import clustering_worker, linked_clusters
+from app.services.counters import counter_buffer
+from app.services.graph import graph_store
+from app.services.layout import layout_store
+from app.services.recommendations import recommendation_store
+from app.services.response_cache import response_cache
+from app.services.suggestions import link_laboratory
+
+router = APIRouter()
+
+
+@router.get("/{laboratory_id}/neighborhood/{concept_id}")
+async def get_neighborhood(
+    laboratory_id: int,
+    concept_id: int,
+    hops: int = Query(1, ge=1, le=5),
+    min_strength: float = Query(0.0, ge=0.0, le=1.0),
+    types: Optional[List[RelationshipType]] = Query(None),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Concepts within k hops of a concept, with the traversed edges"""
+    graph = await db.run_sync(graph_store.get, laboratory_id)
+    distances, edges = await run_in_threadpool(
+        graph.neighborhood, concept_id, hops, min_strength, types, limit
+    )
+    counter_buffer.increment("relationship_access", {edge["relationship_id"] for edge in edges})
+    return {
+        "concept_id": concept_id,
+        "nodes": [{"id": node_id, "distance": distance} for node_id, distance in distances.items()],
+        "edges": edges,
+    }
+
+
+@router.get("/{laboratory_id}/path")
+async def get_shortest_path(
+    laboratory_id: int,
+    source_id: int,
+    target_id: int,
+    max_hops: Optional[int] = Query(None, ge=1, le=20),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Strongest path between two concepts"""
+    graph = await db.run_sync(graph_store.get, laboratory_id)
+    path = await run_in_threadpool(graph.shortest_path, source_id, target_id, max_hops)
+    if path is None:
+        raise HTTPException(status_code=404, detail="No path between concepts")
+    counter_buffer.increment("relationship_access", path["relationship_ids"])
+    return path
+
+
+@router.get("/{laboratory_id}/pagerank")
+async def get_personalized_pagerank(
+    request: Request,
+    laboratory_id: int,
+    seed_ids: List[int] = Query(...),
+    damping: float = Query(0.85, gt=0.0, lt=1.0),
+    limit: int = Query(20, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Concepts most related to the seed concepts by personalised PageRank"""
+    async def produce():
+        graph = await db.run_sync(graph_store.get, laboratory_id)
+        ranked = await run_in_threadpool(
+            graph.personalized_pagerank, seed_ids, damping=damping, limit=limit
+        )
+        return {
+            "seed_ids": seed_ids,
+            "results": [{"id": concept_id, "score": score} for concept_id, score in ranked],
+        }
+
+    return await response_cache.respond(request, [f"graph:{laboratory_id}"], produce)
+
+
+@router.get("/{laboratory_id}/recommendations")
+async def get_next_topics(
+    laboratory_id: int,
+    limit: int = Query(5, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Next topics to study: unmastered concepts next to what has been learned"""
+    frontier = await db.run_sync(recommendation_store.get, laboratory_id)
+    top = frontier.top(limit)
+    if not top:
+        return {"laboratory_id": laboratory_id, "results": []}
+
+    rows = await db.execute(
+        select(Concept.id, Concept.title, Concept.mastery_level, Concept.importance_score)
+        .where(Concept.id.in_([concept_id for concept_id, _ in top]))
+    )
+    concepts = {row.id: row for row in rows}
+    return {
+        "laboratory_id": laboratory_id,
+        "results": [
+            {
+                "id": concept_id,
+                "title": concepts[concept_id].title,
+                "mastery_level": concepts[concept_id].mastery_level,
+                "importance_score": concepts[concept_id].importance_score,
+                "score": round(score, 4),
+                **frontier.explain(concept_id),
+            }
+            for concept_id, score in top
+            if concept_id in concepts
+        ],
+    }
+
+
+def _layout(laboratory_id: int, recompute: bool = False):
+    with SessionLocal() as db:
+        if recompute:
+            return layout_store.compute(db, laboratory_id)
+        return layout_store.get(db, laboratory_id)
+
+
+def _layout_tile(laboratory_id: int, zoom: int, x: int, y: int) -> dict:
+    with SessionLocal() as db:
+        layout = layout_store.get(db, laboratory_id)
+        return layout.tile(graph_store.get(db, laboratory_id), zoom, x, y)
+
+
+@router.get("/{laboratory_id}/layout")
+async def get_layout(request: Request, laboratory_id: int):
+    """Mind-map layout summary: node count, version and nodes per level of detail"""
+    async def produce():
+        layout = await run_in_threadpool(_layout, laboratory_id)
+        return layout.summary()
+
+    return await response_cache.respond(request, [f"graph:{laboratory_id}", f"layout:{laboratory_id}"], produce)
+
+
+@router.post("/{laboratory_id}/layout")
+async def recompute_layout(laboratory_id: int, db: AsyncSession = Depends(get_db)):
+    """Lay the laboratory's mind map out again from scratch"""
+    if not await db.get(Laboratory, laboratory_id):
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+    layout = await run_in_threadpool(_layout, laboratory_id, True)
+    response_cache.invalidate(f"layout:{laboratory_id}")
+    return layout.summary()
+
+
+@router.get("/{laboratory_id}/layout/tiles/{zoom}/{x}/{y}")
+async def get_layout_tile(
+    request: Request,
+    laboratory_id: int,
+    zoom: int,
+    x: int,
+    y: int,
+):
+    """
+    Nodes, edges and clusters of hidden nodes in one tile of the mind map;
+    positions are in the unit square, zoom z has 2^z x 2^z tiles
+    """
+    if not 0 <= zoom <= settings.LAYOUT_MAX_ZOOM:
+        raise HTTPException(status_code=400, detail=f"Zoom must be between 0 and {settings.LAYOUT_MAX_ZOOM}")
+    if not (0 <= x < 1 << zoom and 0 <= y < 1 << zoom):
+        raise HTTPException(status_code=404, detail="Tile outside the map")
+
+    async def produce():
+        return await run_in_threadpool(_layout_tile, laboratory_id, zoom, x, y)
+
+    return await response_cache.respond(request, [f"graph:{laboratory_id}", f"layout:{laboratory_id}"], produce)
+
+
+def _cluster_summary(cluster: ConceptCluster) -> dict:
+    return {
+        "id": cluster.id,
+        "label": cluster.label,
+        "size": cluster.size,
+        "cohesion": cluster.cohesion,
+        "key_concept_ids": json.loads(cluster.key_concept_ids or "[]"),
+    }
+
+
+@router.get("/{laboratory_id}/clusters")
+async def get_clusters(
+    request: Request,
+    laboratory_id: int,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Concept clusters of a laboratory, largest first"""
+    async def produce():
+        clusters = (await db.scalars(
+            select(ConceptCluster)
+            .where(ConceptCluster.laboratory_id == laboratory_id)
+            .order_by(ConceptCluster.size.desc(), ConceptCluster.id)
+        )).all()
+        unclustered = await db.scalar(
+            select(func.count(Concept.id))
+            .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True, Concept.cluster_id.is_(None))
+        )
+        clustered_at = await db.scalar(select(Laboratory.clustered_at).where(Laboratory.id == laboratory_id))
+        return {
+            "laboratory_id": laboratory_id,
+            "clustered_at": clustered_at or (clusters[0].created_at if clusters else None),
+            "unclustered": unclustered,
+            "clusters": [_cluster_summary(cluster) for cluster in clusters],
+        }
+
+    return await response_cache.respond(request, [f"clusters:{laboratory_id}"], produce)
+
+
+@router.get("/{laboratory_id}/clusters/{cluster_id}")
+async def get_cluster(
+    request: Request,
+    laboratory_id: int,
+    cluster_id: int,
+    limit: int = Query(50, ge=1, le=1000),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """A cluster with its most important members and the clusters it links to"""
+    async def produce():
+        cluster = await db.get(ConceptCluster, cluster_id)
+        if cluster is None or cluster.laboratory_id != laboratory_id:
+            raise HTTPException(status_code=404, detail="Cluster not found")
+
+        members = await db.execute(
+            select(Concept.id, Concept.title, Concept.importance_score, Concept.mastery_level)
+            .where(Concept.cluster_id == cluster_id, Concept.is_active == True)
+            .order_by(Concept.importance_score.desc(), Concept.id)
+            .limit(limit)
+        )
+        linked = await db.run_sync(linked_clusters, laboratory_id, cluster_id)
+        return {
+            **_cluster_summary(cluster),
+            "laboratory_id": laboratory_id,
+            "members": [dict(row._mapping) for row in members],
+            "linked_clusters": [{"id": other_id, "weight": weight} for other_id, weight in linked],
+        }
+
+    return await response_cache.respond(
+        request, [f"clusters:{laboratory_id}", f"graph:{laboratory_id}"], produce
+    )
+
+
+@router.post("/{laboratory_id}/clusters")
+async def recompute_clusters(laboratory_id: int, db: AsyncSession = Depends(get_db)):
+    """
+    Detect the laboratory's concept clusters again. Queued on the clustering
+    worker when it runs (the response is the job status), otherwise computed
+    before responding (the response is the run summary).
+    """
+    if not await db.get(Laboratory, laboratory_id):
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+    if clustering_worker.is_running:
+        clustering_worker.schedule(laboratory_id)
+        return clustering_worker.status(laboratory_id)
+    result = await run_in_threadpool(clustering_worker.run, laboratory_id)
+    if result is None:
+        raise HTTPException(status_code=500, detail=f"Clustering failed: {clustering_worker.last_error}")
+    return result
+
+
+def _link_laboratory(laboratory_id: int, k: Optional[int], threshold: Optional[float]) -> int:
+    with SessionLocal() as db:
+        return link_laboratory(db, laboratory_id, k, threshold)
+
+
+@router.post("/{laboratory_id}/suggestions/link")
+async def link_similar_concepts(
+    laboratory_id: int,
+    k: int = Query(settings.RELATIONSHIP_SUGGESTION_K, ge=1, le=50),
+    threshold: float = Query(settings.RELATIONSHIP_SUGGESTION_THRESHOLD, ge=0.0, le=1.0),
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Link every concept of a laboratory to its most similar concepts with AI
+    (semantic) relationships, e.g. after an import
+    """
+    if not await db.get(Laboratory, laboratory_id):
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+    created = await run_in_threadpool(_link_laboratory, laboratory_id, k, threshold)
+    return {"laboratory_id": laboratory_id, "created": created}
@@ -2,72 +2,166 @@
 Laboratory endpoints for Marie Knowledge System
 """
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from typing import List
+import os
+import tempfile
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse
+from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
+from typing import List, Optional
 
-from app.core.database import get_db
+from app.core.config import settings
+from app.core.database import SessionLocal, get_db, get_read_db
 from app.models.laboratory import Laboratory
-from app.schemas.laboratory import LaboratoryCreate, LaboratoryResponse, LaboratoryUpdate
+from app.models.tag import Tag
+from app.schemas.laboratory import LaboratoryCreate, LaboratoryImportResponse, LaboratoryResponse, LaboratoryUpdate
+from app.schemas.tag import TagResponse
+from app.services import archive, uploads
+from app.services.load_plans import with_plan
+from app.services.suggestions import link_laboratory
+from app.services.reindex import reindex_worker
+from app.services.response_cache import response_cache
 
 router = APIRouter()
 
 
+async def _get_laboratory_or_404(db: AsyncSession, laboratory_id: int) -> Laboratory:
+    laboratory = await db.get(Laboratory, laboratory_id)
+    if not laboratory:
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+    return laboratory
+
+
+def _link_laboratory(laboratory_id: int) -> int:
+    with SessionLocal() as db:
+        return link_laboratory(db, laboratory_id)
+
+
 @router.get("/", response_model=List[LaboratoryResponse])
-async def get_laboratories(db: Session = Depends(get_db)):
+async def get_laboratories(request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get all laboratories"""
-    laboratories = db.query(Laboratory).filter(Laboratory.is_active == True).all()
-    return laboratories
+    async def produce():
+        result = await db.scalars(with_plan(select(Laboratory).where(Laboratory.is_active == True), "laboratory"))
+        return result.all()
+
+    return await response_cache.respond(request, ["laboratories"], produce, List[LaboratoryResponse])
 
 
 @router.post("/", response_model=LaboratoryResponse)
 async def create_laboratory(
     laboratory: LaboratoryCreate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Create a new laboratory"""
     db_laboratory = Laboratory(**laboratory.dict())
     db.add(db_laboratory)
-    db.commit()
-    db.refresh(db_laboratory)
+    await db.commit()
+    await db.refresh(db_laboratory)
     return db_laboratory
 
 
+@router.post("/import", response_model=LaboratoryImportResponse)
+async def import_laboratory(
+    request: Request,
+    name: Optional[str] = None,
+    link: bool = False,
+    content_length: Optional[int] = Header(None),
+):
+    """
+    Import a laboratory archive sent as the raw request body. It becomes a
+    new laboratory; ids are reassigned. With ``link`` similar concepts are
+    connected by AI relationships right away.
+    """
+    if content_length is not None and content_length > settings.MAX_ARCHIVE_SIZE:
+        raise HTTPException(status_code=413, detail=f"Archive exceeds {settings.MAX_ARCHIVE_SIZE} bytes")
+
+    handle, path = tempfile.mkstemp(suffix=".zip", dir=uploads.partial_dir())
+    os.close(handle)
+    try:
+        await uploads.write_stream(request.stream(), Path(path), settings.MAX_ARCHIVE_SIZE)
+        result = await run_in_threadpool(archive.import_laboratory, Path(path), name)
+    except uploads.UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except archive.ArchiveError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    finally:
+        os.unlink(path)
+    if link:
+        result["linked"] = await run_in_threadpool(_link_laboratory, result["laboratory_id"])
+    reindex_worker.notify()
+    return result
+
+
+@router.get("/{laboratory_id}/export")
+async def export_laboratory(laboratory_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Download a laboratory as a zip archive (JSON Lines per table plus raw embeddings)"""
+    laboratory = await _get_laboratory_or_404(db, laboratory_id)
+    handle, path = tempfile.mkstemp(suffix=".zip", dir=uploads.partial_dir())
+    os.close(handle)
+    try:
+        await run_in_threadpool(archive.export_laboratory, laboratory_id, Path(path))
+    except Exception:
+        os.unlink(path)
+        raise
+    return FileResponse(
+        path,
+        media_type="application/zip",
+        filename=f"{uploads.safe_filename(laboratory.name)}.zip",
+        background=BackgroundTask(os.unlink, path),
+    )
+
+
 @router.get("/{laboratory_id}", response_model=LaboratoryResponse)
-async def get_laboratory(laboratory_id: int, db: Session = Depends(get_db)):
+async def get_laboratory(laboratory_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
     """Get a specific laboratory by ID"""
-    laboratory = db.query(Laboratory).filter(Laboratory.id == laboratory_id).first()
-    if not laboratory:
-        raise HTTPException(status_code=404, detail="Laboratory not found")
-    return laboratory
+    return await response_cache.respond(
+        request, [f"laboratory:{laboratory_id}"],
+        lambda: _get_laboratory_or_404(db, laboratory_id), LaboratoryResponse,
+    )
+
+
+@router.get("/{laboratory_id}/tags", response_model=List[TagResponse])
+async def get_laboratory_tags(laboratory_id: int, request: Request, db: AsyncSession = Depends(get_read_db)):
+    """Tags usable in a laboratory (its own plus global ones)"""
+    async def produce():
+        await _get_laboratory_or_404(db, laboratory_id)
+        result = await db.scalars(
+            with_plan(select(Tag), "tag")
+            .where(Tag.is_active == True, (Tag.laboratory_id == laboratory_id) | Tag.laboratory_id.is_(None))
+            .order_by(Tag.name)
+        )
+        return result.all()
+
+    return await response_cache.respond(
+        request, ["tags", f"laboratory:{laboratory_id}"], produce, List[TagResponse]
+    )
 
 
 @router.put("/{laboratory_id}", response_model=LaboratoryResponse)
 async def update_laboratory(
     laboratory_id: int,
     laboratory_update: LaboratoryUpdate,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """Update a laboratory"""
-    laboratory = db.query(Laboratory).filter(Laboratory.id == laboratory_id).first()
-    if not laboratory:
-        raise HTTPException(status_code=404, detail="Laboratory not found")
+    laboratory = await _get_laboratory_or_404(db, laboratory_id)
     
     for field, value in laboratory_update.dict(exclude_unset=True).items():
         setattr(laboratory, field, value)
     
-    db.commit()
-    db.refresh(laboratory)
+    await db.commit()
+    await db.refresh(laboratory)
     return laboratory
 
 
 @router.delete("/{laboratory_id}")
-async def delete_laboratory(laboratory_id: int, db: Session = Depends(get_db)):
+async def delete_laboratory(laboratory_id: int, db: AsyncSession = Depends(get_db)):
     """Soft delete a laboratory"""
-    laboratory = db.query(Laboratory).filter(Laboratory.id == laboratory_id).first()
-    if not laboratory:
-        raise HTTPException(status_code=404, detail="Laboratory not found")
+    laboratory = await _get_laboratory_or_404(db, laboratory_id)
     
     laboratory.is_active = False
-    db.commit()
+    await db.commit()
     return {"message": "Laboratory deleted successfully"}
@@ -0,0 +1,90 @@
+"""
+Notebook endpoints for Marie Knowledge System
+"""
+
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, Optional, Union
+
+from app.core.database import get_db, get_read_db
+from app.models.laboratory import Laboratory
+from app.models.notebook import EntryType, NotebookEntry
+from app.schemas.notebook import NotebookEntryCreate, NotebookEntryResponse
+from app.schemas.pagination import Page
+from app.services.llm import LLMUnavailable, notebook_insights
+from app.services.pagination import InvalidPageRequest, fetch_page, parse_fields
+
+router = APIRouter()
+
+
+@router.get("/", response_model=Union[Page[NotebookEntryResponse], Page[Dict[str, Any]]])
+async def get_entries(
+    laboratory_id: int,
+    entry_type: Optional[EntryType] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,title,entry_type"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """A laboratory's notebook, newest first, one keyset page at a time"""
+    stmt = select(NotebookEntry).where(NotebookEntry.laboratory_id == laboratory_id)
+    if entry_type is not None:
+        stmt = stmt.where(NotebookEntry.entry_type == entry_type)
+
+    try:
+        return await fetch_page(
+            db, stmt, NotebookEntry, cursor=cursor, limit=limit,
+            fields=parse_fields(NotebookEntry, fields), plan="notebook_entry",
+        )
+    except InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/", response_model=NotebookEntryResponse)
+async def create_entry(entry: NotebookEntryCreate, db: AsyncSession = Depends(get_db)):
+    """Write a notebook entry"""
+    if not await db.get(Laboratory, entry.laboratory_id):
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+    db_entry = NotebookEntry(**entry.dict())
+    db.add(db_entry)
+    await db.commit()
+    return db_entry
+
+
+@router.get("/{entry_id}", response_model=NotebookEntryResponse)
+async def get_entry(entry_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Get a notebook entry by ID"""
+    entry = await db.get(NotebookEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Notebook entry not found")
+    return entry
+
+
+@router.post("/{entry_id}/insights", response_model=NotebookEntryResponse)
+async def generate_insights(entry_id: int, db: AsyncSession = Depends(get_db)):
+    """Extract key insights and suggested next steps from an entry"""
+    entry = await db.get(NotebookEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Notebook entry not found")
+    laboratory = await db.get(Laboratory, entry.laboratory_id)
+    try:
+        result = await notebook_insights(entry.title, entry.content, laboratory)
+    except LLMUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    entry.key_insights = json.dumps(result["key_insights"])
+    entry.suggested_actions = json.dumps(result["suggested_actions"])
+    await db.commit()
+    return entry
+
+
+@router.delete("/{entry_id}")
+async def delete_entry(entry_id: int, db: AsyncSession = Depends(get_db)):
+    """Delete a notebook entry"""
+    entry = await db.get(NotebookEntry, entry_id)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Notebook entry not found")
+    await db.delete(entry)
+    await db.commit()
+    return {"message": "Notebook entry deleted successfully"}
@@ -0,0 +1,47 @@
+"""
+Spaced-repetition review endpoints for Marie Knowledge System
+"""
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.core.database import get_db, get_read_db
+from app.schemas.review import ReviewBatch, ReviewCard, ReviewScheduleResponse, ReviewSessionResponse
+from app.services import reviews
+
+router = APIRouter()
+
+
+@router.get("/due", response_model=List[ReviewCard])
+async def get_due_concepts(
+    laboratory_id: int,
+    limit: int = Query(20, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """The next concepts due for review, most overdue first"""
+    return await reviews.due_concepts(db, laboratory_id, limit)
+
+
+@router.get("/session", response_model=ReviewSessionResponse)
+async def get_review_session(
+    laboratory_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=500),
+    new_limit: Optional[int] = Query(None, ge=0, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Today's review session: due concepts plus a few never-reviewed ones"""
+    return await reviews.build_session(db, laboratory_id, limit, new_limit)
+
+
+@router.post("/grade", response_model=List[ReviewScheduleResponse])
+async def grade_reviews(batch: ReviewBatch, db: AsyncSession = Depends(get_db)):
+    """Grade reviews and reschedule the concepts in one write"""
+    try:
+        schedules = await reviews.grade_reviews(
+            db, [(review.concept_id, review.grade) for review in batch.reviews], batch.reviewed_at
+        )
+    except reviews.ConceptsNotFound as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    await db.commit()
+    return schedules
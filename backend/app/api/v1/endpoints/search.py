@@ -0,0 +1,126 @@
+"""
+Search endpoints for Marie Knowledge System
+"""
+
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+
+from app.core.config import settings
+from app.core.database import get_read_db
+from app.models.cluster import ConceptCluster
+from app.models.source import SourceType
+from app.schemas.search import ClusterSearchResponse, PassageSearchResponse, SearchResponse
+from app.services.clustering import closest_clusters
+from app.services.embeddings import EmbeddingUnavailable, embedding_service
+from app.services.passages import search_passages
+from app.services.reindex import reindex_worker
+from app.services.search import SearchFilters, hybrid_search
+
+router = APIRouter()
+
+
+@router.get("/", response_model=SearchResponse)
+async def search_concepts(
+    q: str = Query(..., min_length=1),
+    laboratory_id: int = Query(...),
+    mode: str = Query("hybrid", pattern="^(hybrid|keyword|semantic)$"),
+    tags: Optional[List[str]] = Query(None),
+    tag_operator: str = Query("OR", pattern="^(AND|OR)$"),
+    source_types: Optional[List[SourceType]] = Query(None),
+    alpha: float = Query(0.7, ge=0.0, le=1.0),
+    cluster_first: bool = Query(False, description="Search only the clusters closest to the query"),
+    clusters: int = Query(settings.CLUSTER_SEARCH_CLUSTERS, ge=1, le=50),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Hybrid BM25 + semantic search over a laboratory's concepts. With
+    ``cluster_first`` both rankers only see the members of the ``clusters``
+    clusters closest to the query, and concepts not clustered yet; the whole
+    laboratory is searched when it has no clusters.
+    """
+    filters = SearchFilters(
+        laboratory_id=laboratory_id,
+        tags=tags or [],
+        tag_operator=tag_operator,
+        source_types=source_types or [],
+    )
+    query_vector = None
+    if mode != "keyword" or cluster_first:
+        try:
+            query_vector = await embedding_service.embed(q)
+        except EmbeddingUnavailable:
+            pass  # Semantic leg is skipped, clusters cannot be picked
+    if cluster_first and query_vector is not None:
+        closest = await db.run_sync(closest_clusters, laboratory_id, query_vector, clusters)
+        filters.cluster_ids = [cluster_id for cluster_id, _ in closest]
+    results = await db.run_sync(
+        hybrid_search, q, filters, mode=mode, alpha=alpha, page=page, page_size=page_size,
+        query_vector=query_vector
+    )
+    results["clusters"] = list(filters.cluster_ids)
+    return results
+
+
+@router.get("/clusters", response_model=ClusterSearchResponse)
+async def search_clusters(
+    q: str = Query(..., min_length=1),
+    laboratory_id: int = Query(...),
+    k: int = Query(settings.CLUSTER_SEARCH_CLUSTERS, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Concept clusters closest to a query, the first step of cluster-first retrieval"""
+    try:
+        query_vector = await embedding_service.embed(q)
+    except EmbeddingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    closest = await db.run_sync(closest_clusters, laboratory_id, query_vector, k)
+    if not closest:
+        return {"query": q, "results": []}
+
+    rows = await db.scalars(select(ConceptCluster).where(ConceptCluster.id.in_([c for c, _ in closest])))
+    clusters = {cluster.id: cluster for cluster in rows}
+    return {
+        "query": q,
+        "results": [
+            {
+                "id": cluster_id,
+                "label": clusters[cluster_id].label,
+                "size": clusters[cluster_id].size,
+                "cohesion": clusters[cluster_id].cohesion,
+                "key_concept_ids": json.loads(clusters[cluster_id].key_concept_ids or "[]"),
+                "score": round(score, 4),
+            }
+            for cluster_id, score in closest
+            if cluster_id in clusters
+        ],
+    }
+
+
+@router.get("/passages", response_model=PassageSearchResponse)
+async def search_source_passages(
+    q: str = Query(..., min_length=1),
+    laboratory_id: int = Query(...),
+    source_ids: Optional[List[int]] = Query(None),
+    k: int = Query(10, ge=1, le=50),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """Most relevant passages across a laboratory's sources, with page or timestamp"""
+    try:
+        query_vector = await embedding_service.embed(q)
+    except EmbeddingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    results = await db.run_sync(search_passages, laboratory_id, query_vector, k, source_ids)
+    return {"query": q, "results": results}
+
+
+@router.get("/index/status")
+async def get_index_status():
+    """Re-embedding progress: dirty and stale rows left for the current model"""
+    return await run_in_threadpool(reindex_worker.status)
@@ -0,0 +1,252 @@
+"""
+Source endpoints for Marie Knowledge System
+"""
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request
+from pathlib import Path
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Any, Dict, List, Optional, Union
+
+from app.core.config import settings
+from app.core.database import get_db, get_read_db
+from app.models.job import IngestionJob
+from app.models.laboratory import Laboratory
+from app.models.source import Source, SourceType
+from app.schemas.source import (
+    BulkSourceCreate, IngestionJobResponse, SourceCreate, SourceIngestionResponse, SourceResponse,
+    UploadSessionCreate, UploadSessionResponse
+)
+from app.schemas.pagination import Page
+from app.services import uploads
+from app.services.content_store import reuse_duplicate
+from app.services.ingestion import enqueue_source, ingestion_worker
+from app.services.pagination import InvalidPageRequest, fetch_page, parse_fields
+
+router = APIRouter()
+
+
+async def _get_source_or_404(db: AsyncSession, source_id: int) -> Source:
+    source = await db.get(Source, source_id)
+    if not source:
+        raise HTTPException(status_code=404, detail="Source not found")
+    return source
+
+
+async def _ensure_laboratory(db: AsyncSession, laboratory_id: int):
+    if not await db.get(Laboratory, laboratory_id):
+        raise HTTPException(status_code=404, detail="Laboratory not found")
+
+
+def _upload_http_error(error: uploads.UploadError) -> HTTPException:
+    if isinstance(error, uploads.UploadTooLarge):
+        return HTTPException(status_code=413, detail=str(error))
+    if isinstance(error, uploads.UploadOffsetMismatch):
+        return HTTPException(status_code=409, detail=str(error))
+    return HTTPException(status_code=404, detail="Upload not found")
+
+
+async def _queue_or_reuse(db: AsyncSession, db_source: Source, priority: int = 0) -> dict:
+    """
+    Commit a new source. If the same content was already processed, its
+    results are reused; otherwise the source is queued for ingestion.
+    """
+    original = await db.run_sync(reuse_duplicate, db_source)
+    await db.commit()
+    if original is not None:
+        return {"source": db_source, "job": None, "duplicate_of": original.id}
+    
+    job = await db.run_sync(enqueue_source, db_source.id, priority=priority)
+    return {"source": db_source, "job": job.to_dict()}
+
+
+async def _create_uploaded_source(db: AsyncSession, source: SourceCreate, upload: dict) -> dict:
+    """Move a received upload into the store and register the source."""
+    path = await uploads.store_upload(upload)
+    db_source = Source(**source.dict(), file_path=str(path), file_size=upload["size"], content_hash=upload["sha256"])
+    db.add(db_source)
+    result = await _queue_or_reuse(db, db_source)
+    ingestion_worker.notify()
+    return result
+
+
+@router.get("/", response_model=Union[Page[SourceResponse], Page[Dict[str, Any]]])
+async def get_sources(
+    laboratory_id: int,
+    source_type: Optional[SourceType] = None,
+    include_archived: bool = False,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = Query(None, description="Comma-separated columns, e.g. id,title,source_type"),
+    limit: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """A laboratory's sources, newest first, one keyset page at a time"""
+    stmt = select(Source).where(Source.laboratory_id == laboratory_id)
+    if source_type is not None:
+        stmt = stmt.where(Source.source_type == source_type)
+    if not include_archived:
+        stmt = stmt.where(Source.is_archived == False)
+
+    try:
+        return await fetch_page(
+            db, stmt, Source, cursor=cursor, limit=limit,
+            fields=parse_fields(Source, fields), plan="source",
+        )
+    except InvalidPageRequest as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/", response_model=SourceIngestionResponse)
+async def create_source(source: SourceCreate, db: AsyncSession = Depends(get_db)):
+    """Register a source and queue it for background ingestion (or reuse a duplicate)"""
+    await _ensure_laboratory(db, source.laboratory_id)
+    db_source = Source(**source.dict())
+    db.add(db_source)
+    result = await _queue_or_reuse(db, db_source)
+    ingestion_worker.notify()
+    return result
+
+
+@router.post("/bulk", response_model=List[SourceIngestionResponse])
+async def create_sources_bulk(payload: BulkSourceCreate, db: AsyncSession = Depends(get_db)):
+    """Register many sources and queue those whose content is new"""
+    for laboratory_id in {source.laboratory_id for source in payload.sources}:
+        await _ensure_laboratory(db, laboratory_id)
+    
+    results = []
+    for source in payload.sources:
+        db_source = Source(**source.dict())
+        db.add(db_source)
+        results.append(await _queue_or_reuse(db, db_source, priority=payload.priority))
+    ingestion_worker.notify()
+    return results
+
+
+@router.post("/upload", response_model=SourceIngestionResponse)
+async def upload_source(
+    request: Request,
+    laboratory_id: int,
+    filename: str = Query(..., min_length=1, max_length=255),
+    title: Optional[str] = None,
+    source_type: SourceType = SourceType.PDF,
+    author: Optional[str] = None,
+    language: str = "en",
+    content_length: Optional[int] = Header(None),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Upload a file as the raw request body. The body is streamed to disk and
+    hashed on the way, never held in memory.
+    """
+    if content_length is not None and content_length > settings.MAX_FILE_SIZE:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds {settings.MAX_FILE_SIZE} bytes")
+    source = SourceCreate(
+        title=title or Path(filename).stem or filename,
+        source_type=source_type,
+        laboratory_id=laboratory_id,
+        author=author,
+        language=language,
+    )
+    await _ensure_laboratory(db, laboratory_id)
+    
+    try:
+        upload = await uploads.receive_upload(request.stream(), filename)
+    except uploads.UploadError as e:
+        raise _upload_http_error(e)
+    if upload["size"] == 0:
+        await uploads.discard_upload(upload)
+        raise HTTPException(status_code=400, detail="Empty upload")
+    return await _create_uploaded_source(db, source, upload)
+
+
+@router.post("/uploads", response_model=UploadSessionResponse)
+async def create_upload_session(payload: UploadSessionCreate, db: AsyncSession = Depends(get_db)):
+    """Start a resumable upload; send the bytes with PATCH /uploads/{id}"""
+    await _ensure_laboratory(db, payload.source.laboratory_id)
+    try:
+        return await uploads.create_session(
+            payload.filename, payload.size, metadata=payload.source.model_dump(mode="json")
+        )
+    except uploads.UploadError as e:
+        raise _upload_http_error(e)
+
+
+@router.get("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def get_upload_session(upload_id: str):
+    """Offset to resume a resumable upload from"""
+    try:
+        return await uploads.load_session(upload_id)
+    except uploads.UploadError as e:
+        raise _upload_http_error(e)
+
+
+@router.patch("/uploads/{upload_id}", response_model=UploadSessionResponse)
+async def append_upload_chunk(request: Request, upload_id: str, upload_offset: int = Header(...)):
+    """Append the request body at ``Upload-Offset`` (must equal the stored offset)"""
+    try:
+        return await uploads.append_chunk(upload_id, upload_offset, request.stream())
+    except uploads.UploadError as e:
+        raise _upload_http_error(e)
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=SourceIngestionResponse)
+async def complete_upload_session(upload_id: str, db: AsyncSession = Depends(get_db)):
+    """Finish a resumable upload: register the source and queue ingestion"""
+    try:
+        upload = await uploads.finish_session(upload_id)
+    except uploads.UploadError as e:
+        raise _upload_http_error(e)
+    source = SourceCreate(**upload["metadata"])
+    await _ensure_laboratory(db, source.laboratory_id)
+    return await _create_uploaded_source(db, source, upload)
+
+
+@router.delete("/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str):
+    """Discard a resumable upload"""
+    try:
+        await uploads.abort_session(upload_id)
+    except uploads.UploadError as e:
+        raise _upload_http_error(e)
+    return {"message": "Upload discarded"}
+
+
+@router.get("/ingestion/status")
+async def get_ingestion_status():
+    """Worker state: jobs currently running per stage"""
+    return ingestion_worker.status()
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobResponse)
+async def get_job(job_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Get an ingestion job with its progress"""
+    job = await db.get(IngestionJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict()
+
+
+@router.get("/{source_id}", response_model=SourceResponse)
+async def get_source(source_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Get a specific source by ID"""
+    return await _get_source_or_404(db, source_id)
+
+
+@router.post("/{source_id}/ingest", response_model=IngestionJobResponse)
+async def ingest_source(source_id: int, priority: int = 0, db: AsyncSession = Depends(get_db)):
+    """(Re)queue a source for ingestion"""
+    await _get_source_or_404(db, source_id)
+    job = await db.run_sync(enqueue_source, source_id, priority=priority)
+    ingestion_worker.notify()
+    return job.to_dict()
+
+
+@router.get("/{source_id}/jobs", response_model=List[IngestionJobResponse])
+async def get_source_jobs(source_id: int, db: AsyncSession = Depends(get_read_db)):
+    """Ingestion history of a source, newest first"""
+    jobs = await db.scalars(
+        select(IngestionJob)
+        .where(IngestionJob.source_id == source_id)
+        .order_by(IngestionJob.id.desc())
+    )
+    return [job.to_dict() for job in jobs]
@@ -3,7 +3,7 @@ Configuration settings for Marie Knowledge System
 """
 
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import Dict, List
 import os
 from pathlib import Path
 
@@ -29,20 +29,125 @@ class Settings(BaseSettings):
     
     # Database
     DATABASE_URL: str = "sqlite:///./marie.db"
+    DATABASE_READ_URL: str = ""  # Optional read replica; SQLite reuses DATABASE_URL read-only
+    DATABASE_READ_ENGINE: bool = True  # Separate read-only engine for read-heavy endpoints
+    DB_ECHO: bool = False
+    
+    # Connection pool (SQLite files and Postgres)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: int = 30  # Seconds to wait for a pooled connection
+    DB_POOL_RECYCLE: int = 1800  # Seconds before a connection is replaced
+    
+    # SQLite profile, applied to every new connection
+    SQLITE_JOURNAL_MODE: str = "WAL"  # Readers no longer block on writers
+    SQLITE_SYNCHRONOUS: str = "NORMAL"  # Safe with WAL, far fewer fsyncs than FULL
+    SQLITE_CACHE_SIZE_KB: int = 64 * 1024  # Page cache per connection
+    SQLITE_MMAP_SIZE: int = 256 * 1024 * 1024  # Bytes of the file to memory-map
+    SQLITE_BUSY_TIMEOUT_MS: int = 5000  # Wait for locks instead of failing
+    SQLITE_FOREIGN_KEYS: bool = True
     
     # Vector Database
     CHROMA_PERSIST_DIRECTORY: str = "./chroma_db"
     CHROMA_COLLECTION_NAME: str = "marie_knowledge"
+    VECTOR_STORE_DIR: str = "./vector_store"  # Memory-mapped per-laboratory embedding matrices
     
     # AI Models
     OLLAMA_BASE_URL: str = "http://localhost:11434"
     LIGHTWEIGHT_MODEL: str = "llama3.2:3b"
     DEEP_MODEL: str = "llama3.1:8b"
     EMBEDDING_MODEL: str = "sentence-transformers/all-MiniLM-L6-v2"
+    EMBEDDING_VERSION: int = 1  # Bump when the text fed to the model or the chunking changes
+    EMBEDDING_BATCH_WINDOW_MS: int = 10  # How long to gather concurrent requests into one batch
+    EMBEDDING_MAX_BATCH_SIZE: int = 64
+    EMBEDDING_CACHE_SIZE: int = 10000  # In-process LRU entries (the database cache is unbounded)
+    
+    # LLM scheduler (Ollama)
+    LLM_MAX_CONNECTIONS: int = 8  # Pooled keep-alive connections to Ollama
+    LLM_MODEL_CONCURRENCY: Dict[str, int] = {}  # Parallel requests per model, e.g. {"llama3.2:3b": 4}
+    LLM_DEFAULT_CONCURRENCY: int = 2  # For models not listed above
+    LLM_CACHE_SIZE: int = 1000  # Cached responses, keyed by model and prompt
+    LLM_TIMEOUT: float = 120.0  # Seconds to wait for a generation
+    LLM_MAX_PROMPT_CHARS: int = 12000  # Longer inputs are truncated
     
     # File Storage
     UPLOAD_DIR: str = "./uploads"
     MAX_FILE_SIZE: int = 100 * 1024 * 1024  # 100MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # Read size when hashing stored uploads
+    MAX_ARCHIVE_SIZE: int = 2 * 1024 * 1024 * 1024  # 2GB, laboratory import archives
+    
+    # Ingestion pipeline
+    INGESTION_ENABLED: bool = True  # Run the background worker inside the API process
+    INGESTION_MAX_WORKERS: int = 0  # Process pool size, 0 = one per CPU core
+    INGESTION_STAGE_CONCURRENCY: Dict[str, int] = {
+        "extract": 4,
+        "chunk": 4,
+        "embed": 1,
+        "summarise": 2,
+        "tag": 4,
+    }
+    INGESTION_MAX_ATTEMPTS: int = 3
+    INGESTION_RETRY_BACKOFF: int = 10  # Seconds, doubled on every retry
+    INGESTION_POLL_INTERVAL: float = 1.0  # Seconds between queue polls when idle
+    INGESTION_LOCK_TIMEOUT: int = 900  # Seconds before a running job is considered abandoned
+    INGESTION_RECOVER_INTERVAL: float = 60.0  # Seconds between sweeps for abandoned jobs
+    CHUNK_SIZE_TOKENS: int = 200  # Embedding model tokens per passage; all-MiniLM-L6-v2 truncates at 256
+    CHUNK_OVERLAP_TOKENS: int = 40
+    
+    # Text extraction, see app.services.extraction
+    EXTRACTION_WORKERS: int = 1  # Processes extracting PDF pages, 1 = in the extract stage, 0 = one per CPU core
+    EXTRACTION_PAGES_PER_TASK: int = 64  # Contiguous PDF pages handed to a process at a time
+    EXTRACTION_CACHE_ENABLED: bool = True  # Keep extracted text next to stored objects
+    
+    # Laboratory statistics
+    LAB_STATS_RECONCILE_INTERVAL: int = 3600  # Seconds between drift checks, 0 = never
+    
+    # Incremental re-embedding of changed or stale rows
+    REINDEX_ENABLED: bool = True
+    REINDEX_BATCH_SIZE: int = 64
+    REINDEX_BATCH_PAUSE: float = 0.5  # Seconds between batches, keeps the API responsive
+    REINDEX_INTERVAL: float = 10.0  # Seconds between scans for dirty rows
+    
+    # Relationship suggestions from approximate nearest neighbours
+    RELATIONSHIP_SUGGESTIONS_ENABLED: bool = True  # Link new concepts once they are embedded
+    RELATIONSHIP_SUGGESTION_K: int = 5  # Neighbours linked per concept
+    RELATIONSHIP_SUGGESTION_THRESHOLD: float = 0.75  # Minimum cosine similarity
+    ANN_MIN_SIZE: int = 2048  # Smaller laboratories are searched exactly
+    ANN_LIST_SIZE: int = 256  # Average concepts per IVF list
+    ANN_NPROBE: int = 4  # Lists scanned per query
+    
+    # Mind-map layouts and tiles, see app.services.layout
+    LAYOUT_ITERATIONS: int = 150  # Force-directed iterations of a full layout
+    LAYOUT_EXACT_LIMIT: int = 1000  # Nodes up to which repulsion is computed pairwise
+    LAYOUT_RELAYOUT_FRACTION: float = 0.25  # Share of incrementally placed nodes that triggers a full layout
+    LAYOUT_TILE_NODES: int = 200  # Most nodes a tile carries
+    LAYOUT_MAX_ZOOM: int = 12
+    
+    # Concept clusters (community detection), see app.services.clustering
+    CLUSTERING_ENABLED: bool = True  # Run the background worker inside the API process
+    CLUSTERING_INTERVAL: float = 600.0  # Seconds between scans for laboratories to recluster, 0 = on request only
+    CLUSTERING_MIN_CONCEPTS: int = 500  # Smaller laboratories are only clustered on request
+    CLUSTER_RESOLUTION: float = 1.0  # Louvain resolution, higher gives more and smaller clusters
+    CLUSTER_MIN_SIZE: int = 3  # Members of smaller communities are attached by embedding instead
+    CLUSTER_ATTACH_THRESHOLD: float = 0.5  # Minimum cosine similarity to a centroid for attached concepts
+    CLUSTER_SEARCH_CLUSTERS: int = 3  # Clusters searched by cluster-first search
+    
+    # Write-behind usage counters (relationship access, tag usage)
+    COUNTER_FLUSH_INTERVAL: float = 5.0  # Seconds between flushes
+    COUNTER_MAX_PENDING: int = 1000  # Flush early past this many increments; bounds what a crash loses
+    
+    # Response cache for read-heavy endpoints, see app.services.response_cache
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_SIZE: int = 2000  # In-process LRU entries
+    RESPONSE_CACHE_URL: str = ""  # e.g. redis://localhost:6379/0 to share entries between processes
+    RESPONSE_CACHE_TTL: int = 3600  # Seconds an entry lives in Redis
+    
+    # Spaced-repetition reviews
+    REVIEW_SESSION_SIZE: int = 50  # Due concepts in a daily session
+    REVIEW_NEW_PER_SESSION: int = 10  # Never-reviewed concepts added to a session
+    
+    # Startup, see app.core.startup
+    WARM_UP_COMPONENTS: List[str] = ["embedding_model"]  # Built in the background once the server is up
     
     # Content Processing
     YOUTUBE_API_KEY: str = ""  # Optional, for enhanced metadata
@@ -62,6 +167,8 @@ class Settings(BaseSettings):
 # Create settings instance
 settings = Settings()
 
-# Ensure directories exist
-Path(settings.UPLOAD_DIR).mkdir(exist_ok=True)
-Path(settings.CHROMA_PERSIST_DIRECTORY).mkdir(exist_ok=True)
+
+def ensure_directories():
+    """Create the storage directories; run at startup rather than on import."""
+    Path(settings.UPLOAD_DIR).mkdir(parents=True, exist_ok=True)
+    Path(settings.VECTOR_STORE_DIR).mkdir(parents=True, exist_ok=True)
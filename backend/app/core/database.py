@@ -2,28 +2,179 @@
 Database configuration and initialization for Marie Knowledge System
 """
 
-from sqlalchemy import create_engine, MetaData
-from sqlalchemy.ext.declarative import declarative_base
+import importlib.util
+
+from sqlalchemy import create_engine, event, MetaData, func, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
 from .config import settings
+from app.models.base import Base
+
+
+# Database drivers -> package that provides them (see requirements.txt)
+DRIVER_PACKAGES = {
+    "aiosqlite": "aiosqlite",
+    "asyncpg": "asyncpg",
+    "psycopg2": "psycopg2-binary",
+}
+
+
+def to_async_url(url: str) -> str:
+    """Map a sync database URL onto its async driver (aiosqlite / asyncpg)."""
+    if url.startswith("sqlite:"):
+        return url.replace("sqlite:", "sqlite+aiosqlite:", 1)
+    if url.startswith("postgresql:"):
+        return url.replace("postgresql:", "postgresql+asyncpg:", 1)
+    if url.startswith("postgres:"):
+        return url.replace("postgres:", "postgresql+asyncpg:", 1)
+    return url
+
+
+def check_driver(url: str):
+    """Fail at startup, naming the package to install, when a URL's driver is missing."""
+    parsed = make_url(url)
+    driver = parsed.get_driver_name()
+    package = DRIVER_PACKAGES.get(driver)
+    if package and importlib.util.find_spec(driver) is None:
+        raise RuntimeError(
+            f"{parsed.get_backend_name()} URLs use the {driver} driver, which is not installed: pip install {package}"
+        )
+
+
+def sqlite_pragmas(read_only: bool = False) -> list:
+    """PRAGMA statements run on every new SQLite connection."""
+    pragmas = [
+        f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous = {settings.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KB}",
+        f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}",
+        f"PRAGMA foreign_keys = {'ON' if settings.SQLITE_FOREIGN_KEYS else 'OFF'}",
+        "PRAGMA temp_store = MEMORY",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only = ON")
+    else:
+        # journal_mode is persistent in the file; only writers need to set it
+        pragmas.insert(0, f"PRAGMA journal_mode = {settings.SQLITE_JOURNAL_MODE}")
+    return pragmas
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """Pool and driver options for a database URL."""
+    options = {"echo": settings.DB_ECHO}
+    parsed = make_url(url)
+
+    if parsed.get_backend_name() == "sqlite":
+        options["connect_args"] = {"check_same_thread": False}
+        if parsed.database in (None, "", ":memory:"):
+            return options  # In-memory databases keep SQLAlchemy's single-connection pool
+        # aiosqlite defaults to NullPool, which reopens the file on every checkout
+        options["poolclass"] = AsyncAdaptedQueuePool if is_async else QueuePool
+    else:
+        options["pool_pre_ping"] = True
+
+    options.update(
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+    )
+    return options
+
+
+def _install_sqlite_profile(sync_engine, read_only: bool = False):
+    if sync_engine.dialect.name != "sqlite":
+        return
+    pragmas = sqlite_pragmas(read_only)
+
+    @event.listens_for(sync_engine, "connect")
+    def _apply_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in pragmas:
+                cursor.execute(pragma)
+        finally:
+            cursor.close()
+
+
+def dialect_insert(dialect_name: str):
+    """The dialect's ``insert`` construct, which supports ON CONFLICT clauses."""
+    if dialect_name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def create_db_engine(url: str, read_only: bool = False):
+    """Sync engine with the configured pool and SQLite profile."""
+    check_driver(url)
+    db_engine = create_engine(url, **engine_options(url))
+    _install_sqlite_profile(db_engine, read_only)
+    return db_engine
+
+
+def create_async_db_engine(url: str, read_only: bool = False):
+    """Async engine with the configured pool and SQLite profile."""
+    check_driver(to_async_url(url))
+    db_engine = create_async_engine(to_async_url(url), **engine_options(url, is_async=True))
+    _install_sqlite_profile(db_engine.sync_engine, read_only)
+    return db_engine
+
+
+def _read_url() -> str:
+    return settings.DATABASE_READ_URL or settings.DATABASE_URL
 
-# Database engine
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {}
+
+_separate_read_engine = bool(settings.DATABASE_READ_URL) or (
+    settings.DATABASE_READ_ENGINE and settings.DATABASE_URL.startswith("sqlite")
+)
+
+# Sync engine, for background jobs and worker threads
+engine = create_db_engine(settings.DATABASE_URL)
+
+# Async engines for request handlers; reads can use a separate read-only pool
+# so they never queue behind ingestion writes
+async_engine = create_async_db_engine(settings.DATABASE_URL)
+async_read_engine = (
+    create_async_db_engine(_read_url(), read_only=True) if _separate_read_engine else async_engine
 )
 
-# Session factory
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
+AsyncReadSessionLocal = async_sessionmaker(
+    async_read_engine, class_=AsyncSession, autoflush=False, expire_on_commit=False
+)
 
-# Base class for models
-Base = declarative_base()
 
+async def get_db():
+    """
+    Dependency to get an async database session.
 
-def get_db():
+    Sync service code can run on it without blocking the event loop via
+    ``await db.run_sync(fn, *args)``; ``fn`` receives a regular ``Session``.
     """
-    Dependency to get database session.
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+async def get_read_db():
+    """
+    Dependency to get an async session on the read-only engine.
+    """
+    async with AsyncReadSessionLocal() as db:
+        yield db
+
+
+def get_sync_db():
+    """
+    Sync session generator for code that runs outside the event loop.
     """
     db = SessionLocal()
     try:
@@ -32,61 +183,84 @@ def get_db():
         db.close()
 
 
-def init_db():
+async def init_db():
     """
     Initialize database tables.
     """
     # Import all models to ensure they are registered
     from app.models import (
-        Laboratory, Concept, Source, Tag, NotebookEntry, 
-        ConceptRelationship, ConceptTag
+        Laboratory, Concept, Source, SourceChunk, Tag, NotebookEntry, 
+        ConceptRelationship, ConceptTagAssociation, IngestionJob, EmbeddingCacheEntry,
+        DirtyRecord, ConceptCluster
     )
+    from app.core.migrations import run_migrations
+    # Importing the services registers their commit hooks and mapper events
+    from app.services import graph, lab_stats, reindex
+    from app.services.vector_store import vector_store
     
-    # Create all tables
-    Base.metadata.create_all(bind=engine)
+    async with async_engine.begin() as connection:
+        # Create all tables
+        await connection.run_sync(Base.metadata.create_all)
+        
+        # Bring older databases up to date
+        migrated_labs = await connection.run_sync(run_migrations)
+    for laboratory_id in migrated_labs:
+        vector_store.drop(laboratory_id)
     
     # Create default data
-    db = SessionLocal()
-    try:
-        # Check if we have any laboratories
-        existing_labs = db.query(Laboratory).count()
-        if existing_labs == 0:
-            # Create default laboratories
-            default_labs = [
-                Laboratory(
-                    name="Getting Started",
-                    description="Your first laboratory to explore Marie's features",
-                    color="#3B82F6",
-                    icon="🚀",
-                    is_active=True
-                ),
-                Laboratory(
-                    name="Artificial Intelligence",
-                    description="Machine Learning, Deep Learning, and AI applications",
-                    color="#10B981",
-                    icon="🤖",
-                    is_active=True
-                ),
-                Laboratory(
-                    name="Philosophy",
-                    description="Stoicism, Ethics, and Modern Philosophy",
-                    color="#8B5CF6",
-                    icon="🏛️",
-                    is_active=True
-                )
-            ]
-            
-            for lab in default_labs:
-                db.add(lab)
-            
-            db.commit()
-            print("✅ Default laboratories created")
+    async with AsyncSessionLocal() as db:
+        try:
+            await _create_default_data(db)
+        except Exception as e:
+            print(f"❌ Error creating default data: {e}")
+            await db.rollback()
+
+
+async def _create_default_data(db: AsyncSession):
+    """Seed the default laboratories on an empty database."""
+    from app.models import Laboratory
     
-    except Exception as e:
-        print(f"❌ Error creating default data: {e}")
-        db.rollback()
-    finally:
-        db.close()
+    # Check if we have any laboratories
+    existing_labs = await db.scalar(select(func.count()).select_from(Laboratory))
+    if existing_labs == 0:
+        # Create default laboratories
+        default_labs = [
+            Laboratory(
+                name="Getting Started",
+                description="Your first laboratory to explore Marie's features",
+                color="#3B82F6",
+                icon="🚀",
+                is_active=True
+            ),
+            Laboratory(
+                name="Artificial Intelligence",
+                description="Machine Learning, Deep Learning, and AI applications",
+                color="#10B981",
+                icon="🤖",
+                is_active=True
+            ),
+            Laboratory(
+                name="Philosophy",
+                description="Stoicism, Ethics, and Modern Philosophy",
+                color="#8B5CF6",
+                icon="🏛️",
+                is_active=True
+            )
+        ]
+        
+        for lab in default_labs:
+            db.add(lab)
+        
+        await db.commit()
+        print("✅ Default laboratories created")
+
+
+async def dispose_engines():
+    """Close pooled connections (aiosqlite connections own a thread each)."""
+    await async_engine.dispose()
+    if async_read_engine is not async_engine:
+        await async_read_engine.dispose()
+    engine.dispose()
 
 
 def reset_database():
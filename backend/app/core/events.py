@@ -0,0 +1,64 @@
+"""
+Commit-time hooks that keep in-process indexes in sync with the database.
+
+Subsystems register a ``snapshot`` callable that captures plain data from
+flushed instances and an ``apply`` callable that receives those snapshots
+once the surrounding transaction has committed. Rolled back work is dropped.
+"""
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_hooks = []
+
+_PENDING_KEY = "_marie_commit_hooks"
+
+
+def register_commit_hook(model, snapshot, apply):
+    """
+    Register a hook for ``model``.
+
+    ``snapshot(obj, op)`` runs inside the flush with ``op`` being "insert",
+    "update" or "delete" and returns a plain value (or None to skip).
+    ``apply(values)`` runs after commit with every collected value.
+    """
+    _hooks.append((model, snapshot, apply))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_snapshots(session, flush_context):
+    if not _hooks:
+        return
+
+    pending = session.info.setdefault(_PENDING_KEY, {})
+    states = (("insert", session.new), ("update", session.dirty), ("delete", session.deleted))
+
+    for index, (model, snapshot, _) in enumerate(_hooks):
+        for op, instances in states:
+            for obj in instances:
+                if not isinstance(obj, model):
+                    continue
+                if op == "update" and not session.is_modified(obj, include_collections=False):
+                    continue
+                value = snapshot(obj, op)
+                if value is not None:
+                    pending.setdefault(index, []).append(value)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_snapshots(session):
+    pending = session.info.pop(_PENDING_KEY, None)
+    if not pending:
+        return
+
+    for index, values in pending.items():
+        apply = _hooks[index][2]
+        try:
+            apply(values)
+        except Exception as e:
+            print(f"❌ Commit hook {apply.__module__}.{apply.__name__} failed: {e}")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_snapshots(session):
+    session.info.pop(_PENDING_KEY, None)
@@ -0,0 +1,293 @@
+"""
+Lightweight schema migrations for Marie Knowledge System.
+
+Tables are created with ``Base.metadata.create_all``; the steps here bring
+databases created by earlier versions up to date at startup.
+"""
+
+import json
+import os
+import shutil
+from collections import defaultdict
+from pathlib import Path
+
+from sqlalchemy import LargeBinary, String, inspect, text
+
+from app.core.config import settings
+from app.models.base import Base
+from app.utils.identifiers import normalize_url
+from app.utils.vectors import pack_vector
+
+
+def add_missing_columns(connection):
+    """Add model columns that do not exist yet in already-created tables."""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in present:
+                continue
+            column_type = column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+            print(f"🔧 Added column {table.name}.{column.name}")
+
+
+# Indexes replaced by a differently keyed one under a new name
+REPLACED_INDEXES = {
+    "concepts": ["ix_concepts_lab_importance"],  # now ix_concepts_lab_importance_key, NULL-safe
+}
+
+
+def _index_names(connection, inspector, table_name):
+    # SQLite reflection skips expression indexes, so ask the catalog directly
+    if connection.dialect.name == "sqlite":
+        rows = connection.execute(
+            text("SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = :table"),
+            {"table": table_name},
+        )
+        return {name for name, in rows}
+    return {index["name"] for index in inspector.get_indexes(table_name)}
+
+
+def add_missing_indexes(connection):
+    """Create model indexes that are missing on already-created tables."""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        present = _index_names(connection, inspector, table.name)
+        for index in table.indexes:
+            if index.name not in present:
+                index.create(connection)
+                print(f"🔧 Created index {index.name}")
+
+
+def drop_replaced_indexes(connection):
+    """Drop indexes that a model no longer declares, see ``REPLACED_INDEXES``."""
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+
+    for table_name, names in REPLACED_INDEXES.items():
+        if table_name not in existing_tables:
+            continue
+        present = _index_names(connection, inspector, table_name)
+        for name in names:
+            if name in present:
+                connection.execute(text(f"DROP INDEX {name}"))
+                print(f"🔧 Dropped index {name}")
+
+
+def backfill_normalized_urls(connection, batch_size: int = 500):
+    """Fill ``sources.normalized_url`` for rows written before it existed."""
+    select_missing = text(
+        "SELECT id, url FROM sources WHERE url IS NOT NULL AND url != '' "
+        "AND normalized_url IS NULL AND id > :after ORDER BY id LIMIT :limit"
+    )
+    update_url = text("UPDATE sources SET normalized_url = :normalized WHERE id = :id")
+
+    after = 0
+    while True:
+        rows = connection.execute(select_missing, {"after": after, "limit": batch_size}).fetchall()
+        if not rows:
+            break
+        connection.execute(update_url, [{"id": row.id, "normalized": normalize_url(row.url)} for row in rows])
+        after = rows[-1].id
+
+
+def _packed_vector(concept_id, raw, model: str) -> dict:
+    try:
+        values = json.loads(raw)
+    except (TypeError, ValueError):
+        values = None
+    if not values:
+        return {"id": concept_id, "blob": None, "dim": None, "model": None}
+    return {"id": concept_id, "blob": pack_vector(values), "dim": len(values), "model": model}
+
+
+def _migrate_sqlite_vectors(connection, model: str, batch_size: int):
+    # SQLite keeps the declared type loose: legacy rows are TEXT values in place
+    select_legacy = text(
+        "SELECT id, laboratory_id, embedding_vector FROM concepts "
+        "WHERE typeof(embedding_vector) = 'text' LIMIT :limit"
+    )
+    update_vector = text(
+        "UPDATE concepts SET embedding_vector = :blob, embedding_dim = :dim, "
+        "embedding_model = COALESCE(embedding_model, :model) WHERE id = :id"
+    )
+
+    laboratory_ids = set()
+    migrated = 0
+    while True:
+        rows = connection.execute(select_legacy, {"limit": batch_size}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for concept_id, laboratory_id, raw in rows:
+            updates.append(_packed_vector(concept_id, raw, model))
+            if updates[-1]["blob"] is not None:
+                laboratory_ids.add(laboratory_id)
+        connection.execute(update_vector, updates)
+        migrated += len(updates)
+    return laboratory_ids, migrated
+
+
+def _migrate_vector_column_type(connection, model: str, batch_size: int):
+    """
+    Other databases enforce the column type, so a legacy TEXT column is
+    converted into a new binary column that then replaces it. It runs in
+    the startup transaction; on PostgreSQL an interruption rolls it back.
+    """
+    columns = {column["name"]: column["type"] for column in inspect(connection).get_columns("concepts")}
+    if not isinstance(columns.get("embedding_vector"), String):
+        return set(), 0
+
+    if "embedding_blob" not in columns:  # Left over by an interrupted run without transactional DDL
+        blob_type = LargeBinary().compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE concepts ADD COLUMN embedding_blob {blob_type}"))
+
+    select_legacy = text(
+        "SELECT id, laboratory_id, embedding_vector FROM concepts "
+        "WHERE embedding_vector IS NOT NULL AND id > :after ORDER BY id LIMIT :limit"
+    )
+    update_vector = text(
+        "UPDATE concepts SET embedding_blob = :blob, embedding_dim = :dim, "
+        "embedding_model = COALESCE(embedding_model, :model) WHERE id = :id"
+    )
+
+    laboratory_ids = set()
+    migrated = 0
+    after = 0
+    while True:
+        rows = connection.execute(select_legacy, {"after": after, "limit": batch_size}).fetchall()
+        if not rows:
+            break
+        updates = []
+        for concept_id, laboratory_id, raw in rows:
+            updates.append(_packed_vector(concept_id, raw, model))
+            if updates[-1]["blob"] is not None:
+                laboratory_ids.add(laboratory_id)
+        connection.execute(update_vector, updates)
+        migrated += len(updates)
+        after = rows[-1].id
+
+    connection.execute(text("ALTER TABLE concepts DROP COLUMN embedding_vector"))
+    connection.execute(text("ALTER TABLE concepts RENAME COLUMN embedding_blob TO embedding_vector"))
+    print("🔧 Converted concepts.embedding_vector to a binary column")
+    return laboratory_ids, migrated
+
+
+def migrate_embedding_vectors(connection, batch_size: int = 500):
+    """
+    Convert legacy JSON-encoded ``concepts.embedding_vector`` values into
+    float32 blobs, recording the configured embedding model for rows that
+    have none. Returns the ids of laboratories whose vectors changed.
+    """
+    if connection.dialect.name == "sqlite":
+        migrate = _migrate_sqlite_vectors
+    else:
+        migrate = _migrate_vector_column_type
+    laboratory_ids, migrated = migrate(connection, settings.EMBEDDING_MODEL, batch_size)
+
+    if migrated:
+        print(f"🔧 Migrated {migrated} JSON embeddings to float32 blobs")
+    return laboratory_ids
+
+
+def split_shared_work_directories(connection):
+    """
+    Working directories used to be keyed by content hash and shared by
+    duplicate sources. Give each source its own copy under its id; the
+    newest duplicate takes the shared directory over.
+    """
+    root = Path(settings.UPLOAD_DIR) / "extracted"
+    if not root.is_dir():
+        return
+
+    duplicates = defaultdict(list)
+    rows = connection.execute(text("SELECT id, content_hash FROM sources WHERE content_hash IS NOT NULL ORDER BY id"))
+    for source_id, content_hash in rows:
+        duplicates[content_hash].append(source_id)
+
+    for content_hash, source_ids in duplicates.items():
+        shared = root / content_hash
+        if not shared.is_dir():
+            continue
+        for source_id in source_ids[:-1]:
+            if (root / str(source_id)).exists():
+                continue
+            partial = root / f"{source_id}.part"
+            shutil.rmtree(partial, ignore_errors=True)
+            shutil.copytree(shared, partial)
+            os.replace(partial, root / str(source_id))
+        if (root / str(source_ids[-1])).exists():
+            shutil.rmtree(shared)
+        else:
+            os.replace(shared, root / str(source_ids[-1]))
+        print(f"🔧 Split working directory {content_hash[:12]} between {len(source_ids)} sources")
+
+
+def ensure_fulltext_index(connection):
+    """
+    Create the FTS5 index over concept title/content/summary. It is an
+    external-content table kept current by triggers, so writes through the
+    ORM or raw SQL are indexed incrementally.
+    """
+    if connection.dialect.name != "sqlite":
+        return
+
+    exists = connection.execute(
+        text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'concepts_fts'")
+    ).first()
+
+    statements = [
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS concepts_fts USING fts5(
+            title, content, summary,
+            content='concepts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS concepts_fts_ai AFTER INSERT ON concepts BEGIN
+            INSERT INTO concepts_fts(rowid, title, content, summary)
+            VALUES (new.id, new.title, new.content, new.summary);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS concepts_fts_ad AFTER DELETE ON concepts BEGIN
+            INSERT INTO concepts_fts(concepts_fts, rowid, title, content, summary)
+            VALUES ('delete', old.id, old.title, old.content, old.summary);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS concepts_fts_au AFTER UPDATE OF title, content, summary ON concepts BEGIN
+            INSERT INTO concepts_fts(concepts_fts, rowid, title, content, summary)
+            VALUES ('delete', old.id, old.title, old.content, old.summary);
+            INSERT INTO concepts_fts(rowid, title, content, summary)
+            VALUES (new.id, new.title, new.content, new.summary);
+        END
+        """,
+    ]
+    for statement in statements:
+        connection.execute(text(statement))
+
+    if not exists:
+        connection.execute(text("INSERT INTO concepts_fts(concepts_fts) VALUES ('rebuild')"))
+        print("🔧 Built full-text index for concepts")
+
+
+def run_migrations(connection):
+    """Run every migration step; returns laboratories whose vectors changed."""
+    add_missing_columns(connection)
+    add_missing_indexes(connection)
+    drop_replaced_indexes(connection)
+    backfill_normalized_urls(connection)
+    split_shared_work_directories(connection)
+    ensure_fulltext_index(connection)
+    return migrate_embedding_vectors(connection)
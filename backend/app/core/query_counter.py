@@ -0,0 +1,53 @@
+"""
+Query counting for catching N+1 patterns.
+
+``count_queries`` records every statement sent to the database engines
+while the block runs; ``query_budget`` raises ``QueryBudgetExceeded`` when
+the block issues more than a fixed number. Typical use in a test:
+
+    with query_budget(4):
+        client.get("/api/v1/concepts/?laboratory_id=1")
+"""
+
+from contextlib import contextmanager
+from typing import List
+
+from sqlalchemy import event
+
+
+class QueryBudgetExceeded(AssertionError):
+    """A block issued more queries than its budget allows."""
+
+
+def _engines():
+    from app.core.database import async_engine, async_read_engine, engine
+    engines = [engine, async_engine.sync_engine, async_read_engine.sync_engine]
+    return list({id(e): e for e in engines}.values())
+
+
+@contextmanager
+def count_queries():
+    """Yield a list that collects the SQL of every statement executed."""
+    statements: List[str] = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = _engines()
+    for db_engine in engines:
+        event.listen(db_engine, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for db_engine in engines:
+            event.remove(db_engine, "before_cursor_execute", record)
+
+
+@contextmanager
+def query_budget(max_queries: int):
+    """Fail if the block runs more than ``max_queries`` statements."""
+    with count_queries() as statements:
+        yield statements
+    if len(statements) > max_queries:
+        listing = "\n".join(f"  {i + 1}. {sql.strip()[:200]}" for i, sql in enumerate(statements))
+        raise QueryBudgetExceeded(f"{len(statements)} queries issued, budget is {max_queries}:\n{listing}")
@@ -0,0 +1,140 @@
+"""
+Startup bookkeeping and lazily initialised heavy components.
+
+Heavy libraries (sentence-transformers/torch) are never imported at module
+level. Each is registered here as a component: a module to import plus a
+factory that builds the singleton from it. ``get`` builds a component on
+first use; ``warm_up`` builds the ``WARM_UP_COMPONENTS`` in a background
+thread once the server is accepting requests, so the first user request
+doesn't pay for them. Import and initialisation times of every
+component, and the duration of each startup phase, are reported by
+``/health``.
+
+This module is imported before anything else in ``app.main`` so that
+``PROCESS_STARTED`` is as close as possible to interpreter start.
+"""
+
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+PROCESS_STARTED = time.monotonic()
+
+
+class ComponentUnavailable(RuntimeError):
+    """A component's library is missing or its factory failed."""
+
+
+class Component:
+    """One lazily built singleton and its timings."""
+
+    def __init__(self, name: str, module: str, factory: Callable[[Any], Any]):
+        self.name = name
+        self.module = module
+        self.factory = factory
+        self.instance = None
+        self.state = "idle"  # idle, loading, ready, failed
+        self.error: Optional[str] = None
+        self.import_seconds: Optional[float] = None
+        self.init_seconds: Optional[float] = None
+        self.lock = threading.Lock()
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "module": self.module,
+            "import_seconds": self.import_seconds,
+            "init_seconds": self.init_seconds,
+            "error": self.error,
+        }
+
+
+class ComponentRegistry:
+    """Named heavy components, each built once on first use."""
+
+    def __init__(self):
+        self._components: Dict[str, Component] = {}
+        self._phases: Dict[str, float] = {}
+        self._ready_at: Optional[float] = None
+        self._warm_thread = None
+
+    def register(self, name: str, module: str, factory: Callable[[Any], Any]):
+        """Register ``factory(imported module)`` as the builder of ``name``."""
+        self._components[name] = Component(name, module, factory)
+
+    def get(self, name: str):
+        """The component, importing and building it if needed."""
+        component = self._components[name]
+        if component.state == "ready":
+            return component.instance
+        with component.lock:
+            if component.state == "ready":
+                return component.instance
+            if component.state == "failed":
+                raise ComponentUnavailable(component.error)
+
+            component.state = "loading"
+            started = time.perf_counter()
+            try:
+                module = importlib.import_module(component.module)
+                component.import_seconds = round(time.perf_counter() - started, 3)
+                started = time.perf_counter()
+                component.instance = component.factory(module)
+                component.init_seconds = round(time.perf_counter() - started, 3)
+            except Exception as e:
+                component.state = "failed"
+                component.error = f"Cannot load {name}: {e}"
+                raise ComponentUnavailable(component.error)
+            component.state = "ready"
+            return component.instance
+
+    def is_ready(self, name: str) -> bool:
+        return self._components[name].state == "ready"
+
+    # -- startup ----------------------------------------------------------------
+
+    def phase(self, name: str, started: float):
+        """Record how long a startup phase that began at ``started`` (``time.monotonic()``) took."""
+        self._phases[name] = round(time.monotonic() - started, 3)
+
+    def mark_ready(self):
+        self._ready_at = time.monotonic()
+
+    def warm_up(self, names: List[str]):
+        """Build ``names`` one after the other in a background thread."""
+        names = [name for name in names if name in self._components]
+        if not names:
+            return
+
+        def _warm():
+            for name in names:
+                try:
+                    self.get(name)
+                    print(f"🔥 {name} warmed up in {self._components[name].init_seconds}s")
+                except ComponentUnavailable as e:
+                    print(f"⚠️ {e}")
+
+        self._warm_thread = threading.Thread(target=_warm, name="warm-up", daemon=True)
+        self._warm_thread.start()
+
+    def status(self) -> dict:
+        return {
+            "uptime_seconds": round(time.monotonic() - PROCESS_STARTED, 3),
+            "ready_after_seconds": (
+                round(self._ready_at - PROCESS_STARTED, 3) if self._ready_at is not None else None
+            ),
+            "phases": dict(self._phases),
+            "components": {name: component.status() for name, component in self._components.items()},
+        }
+
+
+components = ComponentRegistry()
+
+
+def _embedding_model(sentence_transformers):
+    from app.core.config import settings
+    return sentence_transformers.SentenceTransformer(settings.EMBEDDING_MODEL)
+
+
+components.register("embedding_model", "sentence_transformers", _embedding_model)
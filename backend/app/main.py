@@ -3,17 +3,29 @@ Marie - Personal Knowledge Management System
 Main FastAPI application entry point
 """
 
+# First, so the startup clock begins before the heavy imports below
+from app.core.startup import PROCESS_STARTED, components
+
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
+import asyncio
+import time
 import uvicorn
 import os
 from pathlib import Path
 
-from app.core.config import settings
-from app.core.database import init_db
+from app.core.config import ensure_directories, settings
+from app.core.database import init_db, dispose_engines
 from app.api.v1.api import api_router
+from app.services.clustering import clustering_worker
+from app.services.counters import counter_buffer
+from app.services import extraction
+from app.services.ingestion import ingestion_worker
+from app.services.lab_stats import reconcile_periodically
+from app.services.llm import llm_scheduler
+from app.services.reindex import reindex_worker
 
 
 @asynccontextmanager
@@ -21,18 +33,55 @@ async def lifespan(app: FastAPI):
     """Application lifespan events"""
     # Startup
     print("🧪 Starting Marie Knowledge System...")
+    components.phase("imports", PROCESS_STARTED)
     
     # Initialize database
+    started = time.monotonic()
+    ensure_directories()
     await init_db()
+    components.phase("database", started)
     print("✅ Database initialized")
     
-    # Initialize AI models (placeholder for now)
-    print("🤖 AI models ready")
+    # Background ingestion
+    if settings.INGESTION_ENABLED:
+        ingestion_worker.start()
+    
+    # Incremental re-embedding of changed and stale rows
+    if settings.REINDEX_ENABLED:
+        reindex_worker.start()
+    
+    # Community detection of large laboratories
+    if settings.CLUSTERING_ENABLED:
+        clustering_worker.start()
+    
+    # Usage counters are written behind reads
+    counter_buffer.start()
+    
+    # Keep laboratory statistics from drifting
+    reconcile_task = None
+    if settings.LAB_STATS_RECONCILE_INTERVAL > 0:
+        reconcile_task = asyncio.create_task(reconcile_periodically())
+    
+    # AI models and other heavy components load on first use, or now in the background
+    components.mark_ready()
+    components.warm_up(settings.WARM_UP_COMPONENTS)
+    print(f"🤖 Ready in {components.status()['ready_after_seconds']}s, AI models load in the background")
     
     yield
     
     # Shutdown
     print("🔄 Shutting down Marie...")
+    if reconcile_task is not None:
+        reconcile_task.cancel()
+        with suppress(asyncio.CancelledError):
+            await reconcile_task
+    clustering_worker.stop()
+    reindex_worker.stop()
+    ingestion_worker.stop()
+    extraction.shutdown()  # Parallel extract jobs run on the worker's threads, their pool lives here
+    counter_buffer.stop()
+    await llm_scheduler.close()
+    await dispose_engines()
 
 
 # Create FastAPI app
@@ -60,11 +109,12 @@ app.include_router(api_router, prefix="/api/v1")
 # Health check endpoint
 @app.get("/health")
 async def health_check():
-    """Health check endpoint"""
+    """Health check endpoint, with startup and component load timings"""
     return {
         "status": "healthy",
         "service": "Marie Knowledge System",
-        "version": "0.1.0"
+        "version": "0.1.0",
+        "startup": components.status(),
     }
 
 # Root endpoint
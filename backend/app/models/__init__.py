@@ -5,18 +5,27 @@ SQLAlchemy models for Marie Knowledge System.
 from .base import Base
 from .laboratory import Laboratory
 from .concept import Concept
-from .source import Source
+from .source import Source, SourceChunk
 from .tag import Tag
 from .notebook import NotebookEntry
 from .relationships import ConceptRelationship, ConceptTagAssociation
+from .job import IngestionJob
+from .embedding import EmbeddingCacheEntry
+from .tracking import DirtyRecord
+from .cluster import ConceptCluster
 
 __all__ = [
     "Base",
     "Laboratory", 
     "Concept",
     "Source",
+    "SourceChunk",
     "Tag",
     "NotebookEntry",
     "ConceptRelationship",
-    "ConceptTag"
+    "ConceptTagAssociation",
+    "IngestionJob",
+    "EmbeddingCacheEntry",
+    "DirtyRecord",
+    "ConceptCluster"
 ]
@@ -0,0 +1,31 @@
+"""
+Concept cluster model: communities found in a laboratory's relationship graph.
+"""
+
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, LargeBinary
+from .base import Base, TimestampMixin
+
+
+class ConceptCluster(Base, TimestampMixin):
+    """
+    ConceptCluster is a community of densely related concepts. Clusters are
+    derived data: every clustering run of a laboratory replaces all of its
+    clusters (see app.services.clustering), members point to theirs through
+    ``Concept.cluster_id``.
+    """
+
+    __tablename__ = "concept_clusters"
+
+    laboratory_id = Column(Integer, ForeignKey("laboratories.id", ondelete="CASCADE"), nullable=False, index=True)
+    label = Column(String(200), nullable=False)  # Titles of the most central members
+    size = Column(Integer, default=0)  # Members when the cluster was computed
+    cohesion = Column(Float, default=0.0)  # 0-1 share of the members' link weight that stays inside
+    key_concept_ids = Column(Text)  # JSON list, most central first
+
+    # Mean of the members' unit embeddings, for picking clusters by query
+    centroid = Column(LargeBinary)  # float32 blob, see app.utils.vectors
+    centroid_dim = Column(Integer)
+    embedding_model = Column(String(200))  # Model of the member embeddings
+
+    def __repr__(self):
+        return f"<ConceptCluster(id={self.id}, label='{self.label[:50]}', lab={self.laboratory_id}, size={self.size})>"
@@ -2,7 +2,7 @@
 Concept model for atomic knowledge units.
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, Boolean, DateTime
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, Boolean, DateTime, LargeBinary, Index, func, literal_column
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 
@@ -14,6 +14,12 @@ class Concept(Base, TimestampMixin):
     """
     
     __tablename__ = "concepts"
+    __table_args__ = (
+        # Keyset pagination of list views, see app.services.pagination
+        Index("ix_concepts_lab_created", "laboratory_id", "created_at", "id"),
+        # Due-review queue, see app.services.reviews
+        Index("ix_concepts_review_due", "laboratory_id", "is_active", "next_review"),
+    )
     
     # Basic information
     title = Column(String(200), nullable=False, index=True)
@@ -30,8 +36,14 @@ class Concept(Base, TimestampMixin):
     source_id = Column(Integer, ForeignKey("sources.id"), nullable=True, index=True)
     source_location = Column(String(100))  # Page number, timestamp, etc.
     
+    # Community in the relationship graph, see app.services.clustering
+    cluster_id = Column(Integer, ForeignKey("concept_clusters.id", ondelete="SET NULL"), index=True)
+    
     # AI analysis
-    embedding_vector = Column(Text)  # JSON string of vector embeddings
+    embedding_vector = Column(LargeBinary)  # float32 blob, see app.utils.vectors
+    embedding_dim = Column(Integer)  # Number of float32 components in embedding_vector
+    embedding_model = Column(String(200))  # Model that produced embedding_vector
+    embedding_version = Column(Integer)  # EMBEDDING_VERSION in effect when it was computed
     complexity_score = Column(Float, default=0.0)  # 0-1 difficulty rating
     importance_score = Column(Float, default=0.0)  # 0-1 importance rating
     
@@ -40,6 +52,8 @@ class Concept(Base, TimestampMixin):
     review_count = Column(Integer, default=0)
     last_reviewed = Column(DateTime)
     next_review = Column(DateTime)
+    ease_factor = Column(Float, default=2.5)  # SM-2 easiness, >= 1.3
+    review_interval = Column(Integer, default=0)  # Days until next_review, 0 = never reviewed successfully
     
     # Status
     is_active = Column(Boolean, default=True)
@@ -71,6 +85,21 @@ class Concept(Base, TimestampMixin):
         statuses = {0: "New", 1: "Learning", 2: "Review", 3: "Mastered"}
         return statuses.get(self.mastery_level, "Unknown")
     
+    def set_embedding(self, vector, model, version=None):
+        """Store an embedding as a float32 blob together with its shape, model and version."""
+        from app.utils.vectors import pack_vector
+        self.embedding_vector = pack_vector(vector)
+        self.embedding_dim = len(vector)
+        self.embedding_model = model
+        self.embedding_version = version
+    
+    def get_embedding(self):
+        """Embedding as a NumPy float32 vector, or None if not computed yet."""
+        if self.embedding_vector is None:
+            return None
+        from app.utils.vectors import unpack_vector
+        return unpack_vector(self.embedding_vector, self.embedding_dim)
+    
     def to_dict(self):
         """Convert to dictionary for API responses."""
         return {
@@ -89,8 +118,20 @@ class Concept(Base, TimestampMixin):
             "review_count": self.review_count,
             "last_reviewed": self.last_reviewed.isoformat() if self.last_reviewed else None,
             "next_review": self.next_review.isoformat() if self.next_review else None,
+            "ease_factor": self.ease_factor,
+            "review_interval": self.review_interval,
             "is_active": self.is_active,
             "is_validated": self.is_validated,
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+# Keyset pagination by importance, see app.services.pagination. NULL scores
+# sort as 0, and the expression must match the one the queries order by.
+Index(
+    "ix_concepts_lab_importance_key",
+    Concept.laboratory_id,
+    func.coalesce(Concept.importance_score, literal_column(repr(0.0))),
+    Concept.id,
+)
@@ -0,0 +1,26 @@
+"""
+Embedding cache model: vectors keyed by model and normalised-text hash.
+"""
+
+from sqlalchemy import Column, String, Integer, LargeBinary, UniqueConstraint
+from .base import Base, TimestampMixin
+
+
+class EmbeddingCacheEntry(Base, TimestampMixin):
+    """
+    One cached embedding. Text is identified by the SHA-256 of its
+    normalised form, so unchanged content is never embedded twice.
+    """
+    
+    __tablename__ = "embedding_cache"
+    __table_args__ = (
+        UniqueConstraint("model", "text_hash", name="uq_embedding_cache_model_text"),
+    )
+    
+    model = Column(String(200), nullable=False)
+    text_hash = Column(String(64), nullable=False)
+    dim = Column(Integer, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # float32 blob
+    
+    def __repr__(self):
+        return f"<EmbeddingCacheEntry(model='{self.model}', hash='{self.text_hash[:12]}', dim={self.dim})>"
@@ -0,0 +1,77 @@
+"""
+Ingestion job model for the durable background processing queue.
+"""
+
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, DateTime, Enum, Index
+from sqlalchemy.orm import relationship
+from enum import Enum as PyEnum
+from .base import Base, TimestampMixin
+
+
+class JobStatus(PyEnum):
+    """Lifecycle states of an ingestion job."""
+    PENDING = "pending"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class IngestionJob(Base, TimestampMixin):
+    """
+    IngestionJob is one pipeline stage (extract, chunk, embed, summarise, tag)
+    for one Source. Jobs are claimed by workers, retried with backoff and
+    chained: finishing a stage enqueues the next one.
+    """
+    
+    __tablename__ = "ingestion_jobs"
+    
+    # What to run
+    source_id = Column(Integer, ForeignKey("sources.id"), nullable=False, index=True)
+    stage = Column(String(20), nullable=False)
+    priority = Column(Integer, default=0)  # Higher runs first
+    
+    # Scheduling and retries
+    status = Column(Enum(JobStatus), nullable=False, default=JobStatus.PENDING)
+    attempts = Column(Integer, default=0)
+    max_attempts = Column(Integer, default=3)
+    run_after = Column(DateTime)  # Not claimable before this time (retry backoff)
+    
+    # Worker lease
+    locked_by = Column(String(100))
+    locked_at = Column(DateTime)
+    finished_at = Column(DateTime)
+    
+    # Progress reporting
+    progress = Column(Float, default=0.0)  # 0-1 within this stage
+    message = Column(Text)
+    error = Column(Text)
+    
+    # Relationships
+    source = relationship("Source", backref="ingestion_jobs")
+    
+    __table_args__ = (
+        Index("ix_ingestion_jobs_claim", "status", "stage", "priority", "run_after"),
+    )
+    
+    def __repr__(self):
+        return f"<IngestionJob(id={self.id}, source={self.source_id}, stage={self.stage}, status={self.status.value})>"
+    
+    def to_dict(self):
+        """Convert to dictionary for API responses."""
+        return {
+            "id": self.id,
+            "source_id": self.source_id,
+            "stage": self.stage,
+            "priority": self.priority,
+            "status": self.status.value,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "run_after": self.run_after.isoformat() if self.run_after else None,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "updated_at": self.updated_at.isoformat() if self.updated_at else None
+        }
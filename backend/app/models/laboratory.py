@@ -2,7 +2,7 @@
 Laboratory model for organizing knowledge domains.
 """
 
-from sqlalchemy import Column, String, Text, Boolean, JSON, Integer
+from sqlalchemy import Column, String, Text, Boolean, JSON, Integer, DateTime
 from sqlalchemy.orm import relationship
 from .base import Base, TimestampMixin
 
@@ -36,6 +36,7 @@ class Laboratory(Base, TimestampMixin):
     concept_count = Column(Integer, default=0)
     source_count = Column(Integer, default=0)
     study_hours = Column(Integer, default=0)  # Total study time in minutes
+    clustered_at = Column(DateTime)  # Last clustering run, even one that found no clusters
     
     # Relationships
     concepts = relationship("Concept", back_populates="laboratory", cascade="all, delete-orphan")
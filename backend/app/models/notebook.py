@@ -2,7 +2,7 @@
 Notebook model for laboratory journal entries and learning progress.
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, Boolean, Enum
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, Boolean, Enum, Index
 from sqlalchemy.orm import relationship
 from enum import Enum as PyEnum
 from .base import Base, TimestampMixin
@@ -27,6 +27,9 @@ class NotebookEntry(Base, TimestampMixin):
     """
     
     __tablename__ = "notebook_entries"
+    __table_args__ = (
+        Index("ix_notebook_entries_lab_created", "laboratory_id", "created_at", "id"),
+    )
     
     # Basic information
     title = Column(String(200), nullable=False, index=True)
@@ -2,10 +2,11 @@
 Source model for content references and materials.
 """
 
-from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, Boolean, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, String, Text, Integer, ForeignKey, Float, Boolean, Enum, Index, UniqueConstraint
+from sqlalchemy.orm import relationship, validates
 from enum import Enum as PyEnum
 from .base import Base, TimestampMixin
+from app.utils.identifiers import normalize_doi, normalize_isbn, normalize_url
 
 
 class SourceType(PyEnum):
@@ -29,11 +30,15 @@ class Source(Base, TimestampMixin):
     """
     
     __tablename__ = "sources"
+    __table_args__ = (
+        Index("ix_sources_lab_created", "laboratory_id", "created_at", "id"),
+    )
     
     # Basic information
     title = Column(String(300), nullable=False, index=True)
     author = Column(String(200))
     url = Column(Text)
+    normalized_url = Column(Text, index=True)  # Canonical URL for duplicate lookups
     description = Column(Text)
     
     # Source classification
@@ -49,6 +54,7 @@ class Source(Base, TimestampMixin):
     file_size = Column(Integer)  # Size in bytes
     page_count = Column(Integer)  # For PDFs/books
     duration = Column(Integer)  # For videos/podcasts in seconds
+    content_hash = Column(String(64), index=True)  # SHA-256 of the file, or of the URL for remote sources
     
     # Quality and relevance
     quality_score = Column(Float, default=0.0)  # 0-1 quality rating
@@ -62,17 +68,36 @@ class Source(Base, TimestampMixin):
     
     # AI analysis
     summary = Column(Text)  # AI-generated summary
+    embedding_model = Column(String(200))  # Model that embedded the chunks
+    embedding_version = Column(Integer)  # EMBEDDING_VERSION in effect at that time
     key_topics = Column(Text)  # JSON array of extracted topics
     
     # Academic metadata (for papers/articles)
-    doi = Column(String(100))  # Digital Object Identifier
-    isbn = Column(String(20))  # For books
+    doi = Column(String(100), index=True)  # Digital Object Identifier
+    isbn = Column(String(20), index=True)  # For books, stored as ISBN-13
     publication_date = Column(String(20))  # YYYY-MM-DD format
     journal = Column(String(200))  # Journal or conference name
     
     # Relationships
     laboratory = relationship("Laboratory", back_populates="sources")
     concepts = relationship("Concept", back_populates="source")
+    chunks = relationship(
+        "SourceChunk", back_populates="source", cascade="all, delete-orphan",
+        order_by="SourceChunk.chunk_index", passive_deletes=True
+    )
+    
+    @validates("url")
+    def _validate_url(self, key, url):
+        self.normalized_url = normalize_url(url)
+        return url
+    
+    @validates("doi")
+    def _validate_doi(self, key, doi):
+        return normalize_doi(doi)
+    
+    @validates("isbn")
+    def _validate_isbn(self, key, isbn):
+        return normalize_isbn(isbn)
     
     def __repr__(self):
         return f"<Source(id={self.id}, title='{self.title[:50]}...', type={self.source_type.value})>"
@@ -109,6 +134,7 @@ class Source(Base, TimestampMixin):
             "laboratory_id": self.laboratory_id,
             "file_path": self.file_path,
             "file_size": self.file_size,
+            "content_hash": self.content_hash,
             "page_count": self.page_count,
             "duration": self.duration,
             "quality_score": self.quality_score,
@@ -126,3 +152,48 @@ class Source(Base, TimestampMixin):
             "created_at": self.created_at.isoformat() if self.created_at else None,
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
+
+
+class SourceChunk(Base, TimestampMixin):
+    """
+    A passage of a source's extracted text, the unit of passage retrieval.
+    The text stays on disk in the source's ``text.txt``; a row keeps the
+    byte range of the passage in it and where the passage is in the source.
+    Its embedding lives in the laboratory's chunk index, see
+    ``app.services.passages``.
+    """
+    
+    __tablename__ = "source_chunks"
+    __table_args__ = (
+        UniqueConstraint("source_id", "chunk_index", name="uq_source_chunks_source_index"),
+    )
+    
+    source_id = Column(Integer, ForeignKey("sources.id", ondelete="CASCADE"), nullable=False)
+    laboratory_id = Column(Integer, ForeignKey("laboratories.id"), nullable=False, index=True)
+    chunk_index = Column(Integer, nullable=False)  # Position within the source, from 0
+    
+    # Byte range in text.txt, read lazily when the passage is shown
+    byte_start = Column(Integer, nullable=False)
+    byte_end = Column(Integer, nullable=False)
+    token_count = Column(Integer, nullable=False)
+    
+    # Anchors back into the source
+    page = Column(Integer)  # Page the passage starts on, for paged documents
+    start_seconds = Column(Integer)  # Last timestamp before the passage, for videos/podcasts
+    
+    # Relationships
+    source = relationship("Source", back_populates="chunks")
+    
+    def __repr__(self):
+        return f"<SourceChunk(source={self.source_id}, index={self.chunk_index}, page={self.page})>"
+    
+    @property
+    def location(self):
+        """Human-readable anchor, in the style of ``Concept.source_location``."""
+        if self.start_seconds is not None:
+            minutes, seconds = divmod(self.start_seconds, 60)
+            hours, minutes = divmod(minutes, 60)
+            return f"{hours}:{minutes:02d}:{seconds:02d}" if hours else f"{minutes}:{seconds:02d}"
+        if self.page is not None:
+            return f"p. {self.page}"
+        return None
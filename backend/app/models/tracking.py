@@ -0,0 +1,27 @@
+"""
+Change tracking model: rows whose derived data (embeddings, chunks) is out of date.
+"""
+
+from sqlalchemy import Column, String, Integer, DateTime, UniqueConstraint
+from .base import Base, TimestampMixin
+
+
+class DirtyRecord(Base, TimestampMixin):
+    """
+    DirtyRecord marks a concept or source whose indexed text changed. There
+    is at most one row per entity; marking it again only moves ``marked_at``,
+    which lets the reindex job tell whether a row changed while it worked.
+    """
+    
+    __tablename__ = "dirty_records"
+    __table_args__ = (
+        UniqueConstraint("entity", "entity_id", name="uq_dirty_records_entity"),
+    )
+    
+    entity = Column(String(20), nullable=False)  # "concept" or "source"
+    entity_id = Column(Integer, nullable=False)
+    reason = Column(String(20), nullable=False)  # "insert" or "update"
+    marked_at = Column(DateTime, nullable=False)
+    
+    def __repr__(self):
+        return f"<DirtyRecord({self.entity}={self.entity_id}, reason='{self.reason}')>"
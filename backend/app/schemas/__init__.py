@@ -0,0 +1,3 @@
+"""
+Pydantic schemas for Marie Knowledge System API requests and responses.
+"""
@@ -0,0 +1,107 @@
+"""
+Concept schemas.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.models.relationships import RelationshipType
+from app.models.source import SourceType
+from app.schemas.tag import TagSummary
+
+
+class ConceptBase(BaseModel):
+    """Fields shared by concept requests."""
+    title: str = Field(..., min_length=1, max_length=200)
+    content: str = Field(..., min_length=1)
+    summary: Optional[str] = None
+    source_id: Optional[int] = None
+    source_location: Optional[str] = Field(None, max_length=100)
+    complexity_score: float = Field(0.0, ge=0.0, le=1.0)
+    importance_score: float = Field(0.0, ge=0.0, le=1.0)
+
+
+class ConceptCreate(ConceptBase):
+    """Request body for creating a concept."""
+    laboratory_id: int
+    tag_ids: List[int] = []
+
+
+class ConceptUpdate(BaseModel):
+    """Request body for updating a concept; every field is optional."""
+    title: Optional[str] = Field(None, min_length=1, max_length=200)
+    content: Optional[str] = Field(None, min_length=1)
+    summary: Optional[str] = None
+    source_id: Optional[int] = None
+    source_location: Optional[str] = Field(None, max_length=100)
+    complexity_score: Optional[float] = Field(None, ge=0.0, le=1.0)
+    importance_score: Optional[float] = Field(None, ge=0.0, le=1.0)
+    is_validated: Optional[bool] = None
+    tag_ids: Optional[List[int]] = None
+
+
+class SourceSummary(BaseModel):
+    """Source as embedded in concept responses."""
+    id: int
+    title: str
+    source_type: SourceType
+    display_type: str
+
+    class Config:
+        from_attributes = True
+
+
+class RelationshipResponse(BaseModel):
+    """One edge of the concept graph."""
+    id: int
+    source_concept_id: int
+    target_concept_id: int
+    relationship_type: RelationshipType
+    display_type: str
+    description: Optional[str] = None
+    strength: float = 0.5
+    confidence: float = 0.5
+    created_by: Optional[str] = None
+    is_validated: bool = False
+    is_bidirectional: bool = True
+
+    class Config:
+        from_attributes = True
+
+
+class ConceptResponse(BaseModel):
+    """Concept as returned by list endpoints."""
+    id: int
+    title: str
+    content: str
+    summary: Optional[str] = None
+    zettel_id: Optional[str] = None
+    laboratory_id: int
+    source_id: Optional[int] = None
+    source_location: Optional[str] = None
+    cluster_id: Optional[int] = None
+    complexity_score: Optional[float] = 0.0
+    importance_score: Optional[float] = 0.0
+    mastery_level: Optional[int] = 0
+    mastery_status: str
+    review_count: Optional[int] = 0
+    last_reviewed: Optional[datetime] = None
+    next_review: Optional[datetime] = None
+    ease_factor: Optional[float] = None
+    review_interval: Optional[int] = None
+    is_active: bool = True
+    is_validated: bool = False
+    created_at: datetime
+    updated_at: datetime
+    tags: List[TagSummary] = []
+    source: Optional[SourceSummary] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ConceptDetailResponse(ConceptResponse):
+    """Concept with its outgoing and incoming relationships."""
+    child_relationships: List[RelationshipResponse] = []
+    parent_relationships: List[RelationshipResponse] = []
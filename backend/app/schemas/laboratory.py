@@ -0,0 +1,60 @@
+"""
+Laboratory schemas.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Any, Dict, Optional
+
+
+class LaboratoryBase(BaseModel):
+    """Fields shared by laboratory requests."""
+    name: str = Field(..., min_length=1, max_length=100)
+    description: Optional[str] = None
+    color: str = Field("#3B82F6", pattern=r"^#[0-9A-Fa-f]{6}$")
+    icon: str = "🧪"
+    lightweight_model: Optional[str] = None
+    deep_model: Optional[str] = None
+
+
+class LaboratoryCreate(LaboratoryBase):
+    """Request body for creating a laboratory."""
+    pass
+
+
+class LaboratoryUpdate(BaseModel):
+    """Request body for updating a laboratory; every field is optional."""
+    name: Optional[str] = Field(None, min_length=1, max_length=100)
+    description: Optional[str] = None
+    color: Optional[str] = Field(None, pattern=r"^#[0-9A-Fa-f]{6}$")
+    icon: Optional[str] = None
+    lightweight_model: Optional[str] = None
+    deep_model: Optional[str] = None
+    is_active: Optional[bool] = None
+    is_archived: Optional[bool] = None
+    settings: Optional[Dict[str, Any]] = None
+
+
+class LaboratoryResponse(LaboratoryBase):
+    """Laboratory as returned by the API."""
+    id: int
+    is_active: bool
+    is_archived: bool
+    settings: Optional[Dict[str, Any]] = None
+    concept_count: int = 0
+    source_count: int = 0
+    study_hours: int = 0
+    created_at: datetime
+    updated_at: datetime
+    display_name: str
+
+    class Config:
+        from_attributes = True
+
+
+class LaboratoryImportResponse(BaseModel):
+    """Result of importing a laboratory archive."""
+    laboratory_id: int
+    name: str
+    counts: Dict[str, int]
+    linked: Optional[int] = None  # AI relationships added when importing with link=true
@@ -0,0 +1,56 @@
+"""
+Notebook entry schemas.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from app.models.notebook import EntryType
+
+
+class NotebookEntryCreate(BaseModel):
+    """Request body for writing a notebook entry."""
+    title: str = Field(..., min_length=1, max_length=200)
+    content: str = Field(..., min_length=1)
+    entry_type: EntryType = EntryType.NOTE
+    laboratory_id: int
+    concept_id: Optional[int] = None
+    source_id: Optional[int] = None
+    study_session_id: Optional[str] = Field(None, max_length=50)
+    mood_score: Optional[int] = Field(None, ge=1, le=5)
+    difficulty_rating: Optional[int] = Field(None, ge=1, le=5)
+    understanding_level: float = Field(0.0, ge=0.0, le=1.0)
+    time_spent: int = Field(0, ge=0)
+    is_milestone: bool = False
+    is_favorite: bool = False
+    is_private: bool = False
+
+
+class NotebookEntryResponse(BaseModel):
+    """Notebook entry as returned by the API."""
+    id: int
+    title: str
+    content: str
+    entry_type: EntryType
+    display_type: str
+    laboratory_id: int
+    concept_id: Optional[int] = None
+    source_id: Optional[int] = None
+    study_session_id: Optional[str] = None
+    mood_score: Optional[int] = None
+    mood_emoji: str
+    difficulty_rating: Optional[int] = None
+    understanding_level: Optional[float] = None
+    time_spent: Optional[int] = 0
+    is_milestone: bool = False
+    is_favorite: bool = False
+    is_private: bool = False
+    sentiment_score: Optional[float] = None
+    key_insights: Optional[str] = None
+    suggested_actions: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
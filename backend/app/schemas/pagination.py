@@ -0,0 +1,15 @@
+"""
+Paginated response envelope.
+"""
+
+from pydantic import BaseModel
+from typing import Generic, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class Page(BaseModel, Generic[T]):
+    """One page of a keyset-paginated listing; pass ``next_cursor`` back to continue."""
+    items: List[T]
+    next_cursor: Optional[str] = None
+    has_more: bool = False
@@ -0,0 +1,56 @@
+"""
+Spaced-repetition review schemas.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class ReviewGrade(BaseModel):
+    """One graded review, SM-2 quality from 0 (blackout) to 5 (perfect recall)."""
+    concept_id: int
+    grade: int = Field(..., ge=0, le=5)
+
+
+class ReviewBatch(BaseModel):
+    """Request body for grading several reviews at once."""
+    reviews: List[ReviewGrade] = Field(..., min_length=1, max_length=500)
+    reviewed_at: Optional[datetime] = None
+
+
+class ReviewCard(BaseModel):
+    """A concept to review."""
+    id: int
+    title: str
+    content: str
+    summary: Optional[str] = None
+    laboratory_id: int
+    mastery_level: Optional[int] = 0
+    review_count: Optional[int] = 0
+    last_reviewed: Optional[datetime] = None
+    next_review: Optional[datetime] = None
+    ease_factor: Optional[float] = None
+    review_interval: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class ReviewSessionResponse(BaseModel):
+    """Today's reviews for a laboratory."""
+    laboratory_id: int
+    due_total: int
+    due: List[ReviewCard]
+    new: List[ReviewCard]
+
+
+class ReviewScheduleResponse(BaseModel):
+    """A concept's schedule after grading."""
+    id: int
+    ease_factor: float
+    review_interval: int
+    next_review: datetime
+    last_reviewed: datetime
+    mastery_level: int
+    review_count: int
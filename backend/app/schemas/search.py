@@ -0,0 +1,68 @@
+"""
+Search schemas.
+"""
+
+from pydantic import BaseModel
+from typing import List, Optional
+
+
+class SearchHit(BaseModel):
+    """A single ranked concept."""
+    id: int
+    title: str
+    summary: Optional[str] = None
+    laboratory_id: int
+    source_id: Optional[int] = None
+    mastery_level: Optional[int] = None
+    score: float
+    keyword_rank: Optional[int] = None
+    semantic_rank: Optional[int] = None
+    keyword_score: Optional[float] = None
+    semantic_score: Optional[float] = None
+
+
+class SearchResponse(BaseModel):
+    """A page of fused search results."""
+    query: str
+    mode: str
+    page: int
+    page_size: int
+    has_more: bool
+    legs: List[str]
+    clusters: List[int] = []
+    results: List[SearchHit]
+
+
+class PassageHit(BaseModel):
+    """A passage of a source, anchored to where it appears."""
+    chunk_id: int
+    source_id: int
+    source_title: str
+    chunk_index: int
+    page: Optional[int] = None
+    start_seconds: Optional[int] = None
+    location: Optional[str] = None
+    score: float
+    text: str
+
+
+class PassageSearchResponse(BaseModel):
+    """Top passages across a laboratory's sources."""
+    query: str
+    results: List[PassageHit]
+
+
+class ClusterHit(BaseModel):
+    """A concept cluster ranked by the similarity of its centroid to the query."""
+    id: int
+    label: str
+    size: int
+    cohesion: float
+    key_concept_ids: List[int]
+    score: float
+
+
+class ClusterSearchResponse(BaseModel):
+    """Clusters of a laboratory closest to a query."""
+    query: str
+    results: List[ClusterHit]
@@ -0,0 +1,100 @@
+"""
+Source and ingestion job schemas.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+from app.models.source import SourceType
+
+
+class SourceCreate(BaseModel):
+    """Request body for registering a source."""
+    title: str = Field(..., min_length=1, max_length=300)
+    source_type: SourceType
+    laboratory_id: int
+    author: Optional[str] = None
+    url: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    language: str = "en"
+    doi: Optional[str] = None
+    isbn: Optional[str] = None
+    publication_date: Optional[str] = None
+    journal: Optional[str] = None
+
+
+class SourceResponse(BaseModel):
+    """Source as returned by the API."""
+    id: int
+    title: str
+    source_type: SourceType
+    display_type: str
+    laboratory_id: int
+    author: Optional[str] = None
+    url: Optional[str] = None
+    description: Optional[str] = None
+    category: Optional[str] = None
+    language: Optional[str] = None
+    file_path: Optional[str] = None
+    file_size: Optional[int] = None
+    content_hash: Optional[str] = None
+    page_count: Optional[int] = None
+    duration: Optional[int] = None
+    is_processed: bool = False
+    summary: Optional[str] = None
+    key_topics: Optional[str] = None
+    doi: Optional[str] = None
+    isbn: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
+class IngestionJobResponse(BaseModel):
+    """State of one pipeline stage for a source."""
+    id: int
+    source_id: int
+    stage: str
+    status: str
+    priority: int = 0
+    attempts: int = 0
+    max_attempts: int = 0
+    progress: float = 0.0
+    message: Optional[str] = None
+    error: Optional[str] = None
+    run_after: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    created_at: datetime
+    updated_at: datetime
+
+
+class SourceIngestionResponse(BaseModel):
+    """A source together with its queued ingestion job, or the duplicate it reused."""
+    source: SourceResponse
+    job: Optional[IngestionJobResponse] = None
+    duplicate_of: Optional[int] = None
+
+
+class BulkSourceCreate(BaseModel):
+    """Request body for importing many sources at once."""
+    sources: List[SourceCreate] = Field(..., min_length=1, max_length=1000)
+    priority: int = 0
+
+
+class UploadSessionCreate(BaseModel):
+    """Request body for starting a resumable upload."""
+    filename: str = Field(..., min_length=1, max_length=255)
+    size: int = Field(..., gt=0)
+    source: SourceCreate
+
+
+class UploadSessionResponse(BaseModel):
+    """Progress of a resumable upload."""
+    id: str
+    filename: str
+    size: int
+    offset: int
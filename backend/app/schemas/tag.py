@@ -0,0 +1,30 @@
+"""
+Tag schemas.
+"""
+
+from datetime import datetime
+from pydantic import BaseModel
+from typing import Optional
+
+
+class TagSummary(BaseModel):
+    """Tag as embedded in concept responses."""
+    id: int
+    name: str
+    full_name: str
+    color: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+
+class TagResponse(TagSummary):
+    """Tag as returned by the tag listing."""
+    description: Optional[str] = None
+    laboratory_id: Optional[int] = None
+    parent_id: Optional[int] = None
+    usage_count: int = 0
+    is_system_tag: bool = False
+    is_active: bool = True
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,3 @@
+"""
+Business logic services for Marie Knowledge System.
+"""
@@ -0,0 +1,268 @@
+"""
+Approximate nearest neighbours over the per-laboratory vector matrices.
+
+An inverted-file (IVF) index partitions a laboratory's unit vectors with
+spherical k-means into lists of about ``ANN_LIST_SIZE`` concepts. A query
+only scores the ``ANN_NPROBE`` lists whose centroids are closest, so it
+costs O(nprobe * list size) instead of O(n), and finding the neighbours of
+every concept in a laboratory is near-linear rather than quadratic.
+
+The index stores ids only; vectors are read from the laboratory's
+``VectorIndex`` at query time, so rows removed from it simply stop
+matching. Small laboratories are searched exactly.
+"""
+
+import threading
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.core.events import register_commit_hook
+from app.models.concept import Concept
+from app.services.vector_store import VectorIndex, current_index
+from app.utils.vectors import normalize, unpack_vector
+
+_TRAIN_SAMPLE_PER_LIST = 64
+_ASSIGN_BATCH = 8192
+
+
+def _nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, count: int = 1) -> np.ndarray:
+    """Indexes of the ``count`` most similar centroids for each vector."""
+    count = min(count, len(centroids))
+    result = np.empty((len(vectors), count), dtype=np.int64)
+    for start in range(0, len(vectors), _ASSIGN_BATCH):
+        scores = vectors[start:start + _ASSIGN_BATCH] @ centroids.T
+        if count == 1:
+            result[start:start + _ASSIGN_BATCH, 0] = scores.argmax(axis=1)
+        else:
+            result[start:start + _ASSIGN_BATCH] = np.argpartition(-scores, count - 1, axis=1)[:, :count]
+    return result
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Column indexes of the ``k`` best scores per row, best first."""
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+class IVFIndex:
+    """Inverted lists of concept ids around k-means centroids."""
+
+    def __init__(self, centroids: np.ndarray, list_ids: np.ndarray, assignments: np.ndarray, trained_size: int):
+        self.centroids = centroids
+        self.trained_size = trained_size
+        self._lock = threading.Lock()
+        self._set_lists(list_ids, assignments)
+
+    def _set_lists(self, ids: np.ndarray, assignments: np.ndarray):
+        order = np.argsort(assignments, kind="stable")
+        self._ids = ids[order]
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(assignments, minlength=len(self.centroids)))))
+        self._pending: List[Tuple[np.ndarray, np.ndarray]] = []
+
+    @classmethod
+    def train(cls, ids: np.ndarray, vectors: np.ndarray, list_size: int,
+              iterations: int = 8, seed: int = 0) -> "IVFIndex":
+        """Cluster ``vectors`` (unit rows) into about ``len / list_size`` lists."""
+        rng = np.random.default_rng(seed)
+        nlist = max(1, len(ids) // max(list_size, 1))
+        sample_size = min(len(ids), nlist * _TRAIN_SAMPLE_PER_LIST)
+        sample = np.asarray(vectors[np.sort(rng.choice(len(ids), sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+        for _ in range(iterations):
+            assignments = _nearest_centroids(sample, centroids)[:, 0]
+            order = np.argsort(assignments, kind="stable")
+            counts = np.bincount(assignments, minlength=nlist)
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            sums = np.zeros_like(centroids)
+            sums[counts > 0] = np.add.reduceat(sample[order], starts[counts > 0], axis=0)
+            # Empty lists take a random sample point so every centroid is used
+            empty = np.flatnonzero(counts == 0)
+            sums[empty] = sample[rng.choice(len(sample), len(empty))]
+            centroids = normalize(sums)
+
+        assignments = np.concatenate([
+            _nearest_centroids(np.asarray(vectors[start:start + _ASSIGN_BATCH]), centroids)[:, 0]
+            for start in range(0, len(ids), _ASSIGN_BATCH)
+        ])
+        return cls(centroids, np.asarray(ids, dtype=np.int64), assignments, len(ids))
+
+    def add(self, ids: Sequence[int], vectors: np.ndarray):
+        """Assign new vectors to their nearest list; re-embedded ids move out of their old one."""
+        assignments = _nearest_centroids(normalize(vectors).reshape(len(ids), -1), self.centroids)[:, 0]
+        with self._lock:
+            self._pending.append((np.asarray(ids, dtype=np.int64), assignments))
+
+    def _merge_pending(self):
+        with self._lock:
+            if not self._pending:
+                return
+            pending, self._pending = self._pending, []
+            added = np.concatenate([ids for ids, _ in pending])
+            added_lists = np.concatenate([a for _, a in pending])
+            # The latest assignment of an id wins over earlier pending ones
+            _, last = np.unique(added[::-1], return_index=True)
+            keep = len(added) - 1 - last
+            added, added_lists = added[keep], added_lists[keep]
+
+            lists = np.repeat(np.arange(len(self.centroids)), np.diff(self._offsets))
+            kept = ~np.isin(self._ids, added)
+            self._set_lists(np.concatenate([self._ids[kept], added]), np.concatenate([lists[kept], added_lists]))
+
+    def _list_ids(self, lists: Sequence[int]) -> np.ndarray:
+        return np.unique(np.concatenate([self._ids[self._offsets[i]:self._offsets[i + 1]] for i in lists]))
+
+    def search(self, vectors: VectorIndex, query, k: int, nprobe: int, min_score: Optional[float] = None,
+               exclude: Sequence[int] = (), allowed_ids: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """
+        Approximate cosine top-k for one query vector. ``allowed_ids`` (a
+        sorted id array) filters the members of the probed lists; more lists
+        are probed until enough members pass or every list has been.
+        """
+        self._merge_pending()
+        query = normalize(query)
+        if allowed_ids is None:
+            candidate_ids = self._list_ids(_nearest_centroids(query[None, :], self.centroids, nprobe)[0])
+        else:
+            order = np.argsort(-(self.centroids @ query))
+            while True:
+                candidate_ids = self._list_ids(order[:nprobe])
+                candidate_ids = candidate_ids[np.isin(candidate_ids, allowed_ids, assume_unique=True)]
+                if len(candidate_ids) >= k + len(exclude) or nprobe >= len(order):
+                    break
+                nprobe *= 2
+        ids, matrix = vectors.vectors_of(candidate_ids)
+        if exclude:
+            keep = ~np.isin(ids, np.asarray(exclude, dtype=np.int64))
+            ids, matrix = ids[keep], matrix[keep]
+        if not len(ids):
+            return []
+        scores = matrix @ query
+        top = _top_k(scores[None, :], k)[0]
+        return [(int(ids[i]), float(scores[i])) for i in top if min_score is None or scores[i] >= min_score]
+
+    def all_neighbours(self, vectors: VectorIndex, k: int, nprobe: int,
+                       min_score: Optional[float] = None) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        """
+        Neighbours of every indexed concept, one list at a time: members of a
+        list are scored together against the lists nearest to its centroid,
+        a single matrix product per list.
+        """
+        self._merge_pending()
+        probes = _nearest_centroids(self.centroids, self.centroids, nprobe)
+        for list_no in range(len(self.centroids)):
+            member_ids, members = vectors.vectors_of(self._ids[self._offsets[list_no]:self._offsets[list_no + 1]])
+            if not len(member_ids):
+                continue
+            candidate_ids, candidates = vectors.vectors_of(self._list_ids({list_no, *probes[list_no]}))
+            scores = members @ candidates.T
+            # A concept is not its own neighbour
+            own = np.searchsorted(candidate_ids, member_ids)
+            scores[np.arange(len(member_ids)), own] = -np.inf
+            top = _top_k(scores, k)
+            for row, concept_id in enumerate(member_ids):
+                yield int(concept_id), [
+                    (int(candidate_ids[i]), float(scores[row, i])) for i in top[row]
+                    if scores[row, i] > -np.inf and (min_score is None or scores[row, i] >= min_score)
+                ]
+
+
+class ANNStore:
+    """
+    IVF indexes per laboratory, trained lazily and retrained as labs grow.
+    ``index_of(db, laboratory_id)`` returns the vectors to index: concept
+    embeddings by default, passage embeddings for ``app.services.passages``.
+    """
+
+    def __init__(self, index_of: Callable[..., Optional[VectorIndex]] = current_index):
+        self._index_of = index_of
+        self._indexes: Dict[int, Tuple[VectorIndex, IVFIndex]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db, laboratory_id: int) -> Tuple[Optional[VectorIndex], Optional[IVFIndex]]:
+        """
+        The laboratory's vectors and its IVF index. The IVF index is None when
+        the laboratory is small enough to search exactly.
+        """
+        vectors = self._index_of(db, laboratory_id)
+        if vectors is None or len(vectors) < settings.ANN_MIN_SIZE:
+            return vectors, None
+
+        with self._lock:
+            cached = self._indexes.get(laboratory_id)
+        if cached is not None and cached[0] is vectors and len(vectors) <= 2 * cached[1].trained_size:
+            return cached
+
+        ids, matrix = vectors.matrix()
+        ivf = IVFIndex.train(np.array(ids), matrix, settings.ANN_LIST_SIZE)
+        with self._lock:
+            self._indexes[laboratory_id] = (vectors, ivf)
+        return vectors, ivf
+
+    def search(self, db, laboratory_id: int, concept_id: Optional[int], query, k: int,
+               min_score: Optional[float] = None, allowed_ids=None) -> List[Tuple[int, float]]:
+        """
+        Nearest items to ``query`` in a laboratory, excluding ``concept_id``
+        (when given) and restricted to ``allowed_ids`` (when given).
+        """
+        vectors, ivf = self.get(db, laboratory_id)
+        if vectors is None:
+            return []
+        if allowed_ids is not None:
+            allowed_ids = np.unique(np.asarray(allowed_ids, dtype=np.int64))
+            if len(allowed_ids) * 4 < len(vectors):
+                ivf = None  # Scoring the few allowed rows exactly is cheaper than probing lists
+        if ivf is None:
+            results = vectors.top_k(query, k + 1, allowed_ids=allowed_ids, min_score=min_score)
+            return [(i, score) for i, score in results if i != concept_id][:k]
+        exclude = [concept_id] if concept_id is not None else []
+        return ivf.search(vectors, query, k, settings.ANN_NPROBE, min_score, exclude=exclude, allowed_ids=allowed_ids)
+
+    def all_neighbours(self, db, laboratory_id: int, k: int,
+                       min_score: Optional[float] = None) -> Iterator[Tuple[int, List[Tuple[int, float]]]]:
+        """Neighbours of every concept of a laboratory."""
+        vectors, ivf = self.get(db, laboratory_id)
+        if vectors is None:
+            return iter(())
+        if ivf is None:
+            # Exact: the whole (small) laboratory is a single list
+            ids, matrix = vectors.matrix()
+            ivf = IVFIndex(np.ones((1, vectors.dim), dtype=np.float32), np.array(ids),
+                           np.zeros(len(ids), dtype=np.int64), len(ids))
+        return ivf.all_neighbours(vectors, k, settings.ANN_NPROBE, min_score)
+
+    def add(self, laboratory_id: int, ids: Sequence[int], vectors: np.ndarray):
+        """Add new vectors to the lists of a laboratory's index, if it is loaded."""
+        with self._lock:
+            cached = self._indexes.get(laboratory_id)
+        if cached is not None:
+            cached[1].add(ids, vectors)
+
+    def apply_changes(self, changes):
+        """Add committed embeddings to the lists of loaded indexes."""
+        for change in changes:
+            self.add(change["laboratory_id"], [change["id"]], unpack_vector(change["vector"], change["dim"])[None, :])
+
+
+ann_store = ANNStore()
+
+
+def _snapshot_concept(concept, op):
+    if op == "delete" or not concept.is_active or concept.embedding_vector is None:
+        return None
+    if op == "update" and not inspect(concept).attrs.embedding_vector.history.has_changes():
+        return None
+    return {
+        "id": concept.id,
+        "laboratory_id": concept.laboratory_id,
+        "vector": concept.embedding_vector,
+        "dim": concept.embedding_dim,
+    }
+
+
+register_commit_hook(Concept, _snapshot_concept, ann_store.apply_changes)
@@ -0,0 +1,457 @@
+"""
+Streaming export and import of whole laboratories.
+
+An archive is a zip file with one JSON Lines member per table, read with
+``yield_per`` and written row by row, so memory stays flat however large
+the laboratory is. Concept embeddings are not encoded into the JSON: they
+are appended to ``embeddings/concepts.f32`` as raw little-endian float32
+and each concept row records its offset and dimension. Passages travel
+with their sources: ``source_chunks`` rows plus each source's working
+directory (extracted ``text.txt`` and packed chunk vectors
+``embeddings.f32``) under ``work/<source id>/``, so an imported laboratory
+can be searched by passage without running the pipeline again.
+
+Imports read the members line by line and bulk-insert them in batches
+inside one transaction, remapping every id and foreign key, so an archive
+can be loaded next to the laboratory it was exported from. Uploaded files
+are not part of the archive; sources keep their ``content_hash``.
+
+Usage:
+    python -m app.services.archive export 1 lab.zip
+    python -m app.services.archive import lab.zip --name "Physics (copy)"
+"""
+
+import enum
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from sqlalchemy import DateTime, Enum, bindparam, func, literal, or_, select, update
+
+from app.core.config import settings
+from app.core.database import SessionLocal, engine
+from app.models.concept import Concept
+from app.models.laboratory import Laboratory
+from app.models.notebook import NotebookEntry
+from app.models.relationships import ConceptRelationship, ConceptTagAssociation, concept_tags
+from app.models.source import Source, SourceChunk
+from app.models.tag import Tag
+from app.models.tracking import DirtyRecord
+from app.services.response_cache import response_cache
+
+FORMAT = "marie-laboratory"
+FORMAT_VERSION = 2
+READABLE_VERSIONS = (1, 2)  # Version 1 keyed working directories by content hash
+BATCH_SIZE = 2000
+EMBEDDINGS_MEMBER = "embeddings/concepts.f32"
+EMBEDDING_OFFSET = "_embedding_offset"  # Archive-only concept field, in float32 components
+WORK_MEMBER = "work"
+WORK_FILES = ("text.txt", "embeddings.f32")  # Passage text and packed chunk vectors of a source
+
+concepts_table = Concept.__table__
+relationships_table = ConceptRelationship.__table__
+tag_metadata_table = ConceptTagAssociation.__table__
+
+# member -> (table, {foreign key column: member it refers to}), in insert order
+TABLES = {
+    "laboratory": (Laboratory.__table__, {}),
+    "tags": (Tag.__table__, {"laboratory_id": "laboratory", "parent_id": "tags"}),
+    "sources": (Source.__table__, {"laboratory_id": "laboratory"}),
+    "source_chunks": (SourceChunk.__table__, {"laboratory_id": "laboratory", "source_id": "sources"}),
+    "concepts": (concepts_table, {"laboratory_id": "laboratory", "source_id": "sources"}),
+    "concept_tags": (concept_tags, {"concept_id": "concepts", "tag_id": "tags"}),
+    "concept_tag_metadata": (tag_metadata_table, {"concept_id": "concepts", "tag_id": "tags"}),
+    "relationships": (relationships_table, {"source_concept_id": "concepts", "target_concept_id": "concepts"}),
+    "notebook_entries": (NotebookEntry.__table__, {
+        "laboratory_id": "laboratory", "concept_id": "concepts", "source_id": "sources",
+    }),
+}
+
+
+class ArchiveError(ValueError):
+    """The file is not a laboratory archive this version can read."""
+
+
+# -- export ------------------------------------------------------------------------
+
+def _export_queries(laboratory_id: int) -> Dict[str, object]:
+    lab_concepts = select(concepts_table.c.id).where(concepts_table.c.laboratory_id == laboratory_id)
+    tags = Tag.__table__
+    used_tags = select(concept_tags.c.tag_id).where(concept_tags.c.concept_id.in_(lab_concepts))
+    return {
+        "laboratory": select(Laboratory.__table__).where(Laboratory.__table__.c.id == laboratory_id),
+        "tags": select(tags).where(or_(tags.c.laboratory_id == laboratory_id, tags.c.id.in_(used_tags))),
+        "sources": select(Source.__table__).where(Source.__table__.c.laboratory_id == laboratory_id),
+        "source_chunks": select(SourceChunk.__table__).where(SourceChunk.__table__.c.source_id.in_(
+            select(Source.__table__.c.id).where(Source.__table__.c.laboratory_id == laboratory_id)
+        )),
+        "concepts": select(concepts_table).where(concepts_table.c.laboratory_id == laboratory_id),
+        "concept_tags": select(concept_tags).where(concept_tags.c.concept_id.in_(lab_concepts)),
+        "concept_tag_metadata": select(tag_metadata_table).where(tag_metadata_table.c.concept_id.in_(lab_concepts)),
+        "relationships": select(relationships_table).where(
+            relationships_table.c.source_concept_id.in_(lab_concepts),
+            relationships_table.c.target_concept_id.in_(lab_concepts),
+        ),
+        "notebook_entries": select(NotebookEntry.__table__)
+        .where(NotebookEntry.__table__.c.laboratory_id == laboratory_id),
+    }
+
+
+def _encoder(table):
+    """Convert a row to JSON-ready values; only date and enum columns need it."""
+    converted = [c.name for c in table.columns if isinstance(c.type, (DateTime, Enum))]
+
+    def encode(row) -> dict:
+        row = dict(row)
+        for name in converted:
+            value = row[name]
+            if isinstance(value, datetime):
+                row[name] = value.isoformat()
+            elif isinstance(value, enum.Enum):
+                row[name] = value.name
+        return row
+
+    return encode
+
+
+def export_laboratory(laboratory_id: int, path: Path) -> Dict[str, int]:
+    """Write a laboratory to a zip archive at ``path``; returns row counts per table."""
+    counts = {}
+    with engine.connect() as connection, connection.begin():
+        laboratory_name = connection.scalar(
+            select(Laboratory.__table__.c.name).where(Laboratory.__table__.c.id == laboratory_id)
+        )
+        if laboratory_name is None:
+            raise LookupError(f"Laboratory {laboratory_id} not found")
+
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive, tempfile.TemporaryFile() as embeddings:
+            embedding_offset = 0
+            for member, query in _export_queries(laboratory_id).items():
+                table = TABLES[member][0]
+                encode = _encoder(table)
+                counts[member] = 0
+                result = connection.execution_options(yield_per=BATCH_SIZE).execute(query.order_by(*table.primary_key))
+                with archive.open(f"{member}.jsonl", "w", force_zip64=True) as out:
+                    for partition in result.mappings().partitions():
+                        lines = []
+                        for row in partition:
+                            row = encode(row)
+                            if member == "concepts" and row["embedding_vector"] is not None:
+                                vector = row.pop("embedding_vector")
+                                embeddings.write(vector)
+                                row[EMBEDDING_OFFSET] = embedding_offset
+                                row["embedding_dim"] = len(vector) // 4
+                                embedding_offset += len(vector) // 4
+                            row.pop("embedding_vector", None)
+                            row.pop("cluster_id", None)  # Clusters are recomputed after an import
+                            lines.append(json.dumps(row, ensure_ascii=False))
+                        out.write(("\n".join(lines) + "\n").encode("utf-8"))
+                        counts[member] += len(lines)
+
+            # Float32 noise barely compresses, store it as is
+            embeddings.seek(0)
+            info = zipfile.ZipInfo(EMBEDDINGS_MEMBER, date_time=datetime.utcnow().timetuple()[:6])
+            info.compress_type = zipfile.ZIP_STORED
+            with archive.open(info, "w", force_zip64=True) as out:
+                shutil.copyfileobj(embeddings, out, 1024 * 1024)
+
+            source_ids = connection.scalars(
+                select(Source.__table__.c.id).where(Source.__table__.c.laboratory_id == laboratory_id)
+            )
+            for source_id in source_ids:
+                directory = Path(settings.UPLOAD_DIR) / "extracted" / str(source_id)
+                for name in WORK_FILES:
+                    if (directory / name).is_file():
+                        compression = zipfile.ZIP_STORED if name.endswith(".f32") else zipfile.ZIP_DEFLATED
+                        archive.write(directory / name, f"{WORK_MEMBER}/{source_id}/{name}", compress_type=compression)
+
+            archive.writestr("manifest.json", json.dumps({
+                "format": FORMAT,
+                "version": FORMAT_VERSION,
+                "exported_at": datetime.utcnow().isoformat(),
+                "laboratory": laboratory_name,
+                "counts": counts,
+            }, indent=2))
+    return counts
+
+
+# -- import ------------------------------------------------------------------------
+
+def _read_rows(archive: zipfile.ZipFile, member: str) -> Iterator[List[dict]]:
+    """Batches of decoded rows from a JSON Lines member."""
+    with archive.open(f"{member}.jsonl") as source:
+        batch = []
+        for line in source:
+            if line.strip():
+                batch.append(json.loads(line))
+            if len(batch) >= BATCH_SIZE:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def _decoder(table):
+    """Convert archived JSON values back to what the table's columns accept."""
+    columns = set(table.c.keys())
+    datetime_columns = [c.name for c in table.columns if isinstance(c.type, DateTime)]
+
+    def decode(row: dict) -> dict:
+        if not row.keys() <= columns:
+            row = {key: value for key, value in row.items() if key in columns}
+        for name in datetime_columns:
+            if isinstance(row.get(name), str):
+                row[name] = datetime.fromisoformat(row[name])
+        return row
+
+    return decode
+
+
+def _unique_laboratory_name(connection, name: str) -> str:
+    names = Laboratory.__table__.c.name
+    candidate, suffix = name, 1
+    while connection.scalar(select(names).where(names == candidate)) is not None:
+        suffix += 1
+        candidate = f"{name} ({suffix})"
+    return candidate
+
+
+def import_laboratory(path: Path, name: Optional[str] = None) -> dict:
+    """
+    Load an archive as a new laboratory. Returns its id, name and the row
+    counts inserted per table. Everything is inserted in one transaction.
+    """
+    from app.services.reindex import stale_concepts_condition
+
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ArchiveError("Not a zip archive")
+
+    with archive:
+        try:
+            manifest = json.loads(archive.read("manifest.json"))
+        except (KeyError, ValueError):
+            raise ArchiveError("Archive has no readable manifest")
+        if manifest.get("format") != FORMAT or manifest.get("version") not in READABLE_VERSIONS:
+            raise ArchiveError(f"Unsupported archive format {manifest.get('format')} v{manifest.get('version')}")
+
+        id_maps: Dict[str, Dict[int, int]] = {member: {} for member in TABLES}
+        tag_parents = []
+        source_hashes = {}
+        counts = {}
+        embeddings = archive.open(EMBEDDINGS_MEMBER) if EMBEDDINGS_MEMBER in archive.namelist() else None
+
+        with engine.begin() as connection:
+            for member, (table, foreign_keys) in TABLES.items():
+                counts[member] = 0
+                if f"{member}.jsonl" not in archive.namelist():
+                    continue
+                decode = _decoder(table)
+                has_id = "id" in table.c
+
+                for batch in _read_rows(archive, member):
+                    old_ids, rows = [], []
+                    for raw in batch:
+                        embedding_offset = raw.pop(EMBEDDING_OFFSET, None)
+                        row = decode(raw)
+                        old_id = row.pop("id", None)
+
+                        if member == "laboratory":
+                            row["name"] = _unique_laboratory_name(connection, name or row["name"])
+                        if member == "tags":
+                            parent_id = row.pop("parent_id", None)
+                            if row.get("laboratory_id") is None:
+                                # Global tags are shared, reuse one with the same name
+                                existing = connection.scalar(
+                                    select(Tag.__table__.c.id)
+                                    .where(Tag.__table__.c.laboratory_id.is_(None), Tag.__table__.c.name == row["name"])
+                                )
+                                if existing is not None:
+                                    id_maps["tags"][old_id] = existing
+                                    continue
+                            tag_parents.append((old_id, parent_id))
+                        if member == "sources":
+                            source_hashes[old_id] = row.get("content_hash")
+
+                        unresolved = False
+                        for column, referenced in foreign_keys.items():
+                            if row.get(column) is None:
+                                continue
+                            row[column] = id_maps[referenced].get(row[column])
+                            unresolved |= row[column] is None and not table.c[column].nullable
+                        if unresolved:
+                            continue
+
+                        if embedding_offset is not None and embeddings is not None:
+                            embeddings.seek(embedding_offset * 4)
+                            row["embedding_vector"] = embeddings.read(row["embedding_dim"] * 4)
+                        old_ids.append(old_id)
+                        rows.append(row)
+
+                    if not rows:
+                        continue
+                    if member == "concepts":
+                        _release_taken_zettel_ids(connection, rows)
+                    # Every row of a table carries the same keys, as executemany requires
+                    keys = set().union(*rows)
+                    rows = [{key: row.get(key) for key in keys} for row in rows]
+
+                    if has_id:
+                        id_maps[member].update(zip(old_ids, _insert_with_ids(connection, table, rows)))
+                    else:
+                        connection.execute(table.insert(), rows)
+                    counts[member] += len(rows)
+
+            laboratory_id = next(iter(id_maps["laboratory"].values()), None)
+            if laboratory_id is None:
+                raise ArchiveError("Archive contains no laboratory")
+
+            _link_tag_parents(connection, id_maps["tags"], tag_parents)
+            _refresh_laboratory_counters(connection, laboratory_id)
+
+            # Concepts without a vector from the current model are re-embedded in the background
+            now = datetime.utcnow()
+            connection.execute(
+                DirtyRecord.__table__.insert().from_select(
+                    ["entity", "entity_id", "reason", "marked_at", "created_at", "updated_at"],
+                    select(literal("concept"), Concept.id, literal("import"), literal(now), literal(now), literal(now))
+                    .where(Concept.laboratory_id == laboratory_id, stale_concepts_condition()),
+                )
+            )
+            laboratory_name = connection.scalar(
+                select(Laboratory.__table__.c.name).where(Laboratory.__table__.c.id == laboratory_id)
+            )
+
+        if embeddings is not None:
+            embeddings.close()
+        _restore_work_directories(archive, source_hashes, id_maps["sources"], manifest["version"])
+        has_chunks = "source_chunks.jsonl" in archive.namelist()
+
+    from app.services.ingestion import enqueue_source, ingestion_worker
+    from app.services.passages import chunk_vector_store
+
+    with SessionLocal() as db:
+        chunk_vector_store.rebuild(db, laboratory_id)
+        if not has_chunks:
+            # Archives from before passages were exported: chunk and embed the sources again
+            processed = db.scalars(
+                select(Source.id).where(Source.laboratory_id == laboratory_id, Source.is_processed == True)
+            ).all()
+            for source_id in processed:
+                enqueue_source(db, source_id, priority=-1)
+            if processed:
+                ingestion_worker.notify()
+
+    # Core inserts bypass the response cache's commit hooks
+    response_cache.invalidate("laboratories", "tags")
+    return {"laboratory_id": laboratory_id, "name": laboratory_name, "counts": counts}
+
+
+def _restore_work_directories(archive: zipfile.ZipFile, source_hashes: Dict[int, Optional[str]],
+                              source_ids: Dict[int, int], version: int):
+    """Unpack the archived working directories into those of the imported sources."""
+    names = set(archive.namelist())
+    for old_id, content_hash in source_hashes.items():
+        if old_id not in source_ids:
+            continue
+        old_key = str(old_id) if version >= 2 else content_hash or str(old_id)
+        directory = Path(settings.UPLOAD_DIR) / "extracted" / str(source_ids[old_id])
+        for name in WORK_FILES:
+            member = f"{WORK_MEMBER}/{old_key}/{name}"
+            if member not in names or (directory / name).exists():
+                continue
+            directory.mkdir(parents=True, exist_ok=True)
+            partial = directory / f"{name}.part"
+            with archive.open(member) as source, open(partial, "wb") as out:
+                shutil.copyfileobj(source, out, 1024 * 1024)
+            os.replace(partial, directory / name)
+
+
+def _insert_with_ids(connection, table, rows: List[dict]) -> List[int]:
+    """Bulk insert ``rows`` and return their new ids, in order."""
+    if connection.dialect.name != "sqlite" or table is Laboratory.__table__:
+        return connection.scalars(table.insert().returning(table.c.id, sort_by_parameter_order=True), rows).all()
+
+    # SQLite runs RETURNING one row per statement. The laboratory row was
+    # inserted first, so this transaction holds the write lock and the ids
+    # after max(id) are ours to assign.
+    start = connection.scalar(select(func.coalesce(func.max(table.c.id), 0))) + 1
+    ids = list(range(start, start + len(rows)))
+    for row, row_id in zip(rows, ids):
+        row["id"] = row_id
+    connection.execute(table.insert(), rows)
+    return ids
+
+
+def _release_taken_zettel_ids(connection, rows: List[dict]):
+    """Zettel ids are globally unique; concepts whose id is taken get none."""
+    wanted = [row["zettel_id"] for row in rows if row.get("zettel_id")]
+    if not wanted:
+        return
+    taken = set(connection.scalars(select(concepts_table.c.zettel_id).where(concepts_table.c.zettel_id.in_(wanted))))
+    for row in rows:
+        if row.get("zettel_id") in taken:
+            row["zettel_id"] = None
+
+
+def _link_tag_parents(connection, tag_ids: Dict[int, int], tag_parents):
+    """Tags reference each other, so parents are set once every tag exists."""
+    tags = Tag.__table__
+    params = [
+        {"tag_id": tag_ids[old_id], "new_parent_id": tag_ids[old_parent_id]}
+        for old_id, old_parent_id in tag_parents
+        if old_parent_id in tag_ids and old_id in tag_ids
+    ]
+    if params:
+        connection.execute(
+            update(tags)
+            .where(tags.c.id == bindparam("tag_id"), tags.c.parent_id.is_(None))
+            .values(parent_id=bindparam("new_parent_id")),
+            params,
+        )
+
+
+def _refresh_laboratory_counters(connection, laboratory_id: int):
+    """Bulk inserts bypass the counter events in app.services.lab_stats."""
+    laboratories = Laboratory.__table__
+    connection.execute(
+        update(laboratories)
+        .where(laboratories.c.id == laboratory_id)
+        .values(
+            concept_count=select(func.count(Concept.id))
+            .where(Concept.laboratory_id == laboratory_id, Concept.is_active.isnot(False)).scalar_subquery(),
+            source_count=select(func.count(Source.id))
+            .where(Source.laboratory_id == laboratory_id, Source.is_archived.isnot(True)).scalar_subquery(),
+            study_hours=select(func.coalesce(func.sum(NotebookEntry.time_spent), 0))
+            .where(NotebookEntry.laboratory_id == laboratory_id).scalar_subquery(),
+        )
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    export_parser = commands.add_parser("export")
+    export_parser.add_argument("laboratory_id", type=int)
+    export_parser.add_argument("path", type=Path)
+    import_parser = commands.add_parser("import")
+    import_parser.add_argument("path", type=Path)
+    import_parser.add_argument("--name")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.command == "export":
+        result = export_laboratory(args.laboratory_id, args.path)
+    else:
+        result = import_laboratory(args.path, args.name)
+    print(json.dumps(result, indent=2))
+    print(f"⏱️ {args.command} took {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,395 @@
+"""
+Concept clusters: communities of the relationship graph.
+
+A laboratory is clustered with Louvain modularity optimisation
+(``networkx.community.louvain_communities``) over its active relationships,
+each weighted by ``strength * confidence``; relationships between the same
+two concepts add up, and a bidirectional relationship counts once in each
+direction. Communities smaller than ``CLUSTER_MIN_SIZE`` are dissolved.
+Every cluster gets a centroid, the normalised mean of its members'
+embeddings; concepts left without a community (isolated, or in a dissolved
+one) join the cluster with the closest centroid when the cosine similarity
+reaches ``CLUSTER_ATTACH_THRESHOLD``.
+
+A run replaces all clusters of the laboratory and rewrites
+``Concept.cluster_id``. Runs are slow on large laboratories, so they happen
+on a background worker: on request, and for laboratories of at least
+``CLUSTERING_MIN_CONCEPTS`` concepts whenever concepts or relationships were
+added since their last run (checked every ``CLUSTERING_INTERVAL`` seconds).
+Each run records ``Laboratory.clustered_at``, so a laboratory whose run
+found no clusters is not clustered again until it changes, across restarts.
+Concepts added since are simply unclustered until the next run.
+
+Cluster-first search (``closest_clusters``) ranks a laboratory's clusters by
+the similarity of their centroids to the query, so retrieval can be
+restricted to the members of the best few.
+"""
+
+import json
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import bindparam, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.cluster import ConceptCluster
+from app.models.concept import Concept
+from app.models.laboratory import Laboratory
+from app.models.relationships import ConceptRelationship
+from app.services.graph import LaboratoryGraph, graph_store
+from app.services.response_cache import invalidate_on_commit
+from app.services.vector_store import current_index
+from app.utils.vectors import normalize, pack_vector, unpack_vector
+
+KEY_CONCEPTS = 5  # Most central members remembered per cluster
+LABEL_CONCEPTS = 3  # Of which the label is made
+
+
+# -- community detection -------------------------------------------------------------
+
+def link_weights(graph: LaboratoryGraph, included: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Undirected weighted links between the graph's nodes (indices into
+    ``graph.node_ids``) whose ``included`` flag is set: ``(lo, hi, weight)``
+    with ``lo < hi`` and one entry per pair.
+    """
+    offsets, neighbours, strengths, confidences, _, _ = graph.csr()
+    node_count = len(offsets) - 1
+    sources = np.repeat(np.arange(node_count, dtype=np.int64), np.diff(offsets))
+    targets = neighbours.astype(np.int64)
+    keep = (sources != targets) & included[sources] & included[targets]
+
+    lo = np.minimum(sources, targets)[keep]
+    hi = np.maximum(sources, targets)[keep]
+    weights = (strengths.astype(np.float64) * confidences)[keep]
+    pairs, inverse = np.unique(lo * node_count + hi, return_inverse=True)
+    return pairs // node_count, pairs % node_count, np.bincount(inverse, weights, minlength=len(pairs))
+
+
+def detect_communities(lo: np.ndarray, hi: np.ndarray, weights: np.ndarray,
+                       resolution: float = 1.0, seed: int = 0) -> Tuple[List[List[int]], float]:
+    """Louvain communities of the linked nodes, largest first, and the partition's modularity."""
+    import networkx as nx
+
+    linked = nx.Graph()
+    linked.add_weighted_edges_from(zip(lo.tolist(), hi.tolist(), weights.tolist()))
+    if not linked.number_of_edges():
+        return [], 0.0
+    communities = nx.community.louvain_communities(linked, weight="weight", resolution=resolution, seed=seed)
+    modularity = nx.community.modularity(linked, communities, weight="weight", resolution=resolution)
+    return sorted((sorted(c) for c in communities), key=len, reverse=True), float(modularity)
+
+
+def cluster_laboratory(db: Session, laboratory_id: int) -> dict:
+    """Cluster a laboratory and replace its clusters. Commits and returns a summary of the run."""
+    clustered_at = datetime.utcnow()
+    started = time.perf_counter()
+
+    concepts = {
+        row.id: row for row in db.execute(
+            select(Concept.id, Concept.title, Concept.importance_score)
+            .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True)
+        )
+    }
+    graph = graph_store.get(db, laboratory_id)
+    node_ids = list(graph.node_ids)
+    included = np.fromiter((concept_id in concepts for concept_id in node_ids), dtype=np.bool_, count=len(node_ids))
+    lo, hi, weights = link_weights(graph, included)
+    communities, modularity = detect_communities(lo, hi, weights, settings.CLUSTER_RESOLUTION, seed=laboratory_id)
+    communities = [c for c in communities if len(c) >= settings.CLUSTER_MIN_SIZE]
+
+    labels = np.full(len(node_ids), -1, dtype=np.int64)
+    for number, community in enumerate(communities):
+        labels[community] = number
+    degree = np.bincount(lo, weights, minlength=len(node_ids)) + np.bincount(hi, weights, minlength=len(node_ids))
+    inside = (labels[lo] == labels[hi]) & (labels[lo] >= 0)
+    internal = np.bincount(labels[lo][inside], weights[inside], minlength=len(communities))
+    volume = np.bincount(labels[labels >= 0], degree[labels >= 0], minlength=len(communities))
+
+    # Central members first: most link weight, then most important
+    def centrality(node: int):
+        concept_id = node_ids[node]
+        return -degree[node], -(concepts[concept_id].importance_score or 0.0), concept_id
+
+    members = [[node_ids[node] for node in sorted(community, key=centrality)] for community in communities]
+
+    index = current_index(db, laboratory_id)
+    centroids: List[Optional[np.ndarray]] = [None] * len(members)
+    if index is not None:
+        for number, ids in enumerate(members):
+            _, vectors = index.vectors_of(ids)
+            if len(vectors):
+                centroids[number] = normalize(vectors.mean(axis=0))
+
+        # Concepts without a community join the closest cluster, if it is close enough
+        with_centroid = [number for number, centroid in enumerate(centroids) if centroid is not None]
+        clustered = {concept_id for ids in members for concept_id in ids}
+        loose_ids, loose_vectors = index.vectors_of(concept_id for concept_id in concepts if concept_id not in clustered)
+        if with_centroid and len(loose_ids):
+            similarities = loose_vectors @ np.stack([centroids[number] for number in with_centroid]).T
+            best = similarities.argmax(axis=1)
+            for concept_id, column, similarity in zip(loose_ids.tolist(), best, similarities[np.arange(len(best)), best]):
+                if similarity >= settings.CLUSTER_ATTACH_THRESHOLD:
+                    members[with_centroid[column]].append(concept_id)
+
+    # Replace the laboratory's clusters
+    db.execute(
+        update(Concept)
+        .where(Concept.laboratory_id == laboratory_id, Concept.cluster_id.isnot(None))
+        .values(cluster_id=None, updated_at=Concept.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.execute(delete(ConceptCluster).where(ConceptCluster.laboratory_id == laboratory_id))
+    clusters = [
+        ConceptCluster(
+            laboratory_id=laboratory_id,
+            label=", ".join(concepts[concept_id].title for concept_id in ids[:LABEL_CONCEPTS])[:200],
+            size=len(ids),
+            cohesion=round(float(2 * internal[number] / volume[number]), 4) if volume[number] else 0.0,
+            key_concept_ids=json.dumps(ids[:KEY_CONCEPTS]),
+            centroid=pack_vector(centroids[number]) if centroids[number] is not None else None,
+            centroid_dim=len(centroids[number]) if centroids[number] is not None else None,
+            embedding_model=(index.model or settings.EMBEDDING_MODEL) if centroids[number] is not None else None,
+            created_at=clustered_at,
+            updated_at=clustered_at,
+        )
+        for number, ids in enumerate(members)
+    ]
+    db.add_all(clusters)
+    db.flush()
+
+    # Membership is derived data: leave updated_at to edits of the concept itself
+    concepts_table = Concept.__table__
+    assignments = [
+        {"concept_id": concept_id, "cluster": cluster.id}
+        for cluster, ids in zip(clusters, members) for concept_id in ids
+    ]
+    if assignments:
+        db.connection().execute(
+            concepts_table.update()
+            .where(concepts_table.c.id == bindparam("concept_id"))
+            .values(cluster_id=bindparam("cluster"), updated_at=concepts_table.c.updated_at),
+            assignments,
+        )
+    # Bookkeeping, not an edit of the laboratory: its responses and updated_at stay as they are
+    laboratories_table = Laboratory.__table__
+    db.connection().execute(
+        laboratories_table.update()
+        .where(laboratories_table.c.id == laboratory_id)
+        .values(clustered_at=clustered_at, updated_at=laboratories_table.c.updated_at)
+    )
+    invalidate_on_commit(db, f"concepts:{laboratory_id}", f"clusters:{laboratory_id}")
+    db.commit()
+
+    return {
+        "laboratory_id": laboratory_id,
+        "clustered_at": clustered_at,
+        "clusters": len(clusters),
+        "clustered": len(assignments),
+        "unclustered": len(concepts) - len(assignments),
+        "modularity": round(modularity, 4),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+
+# -- queries -------------------------------------------------------------------------
+
+def closest_clusters(db: Session, laboratory_id: int, query_vector, count: int) -> List[Tuple[int, float]]:
+    """The ``count`` clusters whose centroids are most similar to the query: (cluster_id, score) best first."""
+    rows = db.execute(
+        select(ConceptCluster.id, ConceptCluster.centroid, ConceptCluster.centroid_dim)
+        .where(
+            ConceptCluster.laboratory_id == laboratory_id,
+            ConceptCluster.centroid.isnot(None),
+            ConceptCluster.embedding_model == settings.EMBEDDING_MODEL,
+        )
+    ).all()
+    query_vector = normalize(query_vector)
+    rows = [row for row in rows if row.centroid_dim == len(query_vector)]
+    if not rows or count <= 0:
+        return []
+
+    scores = np.stack([unpack_vector(row.centroid) for row in rows]) @ query_vector
+    top = np.argsort(-scores, kind="stable")[:count]
+    return [(rows[number].id, float(scores[number])) for number in top]
+
+
+def linked_clusters(db: Session, laboratory_id: int, cluster_id: int) -> List[Tuple[int, float]]:
+    """Clusters the members of a cluster link to, by total link weight, heaviest first."""
+    membership = dict(db.execute(
+        select(Concept.id, Concept.cluster_id)
+        .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True, Concept.cluster_id.isnot(None))
+    ).all())
+    graph = graph_store.get(db, laboratory_id)
+    labels = np.fromiter((membership.get(concept_id, -1) for concept_id in graph.node_ids),
+                         dtype=np.int64, count=len(graph.node_ids))
+    lo, hi, weights = link_weights(graph, labels >= 0)
+
+    outgoing = (labels[lo] == cluster_id) & (labels[hi] != cluster_id)
+    incoming = (labels[hi] == cluster_id) & (labels[lo] != cluster_id)
+    others = np.concatenate([labels[hi][outgoing], labels[lo][incoming]])
+    if not len(others):
+        return []
+    linked, inverse = np.unique(others, return_inverse=True)
+    totals = np.bincount(inverse, np.concatenate([weights[outgoing], weights[incoming]]))
+    order = np.argsort(-totals, kind="stable")
+    return [(int(linked[number]), round(float(totals[number]), 4)) for number in order]
+
+
+def stale_laboratories(db: Session) -> List[int]:
+    """
+    Laboratories of at least ``CLUSTERING_MIN_CONCEPTS`` active concepts that
+    gained concepts or relationships since they were last clustered.
+    """
+    sizes = db.execute(
+        select(Concept.laboratory_id, func.max(Concept.created_at))
+        .where(Concept.is_active == True)
+        .group_by(Concept.laboratory_id)
+        .having(func.count(Concept.id) >= settings.CLUSTERING_MIN_CONCEPTS)
+    ).all()
+    if not sizes:
+        return []
+    laboratory_ids = [laboratory_id for laboratory_id, _ in sizes]
+    # Clusters written before clustered_at was recorded still date their run
+    first_clusters = (
+        select(func.min(ConceptCluster.created_at))
+        .where(ConceptCluster.laboratory_id == Laboratory.id)
+        .scalar_subquery()
+    )
+    last_runs = dict(db.execute(
+        select(Laboratory.id, func.coalesce(Laboratory.clustered_at, first_clusters))
+        .where(Laboratory.id.in_(laboratory_ids))
+    ).all())
+    last_links = dict(db.execute(
+        select(Concept.laboratory_id, func.max(ConceptRelationship.created_at))
+        .join(Concept, Concept.id == ConceptRelationship.source_concept_id)
+        .where(Concept.laboratory_id.in_(laboratory_ids))
+        .group_by(Concept.laboratory_id)
+    ).all())
+
+    stale = []
+    for laboratory_id, newest_concept in sizes:
+        last_run = last_runs.get(laboratory_id)
+        newest = max(filter(None, (newest_concept, last_links.get(laboratory_id))))
+        if last_run is None or newest > last_run:
+            stale.append(laboratory_id)
+    return stale
+
+
+# -- clustering worker ---------------------------------------------------------------
+
+class ClusteringWorker:
+    """Background thread clustering one laboratory at a time, on request or when it grew."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._queue: Dict[int, None] = {}  # Laboratories to cluster, in request order
+        self._current: Optional[int] = None
+        self.results: Dict[int, dict] = {}
+        self.last_error = None
+        self.stats = {"runs": 0, "failures": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="clustering", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def schedule(self, laboratory_id: int):
+        """Cluster a laboratory as soon as the worker is free."""
+        with self._lock:
+            self._queue.setdefault(laboratory_id, None)
+        self._wake.set()
+
+    def status(self, laboratory_id: Optional[int] = None) -> dict:
+        with self._lock:
+            queued = list(self._queue)
+        if laboratory_id is not None:
+            return {
+                "alive": self.is_running,
+                "queued": laboratory_id in queued,
+                "running": self._current == laboratory_id,
+                "last_run": self.results.get(laboratory_id),
+            }
+        return {
+            "alive": self.is_running,
+            "queued": queued,
+            "running": self._current,
+            "processed": dict(self.stats),
+            "last_error": self.last_error,
+        }
+
+    # -- internals ---------------------------------------------------------------
+
+    def _next(self) -> Optional[int]:
+        with self._lock:
+            if not self._queue:
+                return None
+            laboratory_id = next(iter(self._queue))
+            del self._queue[laboratory_id]
+            self._current = laboratory_id
+            return laboratory_id
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                if settings.CLUSTERING_INTERVAL > 0:
+                    with SessionLocal() as db:
+                        for laboratory_id in stale_laboratories(db):
+                            with self._lock:
+                                self._queue.setdefault(laboratory_id, None)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Clustering scan error: {e}")
+
+            while not self._stop.is_set():
+                laboratory_id = self._next()
+                if laboratory_id is None:
+                    break
+                self.run(laboratory_id)
+            self._wake.wait(settings.CLUSTERING_INTERVAL or None)
+
+    def run(self, laboratory_id: int) -> Optional[dict]:
+        """Cluster a laboratory now, on the calling thread; None if it failed."""
+        try:
+            with SessionLocal() as db:
+                result = cluster_laboratory(db, laboratory_id)
+        except Exception as e:
+            self.last_error = str(e)
+            self.stats["failures"] += 1
+            print(f"❌ Clustering error in laboratory {laboratory_id}: {e}")
+            return None
+        finally:
+            with self._lock:
+                if self._current == laboratory_id:
+                    self._current = None
+        self.results[laboratory_id] = result
+        self.stats["runs"] += 1
+        self.last_error = None
+        print(f"🧩 Clustered laboratory {laboratory_id}: {result['clusters']} clusters, "
+              f"{result['clustered']} concepts in {result['seconds']}s")
+        return result
+
+
+clustering_worker = ClusteringWorker()
@@ -0,0 +1,112 @@
+"""
+Content-addressed storage and duplicate detection for sources.
+
+Uploaded files live once under ``UPLOAD_DIR/objects/<ab>/<sha256><suffix>``
+and every Source importing the same bytes references that object. That
+object is the only thing duplicates share: ingestion artefacts (text,
+chunks, embeddings) are rewritten in place by the pipeline, so each source
+keeps them in its own working directory. A re-import of known content
+copies the processed results instead of running the pipeline again.
+"""
+
+import hashlib
+import os
+from pathlib import Path
+from typing import Optional
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.source import Source
+
+# Results copied from an already processed duplicate
+REUSED_FIELDS = (
+    "content_hash", "file_size", "page_count", "duration", "summary", "key_topics",
+    "embedding_model", "embedding_version",
+)
+
+
+def objects_dir() -> Path:
+    return Path(settings.UPLOAD_DIR) / "objects"
+
+
+def find_object(sha256: str) -> Optional[Path]:
+    """Stored object for a digest, whatever suffix it was stored with."""
+    directory = objects_dir() / sha256[:2]
+    if not directory.is_dir():
+        return None
+    return next(directory.glob(f"{sha256}*"), None)
+
+
+def put_file(path: Path, sha256: str, suffix: str = "") -> Path:
+    """
+    Move ``path`` into the store under its digest. If the content is
+    already stored the new copy is deleted and the existing object returned.
+    """
+    existing = find_object(sha256)
+    if existing is not None:
+        os.remove(path)
+        return existing
+
+    destination = objects_dir() / sha256[:2] / f"{sha256}{suffix.lower()}"
+    destination.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(path, destination)
+    return destination
+
+
+def assign_content_hash(source: Source):
+    """Remote sources without a file are addressed by their normalised URL."""
+    if source.content_hash is None and source.normalized_url and not source.file_path:
+        source.content_hash = hashlib.sha256(source.normalized_url.encode("utf-8")).hexdigest()
+
+
+def find_duplicate(db: Session, source: Source) -> Optional[Source]:
+    """
+    A processed source with the same content hash, DOI, ISBN or normalised
+    URL, using the indexes on those columns. Sources carrying their own file
+    only match on identical bytes.
+    """
+    matches = []
+    if source.content_hash:
+        matches.append(Source.content_hash == source.content_hash)
+    if not source.file_path:
+        if source.doi:
+            matches.append(Source.doi == source.doi)
+        if source.isbn:
+            matches.append(Source.isbn == source.isbn)
+        if source.normalized_url:
+            matches.append(Source.normalized_url == source.normalized_url)
+    if not matches:
+        return None
+
+    return db.scalars(
+        select(Source)
+        .where(or_(*matches), Source.is_processed.is_(True), Source.id != source.id)
+        .order_by(Source.id)
+        .limit(1)
+    ).first()
+
+
+def reuse_duplicate(db: Session, source: Source) -> Optional[Source]:
+    """
+    Copy processed results from a known duplicate onto ``source``, chunks
+    and working files included, and mark it processed once its passages are searchable in its
+    laboratory. Returns the original, or None when the content is new. The
+    caller commits.
+    """
+    from app.services.passages import copy_chunks, index_source_chunks
+
+    assign_content_hash(source)
+    original = find_duplicate(db, source)
+    if original is None or original.content_hash is None:
+        return None
+
+    for field in REUSED_FIELDS:
+        setattr(source, field, getattr(original, field))
+    if not source.file_path:
+        source.file_path = original.file_path
+    if copy_chunks(db, original, source) and source.embedding_model:
+        index_source_chunks(db, source)
+    source.is_processed = True
+    return original
@@ -0,0 +1,138 @@
+"""
+Write-behind buffer for hot usage counters.
+
+Graph traversals bump ``ConceptRelationship.access_count`` and tagging a
+concept bumps ``Tag.usage_count`` (the number of times it was applied).
+Instead of one UPDATE and commit per event, the increments are coalesced in memory per row and written by a background
+thread in one ``executemany`` transaction every ``COUNTER_FLUSH_INTERVAL``
+seconds, when ``COUNTER_MAX_PENDING`` increments are waiting, and at
+shutdown. A crash therefore loses at most ``COUNTER_MAX_PENDING``
+increments (plus those recorded while a flush is running) or
+``COUNTER_FLUSH_INTERVAL`` seconds of them, whichever is smaller.
+"""
+
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import bindparam, func
+
+from app.core.config import settings
+from app.core.database import engine
+from app.models.relationships import ConceptRelationship
+from app.models.tag import Tag
+
+# counter name -> (table, column)
+COUNTERS = {
+    "relationship_access": (ConceptRelationship.__table__, "access_count"),
+    "tag_usage": (Tag.__table__, "usage_count"),
+}
+
+
+class CounterBuffer:
+    """Coalesces counter increments and flushes them in bulk."""
+
+    def __init__(self):
+        self._pending: Dict[Tuple[str, int], int] = defaultdict(int)
+        self._pending_total = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self.last_error = None
+        self.stats = {"flushes": 0, "increments": 0, "rows": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        if self.is_running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="counters", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the flusher and write whatever is still pending."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        self.flush()
+
+    def increment(self, counter: str, row_ids: Iterable[int], amount: int = 1):
+        """Add ``amount`` to ``counter`` for every row in ``row_ids``."""
+        if counter not in COUNTERS:
+            raise KeyError(f"Unknown counter: {counter}")
+        with self._lock:
+            for row_id in row_ids:
+                self._pending[(counter, row_id)] += amount
+                self._pending_total += amount
+            full = self._pending_total >= settings.COUNTER_MAX_PENDING
+        if full:
+            self._wake.set()
+
+    def status(self) -> dict:
+        with self._lock:
+            pending = self._pending_total
+        return {
+            "alive": self.is_running,
+            "pending": pending,
+            "flushed": dict(self.stats),
+            "last_error": self.last_error,
+        }
+
+    def flush(self) -> int:
+        """Write pending increments in one transaction; returns rows updated."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, defaultdict(int)
+                total, self._pending_total = self._pending_total, 0
+            if not pending:
+                return 0
+
+            by_counter = defaultdict(list)
+            for (counter, row_id), amount in pending.items():
+                by_counter[counter].append({"row_id": row_id, "amount": amount})
+
+            try:
+                with engine.begin() as connection:
+                    for counter, params in by_counter.items():
+                        table, column = COUNTERS[counter]
+                        connection.execute(
+                            table.update()
+                            .where(table.c.id == bindparam("row_id"))
+                            # Counting a read is not an edit, keep updated_at
+                            .values({column: func.coalesce(table.c[column], 0) + bindparam("amount"),
+                                     "updated_at": table.c.updated_at}),
+                            params,
+                        )
+            except Exception:
+                # Keep the increments for the next attempt
+                with self._lock:
+                    for key, amount in pending.items():
+                        self._pending[key] += amount
+                    self._pending_total += total
+                raise
+
+            self.stats["flushes"] += 1
+            self.stats["increments"] += total
+            self.stats["rows"] += len(pending)
+            return len(pending)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.wait(settings.COUNTER_FLUSH_INTERVAL)
+            self._wake.clear()
+            try:
+                self.flush()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Counter flush failed: {e}")
+
+
+counter_buffer = CounterBuffer()
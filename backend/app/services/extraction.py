@@ -0,0 +1,238 @@
+"""
+Text extraction from PDF and DOCX files.
+
+``iter_pages`` yields a document's pages, in order, as soon as they are
+extracted, so a consumer can write or process them without holding the
+whole document. With ``EXTRACTION_WORKERS`` above 1, PDFs are split into
+contiguous ranges of ``EXTRACTION_PAGES_PER_TASK`` pages extracted on a
+shared process pool; each pool process keeps its last documents open, so a
+PDF is parsed once per process rather than once per range. Only a bounded
+number of ranges is in flight, so memory stays flat on very large books.
+Parallel extraction pays for process start-up and inter-process copies, so
+it is off by default: enable it only where the benchmark below shows a gain.
+DOCX files are split on their page breaks.
+
+Extracted text of a content-addressed object (see
+``app.services.content_store``) is cached next to it, as
+``objects/<ab>/text/<sha256><suffix>.txt`` with pages separated by form
+feeds; later extractions of the same bytes read that file instead.
+
+Run ``python -m app.utils.extraction_benchmark`` for pages per second on a
+synthetic corpus.
+"""
+
+import multiprocessing
+import os
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional
+
+from app.core.config import settings
+
+PAGE_BREAK = "\f"
+PDF_SUFFIXES = {".pdf"}
+DOCX_SUFFIXES = {".docx"}
+SUFFIXES = PDF_SUFFIXES | DOCX_SUFFIXES
+
+_READ_SIZE = 1024 * 1024
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _no_report(progress: float, message: str = None):
+    pass
+
+
+def extraction_workers() -> int:
+    return settings.EXTRACTION_WORKERS or os.cpu_count() or 1
+
+
+def _executor(workers: int) -> ProcessPoolExecutor:
+    """The shared extraction pool, recreated when the requested size changes."""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            # spawn: children must not inherit the parent's threads and DB connections
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+            _pool_workers = workers
+        return _pool
+
+
+def start_pool(workers: Optional[int] = None):
+    """Start every process of the extraction pool ahead of the first document."""
+    workers = workers or extraction_workers()
+    pool = _executor(workers)
+    for future in [pool.submit(os.getpid) for _ in range(workers)]:
+        future.result()
+
+
+def shutdown():
+    """Stop the extraction pool, if one was started."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=True, cancel_futures=True)
+            _pool = None
+
+
+# -- PDF -------------------------------------------------------------------------
+
+def _clean(text: Optional[str]) -> str:
+    # Form feeds separate pages in extracted text
+    return (text or "").replace(PAGE_BREAK, "\n")
+
+
+@lru_cache(maxsize=2)
+def _open_pdf(path: str, size: int, modified: int):
+    """
+    A parsed PDF, kept per pool process so the ranges of one document reuse
+    it; ``size`` and ``modified`` only key the cache.
+    """
+    from PyPDF2 import PdfReader
+
+    return PdfReader(path, strict=False)
+
+
+def _extract_pdf_range(path: str, start: int, stop: int) -> List[str]:
+    """Text of pages ``start``..``stop - 1``; runs in the extraction pool."""
+    stat = os.stat(path)
+    reader = _open_pdf(path, stat.st_size, stat.st_mtime_ns)
+    return [_clean(reader.pages[number].extract_text()) for number in range(start, stop)]
+
+
+def _iter_pdf(path: Path, report: Callable, workers: int) -> Iterator[str]:
+    from PyPDF2 import PdfReader
+
+    if workers <= 1:
+        reader = PdfReader(str(path), strict=False)
+        total = len(reader.pages)
+        for number, page in enumerate(reader.pages, start=1):
+            yield _clean(page.extract_text())
+            report(number / total, f"Extracted page {number}/{total}")
+        return
+
+    # Only the page count is read here; the pool processes parse the document
+    with open(path, "rb") as f:
+        total = len(PdfReader(f, strict=False).pages)
+    size = max(settings.EXTRACTION_PAGES_PER_TASK, 1)
+    ranges = ((start, min(start + size, total)) for start in range(0, total, size))
+    pool = _executor(workers)
+    # Two ranges per worker keep the pool busy while the consumer catches up
+    pending = deque(pool.submit(_extract_pdf_range, str(path), *r) for r in islice(ranges, 2 * workers))
+    done = 0
+    try:
+        while pending:
+            try:
+                pages = pending.popleft().result()
+            except BrokenProcessPool:
+                shutdown()
+                raise
+            following = next(ranges, None)
+            if following is not None:
+                pending.append(pool.submit(_extract_pdf_range, str(path), *following))
+            for page in pages:
+                done += 1
+                yield page
+            report(done / total, f"Extracted page {done}/{total}")
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# -- DOCX ------------------------------------------------------------------------
+
+def _iter_docx(path: Path, report: Callable) -> Iterator[str]:
+    import docx
+
+    document = docx.Document(str(path))
+    lines = []
+    for paragraph in document.paragraphs:
+        if paragraph.paragraph_format.page_break_before and lines:
+            yield _clean("\n".join(lines))
+            lines = []
+        lines.append(paragraph.text)
+        # Explicit breaks, or the ones Word recorded when it last laid the document out
+        if paragraph._p.xpath('.//w:br[@w:type="page"] | .//w:lastRenderedPageBreak'):
+            yield _clean("\n".join(lines))
+            lines = []
+    if lines:
+        yield _clean("\n".join(lines))
+    report(1.0, "Extracted document")
+
+
+# -- cache -----------------------------------------------------------------------
+
+def text_cache_path(path: Path) -> Optional[Path]:
+    """Where the text of a stored object is cached; None for files outside the store."""
+    from app.services.content_store import objects_dir
+
+    path = Path(path).resolve()
+    if objects_dir().resolve() not in path.parents:
+        return None
+    return path.parent / "text" / f"{path.name}.txt"
+
+
+def _iter_cached(cache: Path, report: Callable) -> Iterator[str]:
+    """Pages of a cached text file, read a block at a time."""
+    buffer = ""
+    with open(cache, encoding="utf-8") as f:
+        while True:
+            block = f.read(_READ_SIZE)
+            if not block:
+                break
+            *pages, buffer = (buffer + block).split(PAGE_BREAK)
+            yield from pages
+    yield buffer
+    report(1.0, "Extracted text read from cache")
+
+
+def _caching(pages: Iterator[str], cache: Path) -> Iterator[str]:
+    """Pass pages through while writing them to ``cache``; kept only if complete."""
+    cache.parent.mkdir(parents=True, exist_ok=True)
+    partial = cache.with_name(f"{cache.name}.{os.getpid()}.{threading.get_ident()}.part")
+    complete = False
+    try:
+        with open(partial, "w", encoding="utf-8") as f:
+            for number, page in enumerate(pages):
+                if number:
+                    f.write(PAGE_BREAK)
+                f.write(page)
+                yield page
+        os.replace(partial, cache)
+        complete = True
+    finally:
+        if not complete:
+            partial.unlink(missing_ok=True)
+
+
+# -- entry point -----------------------------------------------------------------
+
+def iter_pages(path: Path, report: Callable = _no_report, workers: Optional[int] = None,
+               use_cache: bool = True) -> Iterator[str]:
+    """
+    Pages of a PDF or DOCX file, in order, yielded as they are extracted.
+    ``workers`` overrides ``EXTRACTION_WORKERS`` for PDFs.
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    if suffix not in SUFFIXES:
+        raise ValueError(f"Cannot extract text from {suffix or 'files without a suffix'}")
+
+    cache = text_cache_path(path) if use_cache and settings.EXTRACTION_CACHE_ENABLED else None
+    if cache is not None and cache.exists():
+        return _iter_cached(cache, report)
+
+    if suffix in PDF_SUFFIXES:
+        pages = _iter_pdf(path, report, workers or extraction_workers())
+    else:
+        pages = _iter_docx(path, report)
+    return _caching(pages, cache) if cache is not None else pages
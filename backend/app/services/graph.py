@@ -0,0 +1,438 @@
+"""
+In-memory knowledge graph built from ``ConceptRelationship`` rows.
+
+Each laboratory's active edges are loaded once into growable NumPy edge
+arrays and compiled into CSR form (row offsets + neighbour indices +
+strength array). Commit hooks patch the edge arrays as relationships are
+inserted, updated or deleted; the CSR is recompiled in memory on the next
+query, so traversals never go back to SQL.
+"""
+
+import heapq
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import inspect, select
+from sqlalchemy.orm import aliased
+
+from app.core.events import register_commit_hook
+from app.models.concept import Concept
+from app.models.relationships import ConceptRelationship, RelationshipType
+
+RELATIONSHIP_TYPES = list(RelationshipType)
+_TYPE_CODES = {relationship_type: code for code, relationship_type in enumerate(RELATIONSHIP_TYPES)}
+
+_EDGE_FIELDS = (
+    ("source", np.int32),
+    ("target", np.int32),
+    ("strength", np.float32),
+    ("confidence", np.float32),
+    ("type", np.int8),
+    ("bidirectional", np.bool_),
+    ("alive", np.bool_),
+    ("relationship_id", np.int64),
+)
+
+
+class LaboratoryGraph:
+    """
+    Adjacency structure for one laboratory.
+
+    Nodes are concept ids mapped to dense indices. Edges live in parallel
+    arrays indexed by slot; ``relationship_id -> slot`` allows in-place
+    updates and tombstoning. ``csr()`` returns the compiled adjacency.
+    """
+
+    def __init__(self, laboratory_id: int):
+        self.laboratory_id = laboratory_id
+        self.node_ids: List[int] = []
+        self._node_index: Dict[int, int] = {}
+        self._edges = {name: np.empty(0, dtype=dtype) for name, dtype in _EDGE_FIELDS}
+        self._edge_count = 0
+        self._slots: Dict[int, int] = {}
+        self._csr = None
+        self._lock = threading.RLock()
+
+    # -- construction --------------------------------------------------------
+
+    def _node(self, concept_id: int) -> int:
+        index = self._node_index.get(concept_id)
+        if index is None:
+            index = len(self.node_ids)
+            self.node_ids.append(concept_id)
+            self._node_index[concept_id] = index
+        return index
+
+    def _reserve(self, needed: int):
+        capacity = len(self._edges["source"])
+        if needed <= capacity:
+            return
+        capacity = max(capacity * 2, needed, 256)
+        for name, dtype in _EDGE_FIELDS:
+            grown = np.zeros(capacity, dtype=dtype)
+            grown[:self._edge_count] = self._edges[name][:self._edge_count]
+            self._edges[name] = grown
+
+    def upsert_edges(self, edges: Iterable[dict]):
+        """Insert or update edges given as dicts with relationship columns."""
+        with self._lock:
+            for edge in edges:
+                slot = self._slots.get(edge["id"])
+                if slot is None:
+                    self._reserve(self._edge_count + 1)
+                    slot = self._edge_count
+                    self._edge_count += 1
+                    self._slots[edge["id"]] = slot
+
+                arrays = self._edges
+                arrays["source"][slot] = self._node(edge["source_concept_id"])
+                arrays["target"][slot] = self._node(edge["target_concept_id"])
+                arrays["strength"][slot] = edge["strength"] if edge["strength"] is not None else 0.5
+                arrays["confidence"][slot] = edge["confidence"] if edge["confidence"] is not None else 0.5
+                arrays["type"][slot] = _TYPE_CODES[edge["relationship_type"]]
+                arrays["bidirectional"][slot] = bool(edge["is_bidirectional"])
+                arrays["alive"][slot] = bool(edge["is_active"])
+                arrays["relationship_id"][slot] = edge["id"]
+            self._csr = None
+
+    def remove_edges(self, relationship_ids: Iterable[int]):
+        """Tombstone edges by relationship id."""
+        with self._lock:
+            for relationship_id in relationship_ids:
+                slot = self._slots.get(relationship_id)
+                if slot is not None:
+                    self._edges["alive"][slot] = False
+            self._csr = None
+
+    def remove_nodes(self, concept_ids: Iterable[int]):
+        """Tombstone every edge touching the given concepts."""
+        with self._lock:
+            indices = [self._node_index[c] for c in concept_ids if c in self._node_index]
+            if not indices:
+                return
+            n = self._edge_count
+            touching = np.isin(self._edges["source"][:n], indices) | np.isin(self._edges["target"][:n], indices)
+            self._edges["alive"][:n][touching] = False
+            self._csr = None
+
+    def csr(self):
+        """
+        Compile (or return the cached) CSR adjacency:
+        ``offsets, neighbours, strengths, confidences, types, relationship_ids``.
+        Bidirectional edges appear in both directions.
+        """
+        with self._lock:
+            if self._csr is not None:
+                return self._csr
+
+            n = self._edge_count
+            e = {name: array[:n] for name, array in self._edges.items()}
+            alive = e["alive"]
+            back = alive & e["bidirectional"]
+
+            sources = np.concatenate([e["source"][alive], e["target"][back]])
+            targets = np.concatenate([e["target"][alive], e["source"][back]])
+            order = np.argsort(sources, kind="stable")
+
+            def both(name):
+                return np.concatenate([e[name][alive], e[name][back]])[order]
+
+            node_count = len(self.node_ids)
+            offsets = np.zeros(node_count + 1, dtype=np.int64)
+            np.cumsum(np.bincount(sources, minlength=node_count), out=offsets[1:])
+
+            self._csr = (
+                offsets,
+                targets[order].astype(np.int32),
+                both("strength"),
+                both("confidence"),
+                both("type"),
+                both("relationship_id"),
+            )
+            return self._csr
+
+    # -- queries ---------------------------------------------------------------
+
+    def __contains__(self, concept_id: int) -> bool:
+        return concept_id in self._node_index
+
+    @property
+    def edge_count(self) -> int:
+        return int(self._edges["alive"][:self._edge_count].sum())
+
+    def _expand(self, offsets, frontier: np.ndarray) -> np.ndarray:
+        """Positions in the CSR arrays of every edge leaving ``frontier``."""
+        starts = offsets[frontier]
+        lengths = offsets[frontier + 1] - starts
+        total = int(lengths.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        shifts = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        return shifts + np.arange(total)
+
+    def neighborhood(self, concept_id: int, hops: int = 1, min_strength: float = 0.0,
+                     types: Optional[Iterable[RelationshipType]] = None, limit: Optional[int] = None):
+        """
+        Breadth-first k-hop neighbourhood. Returns ``(distances, edges)``:
+        ``{concept_id: hop}`` and a list of traversed edge dicts.
+        """
+        if concept_id not in self._node_index:
+            return {concept_id: 0}, []
+
+        offsets, neighbours, strengths, _, edge_types, relationship_ids = self.csr()
+        allowed_types = None if types is None else np.array([_TYPE_CODES[t] for t in types], dtype=np.int8)
+
+        distance = np.full(len(self.node_ids), -1, dtype=np.int32)
+        start = self._node_index[concept_id]
+        distance[start] = 0
+        frontier = np.array([start], dtype=np.int64)
+        edges = []
+
+        for hop in range(1, hops + 1):
+            positions = self._expand(offsets, frontier)
+            keep = strengths[positions] >= min_strength
+            if allowed_types is not None:
+                keep &= np.isin(edge_types[positions], allowed_types)
+            positions = positions[keep]
+            if not len(positions):
+                break
+
+            sources = np.repeat(frontier, offsets[frontier + 1] - offsets[frontier])[keep]
+            targets = neighbours[positions]
+            edges.extend(
+                {
+                    "relationship_id": int(relationship_ids[p]),
+                    "source_id": self.node_ids[s],
+                    "target_id": self.node_ids[t],
+                    "strength": float(strengths[p]),
+                    "relationship_type": RELATIONSHIP_TYPES[edge_types[p]].value,
+                }
+                for p, s, t in zip(positions, sources, targets)
+            )
+
+            fresh = np.unique(targets[distance[targets] < 0])
+            if limit is not None:
+                fresh = fresh[:max(limit - int((distance >= 0).sum()), 0)]
+            if not len(fresh):
+                break
+            distance[fresh] = hop
+            frontier = fresh.astype(np.int64)
+
+        reached = np.flatnonzero(distance >= 0)
+        distances = {self.node_ids[i]: int(distance[i]) for i in reached}
+        edges = [edge for edge in edges if edge["target_id"] in distances]
+        return distances, edges
+
+    def shortest_path(self, source_id: int, target_id: int, max_hops: Optional[int] = None):
+        """
+        Strongest path between two concepts (Dijkstra with cost
+        ``-log(strength)``, i.e. maximising the product of strengths).
+        Returns ``{"concept_ids", "relationship_ids", "strength"}`` or None.
+        """
+        if source_id not in self._node_index or target_id not in self._node_index:
+            return None
+
+        offsets, neighbours, strengths, _, _, relationship_ids = self.csr()
+        start, goal = self._node_index[source_id], self._node_index[target_id]
+        costs = -np.log(np.clip(strengths, 1e-6, 1.0))
+
+        best = {start: 0.0}
+        previous: Dict[int, Tuple[int, int]] = {}
+        hops = {start: 0}
+        heap = [(0.0, start)]
+
+        while heap:
+            cost, node = heapq.heappop(heap)
+            if node == goal:
+                break
+            if cost > best.get(node, math.inf):
+                continue
+            if max_hops is not None and hops[node] >= max_hops:
+                continue
+            for position in range(offsets[node], offsets[node + 1]):
+                neighbour = int(neighbours[position])
+                candidate = cost + float(costs[position])
+                if candidate < best.get(neighbour, math.inf):
+                    best[neighbour] = candidate
+                    previous[neighbour] = (node, position)
+                    hops[neighbour] = hops[node] + 1
+                    heapq.heappush(heap, (candidate, neighbour))
+
+        if goal not in best:
+            return None
+
+        nodes, edges = [goal], []
+        while nodes[-1] != start:
+            node, position = previous[nodes[-1]]
+            edges.append(int(relationship_ids[position]))
+            nodes.append(node)
+
+        return {
+            "concept_ids": [self.node_ids[i] for i in reversed(nodes)],
+            "relationship_ids": list(reversed(edges)),
+            "strength": math.exp(-best[goal]),
+        }
+
+    def personalized_pagerank(self, seed_ids: Iterable[int], damping: float = 0.85,
+                              max_iterations: int = 50, tolerance: float = 1e-6, limit: int = 20):
+        """
+        Personalised PageRank from ``seed_ids`` using strength-weighted
+        transitions. Returns ``[(concept_id, score)]`` excluding the seeds.
+        """
+        seeds = [self._node_index[c] for c in seed_ids if c in self._node_index]
+        if not seeds:
+            return []
+
+        offsets, neighbours, strengths, _, _, _ = self.csr()
+        n = len(self.node_ids)
+        sources = np.repeat(np.arange(n), np.diff(offsets))
+        out_weight = np.bincount(sources, weights=strengths, minlength=n)
+        transition = strengths / np.where(out_weight > 0, out_weight, 1.0)[sources]
+        dangling = out_weight == 0
+
+        personalization = np.zeros(n)
+        personalization[seeds] = 1.0 / len(seeds)
+        rank = personalization.copy()
+
+        for _ in range(max_iterations):
+            spread = np.bincount(neighbours, weights=rank[sources] * transition, minlength=n)
+            updated = damping * (spread + rank[dangling].sum() * personalization) + (1 - damping) * personalization
+            converged = np.abs(updated - rank).sum() < tolerance
+            rank = updated
+            if converged:
+                break
+
+        rank[seeds] = 0.0
+        top = np.argsort(-rank)[:limit]
+        return [(self.node_ids[i], float(rank[i])) for i in top if rank[i] > 0]
+
+
+def _edge_dict(relationship) -> dict:
+    return {
+        "id": relationship.id,
+        "source_concept_id": relationship.source_concept_id,
+        "target_concept_id": relationship.target_concept_id,
+        "strength": relationship.strength,
+        "confidence": relationship.confidence,
+        "relationship_type": relationship.relationship_type,
+        "is_bidirectional": relationship.is_bidirectional,
+        "is_active": relationship.is_active,
+    }
+
+
+class GraphStore:
+    """Lazily loaded graphs, one per laboratory."""
+
+    def __init__(self):
+        self._graphs: Dict[int, LaboratoryGraph] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db, laboratory_id: int) -> LaboratoryGraph:
+        """Return the laboratory graph, loading it with a single query if needed."""
+        with self._lock:
+            graph = self._graphs.get(laboratory_id)
+        if graph is None:
+            graph = self.load(db, laboratory_id)
+        return graph
+
+    def load(self, db, laboratory_id: int) -> LaboratoryGraph:
+        """(Re)load all active edges between active concepts of a laboratory."""
+        source = aliased(Concept)
+        target = aliased(Concept)
+        stmt = (
+            select(ConceptRelationship)
+            .join(source, source.id == ConceptRelationship.source_concept_id)
+            .join(target, target.id == ConceptRelationship.target_concept_id)
+            .where(
+                source.laboratory_id == laboratory_id,
+                source.is_active == True,
+                target.is_active == True,
+                ConceptRelationship.is_active == True,
+            )
+            .execution_options(yield_per=5000)
+        )
+
+        graph = LaboratoryGraph(laboratory_id)
+        graph.upsert_edges(_edge_dict(relationship) for relationship in db.scalars(stmt))
+        with self._lock:
+            self._graphs[laboratory_id] = graph
+        return graph
+
+    def loaded(self) -> Dict[int, LaboratoryGraph]:
+        with self._lock:
+            return dict(self._graphs)
+
+    def invalidate(self, laboratory_id: int):
+        """Drop a cached graph so it is reloaded on next access."""
+        with self._lock:
+            self._graphs.pop(laboratory_id, None)
+
+    def apply_relationship_changes(self, changes):
+        """Patch loaded graphs with committed relationship changes."""
+        graphs = self.loaded()
+        if not graphs:
+            return
+
+        # Resolve laboratories from loaded nodes; only unseen concepts need a query
+        labs = {}
+        for laboratory_id, graph in graphs.items():
+            for change in changes:
+                for key in ("source_concept_id", "target_concept_id"):
+                    if change[key] in graph:
+                        labs[change["source_concept_id"]] = laboratory_id
+
+        unresolved = {c["source_concept_id"] for c in changes} - labs.keys()
+        if unresolved:
+            from app.core.database import SessionLocal
+            with SessionLocal() as db:
+                labs.update(db.execute(
+                    select(Concept.id, Concept.laboratory_id).where(Concept.id.in_(unresolved))
+                ).all())
+
+        for change in changes:
+            graph = graphs.get(labs.get(change["source_concept_id"]))
+            if graph is None:
+                continue
+            if change["op"] == "delete" or not change["is_active"]:
+                graph.remove_edges([change["id"]])
+            else:
+                graph.upsert_edges([change])
+
+    def apply_concept_changes(self, changes):
+        """Drop edges of deactivated concepts; reload on reactivation."""
+        graphs = self.loaded()
+        for change in changes:
+            graph = graphs.get(change["laboratory_id"])
+            if graph is None:
+                continue
+            if change["active"]:
+                self.invalidate(change["laboratory_id"])
+            else:
+                graph.remove_nodes([change["id"]])
+
+
+graph_store = GraphStore()
+
+
+def _snapshot_relationship(relationship, op):
+    change = _edge_dict(relationship)
+    change["op"] = op
+    return change
+
+
+def _snapshot_concept(concept, op):
+    if op == "update" and not inspect(concept).attrs.is_active.history.has_changes():
+        return None
+    if op == "insert":
+        return None
+    return {
+        "id": concept.id,
+        "laboratory_id": concept.laboratory_id,
+        "active": op != "delete" and bool(concept.is_active),
+    }
+
+
+register_commit_hook(ConceptRelationship, _snapshot_relationship, graph_store.apply_relationship_changes)
+register_commit_hook(Concept, _snapshot_concept, graph_store.apply_concept_changes)
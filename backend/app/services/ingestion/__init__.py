@@ -0,0 +1,11 @@
+"""
+Background ingestion pipeline for Sources.
+
+Stages run per source in order (extract, chunk, embed, summarise, tag),
+each as an ``IngestionJob`` row claimed by the worker in ``worker.py``.
+"""
+
+from .queue import PIPELINE_STAGES, enqueue_source
+from .worker import ingestion_worker
+
+__all__ = ["PIPELINE_STAGES", "enqueue_source", "ingestion_worker"]
@@ -0,0 +1,199 @@
+"""
+Durable SQLite-backed job queue for the ingestion pipeline.
+
+Claiming is a conditional ``UPDATE ... WHERE status = 'PENDING'`` per job,
+so several workers (threads or processes) can poll the same table safely.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.job import IngestionJob, JobStatus
+from app.models.source import Source
+
+PIPELINE_STAGES = ["extract", "chunk", "embed", "summarise", "tag"]
+
+ACTIVE_STATUSES = (JobStatus.PENDING, JobStatus.RUNNING)
+
+
+def next_stage(stage: str) -> Optional[str]:
+    """Stage that follows ``stage`` in the pipeline, or None after the last."""
+    position = PIPELINE_STAGES.index(stage)
+    return PIPELINE_STAGES[position + 1] if position + 1 < len(PIPELINE_STAGES) else None
+
+
+def enqueue_source(db: Session, source_id: int, stage: str = PIPELINE_STAGES[0], priority: int = 0) -> IngestionJob:
+    """
+    Queue a source for processing starting at ``stage``. If the source
+    already has an active job, that job is returned instead.
+    """
+    active = db.scalars(
+        select(IngestionJob).where(
+            IngestionJob.source_id == source_id,
+            IngestionJob.status.in_(ACTIVE_STATUSES),
+        )
+    ).first()
+    if active is not None:
+        return active
+
+    job = IngestionJob(
+        source_id=source_id,
+        stage=stage,
+        priority=priority,
+        status=JobStatus.PENDING,
+        max_attempts=settings.INGESTION_MAX_ATTEMPTS,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def claim_jobs(db: Session, stage: str, limit: int, worker_id: str) -> List[dict]:
+    """
+    Atomically claim up to ``limit`` runnable jobs for a stage. Returns
+    plain payloads (job and source fields) safe to hand to other processes.
+    """
+    if limit <= 0:
+        return []
+
+    now = datetime.utcnow()
+    candidates = db.scalars(
+        select(IngestionJob.id)
+        .where(
+            IngestionJob.status == JobStatus.PENDING,
+            IngestionJob.stage == stage,
+            or_(IngestionJob.run_after.is_(None), IngestionJob.run_after <= now),
+        )
+        .order_by(IngestionJob.priority.desc(), IngestionJob.id)
+        .limit(limit * 2)
+    ).all()
+
+    claimed = []
+    for job_id in candidates:
+        result = db.execute(
+            update(IngestionJob)
+            .where(IngestionJob.id == job_id, IngestionJob.status == JobStatus.PENDING)
+            .values(
+                status=JobStatus.RUNNING,
+                locked_by=worker_id,
+                locked_at=now,
+                attempts=IngestionJob.attempts + 1,
+                progress=0.0,
+                error=None,
+            )
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+        if len(claimed) >= limit:
+            break
+    db.commit()
+
+    if not claimed:
+        return []
+
+    rows = db.execute(
+        select(IngestionJob, Source)
+        .join(Source, Source.id == IngestionJob.source_id)
+        .where(IngestionJob.id.in_(claimed))
+    ).all()
+    return [
+        {
+            "job_id": job.id,
+            "stage": job.stage,
+            "attempt": job.attempts,
+            "source": {
+                "id": source.id,
+                "title": source.title,
+                "source_type": source.source_type.value,
+                "file_path": source.file_path,
+                "content_hash": source.content_hash,
+                "url": source.url,
+                "description": source.description,
+                "language": source.language,
+            },
+        }
+        for job, source in rows
+    ]
+
+
+def complete_job(db: Session, job_id: int) -> Optional[IngestionJob]:
+    """
+    Mark a job as succeeded and enqueue the next stage in the same
+    transaction. The caller commits.
+    """
+    job = db.get(IngestionJob, job_id)
+    job.status = JobStatus.SUCCEEDED
+    job.progress = 1.0
+    job.finished_at = datetime.utcnow()
+    job.locked_by = None
+
+    following = next_stage(job.stage)
+    if following is None:
+        return None
+
+    next_job = IngestionJob(
+        source_id=job.source_id,
+        stage=following,
+        priority=job.priority,
+        status=JobStatus.PENDING,
+        max_attempts=job.max_attempts,
+    )
+    db.add(next_job)
+    return next_job
+
+
+def fail_job(db: Session, job_id: int, error: str):
+    """Schedule a retry with exponential backoff, or fail for good."""
+    job = db.get(IngestionJob, job_id)
+    job.error = error[-4000:]
+    job.locked_by = None
+
+    if job.attempts < job.max_attempts:
+        delay = settings.INGESTION_RETRY_BACKOFF * 2 ** (job.attempts - 1)
+        job.status = JobStatus.PENDING
+        job.run_after = datetime.utcnow() + timedelta(seconds=delay)
+        job.message = f"Retrying in {delay}s (attempt {job.attempts}/{job.max_attempts})"
+    else:
+        job.status = JobStatus.FAILED
+        job.finished_at = datetime.utcnow()
+        job.message = "Failed"
+    db.commit()
+
+
+def report_progress(db: Session, job_id: int, progress: float, message: Optional[str] = None):
+    """Record progress for a running job."""
+    db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.id == job_id, IngestionJob.status == JobStatus.RUNNING)
+        .values(progress=max(0.0, min(progress, 1.0)), message=message, locked_at=datetime.utcnow())
+    )
+    db.commit()
+
+
+def recover_abandoned(db: Session, lock_timeout: int = None) -> int:
+    """Return running jobs whose lease expired (crashed worker) to the queue."""
+    lock_timeout = lock_timeout or settings.INGESTION_LOCK_TIMEOUT
+    cutoff = datetime.utcnow() - timedelta(seconds=lock_timeout)
+    result = db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.status == JobStatus.RUNNING, IngestionJob.locked_at < cutoff)
+        .values(status=JobStatus.PENDING, locked_by=None, message="Recovered after worker timeout")
+    )
+    db.commit()
+    return result.rowcount
+
+
+def cancel_source_jobs(db: Session, source_id: int) -> int:
+    """Cancel pending jobs of a source."""
+    result = db.execute(
+        update(IngestionJob)
+        .where(IngestionJob.source_id == source_id, IngestionJob.status == JobStatus.PENDING)
+        .values(status=JobStatus.CANCELLED, finished_at=datetime.utcnow())
+    )
+    db.commit()
+    return result.rowcount
@@ -0,0 +1,444 @@
+"""
+Ingestion stage implementations.
+
+Stage functions are plain top-level callables so they can run in a process
+pool: they receive the source as a dict plus a working directory, write
+their artefacts there and return a small result dict. ``apply_result``
+then copies results onto the ``Source`` row in the parent process.
+"""
+
+import json
+import re
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from pathlib import Path
+from typing import Callable, Dict, List
+
+from app.core.config import settings
+from app.services import extraction
+from app.services.extraction import PAGE_BREAK
+
+TEXT_SUFFIXES = {".txt", ".md", ".markdown", ".rst"}
+MEDIA_TYPES = {"video", "podcast", "course"}
+
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_WORD_RE = re.compile(r"[^\W\d_]{3,}", re.UNICODE)
+
+STOPWORDS = set("""
+the and for that with this from are was were have has had not but you your they them their what which
+when where who how can will would should could about into over also than then there these those its
+our out more most such only other some any each been being may might must very just like use used using
+los las del por para con una uno unos unas que como más pero sus sobre entre este esta estos estas son
+fue han ser está están también muy sin hay cuando donde porque desde hasta
+""".split())
+
+
+# Artefacts of a source's working directory, in pipeline order
+WORK_FILES = ("text.txt", "chunks.jsonl", "chunks.stamp", "embeddings.f32")
+
+
+def work_directory(source: dict) -> Path:
+    """
+    Directory holding a source's extracted text, chunks and vectors. Stages
+    rewrite these files in place, so every source has its own; duplicates
+    share only the stored upload (see ``app.services.content_store``).
+    """
+    path = Path(settings.UPLOAD_DIR) / "extracted" / str(source["id"])
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+class ProgressReporter:
+    """Picklable progress callback that updates the job row, throttled."""
+
+    def __init__(self, job_id: int, interval: float = 1.0):
+        self.job_id = job_id
+        self.interval = interval
+        self._last = 0.0
+
+    def __call__(self, progress: float, message: str = None):
+        now = time.monotonic()
+        if now - self._last < self.interval and progress < 1.0:
+            return
+        self._last = now
+
+        from app.core.database import SessionLocal
+        from .queue import report_progress
+        with SessionLocal() as db:
+            report_progress(db, self.job_id, progress, message)
+
+
+# -- extract -----------------------------------------------------------------
+
+def _extract_media(url: str, report) -> dict:
+    import yt_dlp
+
+    with yt_dlp.YoutubeDL({"quiet": True, "skip_download": True}) as ydl:
+        info = ydl.extract_info(url, download=False)
+
+    parts = [info.get("title") or "", info.get("description") or ""]
+    for chapter in info.get("chapters") or []:
+        parts.append(f"[{int(chapter.get('start_time', 0))}s] {chapter.get('title', '')}")
+    return {"pages": ["\n\n".join(p for p in parts if p)], "duration": info.get("duration")}
+
+
+def _extract_web(url: str, report) -> dict:
+    import requests
+    from bs4 import BeautifulSoup
+
+    response = requests.get(url, timeout=30, headers={"User-Agent": "Marie Knowledge System"})
+    response.raise_for_status()
+    soup = BeautifulSoup(response.text, "html.parser")
+    for element in soup(["script", "style", "nav", "footer", "header", "aside"]):
+        element.decompose()
+    return {"pages": [soup.get_text("\n", strip=True)]}
+
+
+def extract(source: dict, work_dir: Path, report: Callable) -> dict:
+    """
+    Extract plain text; pages are separated by form feeds in text.txt.
+    PDF and DOCX pages are written as they arrive from the extraction pool,
+    and chunked as they are written (see ``Chunker``).
+    """
+    file_path = Path(source["file_path"]) if source.get("file_path") else None
+    suffix = file_path.suffix.lower() if file_path else ""
+
+    extracted = {}
+    if file_path and suffix in extraction.SUFFIXES:
+        pages = extraction.iter_pages(file_path, report)
+    elif file_path and suffix in TEXT_SUFFIXES:
+        pages = [file_path.read_text(encoding="utf-8", errors="replace")]
+    elif source.get("url") and source["source_type"] in MEDIA_TYPES:
+        extracted = _extract_media(source["url"], report)
+        pages = extracted["pages"]
+    elif source.get("url"):
+        pages = _extract_web(source["url"], report)["pages"]
+    else:
+        pages = [source.get("description") or source["title"]]
+
+    page_count = characters = 0
+    with Chunker(work_dir) as chunker:
+        # Binary, so chunk byte ranges match the file on every platform
+        with open(work_dir / "text.txt", "wb") as f:
+            for page in pages:
+                data = page.encode("utf-8")
+                if page_count:
+                    data = PAGE_BREAK.encode() + data
+                f.write(data)
+                chunker.feed(data)
+                page_count += 1
+                characters += len(page)
+        chunk_count = chunker.finish()
+    report(1.0, "Text extracted")
+    return {
+        "characters": characters,
+        "page_count": page_count if suffix in extraction.SUFFIXES else None,
+        "duration": extracted.get("duration"),
+        "chunk_count": chunk_count,
+    }
+
+
+# -- chunk -------------------------------------------------------------------
+
+_TOKEN_RE = re.compile(r"\w{1,6}|[^\w\s]", re.UNICODE)
+_WORD_BYTES_RE = re.compile(rb"\f|\S+")
+_TIMESTAMP_RE = re.compile(rb"\[(\d+)s\]")
+_tokenizer = None
+
+
+def _load_tokenizer():
+    """The embedding model's tokenizer, or False when transformers can't provide it."""
+    global _tokenizer
+    if _tokenizer is None:
+        try:
+            from transformers import AutoTokenizer
+            _tokenizer = AutoTokenizer.from_pretrained(settings.EMBEDDING_MODEL)
+        except Exception:
+            _tokenizer = False
+    return _tokenizer
+
+
+def count_tokens(words: List[str]) -> List[int]:
+    """
+    Tokens per word under the embedding model's tokenizer. Without the
+    tokenizer, WordPiece is approximated: a piece per six letters plus one
+    per punctuation mark.
+    """
+    tokenizer = _load_tokenizer()
+    if tokenizer:
+        counts = []
+        for start in range(0, len(words), 10_000):
+            encoded = tokenizer(words[start:start + 10_000], add_special_tokens=False)["input_ids"]
+            counts.extend(max(len(ids), 1) for ids in encoded)
+        return counts
+    return [max(len(_TOKEN_RE.findall(word)), 1) for word in words]
+
+
+class Chunker:
+    """
+    Splits text into windows of at most ``CHUNK_SIZE_TOKENS`` model tokens
+    overlapping by ``CHUNK_OVERLAP_TOKENS``, written to chunks.jsonl. Text
+    is fed in pieces that end between words (pages, as they are extracted)
+    and a window is written as soon as no later word can change it, so
+    chunking keeps pace with extraction instead of re-reading the document.
+
+    Each chunk records its byte range in text.txt, the page it starts on
+    and, for media, the last ``[123s]`` timestamp before it. A complete run
+    leaves a stamp of text.txt and the chunk settings, so the chunk stage
+    can tell the file is current.
+    """
+
+    def __init__(self, work_dir: Path):
+        self.work_dir = work_dir
+        self.size = settings.CHUNK_SIZE_TOKENS
+        self.overlap = min(settings.CHUNK_OVERLAP_TOKENS, self.size - 1)
+        self.count = 0
+        self._offset = 0
+        self._page, self._timestamp = 1, None
+        self._words, self._spans, self._pages, self._seconds = [], [], [], []
+        self._cumulative = [0]
+        self._start = 0
+        self._held = []  # Single-page texts have no page numbers; unknown until a break or the end
+        self._finished = False
+        self._file = None
+
+    def __enter__(self):
+        (self.work_dir / "chunks.stamp").unlink(missing_ok=True)
+        self._file = open(self.work_dir / "chunks.jsonl", "w", encoding="utf-8")
+        return self
+
+    def __exit__(self, *exc_info):
+        self._file.close()
+        if self._finished and exc_info[0] is None:
+            stamp = {"text": _chunk_stamp(self.work_dir), "chunk_count": self.count}
+            (self.work_dir / "chunks.stamp").write_text(json.dumps(stamp))
+
+    def feed(self, data: bytes):
+        words = []
+        for match in _WORD_BYTES_RE.finditer(data):
+            word = match.group()
+            if word == b"\f":
+                self._page += 1
+                continue
+            marker = _TIMESTAMP_RE.fullmatch(word)
+            if marker:
+                self._timestamp = int(marker.group(1))
+            start, end = match.span()
+            self._spans.append((self._offset + start, self._offset + end))
+            self._pages.append(self._page)
+            self._seconds.append(self._timestamp)
+            words.append(word.decode("utf-8", errors="replace"))
+        self._offset += len(data)
+
+        self._words.extend(words)
+        total = self._cumulative[-1]
+        for tokens in count_tokens(words):
+            total += tokens
+            self._cumulative.append(total)
+        if self._page > 1 and self._held:
+            for record in self._held:
+                self._write(record)
+            self._held = []
+        self._emit(final=False)
+
+    def finish(self) -> int:
+        """Write the remaining windows; returns the number of chunks."""
+        self._emit(final=True)
+        for record in self._held:
+            self._write({**record, "page": None})
+        self._held = []
+        self._finished = True
+        return self.count
+
+    def _emit(self, final: bool):
+        words, cumulative = self._words, self._cumulative
+        while self._start < len(words):
+            start = self._start
+            budget = cumulative[start] + self.size
+            if not final and cumulative[-1] <= budget:
+                break  # Words still to come may fit in this window
+            # Longest window within the token budget, at least one word
+            end = max(bisect_right(cumulative, budget) - 1, start + 1)
+            record = {
+                "index": self.count,
+                "text": " ".join(words[start:end]),
+                "byte_start": self._spans[start][0],
+                "byte_end": self._spans[end - 1][1],
+                "token_count": cumulative[end] - cumulative[start],
+                "page": self._pages[start],
+                "start_seconds": self._seconds[start],
+            }
+            self.count += 1
+            if self._page > 1:
+                self._write(record)
+            else:
+                self._held.append(record)
+            if final and end >= len(words):
+                break
+            # The next window starts ``overlap`` tokens before this one ends
+            self._start = max(bisect_left(cumulative, cumulative[end] - self.overlap), start + 1)
+
+        if self._start > 10_000:
+            # Words before the current window are never needed again
+            for column in (self._words, self._spans, self._pages, self._seconds, self._cumulative):
+                del column[:self._start]
+            self._start = 0
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+def _chunk_stamp(work_dir: Path) -> dict:
+    text = (work_dir / "text.txt").stat()
+    return {
+        "size": text.st_size,
+        "modified": text.st_mtime_ns,
+        "chunk_size": settings.CHUNK_SIZE_TOKENS,
+        "overlap": settings.CHUNK_OVERLAP_TOKENS,
+        "model": settings.EMBEDDING_MODEL,
+        "version": settings.EMBEDDING_VERSION,
+    }
+
+
+def chunk(source: dict, work_dir: Path, report: Callable) -> dict:
+    """
+    Chunk text.txt with ``Chunker``. Text chunked while it was extracted is
+    not chunked again unless it or the chunk settings changed since.
+    """
+    stamp_path = work_dir / "chunks.stamp"
+    if stamp_path.exists():
+        stamp = json.loads(stamp_path.read_text())
+        if stamp["text"] == _chunk_stamp(work_dir):
+            report(1.0, f"{stamp['chunk_count']} chunks, written during extraction")
+            return {"chunk_count": stamp["chunk_count"]}
+
+    with Chunker(work_dir) as chunker:
+        chunker.feed((work_dir / "text.txt").read_bytes())
+        count = chunker.finish()
+
+    report(1.0, f"{count} chunks")
+    return {"chunk_count": count}
+
+
+def read_chunks(work_dir: Path) -> List[dict]:
+    with open(work_dir / "chunks.jsonl", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+# -- embed -------------------------------------------------------------------
+
+def embed(source: dict, work_dir: Path, report: Callable) -> dict:
+    """
+    Embed every chunk through the shared embedding service (so unchanged
+    chunks come from its cache); vectors are written as a float32 matrix.
+    """
+    import numpy as np
+    from app.services.embeddings import embedding_service
+
+    chunks = read_chunks(work_dir)
+    batch_size = settings.EMBEDDING_MAX_BATCH_SIZE
+
+    vectors = []
+    for start in range(0, len(chunks), batch_size):
+        batch = [c["text"] for c in chunks[start:start + batch_size]]
+        vectors.append(embedding_service.encode(batch))
+        report(min(start + batch_size, len(chunks)) / max(len(chunks), 1), "Embedding chunks")
+
+    matrix = np.vstack(vectors).astype("<f4") if vectors else np.empty((0, 0), dtype="<f4")
+    matrix.tofile(work_dir / "embeddings.f32")
+    return {
+        "chunk_count": len(chunks),
+        "dim": int(matrix.shape[1]) if matrix.size else 0,
+        "model": embedding_service.model_name,
+        "version": settings.EMBEDDING_VERSION,
+    }
+
+
+# -- summarise ---------------------------------------------------------------
+
+def _keywords(text: str) -> Counter:
+    return Counter(w for w in (m.lower() for m in _WORD_RE.findall(text)) if w not in STOPWORDS)
+
+
+def summarise(source: dict, work_dir: Path, report: Callable, sentences: int = 3) -> dict:
+    """Extractive summary: the highest-scoring sentences in document order."""
+    text = (work_dir / "text.txt").read_text(encoding="utf-8")[:200_000].replace(PAGE_BREAK, " ")
+    candidates = [s.strip() for s in _SENTENCE_RE.split(text) if 40 <= len(s.strip()) <= 400]
+    if not candidates:
+        return {"summary": text[:500].strip() or None}
+
+    frequencies = _keywords(text)
+    scored = []
+    for position, sentence in enumerate(candidates):
+        words = _keywords(sentence)
+        score = sum(frequencies[w] for w in words) / (sum(words.values()) or 1)
+        scored.append((score, position, sentence))
+
+    best = sorted(sorted(scored, reverse=True)[:sentences], key=lambda item: item[1])
+    report(1.0, "Summary generated")
+    return {"summary": " ".join(sentence for _, _, sentence in best)}
+
+
+# -- tag ---------------------------------------------------------------------
+
+def tag(source: dict, work_dir: Path, report: Callable, limit: int = 10) -> dict:
+    """Most frequent non-stopword terms as key topics."""
+    text = (work_dir / "text.txt").read_text(encoding="utf-8")[:500_000]
+    topics = [word for word, _ in _keywords(text).most_common(limit)]
+    report(1.0, "Topics extracted")
+    return {"key_topics": topics}
+
+
+STAGES: Dict[str, Callable] = {
+    "extract": extract,
+    "chunk": chunk,
+    "embed": embed,
+    "summarise": summarise,
+    "tag": tag,
+}
+
+# Where each stage runs: CPU-bound stages go to the process pool, stages that
+# share an in-process model (or wait on I/O) run on threads. Parallel
+# extraction has its own pool, so the extract stage then only waits on it.
+STAGE_EXECUTORS = {
+    "extract": "thread" if extraction.extraction_workers() > 1 else "process",
+    "chunk": "process",
+    "embed": "thread",
+    "summarise": "process",
+    "tag": "process",
+}
+
+
+def run_stage(stage: str, job_id: int, source: dict) -> dict:
+    """Entry point executed by the worker pools."""
+    report = ProgressReporter(job_id)
+    return STAGES[stage](source, work_directory(source), report)
+
+
+def apply_result(db, stage: str, source_id: int, result: dict):
+    """Copy a stage's result onto the Source row (caller commits)."""
+    from app.models.source import Source
+
+    source = db.get(Source, source_id)
+    if source is None:
+        return
+
+    if stage == "extract":
+        if result.get("page_count"):
+            source.page_count = result["page_count"]
+        if result.get("duration"):
+            source.duration = int(result["duration"])
+    elif stage == "chunk":
+        from app.services.passages import replace_chunks, source_directory
+        replace_chunks(db, source, read_chunks(source_directory(source)))
+    elif stage == "embed":
+        from app.services.passages import index_source_chunks
+        source.embedding_model = result.get("model")
+        source.embedding_version = result.get("version")
+        index_source_chunks(db, source)
+    elif stage == "summarise" and result.get("summary"):
+        source.summary = result["summary"]
+    elif stage == "tag":
+        source.key_topics = json.dumps(result.get("key_topics", []), ensure_ascii=False)
+        source.is_processed = True
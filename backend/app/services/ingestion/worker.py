@@ -0,0 +1,168 @@
+"""
+Ingestion worker: a dispatcher thread that claims jobs from the queue and
+runs them on a process pool (CPU-bound stages) or a thread pool, honouring
+per-stage concurrency limits.
+"""
+
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from .queue import PIPELINE_STAGES, claim_jobs, complete_job, fail_job, recover_abandoned
+from .stages import STAGE_EXECUTORS, apply_result, run_stage
+
+
+class IngestionWorker:
+    """Claims pipeline jobs and executes them in the background."""
+
+    def __init__(self):
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.max_workers = 0
+        self._running: Dict[str, int] = {stage: 0 for stage in PIPELINE_STAGES}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._processes = None
+        self._threads = None
+        self._recovered_at = 0.0
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the pools and the dispatcher thread."""
+        if self.is_running:
+            return
+        self._processes = self._process_pool()
+        thread_slots = sum(
+            limit for stage, limit in settings.INGESTION_STAGE_CONCURRENCY.items()
+            if STAGE_EXECUTORS.get(stage) == "thread"
+        )
+        self._threads = ThreadPoolExecutor(max_workers=max(thread_slots, 1), thread_name_prefix="ingestion")
+
+        self._recover()
+
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._dispatch_loop, name="ingestion-dispatcher", daemon=True)
+        self._thread.start()
+        print(f"⚙️ Ingestion worker started ({self.max_workers} processes)")
+
+    def stop(self, wait: bool = True):
+        """Stop claiming jobs and shut the pools down."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+        for pool in (self._processes, self._threads):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        self._processes = self._threads = None
+
+    def notify(self):
+        """Wake the dispatcher, e.g. right after enqueueing work."""
+        self._wake.set()
+
+    def status(self) -> dict:
+        """Jobs currently executing per stage."""
+        with self._lock:
+            return {"worker_id": self.worker_id, "running": dict(self._running), "alive": self.is_running}
+
+    # -- internals ---------------------------------------------------------------
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        self.max_workers = settings.INGESTION_MAX_WORKERS or os.cpu_count() or 1
+        # spawn: children must not inherit the parent's threads and DB connections
+        return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+
+    def _free_slots(self, stage: str) -> int:
+        limit = settings.INGESTION_STAGE_CONCURRENCY.get(stage, 1)
+        with self._lock:
+            return limit - self._running[stage]
+
+    def _dispatch_loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                # Leases of jobs lost while the worker runs (e.g. a result that
+                # could not be recorded) expire too, not only those left by a crash
+                if time.monotonic() - self._recovered_at >= settings.INGESTION_RECOVER_INTERVAL:
+                    self._recover()
+                self._dispatch_once()
+            except Exception as e:
+                print(f"❌ Ingestion dispatcher error: {e}")
+            self._wake.wait(settings.INGESTION_POLL_INTERVAL)
+
+    def _recover(self):
+        self._recovered_at = time.monotonic()
+        with SessionLocal() as db:
+            recovered = recover_abandoned(db)
+        if recovered:
+            print(f"🔁 Re-queued {recovered} abandoned ingestion jobs")
+
+    def _dispatch_once(self):
+        for stage in PIPELINE_STAGES:
+            free = self._free_slots(stage)
+            if free <= 0:
+                continue
+            with SessionLocal() as db:
+                jobs = claim_jobs(db, stage, free, self.worker_id)
+            for job in jobs:
+                self._submit(job)
+
+    def _submit(self, job: dict):
+        stage = job["stage"]
+        with self._lock:
+            self._running[stage] += 1
+        if STAGE_EXECUTORS[stage] == "process":
+            try:
+                future = self._processes.submit(run_stage, stage, job["job_id"], job["source"])
+            except BrokenProcessPool:
+                # A crashed child poisons the pool; replace it and carry on
+                self._processes.shutdown(wait=False, cancel_futures=True)
+                self._processes = self._process_pool()
+                future = self._processes.submit(run_stage, stage, job["job_id"], job["source"])
+        else:
+            future = self._threads.submit(run_stage, stage, job["job_id"], job["source"])
+        future.add_done_callback(lambda f, job=job: self._finish(job, f))
+
+    def _finish(self, job: dict, future):
+        stage = job["stage"]
+        try:
+            if future.cancelled():
+                return  # Lease expires and the job is recovered by the next sweep
+            error = future.exception()
+            if error is None:
+                with SessionLocal() as db:
+                    try:
+                        apply_result(db, stage, job["source"]["id"], future.result())
+                        complete_job(db, job["job_id"])
+                        db.commit()
+                    except Exception as e:
+                        # Nothing of the result is kept; the attempt counts as failed
+                        db.rollback()
+                        error = e
+            if error is not None:
+                details = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+                with SessionLocal() as db:
+                    fail_job(db, job["job_id"], details)
+                print(f"⚠️ Ingestion {stage} failed for source {job['source']['id']}: {error}")
+        except Exception as e:
+            # The job stays RUNNING until its lease expires and a sweep re-queues it
+            print(f"❌ Could not record ingestion result for job {job['job_id']}: {e}")
+        finally:
+            with self._lock:
+                self._running[stage] -= 1
+            self._wake.set()
+
+ingestion_worker = IngestionWorker()
@@ -0,0 +1,144 @@
+"""
+Denormalised laboratory statistics.
+
+``Laboratory.concept_count`` (active concepts), ``source_count``
+(non-archived sources) and ``study_hours`` (sum of notebook ``time_spent``,
+in minutes) are adjusted by mapper events inside the flush that changes a
+row, so they commit or roll back with it. Bulk SQL statements bypass the
+events; ``reconcile_laboratory_stats`` recomputes everything in one
+statement and is run periodically to fix any drift.
+"""
+
+import asyncio
+from collections import defaultdict
+from typing import Callable, Dict, Tuple
+
+from sqlalchemy import event, func, inspect, or_, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.concept import Concept
+from app.models.laboratory import Laboratory
+from app.models.notebook import NotebookEntry
+from app.models.source import Source
+
+# model -> (laboratory column, attributes it depends on, contribution of one row)
+COUNTERS: Dict[type, Tuple[str, Tuple[str, ...], Callable[[dict], int]]] = {
+    Concept: ("concept_count", ("laboratory_id", "is_active"),
+              lambda row: 0 if row["is_active"] is False else 1),
+    Source: ("source_count", ("laboratory_id", "is_archived"),
+             lambda row: 0 if row["is_archived"] else 1),
+    NotebookEntry: ("study_hours", ("laboratory_id", "time_spent"),
+                    lambda row: row["time_spent"] or 0),
+}
+
+
+def _values(target, attributes, previous: bool) -> dict:
+    """Attribute values after the flush, or before it when ``previous``."""
+    state = inspect(target)
+    values = {}
+    for name in attributes:
+        history = state.attrs[name].history
+        if previous and history.deleted:
+            values[name] = history.deleted[0]
+        else:
+            values[name] = getattr(target, name)
+    return values
+
+
+def _apply(connection, column: str, deltas: Dict[int, int]):
+    laboratories = Laboratory.__table__
+    for laboratory_id, delta in deltas.items():
+        if laboratory_id is None or not delta:
+            continue
+        connection.execute(
+            update(laboratories)
+            .where(laboratories.c.id == laboratory_id)
+            .values({column: func.coalesce(laboratories.c[column], 0) + delta})
+        )
+
+
+def _keep_previous_value(target, value, oldvalue, initiator):
+    return value
+
+
+def _register(model):
+    column, attributes, contribution = COUNTERS[model]
+
+    # Load the old value when an expired attribute is assigned, so the
+    # update handler can see what the row counted for before
+    for name in attributes:
+        event.listen(getattr(model, name), "set", _keep_previous_value, active_history=True, retval=True)
+
+    @event.listens_for(model, "after_insert")
+    def _inserted(mapper, connection, target):
+        row = _values(target, attributes, previous=False)
+        _apply(connection, column, {row["laboratory_id"]: contribution(row)})
+
+    @event.listens_for(model, "after_update")
+    def _updated(mapper, connection, target):
+        state = inspect(target)
+        if not any(state.attrs[name].history.has_changes() for name in attributes):
+            return
+        before = _values(target, attributes, previous=True)
+        after = _values(target, attributes, previous=False)
+        deltas = defaultdict(int)
+        deltas[before["laboratory_id"]] -= contribution(before)
+        deltas[after["laboratory_id"]] += contribution(after)
+        _apply(connection, column, deltas)
+
+    @event.listens_for(model, "after_delete")
+    def _deleted(mapper, connection, target):
+        row = _values(target, attributes, previous=True)
+        _apply(connection, column, {row["laboratory_id"]: -contribution(row)})
+
+
+for _model in COUNTERS:
+    _register(_model)
+
+
+def reconcile_laboratory_stats(db: Session) -> int:
+    """
+    Recompute every laboratory's counters from the source tables and fix
+    the ones that drifted, in a single UPDATE so the values written are the
+    ones the statement counted. Returns the number of laboratories corrected.
+    """
+    from app.services.response_cache import invalidate_on_commit
+
+    laboratories = Laboratory.__table__
+    actual = {
+        "concept_count": select(func.count(Concept.id))
+        .where(Concept.laboratory_id == laboratories.c.id, Concept.is_active.isnot(False)),
+        "source_count": select(func.count(Source.id))
+        .where(Source.laboratory_id == laboratories.c.id, Source.is_archived.isnot(True)),
+        "study_hours": select(func.coalesce(func.sum(NotebookEntry.time_spent), 0))
+        .where(NotebookEntry.laboratory_id == laboratories.c.id),
+    }
+    actual = {column: query.scalar_subquery() for column, query in actual.items()}
+
+    corrected = db.scalars(
+        update(laboratories)
+        .where(or_(*(laboratories.c[column].is_distinct_from(value) for column, value in actual.items())))
+        .values(actual)
+        .returning(laboratories.c.id)
+    ).all()
+    if corrected:
+        # Core statements bypass the response cache's commit hooks
+        invalidate_on_commit(db, "laboratories", *(f"laboratory:{laboratory_id}" for laboratory_id in corrected))
+    db.commit()
+    return len(corrected)
+
+
+async def reconcile_periodically():
+    """Reconcile at startup and then every ``LAB_STATS_RECONCILE_INTERVAL`` seconds."""
+    from app.core.database import AsyncSessionLocal
+
+    while True:
+        try:
+            async with AsyncSessionLocal() as db:
+                corrected = await db.run_sync(reconcile_laboratory_stats)
+            if corrected:
+                print(f"🔧 Reconciled statistics of {corrected} laboratories")
+        except Exception as e:
+            print(f"❌ Laboratory statistics reconcile failed: {e}")
+        await asyncio.sleep(settings.LAB_STATS_RECONCILE_INTERVAL)
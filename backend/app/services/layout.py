@@ -0,0 +1,556 @@
+"""
+Precomputed mind-map layouts, served as tiles.
+
+Each laboratory's concepts are placed with a vectorised force-directed
+layout (Fruchterman-Reingold). Repulsion is exact for small laboratories;
+larger ones use a grid approximation in which every node is pushed away
+from the centroid of each grid cell, weighted by the cell's node count, so
+an iteration costs O(nodes x cells) rather than O(nodes^2). Edge
+attraction is weighted by relationship strength. Edges come from the
+in-memory graph (``app.services.graph``).
+
+Layouts are kept in memory and saved under
+``VECTOR_STORE_DIR/layouts``. Concepts created later are placed
+incrementally: each starts at the centroid of its placed neighbours and
+only the new nodes are relaxed. After ``LAYOUT_RELAYOUT_FRACTION`` of the
+layout has been added that way, the whole layout is recomputed.
+
+Tiles follow the web-map scheme: positions are normalised to the unit
+square (outliers are clamped to its border), and zoom ``z`` splits it into ``2^z x 2^z`` tiles. A node's
+level of detail is the lowest zoom at which it ranks among the
+``LAYOUT_TILE_NODES`` most prominent nodes of its tile, by importance and
+degree. A tile therefore never carries more than that many nodes, and the
+nodes not shown yet are summarised as clusters (count and centroid).
+"""
+
+import math
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Optional, Set, Tuple
+
+import numpy as np
+from sqlalchemy import inspect, select
+
+from app.core.config import settings
+from app.core.events import register_commit_hook
+from app.models.concept import Concept
+from app.services.graph import RELATIONSHIP_TYPES, LaboratoryGraph, graph_store
+
+_BLOCK = 512  # Rows per repulsion block, bounds temporary arrays to _BLOCK x cells
+_CLUSTER_LEVELS = 2  # Hidden nodes are summarised on a grid 2^_CLUSTER_LEVELS finer than the tile
+
+
+# -- force-directed layout -----------------------------------------------------------
+
+def _repulsion(positions: np.ndarray, rows: np.ndarray, k: float) -> np.ndarray:
+    """Repulsive displacement (k^2 / distance) of ``rows`` from every other node."""
+    n = len(positions)
+    displacement = np.zeros((len(rows), 2))
+
+    if n <= settings.LAYOUT_EXACT_LIMIT:
+        sources, masses, own = positions, np.ones(n), None
+    else:
+        # Grid approximation: every cell acts as a point mass at its centroid
+        side = max(int(math.sqrt(n) / 4), 8)
+        low = positions.min(axis=0)
+        size = np.maximum(positions.max(axis=0) - low, 1e-9) / side
+        cell_xy = np.minimum(((positions - low) / size).astype(np.int64), side - 1)
+        cells = cell_xy[:, 0] * side + cell_xy[:, 1]
+        occupied, inverse, masses = np.unique(cells, return_inverse=True, return_counts=True)
+        sources = np.stack([
+            np.bincount(inverse, weights=positions[:, axis], minlength=len(occupied)) / masses
+            for axis in range(2)
+        ], axis=1)
+        own = inverse
+
+    kk = k * k
+    for start in range(0, len(rows), _BLOCK):
+        block = rows[start:start + _BLOCK]
+        dx = positions[block, 0, None] - sources[None, :, 0]
+        dy = positions[block, 1, None] - sources[None, :, 1]
+        weight = masses * kk / np.maximum(dx * dx + dy * dy, 1e-6)
+        if own is None:
+            weight[np.arange(len(block)), block] = 0.0  # No self-repulsion
+        else:
+            # A node's own cell acts as the centroid of the other nodes in it
+            block_cells = own[block]
+            weight[np.arange(len(block)), block_cells] = 0.0
+            mass = masses[block_cells] - 1
+            others = sources[block_cells] * masses[block_cells, None] - positions[block]
+            near = positions[block] - others / np.maximum(mass, 1)[:, None]
+            near_weight = mass * kk / np.maximum((near ** 2).sum(axis=1), 1e-6)
+            displacement[start:start + len(block)] += near * near_weight[:, None]
+        displacement[start:start + len(block), 0] += (dx * weight).sum(axis=1)
+        displacement[start:start + len(block), 1] += (dy * weight).sum(axis=1)
+    return displacement
+
+
+def force_layout(node_count: int, sources: np.ndarray, targets: np.ndarray, weights: np.ndarray,
+                 positions: Optional[np.ndarray] = None, movable: Optional[np.ndarray] = None,
+                 iterations: Optional[int] = None, seed: int = 0) -> np.ndarray:
+    """
+    Fruchterman-Reingold layout with ideal edge length 1. Only ``movable``
+    node indices are moved when given (incremental placement).
+    """
+    rng = np.random.default_rng(seed)
+    iterations = iterations or settings.LAYOUT_ITERATIONS
+    if positions is None:
+        positions = rng.uniform(-1.0, 1.0, (node_count, 2)) * math.sqrt(max(node_count, 1))
+    positions = positions.astype(np.float64, copy=True)
+    if node_count < 2:
+        return positions
+
+    rows = np.arange(node_count) if movable is None else np.asarray(movable, dtype=np.int64)
+    if movable is not None:
+        # Only edges touching a moving node matter
+        moving = np.zeros(node_count, dtype=bool)
+        moving[rows] = True
+        touching = moving[sources] | moving[targets]
+        sources, targets, weights = sources[touching], targets[touching], weights[touching]
+
+    k = 1.0
+    temperature = math.sqrt(node_count) / 4 if movable is None else 1.0
+    cooling = (0.01 / temperature) ** (1.0 / iterations) if temperature > 0.01 else 1.0
+    gravity = 0.05
+
+    for _ in range(iterations):
+        displacement = np.zeros((node_count, 2))
+        displacement[rows] = _repulsion(positions, rows, k)
+
+        delta = positions[sources] - positions[targets]
+        distance = np.maximum(np.sqrt((delta ** 2).sum(axis=1)), 1e-6)
+        pull = delta * (distance * weights / k)[:, None]
+        for axis in range(2):
+            displacement[:, axis] -= np.bincount(sources, weights=pull[:, axis], minlength=node_count)
+            displacement[:, axis] += np.bincount(targets, weights=pull[:, axis], minlength=node_count)
+        # Gravity keeps disconnected components from drifting apart
+        displacement -= gravity * positions
+
+        step = displacement[rows]
+        length = np.maximum(np.sqrt((step ** 2).sum(axis=1)), 1e-9)
+        positions[rows] += step * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+    return positions
+
+
+# -- level of detail -----------------------------------------------------------------
+
+def _tile_coordinates(unit: np.ndarray, zoom: int) -> Tuple[np.ndarray, np.ndarray]:
+    scale = 1 << zoom
+    tiles = np.minimum((unit * scale).astype(np.int64), scale - 1)
+    return tiles[:, 0], tiles[:, 1]
+
+
+def detail_levels(unit: np.ndarray, priority: np.ndarray, budget: int, max_zoom: int) -> np.ndarray:
+    """
+    Lowest zoom at which each node is among the ``budget`` highest-priority
+    nodes of its tile. A node in the top of a tile is also in the top of
+    every sub-tile holding it, so levels are consistent across zooms.
+    """
+    levels = np.full(len(unit), max_zoom, dtype=np.int8)
+    pending = np.ones(len(unit), dtype=bool)
+    for zoom in range(max_zoom):
+        tx, ty = _tile_coordinates(unit, zoom)
+        tile = tx * (1 << zoom) + ty
+        order = np.lexsort((-priority, tile))
+        sorted_tiles = tile[order]
+        starts = np.flatnonzero(np.r_[True, sorted_tiles[1:] != sorted_tiles[:-1]])
+        ranks = np.arange(len(order)) - np.repeat(starts, np.diff(np.r_[starts, len(order)]))
+        chosen = order[ranks < budget]
+        fresh = chosen[pending[chosen]]
+        levels[fresh] = zoom
+        pending[fresh] = False
+        if not pending.any():
+            break
+    return levels
+
+
+# -- per-laboratory layout -----------------------------------------------------------
+
+class LaboratoryLayout:
+    """Node positions and levels of detail for one laboratory."""
+
+    def __init__(self, laboratory_id: int):
+        self.laboratory_id = laboratory_id
+        self.concept_ids = np.empty(0, dtype=np.int64)
+        self.positions = np.empty((0, 2))
+        self.importance = np.empty(0)
+        self.low = np.zeros(2)
+        self.extent = 1.0
+        self.levels = np.empty(0, dtype=np.int8)
+        self.unit = np.empty((0, 2))
+        self.version = 0
+        self.computed_at = 0.0
+        self.incremental_nodes = 0
+        self.unsaved = False  # Nodes changed since the layout was saved
+        self._index: Dict[int, int] = {}
+        self._pending: Dict[int, float] = {}  # New concepts to place -> importance
+        self._importance_changes: Dict[int, float] = {}
+        self._removed: Set[int] = set()
+        self._graph_seen = None
+        self._lock = threading.RLock()
+
+    # -- edges -----------------------------------------------------------------
+
+    def _edges(self, graph: LaboratoryGraph):
+        """Edges as layout indices: ``sources, targets, strengths, relationship_types, relationship_ids``."""
+        offsets, neighbours, strengths, _, types, relationship_ids = graph.csr()
+        to_layout = np.array([self._index.get(concept_id, -1) for concept_id in graph.node_ids], dtype=np.int64)
+        if not len(to_layout):
+            empty = np.empty(0, dtype=np.int64)
+            return empty, empty, np.empty(0), empty, empty
+        sources = to_layout[np.repeat(np.arange(len(offsets) - 1), np.diff(offsets))]
+        targets = to_layout[neighbours]
+        # Each undirected edge once (bidirectional ones are listed both ways)
+        _, first = np.unique(relationship_ids, return_index=True)
+        keep = first[(sources[first] >= 0) & (targets[first] >= 0)]
+        return sources[keep], targets[keep], strengths[keep].astype(np.float64), types[keep], relationship_ids[keep]
+
+    # -- computation ---------------------------------------------------------------
+
+    def _set_nodes(self, concept_ids: np.ndarray, positions: np.ndarray, importance: np.ndarray):
+        self.concept_ids = concept_ids
+        self.positions = positions
+        self.importance = importance
+        self._index = {int(concept_id): i for i, concept_id in enumerate(concept_ids)}
+
+    def compute(self, concepts: Dict[int, float], graph: LaboratoryGraph):
+        """Lay out ``{concept_id: importance}`` from scratch."""
+        with self._lock:
+            ids = np.array(sorted(concepts), dtype=np.int64)
+            self._set_nodes(ids, np.zeros((len(ids), 2)), np.array([concepts[i] or 0.0 for i in ids.tolist()]))
+            sources, targets, strengths, _, _ = self._edges(graph)
+            self.positions = force_layout(len(ids), sources, targets, strengths, seed=self.laboratory_id)
+            if len(ids):
+                # Robust bounds: a few far-flung loose nodes would squeeze everything else into one tile
+                low, high = np.percentile(self.positions, [1, 99], axis=0)
+                margin = 0.05 * (high - low).max()
+                self.low = low - margin
+                self.extent = float(max((high - low).max() + 2 * margin, 1e-9))
+            self._pending.clear()
+            self._importance_changes.clear()
+            self._removed.clear()
+            self.incremental_nodes = 0
+            self.computed_at = time.time()
+            self._refresh(graph)
+            self.unsaved = True
+
+    def _place_pending(self, graph: LaboratoryGraph):
+        new_ids = [concept_id for concept_id in self._pending if concept_id not in self._index]
+        start = len(self.concept_ids)
+        self._set_nodes(
+            np.concatenate([self.concept_ids, np.array(new_ids, dtype=np.int64)]),
+            np.concatenate([self.positions, np.zeros((len(new_ids), 2))]),
+            np.concatenate([self.importance, [self._pending[i] or 0.0 for i in new_ids]]),
+        )
+        self._pending.clear()
+        movable = np.arange(start, len(self.concept_ids))
+        if not len(movable):
+            return
+
+        sources, targets, strengths, _, _ = self._edges(graph)
+        rng = np.random.default_rng(int(self.concept_ids[-1]))
+        placed = np.ones(len(self.concept_ids), dtype=bool)
+        placed[movable] = False
+        total = np.zeros((len(self.concept_ids), 2))
+        counts = np.zeros(len(self.concept_ids))
+        for a, b in ((sources, targets), (targets, sources)):
+            known = placed[b]
+            np.add.at(total, a[known], self.positions[b[known]])
+            np.add.at(counts, a[known], 1)
+        linked = movable[counts[movable] > 0]
+        self.positions[linked] = total[linked] / counts[linked, None]
+        isolated = movable[counts[movable] == 0]
+        self.positions[isolated] = self.low + rng.uniform(0.0, 1.0, (len(isolated), 2)) * self.extent
+        self.positions[movable] += rng.normal(0.0, 0.5, (len(movable), 2))
+
+        self.positions = force_layout(
+            len(self.concept_ids), sources, targets, strengths, positions=self.positions,
+            movable=movable, iterations=max(settings.LAYOUT_ITERATIONS // 5, 10), seed=int(movable[0]),
+        )
+        self.incremental_nodes += len(movable)
+
+    def _remove(self, concept_ids: Set[int]):
+        keep = ~np.isin(self.concept_ids, list(concept_ids))
+        self._set_nodes(self.concept_ids[keep], self.positions[keep], self.importance[keep])
+
+    def _refresh(self, graph: LaboratoryGraph):
+        """Recompute normalised positions and levels of detail."""
+        if len(self.concept_ids):
+            self.unit = np.clip((self.positions - self.low) / self.extent, 0.0, 1.0)
+        else:
+            self.unit = np.empty((0, 2))
+        sources, targets, _, _, _ = self._edges(graph)
+        degree = np.bincount(np.concatenate([sources, targets]), minlength=len(self.concept_ids))
+        prominence = np.log1p(degree) / math.log1p(max(int(degree.max(initial=0)), 1))
+        self.levels = detail_levels(self.unit, self.importance + prominence,
+                                    settings.LAYOUT_TILE_NODES, settings.LAYOUT_MAX_ZOOM)
+        self._graph_seen = graph.csr()
+        self.version += 1
+
+    def sync(self, graph: LaboratoryGraph) -> bool:
+        """Apply committed concept changes; returns whether a full recompute is due instead."""
+        with self._lock:
+            changed = False
+            if self._removed:
+                self._remove(self._removed)
+                self._removed.clear()
+                changed = True
+            for concept_id, importance in self._importance_changes.items():
+                if concept_id in self._index:
+                    self.importance[self._index[concept_id]] = importance or 0.0
+                    changed = True
+            self._importance_changes.clear()
+            if self._pending:
+                if self.incremental_nodes + len(self._pending) > settings.LAYOUT_RELAYOUT_FRACTION * max(len(self.concept_ids), 1):
+                    return True
+                self._place_pending(graph)
+                changed = True
+            if changed or graph.csr() is not self._graph_seen:
+                self._refresh(graph)
+            self.unsaved = self.unsaved or changed
+            return False
+
+    # -- change tracking ----------------------------------------------------------
+
+    def add_concept(self, concept_id: int, importance: Optional[float]):
+        with self._lock:
+            self._removed.discard(concept_id)
+            if concept_id not in self._index:
+                self._pending[concept_id] = importance
+
+    def remove_concept(self, concept_id: int):
+        with self._lock:
+            self._pending.pop(concept_id, None)
+            if concept_id in self._index:
+                self._removed.add(concept_id)
+
+    def set_importance(self, concept_id: int, importance: Optional[float]):
+        with self._lock:
+            if concept_id in self._pending:
+                self._pending[concept_id] = importance
+            else:
+                self._importance_changes[concept_id] = importance
+
+    # -- persistence --------------------------------------------------------------
+
+    def save(self, path: Path):
+        with self._lock:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            partial = path.with_name(f"{path.stem}.part.npz")
+            np.savez(
+                partial, concept_ids=self.concept_ids, positions=self.positions,
+                low=self.low, extent=np.array([self.extent]), computed_at=np.array([self.computed_at]),
+                incremental_nodes=np.array([self.incremental_nodes]),
+            )
+            partial.replace(path)
+            self.unsaved = False
+
+    @classmethod
+    def open(cls, laboratory_id: int, path: Path) -> Optional["LaboratoryLayout"]:
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                layout = cls(laboratory_id)
+                layout._set_nodes(data["concept_ids"], data["positions"], np.zeros(len(data["concept_ids"])))
+                layout.low = data["low"]
+                layout.extent = float(data["extent"][0])
+                layout.computed_at = float(data["computed_at"][0])
+                layout.incremental_nodes = int(data["incremental_nodes"][0])
+        except (OSError, KeyError, ValueError):
+            return None
+        return layout
+
+    # -- queries ---------------------------------------------------------------
+
+    def summary(self) -> dict:
+        with self._lock:
+            return {
+                "laboratory_id": self.laboratory_id,
+                "node_count": len(self.concept_ids),
+                "version": self.version,
+                "computed_at": self.computed_at,
+                "incremental_nodes": self.incremental_nodes,
+                "max_zoom": settings.LAYOUT_MAX_ZOOM,
+                "tile_nodes": settings.LAYOUT_TILE_NODES,
+                "levels": np.bincount(self.levels, minlength=settings.LAYOUT_MAX_ZOOM + 1).tolist(),
+            }
+
+    def tile(self, graph: LaboratoryGraph, zoom: int, x: int, y: int) -> dict:
+        """
+        Nodes of tile ``zoom/x/y`` visible at that zoom, the edges leaving
+        them towards other visible nodes, and clusters of the nodes that only
+        appear at deeper zooms.
+        """
+        with self._lock:
+            tx, ty = _tile_coordinates(self.unit, zoom)
+            inside = (tx == x) & (ty == y)
+            visible = self.levels <= zoom
+            shown = np.flatnonzero(inside & visible)
+
+            sources, targets, strengths, types, relationship_ids = self._edges(graph)
+            shown_mask = np.zeros(len(self.concept_ids), dtype=bool)
+            shown_mask[shown] = True
+            # Edges with an end in this tile whose other end is visible too
+            keep = (shown_mask[sources] & visible[targets]) | (shown_mask[targets] & visible[sources])
+            edges = [
+                {
+                    "relationship_id": int(relationship_id),
+                    "source_id": int(self.concept_ids[source]),
+                    "target_id": int(self.concept_ids[target]),
+                    "strength": round(float(strength), 4),
+                    "relationship_type": RELATIONSHIP_TYPES[code].value,
+                }
+                for source, target, strength, code, relationship_id in zip(
+                    sources[keep], targets[keep], strengths[keep], types[keep], relationship_ids[keep]
+                )
+            ]
+            # Visible neighbours outside the tile, so the frontend can draw the edges
+            outside = np.setdiff1d(np.concatenate([sources[keep], targets[keep]]), shown)
+
+            hidden = np.flatnonzero(inside & ~visible)
+            clusters = []
+            if len(hidden):
+                level = min(zoom + _CLUSTER_LEVELS, 30)
+                cx, cy = _tile_coordinates(self.unit[hidden], level)
+                _, inverse, counts = np.unique(cx * (1 << level) + cy, return_inverse=True, return_counts=True)
+                centroids = np.stack([
+                    np.bincount(inverse, weights=self.unit[hidden, axis]) / counts for axis in range(2)
+                ], axis=1)
+                clusters = [
+                    {"x": round(float(centroid[0]), 6), "y": round(float(centroid[1]), 6), "count": int(count)}
+                    for centroid, count in zip(centroids, counts)
+                ]
+
+            def node(i):
+                return {
+                    "id": int(self.concept_ids[i]),
+                    "x": round(float(self.unit[i, 0]), 6),
+                    "y": round(float(self.unit[i, 1]), 6),
+                    "level": int(self.levels[i]),
+                }
+
+            return {
+                "zoom": zoom,
+                "x": x,
+                "y": y,
+                "version": self.version,
+                "nodes": [node(i) for i in shown],
+                "neighbours": [node(i) for i in outside],
+                "edges": edges,
+                "clusters": clusters,
+            }
+
+
+class LayoutStore:
+    """Lazily computed layouts, one per laboratory."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._layouts: Dict[int, LaboratoryLayout] = {}
+        self._lock = threading.Lock()
+        self._computing: Dict[int, threading.Lock] = {}
+
+    def _path(self, laboratory_id: int) -> Path:
+        return self.root / "layouts" / f"lab_{laboratory_id}.npz"
+
+    def _concepts(self, db, laboratory_id: int) -> Dict[int, float]:
+        return dict(db.execute(
+            select(Concept.id, Concept.importance_score)
+            .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True)
+        ).all())
+
+    def get(self, db, laboratory_id: int) -> LaboratoryLayout:
+        """
+        The laboratory's layout with committed changes applied. It is opened
+        from disk (and reconciled with the database) or computed on first use.
+        """
+        with self._lock:
+            layout = self._layouts.get(laboratory_id)
+            compute_lock = self._computing.setdefault(laboratory_id, threading.Lock())
+
+        with compute_lock:
+            graph = graph_store.get(db, laboratory_id)
+            if layout is None:
+                layout = self._open(db, laboratory_id)
+            if layout is None or layout.sync(graph):
+                layout = self.compute(db, laboratory_id)
+            elif layout.unsaved:
+                layout.save(self._path(laboratory_id))
+        return layout
+
+    def _open(self, db, laboratory_id: int) -> Optional[LaboratoryLayout]:
+        layout = LaboratoryLayout.open(laboratory_id, self._path(laboratory_id))
+        if layout is None:
+            return None
+        concepts = self._concepts(db, laboratory_id)
+        known = set(layout.concept_ids.tolist())
+        layout.importance = np.array([concepts.get(i) or 0.0 for i in layout.concept_ids.tolist()])
+        for concept_id in known - concepts.keys():
+            layout.remove_concept(concept_id)
+        for concept_id in concepts.keys() - known:
+            layout.add_concept(concept_id, concepts[concept_id])
+        with self._lock:
+            self._layouts[laboratory_id] = layout
+        return layout
+
+    def compute(self, db, laboratory_id: int) -> LaboratoryLayout:
+        """Lay a laboratory out from scratch and save it."""
+        started = time.perf_counter()
+        layout = LaboratoryLayout(laboratory_id)
+        layout.compute(self._concepts(db, laboratory_id), graph_store.get(db, laboratory_id))
+        layout.save(self._path(laboratory_id))
+        with self._lock:
+            previous = self._layouts.get(laboratory_id)
+            if previous is not None:
+                layout.version = previous.version + 1
+            self._layouts[laboratory_id] = layout
+        print(f"🗺️ Laid out laboratory {laboratory_id} ({len(layout.concept_ids)} concepts) "
+              f"in {time.perf_counter() - started:.2f}s")
+        return layout
+
+    def loaded(self) -> Dict[int, LaboratoryLayout]:
+        with self._lock:
+            return dict(self._layouts)
+
+    def apply_concept_changes(self, changes):
+        layouts = self.loaded()
+        for change in changes:
+            layout = layouts.get(change["laboratory_id"])
+            if layout is None:
+                continue
+            if not change["active"]:
+                layout.remove_concept(change["id"])
+            elif change["op"] == "insert" or change["activated"]:
+                layout.add_concept(change["id"], change["importance_score"])
+            else:
+                layout.set_importance(change["id"], change["importance_score"])
+            for laboratory_id in change["previous_laboratory_ids"]:
+                if laboratory_id in layouts:
+                    layouts[laboratory_id].remove_concept(change["id"])
+
+
+layout_store = LayoutStore(settings.VECTOR_STORE_DIR)
+
+
+def _snapshot_concept(concept, op):
+    state = inspect(concept)
+    if op == "update" and not any(
+        state.attrs[name].history.has_changes() for name in ("is_active", "importance_score", "laboratory_id")
+    ):
+        return None
+    laboratory = state.attrs.laboratory_id.history
+    return {
+        "id": concept.id,
+        "op": op,
+        "laboratory_id": concept.laboratory_id,
+        "previous_laboratory_ids": [lab_id for lab_id in laboratory.deleted if lab_id is not None],
+        "active": op != "delete" and bool(concept.is_active),
+        "activated": state.attrs.is_active.history.has_changes() or laboratory.has_changes(),
+        "importance_score": concept.importance_score,
+    }
+
+
+register_commit_hook(Concept, _snapshot_concept, layout_store.apply_concept_changes)
@@ -0,0 +1,260 @@
+"""
+Scheduler for local LLM calls through Ollama.
+
+Every generation goes through ``llm_scheduler``:
+
+* one pooled ``httpx.AsyncClient`` keeps connections to Ollama alive;
+* each model has ``LLM_MODEL_CONCURRENCY`` slots (Ollama batches parallel
+  requests to a loaded model, more only queue inside Ollama); waiting
+  requests are served by priority, interactive before background, then in
+  arrival order;
+* tasks are routed to the laboratory's (or the default) lightweight or
+  deep model, see ``TASK_TIERS``;
+* responses are cached by (model, prompt hash) and identical requests in
+  flight share one call.
+
+Point ``OLLAMA_BASE_URL`` at a stub server (anything answering
+``POST /api/generate``) to run without Ollama.
+"""
+
+import asyncio
+import hashlib
+import heapq
+import itertools
+import json
+from collections import OrderedDict
+from enum import IntEnum
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from app.core.config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class LLMUnavailable(Exception):
+    """Ollama could not be reached or returned an error."""
+
+
+class Priority(IntEnum):
+    INTERACTIVE = 0  # A user is waiting for the answer
+    BACKGROUND = 1  # Ingestion, batch enrichment
+
+
+# task -> model tier; unknown tasks use the deep model
+TASK_TIERS = {
+    "concept_summary": "lightweight",
+    "source_summary": "deep",
+    "notebook_insights": "lightweight",
+}
+
+
+def route(task: str, laboratory=None) -> str:
+    """Model for a task, honouring the laboratory's model overrides."""
+    if TASK_TIERS.get(task) == "lightweight":
+        return (laboratory and laboratory.lightweight_model) or settings.LIGHTWEIGHT_MODEL
+    return (laboratory and laboratory.deep_model) or settings.DEEP_MODEL
+
+
+def cache_key(model: str, prompt: str, system: Optional[str] = None, options: Optional[dict] = None) -> str:
+    payload = json.dumps([model, system, prompt, options], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class _ModelLane:
+    """Concurrency slots of one model, handed to waiters by priority."""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+        self._waiting = []
+        self._order = itertools.count()
+
+    @property
+    def waiting(self) -> int:
+        return sum(1 for _, _, future in self._waiting if not future.done())
+
+    async def acquire(self, priority: Priority):
+        if self.active < self.limit and not self.waiting:
+            self.active += 1
+            return
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting, (int(priority), next(self._order), future))
+        try:
+            await future
+        except asyncio.CancelledError:
+            # The slot may have been handed over just before the cancel
+            if future.done() and not future.cancelled():
+                self.release()
+            raise
+
+    def release(self):
+        while self._waiting:
+            _, _, future = heapq.heappop(self._waiting)
+            if not future.done():
+                future.set_result(None)  # The slot passes to the waiter
+                return
+        self.active -= 1
+
+
+class LLMScheduler:
+    """Pooled, prioritised, cached access to Ollama."""
+
+    def __init__(self, base_url: Optional[str] = None, transport: Optional["httpx.AsyncBaseTransport"] = None):
+        self.base_url = base_url or settings.OLLAMA_BASE_URL
+        self._transport = transport
+        self._client: Optional["httpx.AsyncClient"] = None
+        self._lanes: Dict[str, _ModelLane] = {}
+        self._cache: "OrderedDict[str, str]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"requests": 0, "calls": 0, "cache_hits": 0, "coalesced": 0, "errors": 0}
+
+    @property
+    def client(self) -> "httpx.AsyncClient":
+        if self._client is None:
+            import httpx  # Imported on first use, keeps it off the startup path
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                transport=self._transport,
+                timeout=httpx.Timeout(settings.LLM_TIMEOUT, connect=5.0),
+                limits=httpx.Limits(
+                    max_connections=settings.LLM_MAX_CONNECTIONS,
+                    max_keepalive_connections=settings.LLM_MAX_CONNECTIONS,
+                ),
+            )
+        return self._client
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def _lane(self, model: str) -> _ModelLane:
+        lane = self._lanes.get(model)
+        if lane is None:
+            limit = settings.LLM_MODEL_CONCURRENCY.get(model, settings.LLM_DEFAULT_CONCURRENCY)
+            lane = self._lanes[model] = _ModelLane(max(1, limit))
+        return lane
+
+    def status(self) -> dict:
+        return {
+            "base_url": self.base_url,
+            "models": {
+                model: {"limit": lane.limit, "active": lane.active, "waiting": lane.waiting}
+                for model, lane in self._lanes.items()
+            },
+            "cached": len(self._cache),
+            "stats": dict(self.stats),
+        }
+
+    # -- generation --------------------------------------------------------------
+
+    async def generate(
+        self,
+        prompt: str,
+        task: str = "",
+        system: Optional[str] = None,
+        priority: Priority = Priority.INTERACTIVE,
+        laboratory=None,
+        model: Optional[str] = None,
+        options: Optional[dict] = None,
+        json_format: bool = False,
+    ) -> str:
+        """Generate a completion, from the cache when the same request was answered before."""
+        model = model or route(task, laboratory)
+        key = cache_key(model, prompt, system, {"options": options, "json": json_format})
+        self.stats["requests"] += 1
+
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return await asyncio.shield(inflight)
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            text = await self._call(model, prompt, system, options, json_format, priority)
+        except BaseException as e:
+            future.set_exception(e if isinstance(e, Exception) else LLMUnavailable("Request cancelled"))
+            future.exception()  # Waiters re-raise it; don't warn when there are none
+            raise
+        else:
+            future.set_result(text)
+            self._cache[key] = text
+            if len(self._cache) > settings.LLM_CACHE_SIZE:
+                self._cache.popitem(last=False)
+            return text
+        finally:
+            self._inflight.pop(key, None)
+
+    async def generate_many(self, prompts: List[str], **kwargs) -> List[str]:
+        """Generate several prompts concurrently; the model lanes bound the parallelism."""
+        return await asyncio.gather(*(self.generate(prompt, **kwargs) for prompt in prompts))
+
+    async def _call(self, model: str, prompt: str, system: Optional[str], options: Optional[dict],
+                    json_format: bool, priority: Priority) -> str:
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if system:
+            payload["system"] = system
+        if options:
+            payload["options"] = options
+        if json_format:
+            payload["format"] = "json"
+
+        import httpx
+
+        lane = self._lane(model)
+        await lane.acquire(priority)
+        try:
+            self.stats["calls"] += 1
+            response = await self.client.post("/api/generate", json=payload)
+            response.raise_for_status()
+            return response.json()["response"]
+        except (httpx.HTTPError, KeyError, ValueError) as e:
+            self.stats["errors"] += 1
+            raise LLMUnavailable(f"{model}: {e}") from e
+        finally:
+            lane.release()
+
+
+llm_scheduler = LLMScheduler()
+
+
+# -- tasks -------------------------------------------------------------------------
+
+SUMMARY_SYSTEM = "You write concise, faithful summaries for a personal knowledge base. Answer with the summary only."
+INSIGHTS_SYSTEM = (
+    "You help a learner reflect on their lab notebook. Answer with JSON: "
+    '{"key_insights": [short strings], "suggested_actions": [short strings]}.'
+)
+
+
+async def summarize(text: str, task: str, laboratory=None, priority: Priority = Priority.INTERACTIVE,
+                    sentences: int = 3) -> str:
+    """A short summary of ``text``."""
+    prompt = f"Summarise the following in at most {sentences} sentences.\n\n{text[:settings.LLM_MAX_PROMPT_CHARS]}"
+    summary = await llm_scheduler.generate(prompt, task, SUMMARY_SYSTEM, priority, laboratory)
+    return summary.strip()
+
+
+async def notebook_insights(title: str, content: str, laboratory=None,
+                            priority: Priority = Priority.INTERACTIVE) -> dict:
+    """Key insights and suggested next steps for a notebook entry."""
+    prompt = f"Notebook entry: {title}\n\n{content[:settings.LLM_MAX_PROMPT_CHARS]}"
+    answer = await llm_scheduler.generate(
+        prompt, "notebook_insights", INSIGHTS_SYSTEM, priority, laboratory, json_format=True
+    )
+    try:
+        parsed = json.loads(answer)
+    except ValueError:
+        raise LLMUnavailable("Model did not answer with JSON")
+    return {
+        "key_insights": [str(item) for item in parsed.get("key_insights") or []],
+        "suggested_actions": [str(item) for item in parsed.get("suggested_actions") or []],
+    }
@@ -0,0 +1,43 @@
+"""
+Load plans: the relationships each API response shape serialises, loaded
+up front with ``selectinload``/``joinedload``.
+
+Every plan ends with ``raiseload("*")``, so touching a relationship that is
+not part of the plan raises instead of quietly issuing one query per row.
+List endpoints therefore run a constant number of queries however many
+rows they return (see ``app.core.query_counter``).
+"""
+
+from typing import Dict, Tuple
+
+from sqlalchemy.orm import joinedload, raiseload, selectinload
+
+from app.models.concept import Concept
+from app.models.tag import Tag
+
+_CONCEPT_TAGS = selectinload(Concept.tags).joinedload(Tag.parent)  # Tag.full_name needs the parent
+
+LOAD_PLANS: Dict[str, Tuple] = {
+    "laboratory": (raiseload("*"),),
+    "tag": (joinedload(Tag.parent), raiseload("*")),
+    "source": (raiseload("*"),),
+    "notebook_entry": (raiseload("*"),),
+    "concept_list": (
+        _CONCEPT_TAGS,
+        joinedload(Concept.source),
+        raiseload("*"),
+    ),
+    "concept_detail": (
+        _CONCEPT_TAGS,
+        joinedload(Concept.source),
+        selectinload(Concept.child_relationships).raiseload("*"),
+        selectinload(Concept.parent_relationships).raiseload("*"),
+        raiseload("*"),
+    ),
+    "relationship": (raiseload("*"),),
+}
+
+
+def with_plan(stmt, shape: str):
+    """Apply the load plan for a response shape to a select() statement."""
+    return stmt.options(*LOAD_PLANS[shape])
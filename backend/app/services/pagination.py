@@ -0,0 +1,120 @@
+"""
+Keyset (cursor) pagination and column projection for list endpoints.
+
+Pages are ordered by ``(sort key, id)`` descending and continue from an
+opaque cursor holding the last row's key, so every page costs the same
+index range scan however deep the client goes. Nullable sort columns are
+keyed by ``coalesce(column, default)``: a NULL in the row/cursor comparison
+would otherwise silently drop rows. ``fields=`` narrows the
+loaded columns with ``load_only`` for light list views.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import DateTime, func, literal_column, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload
+
+from app.models.concept import Concept
+from app.models.notebook import NotebookEntry
+from app.models.source import Source
+from app.services.load_plans import LOAD_PLANS
+
+# Sort keys per model, as (column, value that stands for NULL); each is backed
+# by a (laboratory_id, key, id) index
+SORT_KEYS = {
+    Concept: {"created": (Concept.created_at, None), "importance": (Concept.importance_score, 0.0)},
+    Source: {"created": (Source.created_at, None)},
+    NotebookEntry: {"created": (NotebookEntry.created_at, None)},
+}
+
+# Columns that can never be requested through ``fields=``
+HIDDEN_COLUMNS = {"embedding_vector"}
+
+
+class InvalidPageRequest(ValueError):
+    """Unknown sort key or field, or a cursor that cannot be decoded."""
+
+
+def encode_cursor(sort: str, value, row_id: int) -> str:
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    payload = json.dumps([sort, value, row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str, column):
+    """Return the ``(value, id)`` a cursor continues after."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        if isinstance(column.type, DateTime) and value is not None:
+            value = datetime.fromisoformat(value)
+    except (ValueError, TypeError):
+        raise InvalidPageRequest("Invalid cursor")
+    if cursor_sort != sort:
+        raise InvalidPageRequest("Cursor was issued for a different sort order")
+    return value, int(row_id)
+
+
+def parse_fields(model, fields: Optional[str]) -> Optional[List[str]]:
+    """Validate a comma-separated ``fields=`` value against the model's columns."""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    columns = set(model.__table__.columns.keys()) - HIDDEN_COLUMNS
+    unknown = [name for name in names if name not in columns]
+    if unknown:
+        raise InvalidPageRequest(f"Unknown fields: {', '.join(unknown)}")
+    return list(dict.fromkeys(["id", *names]))
+
+
+async def fetch_page(
+    db: AsyncSession,
+    stmt,
+    model,
+    sort: str = "created",
+    cursor: Optional[str] = None,
+    limit: int = 50,
+    fields: Optional[Sequence[str]] = None,
+    plan: Optional[str] = None,
+) -> Dict:
+    """
+    Run ``stmt`` (a filtered ``select(model)``) for one page. With
+    ``fields`` only those columns are loaded and items are plain dicts;
+    otherwise items are ORM objects loaded with the given load plan.
+    """
+    if sort not in SORT_KEYS[model]:
+        raise InvalidPageRequest(f"Unknown sort: {sort}")
+    column, null_value = SORT_KEYS[model][sort]
+    # Rendered inline, a bound parameter would not match the expression index
+    key = column if null_value is None else func.coalesce(column, literal_column(repr(null_value)))
+
+    if cursor:
+        value, row_id = decode_cursor(cursor, sort, column)
+        if value is None:
+            value = null_value
+        stmt = stmt.where(tuple_(key, model.id) < tuple_(value, row_id))
+    stmt = stmt.order_by(key.desc(), model.id.desc()).limit(limit + 1)
+
+    if fields:
+        loaded = [getattr(model, name) for name in dict.fromkeys([*fields, column.key])]
+        stmt = stmt.options(load_only(*loaded, raiseload=True), raiseload("*"))
+    elif plan:
+        stmt = stmt.options(*LOAD_PLANS[plan])
+
+    rows = (await db.scalars(stmt)).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more:
+        last = rows[-1]
+        value = getattr(last, column.key)
+        next_cursor = encode_cursor(sort, null_value if value is None else value, last.id)
+
+    items = [{name: getattr(row, name) for name in fields} for row in rows] if fields else rows
+    return {"items": items, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,234 @@
+"""
+Passage retrieval over the chunks of a laboratory's sources.
+
+Ingestion splits a source into ``SourceChunk`` rows (chunk stage) and
+embeds them into ``embeddings.f32`` in the source's working directory, one
+float32 row per chunk in ``chunk_index`` order (embed stage). Those files
+are the packed store of chunk vectors; each laboratory additionally gets a
+memory-mapped index of all its chunk vectors, keyed by ``SourceChunk.id``,
+searched through an IVF index once it is large (see ``app.services.ann``).
+
+Passage text is never held in the database or in memory: a result reads
+its byte range from the source's ``text.txt`` when it is returned.
+"""
+
+import os
+import shutil
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import delete, insert, literal, select
+
+from app.core.config import settings
+from app.models.source import Source, SourceChunk
+from app.services.ann import ANNStore
+from app.services.ingestion.stages import WORK_FILES, work_directory
+from app.services.vector_store import LaboratoryVectorStore, VectorIndex
+
+
+def source_directory(source) -> Path:
+    """Working directory holding a source's text.txt and embeddings.f32."""
+    return work_directory({"id": source.id})
+
+
+def read_passage(directory: Path, byte_start: int, byte_end: int) -> str:
+    """Read one passage from text.txt without loading the document."""
+    with open(directory / "text.txt", "rb") as f:
+        f.seek(byte_start)
+        return f.read(byte_end - byte_start).decode("utf-8", errors="replace").replace("\f", "\n")
+
+
+def _chunk_vectors(directory: Path, count: int) -> Optional[np.ndarray]:
+    """The embed stage's matrix for ``count`` chunks, memory-mapped, or None if missing."""
+    path = directory / "embeddings.f32"
+    if not count or not path.exists() or path.stat().st_size % (4 * count):
+        return None
+    return np.memmap(path, dtype="<f4", mode="r").reshape(count, -1)
+
+
+class ChunkVectorStore(LaboratoryVectorStore):
+    """Registry of passage vector indexes, one per laboratory."""
+
+    def _directory(self, laboratory_id: int) -> Path:
+        return self.root / "chunks" / f"lab_{laboratory_id}"
+
+    def rebuild(self, db, laboratory_id: int, batch_size: int = 1000) -> Optional[VectorIndex]:
+        """Rebuild a laboratory's index from the embedded sources' packed vectors."""
+        directory = self._directory(laboratory_id)
+        for stale in ("vectors.f32", "ids.i64", "meta.json"):
+            (directory / stale).unlink(missing_ok=True)
+
+        sources = db.execute(
+            select(Source.id).where(
+                Source.laboratory_id == laboratory_id,
+                Source.is_archived == False,
+                Source.embedding_model == settings.EMBEDDING_MODEL,
+            )
+        ).all()
+
+        index = None
+        for source in sources:
+            chunk_ids = db.scalars(
+                select(SourceChunk.id).where(SourceChunk.source_id == source.id).order_by(SourceChunk.chunk_index)
+            ).all()
+            vectors = _chunk_vectors(source_directory(source), len(chunk_ids))
+            if vectors is None:
+                continue
+            if index is None:
+                index = VectorIndex(directory, vectors.shape[1], settings.EMBEDDING_MODEL)
+            if vectors.shape[1] != index.dim:
+                continue
+            for start in range(0, len(chunk_ids), batch_size):
+                index.upsert_many(zip(chunk_ids[start:start + batch_size], vectors[start:start + batch_size]))
+
+        if index is None:
+            return None
+        index.flush()
+        with self._lock:
+            self._indexes[laboratory_id] = index
+        return index
+
+
+chunk_vector_store = ChunkVectorStore(settings.VECTOR_STORE_DIR)
+
+
+def current_chunk_index(db, laboratory_id: int) -> Optional[VectorIndex]:
+    """A laboratory's passage index for the configured embedding model."""
+    index = chunk_vector_store.get(laboratory_id, db)
+    if index is not None and index.model and index.model != settings.EMBEDDING_MODEL:
+        chunk_vector_store.drop(laboratory_id)
+        index = chunk_vector_store.get(laboratory_id, db)
+    return index
+
+
+chunk_ann_store = ANNStore(current_chunk_index)
+
+
+# -- ingestion ---------------------------------------------------------------------
+
+def replace_chunks(db, source: Source, records: Iterable[dict]) -> int:
+    """
+    Swap a source's chunk rows for the chunk stage's records (the caller
+    commits). Vectors of the old chunks leave the passage index now; the new
+    ones arrive with the embed stage.
+    """
+    old_ids = db.scalars(select(SourceChunk.id).where(SourceChunk.source_id == source.id)).all()
+    if old_ids:
+        index = chunk_vector_store.get(source.laboratory_id)
+        if index is not None:
+            index.remove_many(old_ids)
+            index.flush()
+        db.execute(delete(SourceChunk).where(SourceChunk.source_id == source.id))
+
+    rows = [
+        {
+            "source_id": source.id,
+            "laboratory_id": source.laboratory_id,
+            "chunk_index": record["index"],
+            "byte_start": record["byte_start"],
+            "byte_end": record["byte_end"],
+            "token_count": record["token_count"],
+            "page": record.get("page"),
+            "start_seconds": record.get("start_seconds"),
+        }
+        for record in records
+    ]
+    if rows:
+        db.execute(insert(SourceChunk), rows)
+    return len(rows)
+
+
+def copy_work_files(original: Source, source: Source):
+    """Copy the artefacts of ``original``'s working directory into ``source``'s."""
+    original_directory, directory = source_directory(original), source_directory(source)
+    for name in WORK_FILES:
+        if not (original_directory / name).is_file():
+            continue
+        partial = directory / f"{name}.part"
+        shutil.copyfile(original_directory / name, partial)
+        os.replace(partial, directory / name)
+
+
+def copy_chunks(db, original: Source, source: Source) -> int:
+    """
+    Give ``source`` the chunk rows and working files of ``original``, a
+    processed duplicate (the caller commits). The copied rows point into
+    the copied text and packed vectors.
+    """
+    db.flush()
+    copy_work_files(original, source)
+    db.execute(delete(SourceChunk).where(SourceChunk.source_id == source.id))
+    copied = select(
+        literal(source.id), literal(source.laboratory_id), SourceChunk.chunk_index, SourceChunk.byte_start,
+        SourceChunk.byte_end, SourceChunk.token_count, SourceChunk.page, SourceChunk.start_seconds,
+        SourceChunk.created_at, SourceChunk.updated_at,
+    ).where(SourceChunk.source_id == original.id)
+    result = db.execute(insert(SourceChunk).from_select(
+        ["source_id", "laboratory_id", "chunk_index", "byte_start", "byte_end", "token_count", "page",
+         "start_seconds", "created_at", "updated_at"],
+        copied,
+    ))
+    return result.rowcount
+
+
+def index_source_chunks(db, source: Source) -> int:
+    """Add a freshly embedded source's chunk vectors to its laboratory's passage index."""
+    index = chunk_vector_store.get(source.laboratory_id)
+    if index is None:
+        return 0  # Built from the packed files on first search
+    chunk_ids = db.scalars(
+        select(SourceChunk.id).where(SourceChunk.source_id == source.id).order_by(SourceChunk.chunk_index)
+    ).all()
+    vectors = _chunk_vectors(source_directory(source), len(chunk_ids))
+    if vectors is None or vectors.shape[1] != index.dim:
+        return 0
+    index.upsert_many(zip(chunk_ids, vectors))
+    index.flush()
+    chunk_ann_store.add(source.laboratory_id, chunk_ids, np.asarray(vectors))
+    return len(chunk_ids)
+
+
+# -- retrieval ---------------------------------------------------------------------
+
+def search_passages(db, laboratory_id: int, query_vector, k: int = 10,
+                    source_ids: Optional[Sequence[int]] = None) -> List[dict]:
+    """
+    Top-k passages of a laboratory's (non-archived) sources by cosine
+    similarity, best first, each with its text read from disk.
+    """
+    if source_ids:
+        # A few sources: exact search over their chunks only
+        index = current_chunk_index(db, laboratory_id)
+        if index is None:
+            return []
+        allowed = db.scalars(select(SourceChunk.id).where(SourceChunk.source_id.in_(source_ids))).all()
+        hits = index.top_k(query_vector, k, allowed_ids=allowed)
+    else:
+        # Over-fetch a little: archived sources are filtered out below
+        hits = chunk_ann_store.search(db, laboratory_id, None, query_vector, 2 * k)
+    if not hits:
+        return []
+
+    scores = dict(hits)
+    rows = db.execute(
+        select(SourceChunk, Source.title)
+        .join(Source, Source.id == SourceChunk.source_id)
+        .where(SourceChunk.id.in_(scores), Source.is_archived == False)
+    ).all()
+
+    passages = []
+    for chunk, title in sorted(rows, key=lambda row: -scores[row[0].id])[:k]:
+        directory = work_directory({"id": chunk.source_id})
+        passages.append({
+            "chunk_id": chunk.id,
+            "source_id": chunk.source_id,
+            "source_title": title,
+            "chunk_index": chunk.chunk_index,
+            "page": chunk.page,
+            "start_seconds": chunk.start_seconds,
+            "location": chunk.location,
+            "score": round(scores[chunk.id], 4),
+            "text": read_passage(directory, chunk.byte_start, chunk.byte_end),
+        })
+    return passages
@@ -0,0 +1,385 @@
+"""
+"Next topics" recommendations from the knowledge graph.
+
+A laboratory's frontier is the set of concepts that are not mastered yet
+but sit next to concepts that (partly) are. With progress ``m`` being
+``mastery_level / MASTERED_LEVEL`` and every edge weighted by
+``strength * confidence``, a concept ``c`` scores
+
+    support(c)   = sum of weight * m(neighbour) over its edges (any direction)
+    readiness(c) = weighted mean of m(parent) over its HIERARCHICAL parents,
+                   which act as prerequisites (1 without any)
+    score(c)     = support * readiness * (1 - m(c)) * (1 + importance_score)
+
+Support and prerequisite sums are kept per concept and patched when a
+review changes a mastery level or a relationship changes, so an update
+touches only the concept and its neighbours. Scores sit in a lazily
+pruned max-heap; the top N is read off the heap and kept until the next
+change, so serving recommendations does not depend on the laboratory's
+size.
+"""
+
+import heapq
+import threading
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, aliased
+
+from app.core.events import register_commit_hook
+from app.models.concept import Concept
+from app.models.relationships import ConceptRelationship, RelationshipType
+
+MASTERED_LEVEL = 3
+_EPSILON = 1e-9
+_PENDING_KEY = "_marie_mastery_changes"
+
+
+def _progress(mastery_level: Optional[int]) -> float:
+    return min(max(mastery_level or 0, 0), MASTERED_LEVEL) / MASTERED_LEVEL
+
+
+def _weight(strength: Optional[float], confidence: Optional[float]) -> float:
+    return (0.5 if strength is None else strength) * (0.5 if confidence is None else confidence)
+
+
+class LaboratoryFrontier:
+    """Frontier scores of one laboratory's active concepts."""
+
+    def __init__(self, laboratory_id: int):
+        self.laboratory_id = laboratory_id
+        self.mastery: Dict[int, float] = {}
+        self.importance: Dict[int, float] = {}
+        # relationship_id -> (source, target, weight, type)
+        self._edges: Dict[int, Tuple[int, int, float, RelationshipType]] = {}
+        self._incident: Dict[int, Set[int]] = defaultdict(set)
+        self._support: Dict[int, float] = defaultdict(float)
+        self._prerequisites: Dict[int, float] = defaultdict(float)  # Total weight of HIERARCHICAL parents
+        self._prerequisites_met: Dict[int, float] = defaultdict(float)  # Same, weighted by their progress
+        self._scores: Dict[int, float] = {}
+        self._heap: List[Tuple[float, int]] = []
+        self._top: Optional[List[Tuple[int, float]]] = None
+        self._top_limit = 0
+        self._lock = threading.RLock()
+
+    def __contains__(self, concept_id: int) -> bool:
+        return concept_id in self.mastery
+
+    # -- scoring ---------------------------------------------------------------
+
+    def _score(self, concept_id: int) -> float:
+        progress = self.mastery[concept_id]
+        support = self._support.get(concept_id, 0.0)
+        if progress >= 1.0 or support <= _EPSILON:
+            return 0.0
+        total = self._prerequisites.get(concept_id, 0.0)
+        readiness = self._prerequisites_met.get(concept_id, 0.0) / total if total > _EPSILON else 1.0
+        return support * readiness * (1.0 - progress) * (1.0 + self.importance[concept_id])
+
+    def _rescore(self, concept_ids):
+        for concept_id in concept_ids:
+            score = self._score(concept_id) if concept_id in self.mastery else 0.0
+            if score == self._scores.get(concept_id, 0.0):
+                continue
+            if score > 0.0:
+                self._scores[concept_id] = score
+                heapq.heappush(self._heap, (-score, concept_id))
+            else:
+                self._scores.pop(concept_id, None)
+            self._top = None
+        # Drop superseded entries once they outnumber the live ones
+        if len(self._heap) > 2 * len(self._scores) + 1024:
+            self._heap = [(-score, concept_id) for concept_id, score in self._scores.items()]
+            heapq.heapify(self._heap)
+
+    def _link(self, relationship_id: int, sign: float) -> Set[int]:
+        """Add (``sign=1``) or subtract (``-1``) an edge's contributions; returns the touched concepts."""
+        source, target, weight, relationship_type = self._edges[relationship_id]
+        self._support[target] += sign * weight * self.mastery[source]
+        self._support[source] += sign * weight * self.mastery[target]
+        if relationship_type == RelationshipType.HIERARCHICAL:
+            self._prerequisites[target] += sign * weight
+            self._prerequisites_met[target] += sign * weight * self.mastery[source]
+        return {source, target}
+
+    # -- updates ---------------------------------------------------------------
+
+    def set_concept(self, concept_id: int, mastery_level: Optional[int], importance_score: Optional[float],
+                    rescore: bool = True):
+        """Add a concept or update its mastery and importance."""
+        with self._lock:
+            progress = _progress(mastery_level)
+            previous = self.mastery.get(concept_id)
+            self.mastery[concept_id] = progress
+            self.importance[concept_id] = importance_score or 0.0
+            touched = {concept_id}
+            if previous is not None and progress != previous:
+                delta = progress - previous
+                for relationship_id in self._incident.get(concept_id, ()):
+                    source, target, weight, relationship_type = self._edges[relationship_id]
+                    neighbour = target if source == concept_id else source
+                    self._support[neighbour] += delta * weight
+                    if relationship_type == RelationshipType.HIERARCHICAL and source == concept_id:
+                        self._prerequisites_met[target] += delta * weight
+                    touched.add(neighbour)
+            if rescore:
+                self._rescore(touched)
+
+    def remove_concept(self, concept_id: int):
+        """Forget a deleted or deactivated concept and its edges."""
+        with self._lock:
+            if concept_id not in self.mastery:
+                return
+            touched = set()
+            for relationship_id in list(self._incident.get(concept_id, ())):
+                touched |= self._remove_edge(relationship_id)
+            for table in (self.mastery, self.importance, self._support, self._prerequisites,
+                          self._prerequisites_met, self._incident):
+                table.pop(concept_id, None)
+            touched.discard(concept_id)
+            self._rescore(touched | {concept_id})
+
+    def set_edge(self, relationship_id: int, source: int, target: int, strength: Optional[float],
+                 confidence: Optional[float], relationship_type: RelationshipType, rescore: bool = True):
+        """Add or update an edge between two known concepts."""
+        with self._lock:
+            touched = self._remove_edge(relationship_id)
+            if source in self.mastery and target in self.mastery and source != target:
+                self._edges[relationship_id] = (source, target, _weight(strength, confidence), relationship_type)
+                self._incident[source].add(relationship_id)
+                self._incident[target].add(relationship_id)
+                touched |= self._link(relationship_id, 1.0)
+            if rescore:
+                self._rescore(touched)
+
+    def remove_edge(self, relationship_id: int):
+        with self._lock:
+            self._rescore(self._remove_edge(relationship_id))
+
+    def _remove_edge(self, relationship_id: int) -> Set[int]:
+        if relationship_id not in self._edges:
+            return set()
+        touched = self._link(relationship_id, -1.0)
+        source, target, _, _ = self._edges.pop(relationship_id)
+        self._incident[source].discard(relationship_id)
+        self._incident[target].discard(relationship_id)
+        return touched
+
+    def rescore_all(self):
+        with self._lock:
+            self._scores = {}
+            self._heap = []
+            self._top = None
+            for concept_id in self.mastery:
+                score = self._score(concept_id)
+                if score > 0.0:
+                    self._scores[concept_id] = score
+                    self._heap.append((-score, concept_id))
+            heapq.heapify(self._heap)
+
+    # -- queries ---------------------------------------------------------------
+
+    def top(self, limit: int) -> List[Tuple[int, float]]:
+        """The ``limit`` best ``(concept_id, score)`` pairs, best first."""
+        with self._lock:
+            if self._top is not None and limit <= self._top_limit:
+                return self._top[:limit]
+
+            best, kept, seen = [], [], set()
+            while self._heap and len(best) < limit:
+                entry = heapq.heappop(self._heap)
+                score, concept_id = -entry[0], entry[1]
+                if concept_id in seen or self._scores.get(concept_id) != score:
+                    continue  # Superseded by a later score
+                seen.add(concept_id)
+                best.append((concept_id, score))
+                kept.append(entry)
+            for entry in kept:
+                heapq.heappush(self._heap, entry)
+
+            self._top, self._top_limit = best, limit
+            return best
+
+    def explain(self, concept_id: int) -> dict:
+        """Why a concept is recommended: its strongest link to a learned concept and its readiness."""
+        with self._lock:
+            best, via = 0.0, None
+            for relationship_id in self._incident.get(concept_id, ()):
+                source, target, weight, relationship_type = self._edges[relationship_id]
+                neighbour = target if source == concept_id else source
+                contribution = weight * self.mastery[neighbour]
+                if contribution > best:
+                    best = contribution
+                    via = {
+                        "concept_id": neighbour,
+                        "relationship_type": relationship_type.value,
+                        "is_prerequisite": relationship_type == RelationshipType.HIERARCHICAL and target == concept_id,
+                    }
+            total = self._prerequisites.get(concept_id, 0.0)
+            return {
+                "support": round(self._support.get(concept_id, 0.0), 4),
+                "prerequisite_readiness": (
+                    round(self._prerequisites_met[concept_id] / total, 4) if total > _EPSILON else None
+                ),
+                "via": via,
+            }
+
+
+class RecommendationStore:
+    """Lazily loaded frontiers, one per laboratory."""
+
+    def __init__(self):
+        self._frontiers: Dict[int, LaboratoryFrontier] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db, laboratory_id: int) -> LaboratoryFrontier:
+        with self._lock:
+            frontier = self._frontiers.get(laboratory_id)
+        if frontier is None:
+            frontier = self.load(db, laboratory_id)
+        return frontier
+
+    def load(self, db, laboratory_id: int) -> LaboratoryFrontier:
+        """(Re)build a laboratory's frontier with two queries."""
+        frontier = LaboratoryFrontier(laboratory_id)
+        for concept_id, mastery_level, importance_score in db.execute(
+            select(Concept.id, Concept.mastery_level, Concept.importance_score)
+            .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True)
+        ):
+            frontier.set_concept(concept_id, mastery_level, importance_score, rescore=False)
+
+        source = aliased(Concept)
+        stmt = (
+            select(
+                ConceptRelationship.id, ConceptRelationship.source_concept_id,
+                ConceptRelationship.target_concept_id, ConceptRelationship.strength,
+                ConceptRelationship.confidence, ConceptRelationship.relationship_type,
+            )
+            .join(source, source.id == ConceptRelationship.source_concept_id)
+            .where(source.laboratory_id == laboratory_id, ConceptRelationship.is_active == True)
+            .execution_options(yield_per=5000)
+        )
+        for row in db.execute(stmt):
+            # Edges to inactive concepts are skipped: those are not in the frontier
+            frontier.set_edge(*row, rescore=False)
+        frontier.rescore_all()
+
+        with self._lock:
+            self._frontiers[laboratory_id] = frontier
+        return frontier
+
+    def loaded(self) -> Dict[int, LaboratoryFrontier]:
+        with self._lock:
+            return dict(self._frontiers)
+
+    def invalidate(self, laboratory_id: int):
+        """Drop a frontier so it is rebuilt on next access, e.g. after bulk inserts."""
+        with self._lock:
+            self._frontiers.pop(laboratory_id, None)
+
+    def apply_mastery(self, changes: Dict[int, Tuple[int, int]]):
+        """Apply ``{concept_id: (laboratory_id, mastery_level)}`` to loaded frontiers."""
+        frontiers = self.loaded()
+        for concept_id, (laboratory_id, mastery_level) in changes.items():
+            frontier = frontiers.get(laboratory_id)
+            if frontier is not None and concept_id in frontier:
+                frontier.set_concept(concept_id, mastery_level, frontier.importance[concept_id])
+
+    def apply_concept_changes(self, changes):
+        frontiers = self.loaded()
+        for change in changes:
+            if change["moved"]:
+                for laboratory_id in change["laboratory_ids"]:
+                    self.invalidate(laboratory_id)
+                continue
+            frontier = frontiers.get(change["laboratory_id"])
+            if frontier is None:
+                continue
+            if not change["active"]:
+                frontier.remove_concept(change["id"])
+            elif change["op"] == "update" and change["id"] not in frontier:
+                # Reactivated: its edges have to be read again
+                self.invalidate(change["laboratory_id"])
+            else:
+                frontier.set_concept(change["id"], change["mastery_level"], change["importance_score"])
+
+    def apply_relationship_changes(self, changes):
+        frontiers = self.loaded()
+        if not frontiers:
+            return
+        for change in changes:
+            for frontier in frontiers.values():
+                if change["source_concept_id"] not in frontier:
+                    continue
+                if change["op"] == "delete" or not change["is_active"]:
+                    frontier.remove_edge(change["id"])
+                else:
+                    frontier.set_edge(
+                        change["id"], change["source_concept_id"], change["target_concept_id"],
+                        change["strength"], change["confidence"], change["relationship_type"],
+                    )
+                break
+
+
+recommendation_store = RecommendationStore()
+
+
+# -- commit hooks ------------------------------------------------------------------
+
+def update_mastery_on_commit(session: Session, changes: Dict[int, Tuple[int, int]]):
+    """
+    Patch loaded frontiers with ``{concept_id: (laboratory_id, mastery_level)}``
+    once ``session`` commits, for bulk UPDATEs that bypass the commit hooks.
+    """
+    session.info.setdefault(_PENDING_KEY, {}).update(changes)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_mastery(session):
+    changes = session.info.pop(_PENDING_KEY, None)
+    if changes:
+        recommendation_store.apply_mastery(changes)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_mastery(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+_CONCEPT_COLUMNS = ("mastery_level", "importance_score", "is_active", "laboratory_id")
+
+
+def _snapshot_concept(concept, op):
+    state = inspect(concept)
+    if op == "update" and not any(state.attrs[name].history.has_changes() for name in _CONCEPT_COLUMNS):
+        return None
+    history = state.attrs.laboratory_id.history
+    return {
+        "id": concept.id,
+        "op": op,
+        "laboratory_id": concept.laboratory_id,
+        "moved": op == "update" and history.has_changes(),
+        "laboratory_ids": {lab_id for lab_id in (*history.added, *history.deleted) if lab_id is not None},
+        "active": op != "delete" and bool(concept.is_active),
+        "mastery_level": concept.mastery_level,
+        "importance_score": concept.importance_score,
+    }
+
+
+def _snapshot_relationship(relationship, op):
+    return {
+        "id": relationship.id,
+        "op": op,
+        "source_concept_id": relationship.source_concept_id,
+        "target_concept_id": relationship.target_concept_id,
+        "strength": relationship.strength,
+        "confidence": relationship.confidence,
+        "relationship_type": relationship.relationship_type,
+        "is_active": relationship.is_active,
+    }
+
+
+# Concepts first, so edges to concepts created in the same commit find them
+register_commit_hook(Concept, _snapshot_concept, recommendation_store.apply_concept_changes)
+register_commit_hook(ConceptRelationship, _snapshot_relationship, recommendation_store.apply_relationship_changes)
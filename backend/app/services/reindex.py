@@ -0,0 +1,282 @@
+"""
+Change tracking and incremental re-embedding.
+
+Mapper events record concepts and sources whose indexed text changed in
+``dirty_records`` (inside the same transaction as the change). A background
+worker re-embeds dirty concepts and re-queues dirty sources in small,
+throttled batches. At startup it also looks for *stale* rows, embedded with
+another ``EMBEDDING_MODEL`` or ``EMBEDDING_VERSION``, and converts them the
+same way. Staleness is read from the rows themselves, so an interrupted
+re-embed simply resumes where it stopped on the next start.
+"""
+
+import threading
+from datetime import datetime
+
+from sqlalchemy import and_, bindparam, event, func, inspect, or_, select
+
+from app.core.config import settings
+from app.core.database import SessionLocal, dialect_insert
+from app.models.concept import Concept
+from app.models.source import Source
+from app.models.tracking import DirtyRecord
+from app.services.embeddings import EmbeddingUnavailable, embed_concepts
+
+# Columns whose change invalidates derived data
+CONCEPT_TEXT_COLUMNS = ("title", "content", "summary")
+SOURCE_CONTENT_COLUMNS = ("file_path", "url")
+
+
+# -- change tracking ---------------------------------------------------------------
+
+def _mark_dirty(connection, entity: str, entity_id: int, reason: str):
+    now = datetime.utcnow()
+    insert = dialect_insert(connection.dialect.name)
+    stmt = insert(DirtyRecord.__table__).values(
+        entity=entity, entity_id=entity_id, reason=reason, marked_at=now, created_at=now, updated_at=now
+    )
+    connection.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["entity", "entity_id"],
+            set_={"marked_at": now, "updated_at": now},
+        )
+    )
+
+
+def _has_current_embedding(concept: Concept) -> bool:
+    """The writer embedded the new text itself in the same flush."""
+    return (
+        inspect(concept).attrs.embedding_vector.history.has_changes()
+        and concept.embedding_model == settings.EMBEDDING_MODEL
+        and concept.embedding_version == settings.EMBEDDING_VERSION
+    )
+
+
+@event.listens_for(Concept, "after_insert")
+def _concept_inserted(mapper, connection, concept):
+    if not _has_current_embedding(concept):
+        _mark_dirty(connection, "concept", concept.id, "insert")
+
+
+@event.listens_for(Concept, "after_update")
+def _concept_updated(mapper, connection, concept):
+    state = inspect(concept)
+    if any(state.attrs[name].history.has_changes() for name in CONCEPT_TEXT_COLUMNS):
+        if not _has_current_embedding(concept):
+            _mark_dirty(connection, "concept", concept.id, "update")
+
+
+@event.listens_for(Source, "after_update")
+def _source_updated(mapper, connection, source):
+    # New sources are queued by the API when they are created
+    state = inspect(source)
+    if any(state.attrs[name].history.has_changes() for name in SOURCE_CONTENT_COLUMNS):
+        _mark_dirty(connection, "source", source.id, "update")
+
+
+def stale_concepts_condition():
+    """Active concepts without a vector from the configured model and version."""
+    return and_(
+        Concept.is_active == True,
+        or_(
+            Concept.embedding_vector.is_(None),
+            Concept.embedding_model.is_(None),
+            Concept.embedding_model != settings.EMBEDDING_MODEL,
+            # Vectors from before versioning count as version 1
+            func.coalesce(Concept.embedding_version, 1) != settings.EMBEDDING_VERSION,
+        ),
+    )
+
+
+def stale_sources_condition():
+    """Processed sources whose chunks were embedded with another model or version."""
+    return and_(
+        Source.is_processed == True,
+        Source.is_archived == False,
+        or_(
+            func.coalesce(Source.embedding_model, settings.EMBEDDING_MODEL) != settings.EMBEDDING_MODEL,
+            func.coalesce(Source.embedding_version, 1) != settings.EMBEDDING_VERSION,
+        ),
+    )
+
+
+# -- reindex worker ----------------------------------------------------------------
+
+class ReindexWorker:
+    """Background thread applying dirty and stale work in throttled batches."""
+
+    def __init__(self):
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread = None
+        self._stale_scan_pending = True
+        self.last_error = None
+        self.stats = {"concepts": 0, "sources": 0, "batches": 0}
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the worker; the first pass also converts stale rows."""
+        if self.is_running:
+            return
+        self._stale_scan_pending = True
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="reindex", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=10)
+            self._thread = None
+
+    def notify(self):
+        """Process dirty rows now instead of at the next interval."""
+        self._wake.set()
+
+    def status(self) -> dict:
+        with SessionLocal() as db:
+            return {
+                "alive": self.is_running,
+                "model": settings.EMBEDDING_MODEL,
+                "version": settings.EMBEDDING_VERSION,
+                "dirty": db.scalar(select(func.count(DirtyRecord.id))),
+                "stale_concepts": db.scalar(select(func.count(Concept.id)).where(stale_concepts_condition())),
+                "stale_sources": db.scalar(select(func.count(Source.id)).where(stale_sources_condition())),
+                "processed": dict(self.stats),
+                "last_error": self.last_error,
+            }
+
+    # -- internals ---------------------------------------------------------------
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._wake.clear()
+            try:
+                self.process_dirty()
+                if self._stale_scan_pending:
+                    self.process_stale()
+                    self._stale_scan_pending = False
+                self.last_error = None
+            except EmbeddingUnavailable as e:
+                # Dirty rows stay marked until the model can be loaded
+                self.last_error = str(e)
+            except Exception as e:
+                self.last_error = str(e)
+                print(f"❌ Reindex error: {e}")
+            self._wake.wait(settings.REINDEX_INTERVAL)
+
+    def _pause(self) -> bool:
+        """Throttle between batches; returns False when stopping."""
+        self.stats["batches"] += 1
+        return not self._stop.wait(settings.REINDEX_BATCH_PAUSE)
+
+    def process_dirty(self):
+        """Re-embed dirty concepts and re-queue dirty sources until none are left."""
+        from app.services.ingestion import enqueue_source, ingestion_worker
+        from app.services.suggestions import suggest_relationships
+
+        after = 0
+        while True:
+            with SessionLocal() as db:
+                records = db.execute(
+                    select(DirtyRecord.id, DirtyRecord.entity, DirtyRecord.entity_id, DirtyRecord.reason,
+                           DirtyRecord.marked_at)
+                    .where(DirtyRecord.id > after)
+                    .order_by(DirtyRecord.id)
+                    .limit(settings.REINDEX_BATCH_SIZE)
+                ).all()
+                if not records:
+                    return
+                after = records[-1].id
+
+                concept_ids = [r.entity_id for r in records if r.entity == "concept"]
+                concepts = db.scalars(
+                    select(Concept).where(Concept.id.in_(concept_ids), Concept.is_active == True)
+                ).all() if concept_ids else []
+                embed_concepts(db, concepts)
+                db.commit()
+
+                if settings.RELATIONSHIP_SUGGESTIONS_ENABLED:
+                    inserted = {r.entity_id for r in records if r.entity == "concept" and r.reason == "insert"}
+                    suggest_relationships(db, [c for c in concepts if c.id in inserted])
+                    db.commit()
+
+                source_ids = [r.entity_id for r in records if r.entity == "source"]
+                for source_id in source_ids:
+                    if db.get(Source, source_id) is not None:
+                        enqueue_source(db, source_id, priority=-1)
+                if source_ids:
+                    ingestion_worker.notify()
+
+                # Rows marked again while we worked keep their newer marked_at
+                db.connection().execute(
+                    DirtyRecord.__table__.delete().where(
+                        DirtyRecord.id == bindparam("record_id"),
+                        DirtyRecord.marked_at == bindparam("seen_at"),
+                    ),
+                    [{"record_id": r.id, "seen_at": r.marked_at} for r in records],
+                )
+                db.commit()
+                self.stats["concepts"] += len(concepts)
+                self.stats["sources"] += len(source_ids)
+
+            if not self._pause():
+                return
+
+    def process_stale(self):
+        """Convert rows embedded with another model or version, oldest first."""
+        from app.services.ingestion import enqueue_source, ingestion_worker
+
+        with SessionLocal() as db:
+            concepts = db.scalar(select(func.count(Concept.id)).where(stale_concepts_condition()))
+            sources = db.scalar(select(func.count(Source.id)).where(stale_sources_condition()))
+        if not concepts and not sources:
+            return
+        print(f"🔁 Re-embedding {concepts} concepts and {sources} sources with "
+              f"{settings.EMBEDDING_MODEL} (version {settings.EMBEDDING_VERSION})")
+
+        # Keyset cursors keep a pass finite even if some rows cannot be fixed
+        after = 0
+        while True:
+            with SessionLocal() as db:
+                batch = db.scalars(
+                    select(Concept)
+                    .where(stale_concepts_condition(), Concept.id > after)
+                    .order_by(Concept.id)
+                    .limit(settings.REINDEX_BATCH_SIZE)
+                ).all()
+                if not batch:
+                    break
+                after = batch[-1].id
+                embed_concepts(db, batch)
+                db.commit()
+                self.stats["concepts"] += len(batch)
+            if not self._pause():
+                return
+
+        after = 0
+        while True:
+            with SessionLocal() as db:
+                source_ids = db.scalars(
+                    select(Source.id)
+                    .where(stale_sources_condition(), Source.id > after)
+                    .order_by(Source.id)
+                    .limit(settings.REINDEX_BATCH_SIZE)
+                ).all()
+                if not source_ids:
+                    break
+                after = source_ids[-1]
+                for source_id in source_ids:
+                    # Chunks are rebuilt too, in case the chunking changed
+                    enqueue_source(db, source_id, stage="chunk", priority=-1)
+                self.stats["sources"] += len(source_ids)
+            ingestion_worker.notify()
+            if not self._pause():
+                return
+
+
+reindex_worker = ReindexWorker()
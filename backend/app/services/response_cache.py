@@ -0,0 +1,316 @@
+"""
+Cache of rendered JSON responses for read-heavy endpoints.
+
+A cached response depends on a few tags such as ``"laboratories"`` or
+``"concepts:3"`` (the concepts of laboratory 3). Every tag has a generation
+counter; the cache key and the ETag of a response include the generations of
+its tags, so bumping a tag makes every response built on it unreachable
+without tracking those responses. Commit hooks bump the tags of the rows
+that changed; bulk statements that bypass the ORM call ``invalidate`` (or
+``invalidate_on_commit``) themselves.
+
+Because a response is keyed by the generations read *before* it was built,
+a commit that lands while it is being computed only orphans it; a stale
+body is never served under the new generation.
+
+Entries live in an in-process LRU, or in a local Redis (or compatible)
+server when ``RESPONSE_CACHE_URL`` is set, which lets several API
+processes share entries and generations. Write-behind usage counters
+(``access_count``, ``usage_count``) do not invalidate anything; they may
+lag in cached responses.
+"""
+
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import TypeAdapter
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.events import register_commit_hook
+from app.models.concept import Concept
+from app.models.laboratory import Laboratory
+from app.models.notebook import NotebookEntry
+from app.models.relationships import ConceptRelationship
+from app.models.source import Source
+from app.models.tag import Tag
+from app.services import graph  # noqa: F401 - its hooks must patch loaded graphs before responses are invalidated
+from app.services.lab_stats import COUNTERS as LAB_COUNTERS
+
+_PENDING_KEY = "_marie_cache_tags"
+
+# Concept columns maintained by the reindex worker; not part of any response
+_EMBEDDING_COLUMNS = {"embedding_vector", "embedding_dim", "embedding_model", "embedding_version"}
+
+
+class MemoryBackend:
+    """LRU of response bodies plus tag generations, private to this process."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._generations: Dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+        # Generations restart at zero with the process; the epoch keeps old ETags from matching
+        self.epoch = os.urandom(4).hex()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def set(self, key: str, body: bytes):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def generations(self, tags: List[str]) -> List[int]:
+        with self._lock:
+            return [self._generations.get(tag, 0) for tag in tags]
+
+    def bump(self, tags: Iterable[str]):
+        with self._lock:
+            for tag in tags:
+                self._generations[tag] += 1
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class RedisBackend:
+    """Entries and generations in a Redis server, shared by every process."""
+
+    def __init__(self, url: str, ttl: int):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RESPONSE_CACHE_URL is set but the redis package is not installed")
+        self._redis = redis.Redis.from_url(url, socket_timeout=0.5)
+        self.ttl = ttl
+        self.epoch = "redis"
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._redis.get(f"marie:response:{key}")
+
+    def set(self, key: str, body: bytes):
+        self._redis.set(f"marie:response:{key}", body, ex=self.ttl)
+
+    def generations(self, tags: List[str]) -> List[int]:
+        return [int(value or 0) for value in self._redis.mget([f"marie:generation:{tag}" for tag in tags])]
+
+    def bump(self, tags: Iterable[str]):
+        pipeline = self._redis.pipeline(transaction=False)
+        for tag in tags:
+            pipeline.incr(f"marie:generation:{tag}")
+        pipeline.execute()
+
+    def __len__(self):
+        return self._redis.dbsize()
+
+
+def _etag_matches(header: Optional[str], etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == etag for candidate in header.split(","))
+
+
+class ResponseCache:
+    """Serves cached bodies and ETags for endpoints keyed by path and query."""
+
+    def __init__(self):
+        self._backend = None
+        self._backend_lock = threading.Lock()
+        self._adapters: Dict[Any, TypeAdapter] = {}
+        self.last_error = None
+        self.stats = {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+
+    @property
+    def backend(self):
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    if settings.RESPONSE_CACHE_URL:
+                        self._backend = RedisBackend(settings.RESPONSE_CACHE_URL, settings.RESPONSE_CACHE_TTL)
+                    else:
+                        self._backend = MemoryBackend(settings.RESPONSE_CACHE_SIZE)
+        return self._backend
+
+    def invalidate(self, *tags: str):
+        """Bump ``tags`` so responses built on them are rebuilt."""
+        if not tags:
+            return
+        try:
+            self.backend.bump(set(tags))
+            self.stats["invalidations"] += 1
+        except Exception as e:
+            self.last_error = str(e)
+            print(f"❌ Response cache invalidation failed: {e}")
+
+    def status(self) -> dict:
+        return {
+            "enabled": settings.RESPONSE_CACHE_ENABLED,
+            "backend": type(self.backend).__name__,
+            "entries": len(self.backend),
+            "stats": dict(self.stats),
+            "last_error": self.last_error,
+        }
+
+    def _render(self, data: Any, response_model: Any) -> bytes:
+        if response_model is None:
+            return json.dumps(jsonable_encoder(data), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        adapter = self._adapters.get(response_model)
+        if adapter is None:
+            adapter = self._adapters[response_model] = TypeAdapter(response_model)
+        return adapter.dump_json(adapter.validate_python(data, from_attributes=True))
+
+    async def respond(
+        self,
+        request: Request,
+        tags: Iterable[str],
+        produce: Callable[[], Awaitable[Any]],
+        response_model: Any = None,
+    ) -> Response:
+        """
+        The response for ``request``: 304 when the client's ``If-None-Match``
+        still matches, the cached body when there is one, otherwise
+        ``await produce()`` rendered through ``response_model``.
+        """
+        if not settings.RESPONSE_CACHE_ENABLED:
+            return Response(self._render(await produce(), response_model), media_type="application/json")
+
+        tags = sorted(set(tags))
+        query = "&".join(f"{name}={value}" for name, value in sorted(request.query_params.multi_items()))
+        try:
+            generations = self.backend.generations(tags)
+            cache = self.backend
+        except Exception as e:
+            # An unreachable Redis degrades to uncached responses
+            self.last_error = str(e)
+            return Response(self._render(await produce(), response_model), media_type="application/json")
+
+        version = ",".join(f"{tag}={generation}" for tag, generation in zip(tags, generations))
+        key = hashlib.sha256(f"{request.url.path}?{query}|{version}|{cache.epoch}".encode("utf-8")).hexdigest()
+        etag = f'"{key[:32]}"'
+        headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+        if _etag_matches(request.headers.get("if-none-match"), etag):
+            self.stats["not_modified"] += 1
+            return Response(status_code=304, headers=headers)
+
+        body = cache.get(key)
+        if body is not None:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            body = self._render(await produce(), response_model)
+            try:
+                cache.set(key, body)
+            except Exception as e:
+                self.last_error = str(e)
+        return Response(body, media_type="application/json", headers=headers)
+
+
+response_cache = ResponseCache()
+
+
+# -- invalidation ----------------------------------------------------------------
+
+
+def invalidate_on_commit(session: Session, *tags: str):
+    """Bump ``tags`` once ``session`` commits, e.g. after a bulk UPDATE."""
+    session.info.setdefault(_PENDING_KEY, set()).update(tags)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_pending_tags(session):
+    tags = session.info.pop(_PENDING_KEY, None)
+    if tags:
+        response_cache.invalidate(*tags)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_tags(session):
+    session.info.pop(_PENDING_KEY, None)
+
+
+def _changed(obj) -> set:
+    return {attr.key for attr in inspect(obj).attrs if attr.history.has_changes()}
+
+
+def _laboratory_ids(obj) -> set:
+    """Current and previous laboratory of a row."""
+    history = inspect(obj).attrs.laboratory_id.history
+    return {lab_id for lab_id in (*history.added, *history.unchanged, *history.deleted) if lab_id is not None}
+
+
+def _laboratory_tags(obj, op) -> List[str]:
+    """Tags of the laboratories whose counters (see app.services.lab_stats) a row changed."""
+    if op == "update" and not _changed(obj) & set(LAB_COUNTERS[type(obj)][1]):
+        return []
+    return ["laboratories", *(f"laboratory:{lab_id}" for lab_id in _laboratory_ids(obj))]
+
+
+def _snapshot_laboratory(laboratory, op):
+    return ["laboratories", f"laboratory:{laboratory.id}"]
+
+
+def _snapshot_tag(tag, op):
+    return ["tags"]
+
+
+def _snapshot_concept(concept, op):
+    if op == "update" and not _changed(concept) - _EMBEDDING_COLUMNS:
+        return None
+    lab_ids = _laboratory_ids(concept)
+    return [
+        *(f"concepts:{lab_id}" for lab_id in lab_ids),
+        *(f"graph:{lab_id}" for lab_id in lab_ids),
+        *_laboratory_tags(concept, op),
+    ]
+
+
+def _snapshot_source(source, op):
+    # Concept lists embed a summary of their source
+    return [*(f"sources:{lab_id}" for lab_id in _laboratory_ids(source)), *_laboratory_tags(source, op)]
+
+
+def _snapshot_notebook_entry(entry, op):
+    return _laboratory_tags(entry, op) or None
+
+
+def _snapshot_relationship(relationship, op):
+    return relationship.source_concept_id
+
+
+def _apply_tags(changes):
+    response_cache.invalidate(*{tag for tags in changes for tag in tags})
+
+
+def _apply_relationship_changes(concept_ids):
+    from app.core.database import SessionLocal
+    with SessionLocal() as db:
+        lab_ids = db.scalars(
+            select(Concept.laboratory_id).where(Concept.id.in_(set(concept_ids))).distinct()
+        ).all()
+    response_cache.invalidate(*(f"graph:{lab_id}" for lab_id in lab_ids))
+
+
+register_commit_hook(Laboratory, _snapshot_laboratory, _apply_tags)
+register_commit_hook(Tag, _snapshot_tag, _apply_tags)
+register_commit_hook(Concept, _snapshot_concept, _apply_tags)
+register_commit_hook(Source, _snapshot_source, _apply_tags)
+register_commit_hook(NotebookEntry, _snapshot_notebook_entry, _apply_tags)
+register_commit_hook(ConceptRelationship, _snapshot_relationship, _apply_relationship_changes)
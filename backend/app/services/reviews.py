@@ -0,0 +1,169 @@
+"""
+Spaced-repetition review scheduling.
+
+Intervals follow SM-2: a concept's schedule is its ``ease_factor``, its
+``review_interval`` in days and the resulting ``next_review``. The
+``(laboratory_id, is_active, next_review)`` index doubles as the due queue,
+ordered by due date, so fetching the next N due concepts is an index range
+scan whatever the size of the laboratory.
+"""
+
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import load_only, raiseload
+
+from app.core.config import settings
+from app.models.concept import Concept
+from app.services.recommendations import update_mastery_on_commit
+from app.services.response_cache import invalidate_on_commit
+
+DEFAULT_EASE = 2.5
+MIN_EASE = 1.3
+PASSING_GRADE = 3  # Grades are SM-2 quality scores, 0 (blackout) to 5 (perfect)
+MASTERED_INTERVAL = 21  # Days
+
+# Columns a review card needs
+CARD_COLUMNS = (
+    Concept.id, Concept.title, Concept.content, Concept.summary, Concept.laboratory_id,
+    Concept.mastery_level, Concept.review_count, Concept.last_reviewed, Concept.next_review,
+    Concept.ease_factor, Concept.review_interval,
+)
+
+
+class ConceptsNotFound(LookupError):
+    """Grades refer to concepts that do not exist or are inactive."""
+
+    def __init__(self, concept_ids):
+        self.concept_ids = sorted(concept_ids)
+        super().__init__(f"Concepts not found: {self.concept_ids}")
+
+
+def next_schedule(ease_factor: Optional[float], interval: Optional[int], grade: int, reviewed_at: datetime) -> dict:
+    """The schedule after a review graded ``grade``."""
+    ease_factor = ease_factor or DEFAULT_EASE
+    interval = interval or 0
+
+    if grade < PASSING_GRADE:
+        # Start the repetitions over; the ease is left alone
+        interval = 1
+    else:
+        ease_factor = max(MIN_EASE, ease_factor + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+        if interval == 0:
+            interval = 1
+        elif interval == 1:
+            interval = 6
+        else:
+            interval = round(interval * ease_factor)
+
+    if grade < PASSING_GRADE or interval < 6:
+        mastery_level = 1
+    elif interval < MASTERED_INTERVAL:
+        mastery_level = 2
+    else:
+        mastery_level = 3
+
+    return {
+        "ease_factor": round(ease_factor, 4),
+        "review_interval": interval,
+        "next_review": reviewed_at + timedelta(days=interval),
+        "mastery_level": mastery_level,
+    }
+
+
+def _cards(stmt):
+    return stmt.options(load_only(*CARD_COLUMNS, raiseload=True), raiseload("*"))
+
+
+async def due_concepts(db: AsyncSession, laboratory_id: int, limit: int, now: Optional[datetime] = None) -> List[Concept]:
+    """The ``limit`` most overdue concepts of a laboratory."""
+    now = now or datetime.utcnow()
+    stmt = (
+        select(Concept)
+        .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True, Concept.next_review <= now)
+        .order_by(Concept.next_review)
+        .limit(limit)
+    )
+    return (await db.scalars(_cards(stmt))).all()
+
+
+async def new_concepts(db: AsyncSession, laboratory_id: int, limit: int) -> List[Concept]:
+    """The oldest concepts that were never scheduled."""
+    stmt = (
+        select(Concept)
+        .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True, Concept.next_review.is_(None))
+        .order_by(Concept.id)
+        .limit(limit)
+    )
+    return (await db.scalars(_cards(stmt))).all()
+
+
+async def build_session(
+    db: AsyncSession,
+    laboratory_id: int,
+    limit: Optional[int] = None,
+    new_limit: Optional[int] = None,
+    now: Optional[datetime] = None,
+) -> dict:
+    """Today's reviews for a laboratory: the most overdue concepts plus a few new ones."""
+    now = now or datetime.utcnow()
+    limit = settings.REVIEW_SESSION_SIZE if limit is None else limit
+    new_limit = settings.REVIEW_NEW_PER_SESSION if new_limit is None else new_limit
+
+    due_total = await db.scalar(
+        select(func.count())
+        .select_from(Concept)
+        .where(Concept.laboratory_id == laboratory_id, Concept.is_active == True, Concept.next_review <= now)
+    )
+    return {
+        "laboratory_id": laboratory_id,
+        "due_total": due_total,
+        "due": await due_concepts(db, laboratory_id, limit, now),
+        "new": await new_concepts(db, laboratory_id, new_limit) if new_limit else [],
+    }
+
+
+async def grade_reviews(
+    db: AsyncSession,
+    grades: Iterable[Tuple[int, int]],
+    reviewed_at: Optional[datetime] = None,
+) -> List[dict]:
+    """
+    Apply ``(concept_id, grade)`` pairs in order and write every new
+    schedule with one bulk UPDATE. The caller commits.
+    """
+    reviewed_at = reviewed_at or datetime.utcnow()
+    grades = list(grades)
+    concept_ids = {concept_id for concept_id, _ in grades}
+
+    rows = await db.execute(
+        select(Concept.id, Concept.laboratory_id, Concept.ease_factor, Concept.review_interval,
+               Concept.review_count)
+        .where(Concept.id.in_(concept_ids), Concept.is_active == True)
+    )
+    state: Dict[int, dict] = {}
+    laboratories: Dict[int, int] = {}
+    for row in rows:
+        state[row.id] = {"ease_factor": row.ease_factor, "review_interval": row.review_interval,
+                         "review_count": row.review_count or 0}
+        laboratories[row.id] = row.laboratory_id
+    missing = concept_ids - state.keys()
+    if missing:
+        raise ConceptsNotFound(missing)
+
+    for concept_id, grade in grades:
+        current = state[concept_id]
+        current.update(next_schedule(current["ease_factor"], current["review_interval"], grade, reviewed_at))
+        current["review_count"] += 1
+        current["last_reviewed"] = reviewed_at
+
+    schedules = [{"id": concept_id, **values} for concept_id, values in state.items()]
+    await db.execute(update(Concept), schedules)
+    # Bulk UPDATEs bypass the commit hooks
+    invalidate_on_commit(db.sync_session, *(f"concepts:{lab_id}" for lab_id in set(laboratories.values())))
+    update_mastery_on_commit(db.sync_session, {
+        concept_id: (laboratories[concept_id], values["mastery_level"]) for concept_id, values in state.items()
+    })
+    return schedules
@@ -0,0 +1,242 @@
+"""
+Hybrid search engine: BM25 over the FTS5 index, vector top-k through the
+laboratory's ANN index (see ``app.services.ann``), and reciprocal-rank
+fusion of both.
+
+Tag, source-type and cluster filters are turned into SQL conditions on
+``concepts``: the keyword leg applies them in its query, the vector leg
+uses the matching ids to mask candidates before scoring them. Cluster-first
+search picks the clusters closest to the query (see
+``app.services.clustering``) and searches only their members.
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from sqlalchemy import distinct, func, literal_column, or_, select, table, column, text
+from sqlalchemy.orm import Session
+
+from app.models.concept import Concept
+from app.models.relationships import concept_tags
+from app.models.source import Source, SourceType
+from app.models.tag import Tag
+from app.services.ann import ann_store
+from app.services.embeddings import EmbeddingUnavailable, embedding_service
+
+RRF_K = 60  # Standard reciprocal-rank fusion constant
+MAX_DEPTH = 1000  # Deepest rank either leg is asked for
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+_concepts_fts = table("concepts_fts", column("rowid"))
+
+
+@dataclass
+class SearchFilters:
+    """Filters pushed down into both rankers."""
+    laboratory_id: int
+    tags: Sequence[str] = field(default_factory=list)
+    tag_operator: str = "OR"  # "AND" = every tag, "OR" = any tag
+    source_types: Sequence[SourceType] = field(default_factory=list)
+    cluster_ids: Sequence[int] = field(default_factory=list)  # Also keeps concepts not clustered yet
+
+    @property
+    def narrows(self) -> bool:
+        """True when the filters restrict more than the laboratory."""
+        return bool(self.tags or self.source_types or self.cluster_ids)
+
+
+def filter_conditions(filters: SearchFilters) -> list:
+    """SQL conditions on ``Concept`` for the given filters."""
+    conditions = [Concept.laboratory_id == filters.laboratory_id, Concept.is_active == True]
+
+    if filters.tags:
+        tagged = (
+            select(concept_tags.c.concept_id)
+            .join(Tag, Tag.id == concept_tags.c.tag_id)
+            .where(Tag.name.in_(list(filters.tags)))
+        )
+        if filters.tag_operator.upper() == "AND":
+            tagged = tagged.group_by(concept_tags.c.concept_id).having(
+                func.count(distinct(Tag.id)) == len(set(filters.tags))
+            )
+        conditions.append(Concept.id.in_(tagged))
+
+    if filters.source_types:
+        sources = select(Source.id).where(
+            Source.laboratory_id == filters.laboratory_id,
+            Source.source_type.in_(list(filters.source_types)),
+        )
+        conditions.append(Concept.source_id.in_(sources))
+
+    if filters.cluster_ids:
+        conditions.append(or_(Concept.cluster_id.in_(list(filters.cluster_ids)), Concept.cluster_id.is_(None)))
+
+    return conditions
+
+
+def to_match_query(query: str) -> Optional[str]:
+    """Turn free text into a safe FTS5 MATCH expression (any term, BM25-ranked)."""
+    terms = _TOKEN_RE.findall(query.lower())
+    if not terms:
+        return None
+    return " OR ".join(f'"{term}"' for term in dict.fromkeys(terms))
+
+
+def keyword_search(db: Session, query: str, filters: SearchFilters, limit: int) -> List[Tuple[int, float]]:
+    """BM25 ranking of concepts; returns (concept_id, score) best first."""
+    if db.get_bind().dialect.name != "sqlite":
+        return _keyword_search_fallback(db, query, filters, limit)
+
+    match = to_match_query(query)
+    if match is None:
+        return []
+
+    # Column weights: title, content, summary. bm25() is lower-is-better.
+    rank = func.bm25(literal_column("concepts_fts"), 10.0, 1.0, 3.0)
+    stmt = (
+        select(Concept.id, rank.label("rank"))
+        .select_from(_concepts_fts)
+        .join(Concept, Concept.id == _concepts_fts.c.rowid)
+        .where(text("concepts_fts MATCH :match"))
+        .where(*filter_conditions(filters))
+        .order_by(rank)
+        .limit(limit)
+    )
+    return [(concept_id, -score) for concept_id, score in db.execute(stmt, {"match": match})]
+
+
+def _keyword_search_fallback(db: Session, query: str, filters: SearchFilters, limit: int):
+    """Substring match for databases without FTS5."""
+    terms = _TOKEN_RE.findall(query.lower())
+    if not terms:
+        return []
+    matches = [or_(Concept.title.ilike(f"%{term}%"), Concept.content.ilike(f"%{term}%")) for term in terms]
+    stmt = (
+        select(Concept.id, Concept.importance_score)
+        .where(*filter_conditions(filters))
+        .where(or_(*matches))
+        .order_by(Concept.importance_score.desc(), Concept.id)
+        .limit(limit)
+    )
+    return [(concept_id, score or 0.0) for concept_id, score in db.execute(stmt)]
+
+
+def embed_query(query: str):
+    """Embed a query with the shared model, or None if unavailable."""
+    try:
+        return embedding_service.encode([query], persist=False)[0]
+    except EmbeddingUnavailable:
+        return None
+
+
+def semantic_search(db: Session, query_vector, filters: SearchFilters, limit: int) -> List[Tuple[int, float]]:
+    """
+    Cosine top-k through the laboratory's ANN index. Filters become a
+    sorted id array that masks the members of the probed lists, or, when
+    few concepts pass, an exact search over just those rows.
+    """
+    allowed_ids = None
+    if filters.narrows:
+        allowed_ids = np.fromiter(db.scalars(select(Concept.id).where(*filter_conditions(filters))), dtype=np.int64)
+        if not len(allowed_ids):
+            return []
+
+    return ann_store.search(db, filters.laboratory_id, None, query_vector, limit, allowed_ids=allowed_ids)
+
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[int]], weights: Optional[Dict[str, float]] = None, k: int = RRF_K):
+    """
+    Fuse ranked id lists with weighted RRF. Returns a list of
+    (id, fused_score, {leg: rank}) sorted best first.
+    """
+    weights = weights or {}
+    scores: Dict[int, float] = {}
+    ranks: Dict[int, Dict[str, int]] = {}
+
+    for leg, ids in rankings.items():
+        weight = weights.get(leg, 1.0)
+        for rank, item_id in enumerate(ids, start=1):
+            scores[item_id] = scores.get(item_id, 0.0) + weight / (k + rank)
+            ranks.setdefault(item_id, {})[leg] = rank
+
+    fused = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(item_id, score, ranks[item_id]) for item_id, score in fused]
+
+
+def hybrid_search(
+    db: Session,
+    query: str,
+    filters: SearchFilters,
+    mode: str = "hybrid",
+    alpha: float = 0.7,
+    page: int = 1,
+    page_size: int = 20,
+    query_vector=None,
+):
+    """
+    Run the requested rankers, fuse them and return one page of results.
+    Async callers pass ``query_vector`` so the query is embedded through the
+    micro-batcher instead of inside this synchronous call.
+
+    ``alpha`` is the weight of the semantic leg in the fusion (the keyword
+    leg gets ``1 - alpha``), mirroring ``hybrid_search_with_tags`` in the
+    design doc.
+    """
+    offset = (page - 1) * page_size
+    depth = min(max(offset + page_size + 1, 50), MAX_DEPTH)
+
+    rankings: Dict[str, List[int]] = {}
+    scores: Dict[str, Dict[int, float]] = {}
+
+    if mode in ("hybrid", "keyword"):
+        hits = keyword_search(db, query, filters, depth)
+        rankings["keyword"] = [concept_id for concept_id, _ in hits]
+        scores["keyword"] = dict(hits)
+
+    if mode in ("hybrid", "semantic"):
+        if query_vector is None:
+            query_vector = embed_query(query)
+        if query_vector is not None:
+            hits = semantic_search(db, query_vector, filters, depth)
+            rankings["semantic"] = [concept_id for concept_id, _ in hits]
+            scores["semantic"] = dict(hits)
+
+    fused = reciprocal_rank_fusion(rankings, {"semantic": alpha, "keyword": 1.0 - alpha})
+    window = fused[offset:offset + page_size]
+
+    concepts = {}
+    if window:
+        ids = [concept_id for concept_id, _, _ in window]
+        concepts = {concept.id: concept for concept in db.scalars(select(Concept).where(Concept.id.in_(ids)))}
+
+    results = []
+    for concept_id, score, ranks in window:
+        concept = concepts.get(concept_id)
+        if concept is None:
+            continue
+        results.append({
+            "id": concept.id,
+            "title": concept.title,
+            "summary": concept.summary,
+            "laboratory_id": concept.laboratory_id,
+            "source_id": concept.source_id,
+            "mastery_level": concept.mastery_level,
+            "score": score,
+            "keyword_rank": ranks.get("keyword"),
+            "semantic_rank": ranks.get("semantic"),
+            "keyword_score": scores.get("keyword", {}).get(concept_id),
+            "semantic_score": scores.get("semantic", {}).get(concept_id),
+        })
+
+    return {
+        "query": query,
+        "mode": mode,
+        "page": page,
+        "page_size": page_size,
+        "has_more": len(fused) > offset + page_size,
+        "legs": sorted(rankings),
+        "results": results,
+    }
@@ -0,0 +1,121 @@
+"""
+AI relationship suggestions from embedding similarity.
+
+Concepts are linked to their nearest neighbours once they have been
+embedded (the reindex worker calls ``suggest_relationships`` for new
+concepts); ``link_laboratory`` does the same for every concept of a
+laboratory in one pass, e.g. after an import. Suggestions are
+``SEMANTIC`` relationships with ``created_by="ai"``, left unvalidated,
+with the cosine similarity as confidence and strength. Pairs that are
+already related, in either direction, are left alone.
+"""
+
+from typing import FrozenSet, Iterable, Optional, Set
+
+from sqlalchemy import or_, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.concept import Concept
+from app.models.relationships import ConceptRelationship, RelationshipType
+from app.services.ann import ann_store
+from app.services.graph import graph_store
+from app.services.recommendations import recommendation_store
+from app.services.response_cache import response_cache
+from app.utils.vectors import unpack_vector
+
+_INSERT_BATCH = 5000
+
+
+def _related_pairs(db: Session, condition) -> Set[FrozenSet[int]]:
+    rows = db.execute(
+        select(ConceptRelationship.source_concept_id, ConceptRelationship.target_concept_id).where(condition)
+    )
+    return {frozenset(pair) for pair in rows}
+
+
+def _suggestion(source_id: int, target_id: int, similarity: float) -> dict:
+    similarity = round(similarity, 4)
+    return {
+        "source_concept_id": source_id,
+        "target_concept_id": target_id,
+        "relationship_type": RelationshipType.SEMANTIC,
+        "strength": similarity,
+        "confidence": similarity,
+        "created_by": "ai",
+        "is_validated": False,
+    }
+
+
+def suggest_relationships(db: Session, concepts: Iterable[Concept], k: Optional[int] = None,
+                          threshold: Optional[float] = None) -> int:
+    """
+    Link embedded concepts to their ``k`` nearest neighbours above
+    ``threshold``. Returns the number of relationships added; the caller
+    commits. Run it after the embeddings were committed, so the vector
+    index already holds them.
+    """
+    k = k or settings.RELATIONSHIP_SUGGESTION_K
+    threshold = settings.RELATIONSHIP_SUGGESTION_THRESHOLD if threshold is None else threshold
+    concepts = [
+        c for c in concepts
+        if c.is_active and c.embedding_vector is not None and c.embedding_model == settings.EMBEDDING_MODEL
+    ]
+    if not concepts:
+        return 0
+
+    ids = [c.id for c in concepts]
+    related = _related_pairs(db, or_(
+        ConceptRelationship.source_concept_id.in_(ids), ConceptRelationship.target_concept_id.in_(ids)
+    ))
+
+    added = 0
+    for concept in concepts:
+        query = unpack_vector(concept.embedding_vector, concept.embedding_dim)
+        for neighbour_id, similarity in ann_store.search(db, concept.laboratory_id, concept.id, query, k, threshold):
+            pair = frozenset((concept.id, neighbour_id))
+            if pair in related:
+                continue
+            related.add(pair)
+            db.add(ConceptRelationship(**_suggestion(concept.id, neighbour_id, similarity)))
+            added += 1
+    return added
+
+
+def link_laboratory(db: Session, laboratory_id: int, k: Optional[int] = None,
+                    threshold: Optional[float] = None) -> int:
+    """
+    Link every embedded concept of a laboratory to its nearest neighbours
+    with bulk inserts, then reload the laboratory's graph. Commits and
+    returns the number of relationships added.
+    """
+    k = k or settings.RELATIONSHIP_SUGGESTION_K
+    threshold = settings.RELATIONSHIP_SUGGESTION_THRESHOLD if threshold is None else threshold
+    related = _related_pairs(db, ConceptRelationship.source_concept_id.in_(
+        select(Concept.id).where(Concept.laboratory_id == laboratory_id)
+    ))
+
+    table = ConceptRelationship.__table__
+    added, batch = 0, []
+    for concept_id, neighbours in ann_store.all_neighbours(db, laboratory_id, k, threshold):
+        for neighbour_id, similarity in neighbours:
+            pair = frozenset((concept_id, neighbour_id))
+            if pair in related:
+                continue
+            related.add(pair)
+            batch.append(_suggestion(concept_id, neighbour_id, similarity))
+        if len(batch) >= _INSERT_BATCH:
+            db.execute(table.insert(), batch)
+            added += len(batch)
+            batch = []
+    if batch:
+        db.execute(table.insert(), batch)
+        added += len(batch)
+    db.commit()
+
+    # Bulk inserts bypass the graph's commit hooks
+    if added:
+        graph_store.invalidate(laboratory_id)
+        recommendation_store.invalidate(laboratory_id)
+        response_cache.invalidate(f"graph:{laboratory_id}")
+    return added
@@ -0,0 +1,205 @@
+"""
+Streaming file uploads.
+
+Request bodies are written to disk chunk by chunk with aiofiles while the
+SHA-256 is computed on the fly, so memory per upload is bounded by the
+chunk size. Uploads larger than ``MAX_FILE_SIZE`` are rejected as soon as
+the limit is crossed. Resumable uploads keep a ``.part`` file plus a small
+JSON session file under ``UPLOAD_DIR/.partial``.
+"""
+
+import asyncio
+import hashlib
+import json
+import re
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+import aiofiles
+import aiofiles.os
+
+from app.core.config import settings
+from app.services import content_store
+
+
+class UploadError(Exception):
+    """Base class for upload failures."""
+
+
+class UploadTooLarge(UploadError):
+    """The upload exceeded the configured or declared size."""
+
+
+class UploadOffsetMismatch(UploadError):
+    """A resumed chunk did not start where the stored data ends."""
+
+
+class UploadNotFound(UploadError):
+    """No resumable upload session with that id."""
+
+
+_SAFE_NAME_RE = re.compile(r"[^A-Za-z0-9._-]+")
+
+
+def safe_filename(filename: str) -> str:
+    """Strip directories and unusual characters from a client filename."""
+    name = _SAFE_NAME_RE.sub("_", Path(filename or "upload").name).strip("._")
+    return name[:150] or "upload"
+
+
+def partial_dir() -> Path:
+    path = Path(settings.UPLOAD_DIR) / ".partial"
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+async def write_stream(chunks: AsyncIterator[bytes], path: Path, max_bytes: int,
+                       offset: int = 0, hasher=None) -> int:
+    """
+    Append ``chunks`` to ``path`` starting at ``offset`` and return the new
+    size. Raises ``UploadTooLarge`` as soon as ``max_bytes`` is exceeded.
+    """
+    size = offset
+    async with aiofiles.open(path, "r+b" if offset else "wb") as f:
+        if offset:
+            await f.seek(offset)
+        async for chunk in chunks:
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+            if hasher is not None:
+                hasher.update(chunk)
+            await f.write(chunk)
+    return size
+
+
+async def hash_file(path: Path) -> str:
+    """SHA-256 of a file, read in ``UPLOAD_CHUNK_SIZE`` pieces."""
+    hasher = hashlib.sha256()
+    async with aiofiles.open(path, "rb") as f:
+        while True:
+            chunk = await f.read(settings.UPLOAD_CHUNK_SIZE)
+            if not chunk:
+                break
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+async def receive_upload(chunks: AsyncIterator[bytes], filename: str) -> dict:
+    """
+    Stream a complete upload to a temporary file. Returns
+    ``{"path", "size", "sha256", "filename"}``.
+    """
+    temp_path = partial_dir() / f"{uuid.uuid4().hex}.part"
+    hasher = hashlib.sha256()
+    try:
+        size = await write_stream(chunks, temp_path, settings.MAX_FILE_SIZE, hasher=hasher)
+    except BaseException:
+        await _remove(temp_path)
+        raise
+    return {"path": temp_path, "size": size, "sha256": hasher.hexdigest(), "filename": safe_filename(filename)}
+
+
+async def store_upload(upload: dict) -> Path:
+    """Move a received upload into the content-addressed store."""
+    return await asyncio.to_thread(
+        content_store.put_file, upload["path"], upload["sha256"], Path(upload["filename"]).suffix
+    )
+
+
+async def discard_upload(upload: dict):
+    """Delete a received upload that will not be stored."""
+    await _remove(upload["path"])
+
+
+# -- resumable uploads ---------------------------------------------------------
+
+def _session_path(upload_id: str) -> Path:
+    if not re.fullmatch(r"[0-9a-f]{32}", upload_id):
+        raise UploadNotFound(upload_id)
+    return partial_dir() / f"{upload_id}.json"
+
+
+async def _remove(path: Path):
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+async def load_session(upload_id: str) -> dict:
+    path = _session_path(upload_id)
+    try:
+        async with aiofiles.open(path) as f:
+            return json.loads(await f.read())
+    except FileNotFoundError:
+        raise UploadNotFound(upload_id)
+
+
+async def _save_session(session: dict):
+    path = _session_path(session["id"])
+    async with aiofiles.open(path.with_suffix(".tmp"), "w") as f:
+        await f.write(json.dumps(session))
+    await aiofiles.os.replace(path.with_suffix(".tmp"), path)
+
+
+async def create_session(filename: str, size: int, metadata: Optional[dict] = None) -> dict:
+    """Start a resumable upload of ``size`` bytes."""
+    if size > settings.MAX_FILE_SIZE:
+        raise UploadTooLarge(f"Upload exceeds {settings.MAX_FILE_SIZE} bytes")
+
+    session = {
+        "id": uuid.uuid4().hex,
+        "filename": safe_filename(filename),
+        "size": size,
+        "offset": 0,
+        "metadata": metadata or {},
+    }
+    async with aiofiles.open(partial_dir() / f"{session['id']}.part", "wb"):
+        pass
+    await _save_session(session)
+    return session
+
+
+async def append_chunk(upload_id: str, offset: int, chunks: AsyncIterator[bytes]) -> dict:
+    """Append a chunk that must start at the session's current offset."""
+    session = await load_session(upload_id)
+    if offset != session["offset"]:
+        raise UploadOffsetMismatch(f"Expected offset {session['offset']}, got {offset}")
+
+    part = partial_dir() / f"{upload_id}.part"
+    try:
+        session["offset"] = await write_stream(chunks, part, session["size"], offset=offset)
+    except UploadTooLarge:
+        # Keep what was already acknowledged so the client can resume
+        async with aiofiles.open(part, "r+b") as f:
+            await f.truncate(session["offset"])
+        raise
+    await _save_session(session)
+    return session
+
+
+async def finish_session(upload_id: str) -> dict:
+    """
+    Validate a fully transferred session and turn it into a received upload
+    (same shape as ``receive_upload``).
+    """
+    session = await load_session(upload_id)
+    if session["offset"] != session["size"]:
+        raise UploadOffsetMismatch(f"Upload incomplete: {session['offset']} of {session['size']} bytes")
+
+    part = partial_dir() / f"{upload_id}.part"
+    digest = await hash_file(part)
+    await _remove(_session_path(upload_id))
+    return {"path": part, "size": session["size"], "sha256": digest,
+            "filename": session["filename"], "metadata": session["metadata"]}
+
+
+async def abort_session(upload_id: str):
+    """Discard a resumable upload."""
+    await load_session(upload_id)
+    await _remove(partial_dir() / f"{upload_id}.part")
+    await _remove(_session_path(upload_id))
@@ -0,0 +1,363 @@
+"""
+Per-laboratory memory-mapped embedding matrices.
+
+Concept embeddings live in the database as float32 blobs (see
+``Concept.embedding_vector``). For similarity queries each laboratory also
+gets an on-disk matrix of L2-normalised rows that is memory-mapped, so a
+brute-force top-k cosine search is a single matrix-vector product.
+"""
+
+import json
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy import inspect, select
+
+from app.core.config import settings
+from app.core.events import register_commit_hook
+from app.models.concept import Concept
+from app.utils.vectors import normalize, unpack_vector
+
+_INITIAL_CAPACITY = 1024
+
+
+class VectorIndex:
+    """
+    Growable memory-mapped matrix of unit vectors keyed by integer id.
+
+    Files in ``directory``: ``vectors.f32`` (capacity x dim float32),
+    ``ids.i64`` (capacity int64) and ``meta.json`` (dim, count, capacity, model).
+    """
+
+    def __init__(self, directory: Path, dim: int, model: Optional[str] = None):
+        self.directory = Path(directory)
+        self.dim = dim
+        self.model = model
+        self.count = 0
+        self.capacity = 0
+        self._rows: Dict[int, int] = {}
+        self._vectors = None
+        self._ids = None
+        self._lock = threading.RLock()
+
+    # -- persistence -------------------------------------------------------
+
+    @property
+    def _meta_path(self) -> Path:
+        return self.directory / "meta.json"
+
+    @classmethod
+    def open(cls, directory: Path) -> Optional["VectorIndex"]:
+        """Open an existing index, or return None if nothing is on disk."""
+        meta_path = Path(directory) / "meta.json"
+        if not meta_path.exists():
+            return None
+
+        meta = json.loads(meta_path.read_text())
+        index = cls(directory, meta["dim"], meta.get("model"))
+        index._map(meta["capacity"])
+        index.count = meta["count"]
+        index._rows = {int(i): row for row, i in enumerate(index._ids[:index.count])}
+        return index
+
+    def _map(self, capacity: int):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        vectors_path = self.directory / "vectors.f32"
+        ids_path = self.directory / "ids.i64"
+
+        for path, itemsize in ((vectors_path, 4 * self.dim), (ids_path, 8)):
+            with open(path, "ab") as f:
+                f.truncate(capacity * itemsize)
+
+        self._vectors = np.memmap(vectors_path, dtype=np.float32, mode="r+", shape=(capacity, self.dim))
+        self._ids = np.memmap(ids_path, dtype=np.int64, mode="r+", shape=(capacity,))
+        self.capacity = capacity
+
+    def _grow(self, needed: int):
+        capacity = max(self.capacity, _INITIAL_CAPACITY)
+        while capacity < needed:
+            capacity *= 2
+        if capacity != self.capacity:
+            self._release()
+            self._map(capacity)
+
+    def _release(self):
+        for array in (self._vectors, self._ids):
+            if array is not None:
+                array.flush()
+        self._vectors = None
+        self._ids = None
+
+    def flush(self):
+        """Flush the matrices and write the metadata file."""
+        with self._lock:
+            if self._vectors is None:
+                self._map(_INITIAL_CAPACITY)
+            self._vectors.flush()
+            self._ids.flush()
+            meta = {"dim": self.dim, "count": self.count, "capacity": self.capacity, "model": self.model}
+            tmp_path = self._meta_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(meta))
+            tmp_path.replace(self._meta_path)
+
+    # -- mutation ----------------------------------------------------------
+
+    def upsert_many(self, items: Iterable[Tuple[int, np.ndarray]]):
+        """Insert or overwrite vectors; rows are normalised on the way in."""
+        with self._lock:
+            for item_id, vector in items:
+                vector = np.asarray(vector, dtype=np.float32)
+                if vector.shape != (self.dim,):
+                    raise ValueError(f"Expected {self.dim} dimensions, got {vector.shape}")
+
+                row = self._rows.get(item_id)
+                if row is None:
+                    self._grow(self.count + 1)
+                    row = self.count
+                    self.count += 1
+                    self._rows[item_id] = row
+                    self._ids[row] = item_id
+                self._vectors[row] = normalize(vector)
+
+    def remove_many(self, item_ids: Iterable[int]):
+        """Remove vectors by id, filling each hole with the last row."""
+        with self._lock:
+            for item_id in item_ids:
+                row = self._rows.pop(item_id, None)
+                if row is None:
+                    continue
+                last = self.count - 1
+                if row != last:
+                    moved_id = int(self._ids[last])
+                    self._vectors[row] = self._vectors[last]
+                    self._ids[row] = moved_id
+                    self._rows[moved_id] = row
+                self.count = last
+
+    def __contains__(self, item_id: int) -> bool:
+        return item_id in self._rows
+
+    def __len__(self) -> int:
+        return self.count
+
+    # -- queries -----------------------------------------------------------
+
+    def matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, vectors) views over the populated rows."""
+        if self._vectors is None:
+            return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32)
+        return self._ids[:self.count], self._vectors[:self.count]
+
+    def get(self, item_id: int) -> Optional[np.ndarray]:
+        """Return the stored unit vector for an id."""
+        row = self._rows.get(item_id)
+        return None if row is None else np.array(self._vectors[row])
+
+    def vectors_of(self, item_ids) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (ids, vectors) for the given ids that are in the index, as copies."""
+        with self._lock:
+            pairs = [(int(i), self._rows[int(i)]) for i in item_ids if int(i) in self._rows]
+            if not pairs:
+                return np.empty(0, dtype=np.int64), np.empty((0, self.dim), dtype=np.float32)
+            ids, rows = (np.array(column, dtype=np.int64) for column in zip(*pairs))
+            return ids, np.asarray(self._vectors[rows])
+
+    def top_k(self, query, k: int = 10, allowed_ids=None, min_score: Optional[float] = None) -> List[Tuple[int, float]]:
+        """
+        Cosine top-k search. ``allowed_ids`` restricts the candidates before
+        ranking (e.g. tag, source or cluster filters).
+        """
+        with self._lock:
+            ids, vectors = self.matrix()
+            if allowed_ids is not None:
+                if not isinstance(allowed_ids, np.ndarray):
+                    allowed_ids = np.fromiter(allowed_ids, dtype=np.int64)
+                if len(allowed_ids) * 4 < len(ids):
+                    # Few candidates: score only their rows instead of masking the whole matrix
+                    rows = np.fromiter(
+                        (self._rows[int(i)] for i in allowed_ids if int(i) in self._rows), dtype=np.int64
+                    )
+                    ids, vectors, allowed_ids = ids[rows], vectors[rows], None
+            if not len(ids) or k <= 0:
+                return []
+
+            scores = vectors @ normalize(query)
+            if allowed_ids is not None:
+                scores = np.where(np.isin(ids, allowed_ids), scores, -np.inf)
+
+            k = min(k, len(scores))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+
+            results = []
+            for row in top:
+                score = float(scores[row])
+                if score == -np.inf or (min_score is not None and score < min_score):
+                    break
+                results.append((int(ids[row]), score))
+            return results
+
+
+class LaboratoryVectorStore:
+    """Registry of concept vector indexes, one per laboratory."""
+
+    def __init__(self, root: str):
+        self.root = Path(root)
+        self._indexes: Dict[int, VectorIndex] = {}
+        self._lock = threading.Lock()
+
+    def _directory(self, laboratory_id: int) -> Path:
+        return self.root / "concepts" / f"lab_{laboratory_id}"
+
+    def get(self, laboratory_id: int, db=None) -> Optional[VectorIndex]:
+        """
+        Return the index for a laboratory, opening it from disk or building
+        it from the database (when ``db`` is given) on first use.
+        """
+        with self._lock:
+            index = self._indexes.get(laboratory_id)
+            if index is None:
+                index = VectorIndex.open(self._directory(laboratory_id))
+                if index is not None:
+                    self._indexes[laboratory_id] = index
+        if index is None and db is not None:
+            index = self.rebuild(db, laboratory_id)
+        return index
+
+    def rebuild(self, db, laboratory_id: int, batch_size: int = 1000) -> Optional[VectorIndex]:
+        """
+        Rebuild a laboratory's matrix from the stored float32 blobs. Only
+        vectors of the configured model are comparable, so while a re-embed
+        is in progress the index holds the rows already converted.
+        """
+        stmt = (
+            select(Concept.id, Concept.embedding_vector, Concept.embedding_dim, Concept.embedding_model)
+            .where(
+                Concept.laboratory_id == laboratory_id,
+                Concept.is_active == True,
+                Concept.embedding_vector.isnot(None),
+                Concept.embedding_model == settings.EMBEDDING_MODEL,
+            )
+            .order_by(Concept.id)
+            .execution_options(yield_per=batch_size)
+        )
+
+        directory = self._directory(laboratory_id)
+        for stale in ("vectors.f32", "ids.i64", "meta.json"):
+            (directory / stale).unlink(missing_ok=True)
+
+        index = None
+        batch = []
+        for concept_id, blob, dim, model in db.execute(stmt):
+            if index is None:
+                index = VectorIndex(directory, dim, model)
+            if dim != index.dim:
+                continue
+            batch.append((concept_id, unpack_vector(blob, dim)))
+            if len(batch) >= batch_size:
+                index.upsert_many(batch)
+                batch = []
+
+        if index is None:
+            return None
+        index.upsert_many(batch)
+        index.flush()
+
+        with self._lock:
+            self._indexes[laboratory_id] = index
+        return index
+
+    def drop(self, laboratory_id: int):
+        """Forget an index so it is rebuilt on next access."""
+        with self._lock:
+            index = self._indexes.pop(laboratory_id, None)
+        if index is not None:
+            index._release()
+        meta = self._directory(laboratory_id) / "meta.json"
+        meta.unlink(missing_ok=True)
+
+    def apply_changes(self, changes):
+        """Apply committed concept changes to indexes that already exist."""
+        touched = {}
+        for change in changes:
+            for lab_id in change["remove_from"]:
+                index = self.get(lab_id)
+                if index is not None:
+                    index.remove_many([change["id"]])
+                    touched[lab_id] = index
+
+            if change["vector"] is None:
+                continue
+            lab_id = change["laboratory_id"]
+            index = self.get(lab_id)
+            if index is None:
+                continue
+            if index.model and change["model"] != index.model:
+                index.remove_many([change["id"]])
+                touched[lab_id] = index
+                continue
+            if index.dim != change["dim"]:
+                self.drop(lab_id)
+                continue
+            index.upsert_many([(change["id"], unpack_vector(change["vector"], change["dim"]))])
+            touched[lab_id] = index
+
+        for index in touched.values():
+            index.flush()
+
+
+vector_store = LaboratoryVectorStore(settings.VECTOR_STORE_DIR)
+
+
+def current_index(db, laboratory_id: int) -> Optional[VectorIndex]:
+    """
+    A laboratory's index for the configured embedding model. An index built
+    for another model (after ``EMBEDDING_MODEL`` changed) is rebuilt from
+    the rows that have already been re-embedded.
+    """
+    index = vector_store.get(laboratory_id, db)
+    if index is not None and index.model and index.model != settings.EMBEDDING_MODEL:
+        vector_store.drop(laboratory_id)
+        index = vector_store.get(laboratory_id, db)
+    return index
+
+
+def search_similar(db, laboratory_id: int, query_vector, k: int = 10, allowed_ids=None, min_score=None):
+    """Top-k concepts in a laboratory by cosine similarity to ``query_vector``."""
+    index = current_index(db, laboratory_id)
+    if index is None:
+        return []
+    return index.top_k(query_vector, k, allowed_ids=allowed_ids, min_score=min_score)
+
+
+def _snapshot_concept(concept, op):
+    state = inspect(concept)
+    lab_history = state.attrs.laboratory_id.history
+
+    if op == "update":
+        watched = ("embedding_vector", "laboratory_id", "is_active")
+        if not any(state.attrs[name].history.has_changes() for name in watched):
+            return None
+
+    remove_from = set()
+    if op == "delete" or not concept.is_active:
+        remove_from.add(concept.laboratory_id)
+    remove_from.update(lab_id for lab_id in lab_history.deleted or () if lab_id is not None)
+
+    live = op != "delete" and concept.is_active and concept.embedding_vector is not None
+    if not live:
+        remove_from.add(concept.laboratory_id)
+
+    return {
+        "id": concept.id,
+        "laboratory_id": concept.laboratory_id,
+        "vector": concept.embedding_vector if live else None,
+        "dim": concept.embedding_dim,
+        "model": concept.embedding_model,
+        "remove_from": remove_from,
+    }
+
+
+register_commit_hook(Concept, _snapshot_concept, vector_store.apply_changes)
@@ -0,0 +1,142 @@
+"""
+Benchmark of PDF text extraction.
+
+Writes a synthetic corpus of text-only PDFs, then extracts it with several
+pool sizes and once more from the text cache, reporting pages per second
+and how soon the first page arrived. Pool start-up is timed separately, as
+a server pays it once. Set ``EXTRACTION_WORKERS`` to the fastest size.
+
+Usage:
+    python -m app.utils.extraction_benchmark --pages 400 --documents 3 --workers 1 2 4 8
+"""
+
+import argparse
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+WORDS = (
+    "radium polonium uranium radiation element atom nucleus isotope decay energy measurement "
+    "electrometer crystal salt sample laboratory experiment result theory physics chemistry "
+    "discovery research paper method observation thesis university paris warsaw science"
+).split()
+
+
+def _escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def write_synthetic_pdf(path: Path, pages: int, lines_per_page: int = 45, seed: int = 0):
+    """A PDF of ``pages`` pages of random words in Helvetica, written without a PDF library."""
+    rng = random.Random(seed)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # Page tree, written once the page objects are numbered
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    page_ids = []
+    for _ in range(pages):
+        lines = [" ".join(rng.choice(WORDS) for _ in range(12)) for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 12 TL 50 780 Td " + " ".join(f"({_escape(line)}) '" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % (len(objects))
+        )
+        page_ids.append(len(objects))
+    kids = " ".join(f"{number} 0 R" for number in page_ids).encode()
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, pages)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def run(paths, workers: int, use_cache: bool) -> dict:
+    from app.services.extraction import iter_pages
+
+    pages = characters = 0
+    first_page = None
+    started = time.perf_counter()
+    for path in paths:
+        for page in iter_pages(path, workers=workers, use_cache=use_cache):
+            if first_page is None:
+                first_page = time.perf_counter() - started
+            pages += 1
+            characters += len(page)
+    elapsed = time.perf_counter() - started
+    return {
+        "pages": pages,
+        "pages_per_second": pages / elapsed,
+        "first_page_ms": (first_page or 0) * 1000,
+        "seconds": elapsed,
+        "characters": characters,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=400, help="Pages per document")
+    parser.add_argument("--documents", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    directory = Path(tempfile.mkdtemp(prefix="marie-extraction-"))
+    # The text cache only applies to stored objects; keep it inside the scratch directory
+    os.environ["UPLOAD_DIR"] = str(directory)
+    from app.services import extraction
+    from app.services.content_store import objects_dir
+
+    try:
+        paths = []
+        for number in range(args.documents):
+            path = objects_dir() / "bm" / f"book{number}.pdf"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_synthetic_pdf(path, args.pages, seed=number)
+            paths.append(path)
+        print(f"Corpus: {args.documents} PDFs x {args.pages} pages in {directory}\n")
+
+        print(f"{'workers':>12} {'pages':>7} {'pages/s':>9} {'first page ms':>14} {'seconds':>8}")
+        baseline = None
+        fastest = (0.0, 1)
+        for workers in args.workers:
+            started = ""
+            if workers > 1:
+                began = time.perf_counter()
+                extraction.start_pool(workers)
+                started = f"   pool start {time.perf_counter() - began:.2f}s"
+            stats = run(paths, workers, use_cache=False)
+            baseline = baseline or stats["pages_per_second"]
+            fastest = max(fastest, (stats["pages_per_second"], workers))
+            print(
+                f"{workers:>12} {stats['pages']:>7} {stats['pages_per_second']:>9.1f} "
+                f"{stats['first_page_ms']:>14.1f} {stats['seconds']:>8.2f}"
+                f"   x{stats['pages_per_second'] / baseline:.2f}{started}"
+            )
+
+        run(paths, max(args.workers), use_cache=True)  # Fills the cache
+        stats = run(paths, max(args.workers), use_cache=True)
+        print(
+            f"{'cached':>12} {stats['pages']:>7} {stats['pages_per_second']:>9.1f} "
+            f"{stats['first_page_ms']:>14.1f} {stats['seconds']:>8.2f}"
+        )
+        print(f"\nFastest on this host ({os.cpu_count()} CPUs): EXTRACTION_WORKERS={fastest[1]}")
+    finally:
+        extraction.shutdown()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Normalisation of source identifiers (URLs, DOIs, ISBNs) so that the same
+resource imported twice compares equal.
+"""
+
+import re
+from typing import Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+TRACKING_PARAMS = {"fbclid", "gclid", "mc_cid", "mc_eid", "ref", "ref_src", "si"}
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+_DOI_PREFIX_RE = re.compile(r"^(?:doi:\s*|https?://(?:dx\.)?doi\.org/)", re.IGNORECASE)
+
+
+def normalize_url(url: Optional[str]) -> Optional[str]:
+    """
+    Canonical form of a URL: lower-case scheme and host, no ``www.``,
+    default port, fragment or tracking parameters, sorted query string and
+    no trailing slash.
+    """
+    if not url or not url.strip():
+        return None
+    url = url.strip()
+    if "://" not in url:
+        url = f"https://{url}"
+
+    parts = urlsplit(url)
+    scheme = parts.scheme.lower()
+    if scheme == "http":
+        scheme = "https"
+    host = (parts.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+    if parts.port and parts.port not in DEFAULT_PORTS.values():
+        host = f"{host}:{parts.port}"
+
+    query = sorted(
+        (key, value) for key, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not key.lower().startswith("utm_") and key.lower() not in TRACKING_PARAMS
+    )
+    path = parts.path.rstrip("/")
+    return urlunsplit((scheme, host, path, urlencode(query), ""))
+
+
+def normalize_doi(doi: Optional[str]) -> Optional[str]:
+    """Bare lower-case DOI (``10.xxxx/...``) without resolver prefixes."""
+    if not doi or not doi.strip():
+        return None
+    return _DOI_PREFIX_RE.sub("", doi.strip()).strip().lower() or None
+
+
+def normalize_isbn(isbn: Optional[str]) -> Optional[str]:
+    """ISBN-13 digits; ISBN-10 values are converted. Invalid input is kept as typed."""
+    if not isbn or not isbn.strip():
+        return None
+    digits = re.sub(r"[^0-9Xx]", "", isbn).upper()
+
+    if len(digits) == 10:
+        core = "978" + digits[:9]
+        check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(core)) % 10) % 10
+        return core + str(check)
+    if len(digits) == 13 and digits.isdigit():
+        return digits
+    return isbn.strip()
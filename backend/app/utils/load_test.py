@@ -0,0 +1,72 @@
+"""
+HTTP load test for Marie's API.
+
+Fires a fixed number of GET requests at several concurrency levels and
+reports throughput and latency percentiles, to check that request handling
+scales with concurrency instead of serialising on the event loop.
+
+Usage (with the server running):
+    python -m app.utils.load_test --url http://localhost:8000/api/v1/laboratories/ \
+        --requests 2000 --concurrency 1 8 32 64
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def run_level(client: httpx.AsyncClient, url: str, total: int, concurrency: int) -> dict:
+    """Run ``total`` requests with ``concurrency`` in flight; return stats."""
+    latencies = []
+    errors = 0
+    remaining = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for _ in remaining:
+            started = time.perf_counter()
+            try:
+                response = await client.get(url)
+                if response.status_code >= 400:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests_per_second": total / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+        "errors": errors,
+    }
+
+
+async def main(url: str, total: int, levels):
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        await client.get(url)  # Warm up
+        print(f"{'concurrency':>11} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        for concurrency in levels:
+            stats = await run_level(client, url, total, concurrency)
+            print(
+                f"{stats['concurrency']:>11} {stats['requests_per_second']:>10.1f} "
+                f"{stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f} {stats['errors']:>7}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8000/api/v1/laboratories/")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+    asyncio.run(main(args.url, args.requests, args.concurrency))
@@ -0,0 +1,91 @@
+"""
+Benchmark of the vector leg of search.
+
+Builds a synthetic laboratory of clustered unit vectors and times top-k
+queries through ``ANNStore.search`` (what ``semantic_search`` calls) against
+an exact scan of the whole matrix, without a filter and with id masks of
+decreasing selectivity. Reports p50/p95 latency and recall against the
+exact results. Tune ``ANN_NPROBE`` and ``ANN_LIST_SIZE`` with it.
+
+Usage:
+    python -m app.utils.search_benchmark --vectors 50000 --dim 384 --queries 200
+"""
+
+import argparse
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def synthetic_vectors(count: int, dim: int, topics: int = 64, seed: int = 0) -> np.ndarray:
+    """Unit vectors scattered around ``topics`` random directions, like embeddings of a corpus."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((topics, dim)).astype(np.float32)
+    vectors = centres[rng.integers(topics, size=count)] + 0.6 * rng.standard_normal((count, dim)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def time_queries(search, queries) -> tuple:
+    latencies, results = [], []
+    for query in queries:
+        started = time.perf_counter()
+        results.append([item_id for item_id, _ in search(query)])
+        latencies.append((time.perf_counter() - started) * 1000)
+    return np.percentile(latencies, 50), np.percentile(latencies, 95), results
+
+
+def recall(results, exact) -> float:
+    found = sum(len(set(got) & set(expected)) for got, expected in zip(results, exact))
+    return found / max(sum(len(expected) for expected in exact), 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=50)
+    parser.add_argument("--selectivity", type=float, nargs="+", default=[0.5, 0.1, 0.01])
+    args = parser.parse_args()
+
+    from app.core.config import settings
+    from app.services.ann import ANNStore
+    from app.services.vector_store import VectorIndex
+
+    directory = Path(tempfile.mkdtemp(prefix="marie-search-"))
+    try:
+        vectors = synthetic_vectors(args.vectors, args.dim)
+        index = VectorIndex(directory, args.dim)
+        index.upsert_many(enumerate(vectors, start=1))
+        store = ANNStore(lambda db, laboratory_id: index)
+        began = time.perf_counter()
+        store.get(None, 1)
+        print(f"Laboratory: {args.vectors} x {args.dim} vectors, k={args.k}, "
+              f"ANN_LIST_SIZE={settings.ANN_LIST_SIZE}, ANN_NPROBE={settings.ANN_NPROBE}, "
+              f"index trained in {time.perf_counter() - began:.2f}s\n")
+
+        rng = np.random.default_rng(1)
+        queries = synthetic_vectors(args.queries, args.dim, seed=1)
+        print(f"{'filter':>10} {'exact p50':>10} {'p95':>7} {'ann p50':>9} {'p95':>7} {'recall':>7}")
+        for selectivity in [None, *args.selectivity]:
+            allowed = None
+            if selectivity is not None:
+                allowed = np.sort(rng.choice(np.arange(1, args.vectors + 1), int(args.vectors * selectivity),
+                                             replace=False))
+            exact_p50, exact_p95, exact = time_queries(
+                lambda query: index.top_k(query, args.k, allowed_ids=allowed), queries)
+            ann_p50, ann_p95, found = time_queries(
+                lambda query: store.search(None, 1, None, query, args.k, allowed_ids=allowed), queries)
+            label = "none" if selectivity is None else f"{selectivity:.0%}"
+            print(f"{label:>10} {exact_p50:>8.2f}ms {exact_p95:>5.2f}ms {ann_p50:>7.2f}ms {ann_p95:>5.2f}ms "
+                  f"{recall(found, exact):>7.3f}")
+    finally:
+        index._release()
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Helpers for packing embedding vectors into compact float32 blobs.
+"""
+
+import numpy as np
+
+
+def pack_vector(values) -> bytes:
+    """Encode a sequence of floats as a little-endian float32 blob."""
+    return np.asarray(values, dtype="<f4").tobytes()
+
+
+def unpack_vector(blob, dim=None) -> np.ndarray:
+    """Decode a float32 blob back into a NumPy vector."""
+    vector = np.frombuffer(blob, dtype="<f4")
+    if dim is not None and vector.shape[0] != dim:
+        raise ValueError(f"Expected {dim} dimensions, got {vector.shape[0]}")
+    return vector
+
+
+def normalize(matrix: np.ndarray) -> np.ndarray:
+    """L2-normalise a vector or each row of a matrix (zero rows stay zero)."""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
@@ -0,0 +1,60 @@
+"""
+Shared fixtures.
+
+Settings are read when ``app.core.config`` is first imported, so the
+environment points at a throwaway database and storage directories before
+anything from ``app`` is imported. Background workers stay off; tests
+drive the code they exercise directly.
+"""
+
+import os
+import shutil
+import tempfile
+
+_DIRECTORY = tempfile.mkdtemp(prefix="marie-tests-")
+os.environ.update({
+    "DATABASE_URL": f"sqlite:///{_DIRECTORY}/test.db",
+    "UPLOAD_DIR": f"{_DIRECTORY}/uploads",
+    "VECTOR_STORE_DIR": f"{_DIRECTORY}/vectors",
+    "INGESTION_ENABLED": "false",
+    "REINDEX_ENABLED": "false",
+    "CLUSTERING_ENABLED": "false",
+    "LAB_STATS_RECONCILE_INTERVAL": "0",
+    "WARM_UP_COMPONENTS": "[]",
+})
+
+import pytest
+
+
+def pytest_sessionfinish(session, exitstatus):
+    shutil.rmtree(_DIRECTORY, ignore_errors=True)
+
+
+@pytest.fixture(scope="session")
+def client():
+    """The API with its startup (schema, migrations) run once per session."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def db(client):
+    """A synchronous session on the test database."""
+    from app.core.database import SessionLocal
+
+    with SessionLocal() as session:
+        yield session
+
+
+@pytest.fixture
+def laboratory(db):
+    """A fresh, empty laboratory."""
+    from app.models import Laboratory
+
+    laboratory = Laboratory(name=f"test-{os.urandom(4).hex()}")
+    db.add(laboratory)
+    db.commit()
+    return laboratory
@@ -0,0 +1,121 @@
+import numpy as np
+import pytest
+from sqlalchemy import or_, select
+
+from app.core.config import settings
+from app.models import Concept
+from app.models.relationships import ConceptRelationship, RelationshipType
+from app.services.ann import IVFIndex
+from app.services.suggestions import link_laboratory, suggest_relationships
+from app.services.vector_store import VectorIndex
+
+
+def two_groups(count: int, dim: int = 8, seed: int = 0) -> np.ndarray:
+    """Unit vectors around two opposite directions, alternating."""
+    rng = np.random.default_rng(seed)
+    centre = np.zeros(dim, dtype=np.float32)
+    centre[0] = 1.0
+    vectors = np.where(np.arange(count)[:, None] % 2 == 0, centre, -centre) + 0.1 * rng.standard_normal((count, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+@pytest.fixture
+def indexed(tmp_path):
+    vectors = two_groups(40)
+    index = VectorIndex(tmp_path, vectors.shape[1])
+    index.upsert_many(enumerate(vectors, start=1))
+    ivf = IVFIndex.train(np.arange(1, 41), vectors, list_size=20)
+    yield index, ivf, vectors
+    index._release()
+
+
+def list_of(ivf: IVFIndex, item_id: int) -> list:
+    ivf._merge_pending()
+    return [number for number in range(len(ivf.centroids))
+            if item_id in ivf._ids[ivf._offsets[number]:ivf._offsets[number + 1]]]
+
+
+def test_re_added_ids_move_to_their_new_list(indexed):
+    index, ivf, vectors = indexed
+    (before,) = list_of(ivf, 1)
+
+    # Concept 1 is re-embedded into the other group, twice before a merge
+    ivf.add([1], vectors[2][None, :])
+    ivf.add([1], vectors[1][None, :])
+    index.upsert_many([(1, vectors[1])])
+    (after,) = list_of(ivf, 1)
+    assert after != before
+    assert len(ivf._ids) == 40
+
+    neighbours = dict(ivf.all_neighbours(index, 3, nprobe=1))
+    assert len(neighbours) == 40
+    assert neighbours[1][0][0] % 2 == 0  # Now among the odd-indexed vectors' group
+    assert 1 in {item_id for item_id, _ in ivf.search(index, vectors[1], 5, nprobe=1)}
+
+
+def test_all_neighbours_lists_every_concept_once(indexed):
+    index, ivf, _ = indexed
+    seen = [concept_id for concept_id, _ in ivf.all_neighbours(index, 3, nprobe=2)]
+    assert sorted(seen) == list(range(1, 41))
+
+
+@pytest.fixture(params=["exact", "ivf"])
+def ann_mode(request, monkeypatch):
+    if request.param == "ivf":
+        monkeypatch.setattr(settings, "ANN_MIN_SIZE", 8)
+        monkeypatch.setattr(settings, "ANN_LIST_SIZE", 6)
+        monkeypatch.setattr(settings, "ANN_NPROBE", 2)
+    return request.param
+
+
+def embedded_concepts(db, laboratory, vectors) -> list:
+    concepts = []
+    for i, vector in enumerate(vectors):
+        concept = Concept(title=f"Concept {i}", content="content", laboratory_id=laboratory.id)
+        concept.set_embedding(vector, settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+        concepts.append(concept)
+    db.add_all(concepts)
+    db.commit()
+    return concepts
+
+
+def relationships(db, concepts) -> list:
+    ids = [c.id for c in concepts]
+    return db.scalars(select(ConceptRelationship).where(or_(
+        ConceptRelationship.source_concept_id.in_(ids), ConceptRelationship.target_concept_id.in_(ids),
+    ))).all()
+
+
+@pytest.mark.usefixtures("ann_mode")
+def test_new_concepts_are_linked_to_their_neighbours(db, laboratory):
+    vectors = two_groups(24)
+    concepts = embedded_concepts(db, laboratory, vectors[:-1])
+    manual = ConceptRelationship(source_concept_id=concepts[2].id, target_concept_id=concepts[0].id,
+                                 relationship_type=RelationshipType.CAUSAL)
+    db.add(manual)
+    db.commit()
+
+    newest = embedded_concepts(db, laboratory, vectors[-1:])[0]  # In the odd group
+    assert suggest_relationships(db, [newest], k=3, threshold=0.5) == 3
+    db.commit()
+    links = [r for r in relationships(db, [newest]) if r.created_by == "ai"]
+    assert {r.source_concept_id for r in links} == {newest.id}
+    assert all(concepts.index(db.get(Concept, r.target_concept_id)) % 2 == 1 for r in links)
+    assert all(r.relationship_type == RelationshipType.SEMANTIC and not r.is_validated for r in links)
+
+    # An already related pair is left alone, whichever direction it was created in
+    assert suggest_relationships(db, [concepts[0]], k=22, threshold=0.5) == 10
+
+
+@pytest.mark.usefixtures("ann_mode")
+def test_link_laboratory_links_each_pair_once(db, laboratory):
+    concepts = embedded_concepts(db, laboratory, two_groups(24))
+    added = link_laboratory(db, laboratory.id, k=3, threshold=0.5)
+
+    links = relationships(db, concepts)
+    assert added == len(links) > 0
+    pairs = [frozenset((r.source_concept_id, r.target_concept_id)) for r in links]
+    assert len(set(pairs)) == len(pairs)
+    parity = {c.id: i % 2 for i, c in enumerate(concepts)}
+    assert all(len({parity[concept_id] for concept_id in pair}) == 1 for pair in pairs)
+    assert link_laboratory(db, laboratory.id, k=3, threshold=0.5) == 0
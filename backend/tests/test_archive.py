@@ -0,0 +1,138 @@
+import json
+import os
+import zipfile
+
+import numpy as np
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.models import Concept, DirtyRecord, Laboratory, NotebookEntry, Source, Tag
+from app.models.notebook import EntryType
+from app.models.relationships import ConceptRelationship, RelationshipType
+from app.models.source import SourceChunk, SourceType
+from app.services.archive import ArchiveError, export_laboratory, import_laboratory
+from app.services.passages import search_passages, source_directory
+
+TEXT = "Radium emits heat.\fPolonium was named after Poland."
+CHUNK_VECTORS = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0]], dtype="<f4")
+
+
+@pytest.fixture
+def populated(db, laboratory):
+    """A laboratory with tags, a processed source and its passages, concepts, a link and a notebook entry."""
+    shared = Tag(name=f"physics-{laboratory.name}")
+    parent = Tag(name="radioactivity", laboratory_id=laboratory.id)
+    db.add_all([shared, parent])
+    db.flush()
+    child = Tag(name="alpha decay", laboratory_id=laboratory.id, parent_id=parent.id)
+
+    source = Source(title="Recherches sur les substances radioactives", source_type=SourceType.BOOK,
+                    laboratory_id=laboratory.id, is_processed=True, embedding_model=settings.EMBEDDING_MODEL,
+                    embedding_version=settings.EMBEDDING_VERSION)
+    db.add_all([child, source])
+    db.flush()
+    db.add_all([
+        SourceChunk(source_id=source.id, laboratory_id=laboratory.id, chunk_index=0, byte_start=0, byte_end=18,
+                    token_count=4, page=1),
+        SourceChunk(source_id=source.id, laboratory_id=laboratory.id, chunk_index=1, byte_start=19, byte_end=52,
+                    token_count=6, page=2),
+    ])
+    (source_directory(source) / "text.txt").write_bytes(TEXT.encode("utf-8"))
+    (source_directory(source) / "embeddings.f32").write_bytes(CHUNK_VECTORS.tobytes())
+
+    radium = Concept(title="Radium", content="Element 88", laboratory_id=laboratory.id, source_id=source.id,
+                     zettel_id=f"z{os.urandom(6).hex()}", tags=[shared, child])
+    radium.set_embedding([0.6, 0.8, 0.0], settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+    polonium = Concept(title="Polonium", content="Element 84", laboratory_id=laboratory.id)
+    db.add_all([radium, polonium])
+    db.flush()
+    db.add_all([
+        ConceptRelationship(source_concept_id=radium.id, target_concept_id=polonium.id,
+                            relationship_type=RelationshipType.TEMPORAL),
+        NotebookEntry(title="Shed notes", content="Pitchblende", entry_type=EntryType.NOTE,
+                      laboratory_id=laboratory.id, concept_id=polonium.id, time_spent=30),
+    ])
+    db.commit()
+    return laboratory
+
+
+def test_round_trip_copies_the_laboratory(db, populated, tmp_path):
+    path = tmp_path / "lab.zip"
+    exported = export_laboratory(populated.id, path)
+    assert exported == {
+        "laboratory": 1, "tags": 3, "sources": 1, "source_chunks": 2, "concepts": 2, "concept_tags": 2,
+        "concept_tag_metadata": 0, "relationships": 1, "notebook_entries": 1,
+    }
+
+    result = import_laboratory(path)
+    assert result["name"] == f"{populated.name} (2)"  # Next to the original
+    assert result["counts"] == {**exported, "tags": 2}  # The global tag is reused
+    copy = db.get(Laboratory, result["laboratory_id"])
+    assert (copy.concept_count, copy.source_count, copy.study_hours) == (2, 1, 30)
+
+    radium, polonium = db.scalars(select(Concept).where(Concept.laboratory_id == copy.id).order_by(Concept.id))
+    (original,) = db.scalars(select(Concept).where(Concept.laboratory_id == populated.id, Concept.title == "Radium"))
+    assert np.array_equal(radium.get_embedding(), original.get_embedding())
+    assert radium.zettel_id is None  # Zettel ids are unique across laboratories
+    assert {tag.name for tag in radium.tags} == {f"physics-{populated.name}", "alpha decay"}
+    alpha = next(tag for tag in radium.tags if tag.laboratory_id == copy.id)
+    assert db.get(Tag, alpha.parent_id).laboratory_id == copy.id
+
+    (link,) = db.scalars(select(ConceptRelationship).where(ConceptRelationship.source_concept_id == radium.id))
+    assert link.target_concept_id == polonium.id
+    assert db.scalar(select(NotebookEntry.concept_id).where(NotebookEntry.laboratory_id == copy.id)) == polonium.id
+
+    # Only the concept without a vector waits for the re-embed
+    marked = db.scalars(select(DirtyRecord.entity_id).where(DirtyRecord.entity_id.in_([radium.id, polonium.id]),
+                                                            DirtyRecord.entity == "concept")).all()
+    assert marked == [polonium.id]
+
+
+def test_imported_passages_are_searchable_under_the_new_source(db, populated, tmp_path):
+    path = tmp_path / "lab.zip"
+    export_laboratory(populated.id, path)
+    copy_id = import_laboratory(path, name="Curie (copy)")["laboratory_id"]
+
+    source = db.scalar(select(Source).where(Source.laboratory_id == copy_id))
+    original = db.scalar(select(Source).where(Source.laboratory_id == populated.id))
+    assert source_directory(source) != source_directory(original)
+    assert (source_directory(source) / "text.txt").read_bytes() == TEXT.encode("utf-8")
+
+    (best, _) = search_passages(db, copy_id, [0.0, 1.0, 0.0], k=2)
+    assert (best["source_id"], best["page"]) == (source.id, 2)
+    assert best["text"] == "Polonium was named after Poland."
+
+
+@pytest.mark.parametrize("manifest, message", [
+    (None, "no readable manifest"),
+    ({"format": "marie-laboratory", "version": 99}, "Unsupported archive format"),
+    ({"format": "marie-laboratory", "version": 2}, "no laboratory"),
+])
+def test_unreadable_archives_are_rejected(tmp_path, manifest, message):
+    path = tmp_path / "lab.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        if manifest is not None:
+            archive.writestr("manifest.json", json.dumps(manifest))
+    with pytest.raises(ArchiveError, match=message):
+        import_laboratory(path)
+
+
+def test_files_that_are_not_zip_archives_are_rejected(tmp_path):
+    path = tmp_path / "lab.zip"
+    path.write_text("Radium")
+    with pytest.raises(ArchiveError):
+        import_laboratory(path)
+
+
+def test_endpoints_round_trip(client, populated):
+    exported = client.get(f"/api/v1/laboratories/{populated.id}/export")
+    assert exported.status_code == 200
+    assert exported.headers["content-type"] == "application/zip"
+
+    imported = client.post("/api/v1/laboratories/import", params={"name": "Curie (upload)"}, content=exported.content)
+    assert imported.status_code == 200
+    laboratory = client.get(f"/api/v1/laboratories/{imported.json()['laboratory_id']}").json()
+    assert (laboratory["name"], laboratory["concept_count"]) == ("Curie (upload)", 2)
+
+    assert client.post("/api/v1/laboratories/import", content=b"Radium").status_code == 400
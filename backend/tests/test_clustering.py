@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.models import Concept
+from app.models.cluster import ConceptCluster
+from app.models.relationships import ConceptRelationship, RelationshipType
+from app.services.clustering import closest_clusters, cluster_laboratory, linked_clusters, stale_laboratories
+
+
+def axis(number: int, dim: int = 8, noise: float = 0.0, seed: int = 0) -> np.ndarray:
+    vector = np.zeros(dim, dtype=np.float32)
+    vector[number] = 1.0
+    vector += noise * np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def add_concepts(db, laboratory, vectors, prefix="Concept") -> list:
+    concepts = []
+    for i, vector in enumerate(vectors):
+        concept = Concept(title=f"{prefix} {i}", content="content", laboratory_id=laboratory.id)
+        if vector is not None:
+            concept.set_embedding(vector, settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+        concepts.append(concept)
+    db.add_all(concepts)
+    db.commit()
+    return concepts
+
+
+def link(db, pairs, strength=1.0):
+    db.add_all(
+        ConceptRelationship(source_concept_id=source.id, target_concept_id=target.id, strength=strength,
+                            confidence=1.0, relationship_type=RelationshipType.SEMANTIC)
+        for source, target in pairs
+    )
+    db.commit()
+
+
+@pytest.fixture
+def communities(db, laboratory):
+    """Two densely linked groups along different axes, one weak link between them, and two loose concepts."""
+    radium = add_concepts(db, laboratory, [axis(0, noise=0.1, seed=i) for i in range(4)], "Radium")
+    optics = add_concepts(db, laboratory, [axis(1, noise=0.1, seed=i) for i in range(4)], "Optics")
+    near, far = add_concepts(db, laboratory, [axis(0), axis(2)], "Loose")
+    for group in (radium, optics):
+        link(db, [(a, b) for i, a in enumerate(group) for b in group[i + 1:]])
+    link(db, [(radium[0], optics[0])], strength=0.2)
+    return radium, optics, near, far
+
+
+def cluster_of(db, concept) -> int:
+    db.refresh(concept)
+    return concept.cluster_id
+
+
+def test_communities_become_clusters(db, laboratory, communities):
+    radium, optics, near, far = communities
+    result = cluster_laboratory(db, laboratory.id)
+    assert (result["clusters"], result["clustered"], result["unclustered"]) == (2, 9, 1)
+    assert result["modularity"] > 0
+
+    radium_cluster, optics_cluster = cluster_of(db, radium[0]), cluster_of(db, optics[0])
+    assert radium_cluster != optics_cluster
+    assert {cluster_of(db, c) for c in radium} == {radium_cluster}
+    assert {cluster_of(db, c) for c in optics} == {optics_cluster}
+    assert cluster_of(db, near) == radium_cluster  # Attached by its embedding
+    assert cluster_of(db, far) is None
+
+    cluster = db.get(ConceptCluster, radium_cluster)
+    assert cluster.size == 5
+    assert cluster.label.startswith("Radium 0")  # The member with the cross link has the most weight
+    assert 0 < cluster.cohesion <= 1
+
+    # A second run replaces the clusters instead of adding to them
+    cluster_laboratory(db, laboratory.id)
+    db.expire_all()
+    clusters = {cluster.id for cluster in db.query(ConceptCluster).filter_by(laboratory_id=laboratory.id)}
+    assert len(clusters) == 2
+    assert {cluster_of(db, c) for c in [*radium, *optics]} == clusters
+
+
+def test_closest_clusters_rank_by_centroid(db, laboratory, communities):
+    radium, optics, _, _ = communities
+    cluster_laboratory(db, laboratory.id)
+    radium_cluster, optics_cluster = cluster_of(db, radium[0]), cluster_of(db, optics[0])
+
+    ranked = closest_clusters(db, laboratory.id, axis(1), 2)
+    assert [cluster_id for cluster_id, _ in ranked] == [optics_cluster, radium_cluster]
+    assert ranked[0][1] > 0.9 > ranked[1][1]
+    assert closest_clusters(db, laboratory.id, axis(0), 1)[0][0] == radium_cluster
+    assert closest_clusters(db, laboratory.id, np.ones(3), 2) == []  # Other dimension
+
+
+def test_linked_clusters_follow_links_between_members(db, laboratory, communities):
+    radium, optics, _, _ = communities
+    cluster_laboratory(db, laboratory.id)
+    radium_cluster, optics_cluster = cluster_of(db, radium[0]), cluster_of(db, optics[0])
+
+    ((linked, weight),) = linked_clusters(db, laboratory.id, radium_cluster)
+    assert linked == optics_cluster and weight > 0
+    assert linked_clusters(db, laboratory.id, optics_cluster)[0] == (radium_cluster, weight)
+
+
+def test_runs_without_clusters_are_remembered(client, db, laboratory, monkeypatch):
+    monkeypatch.setattr(settings, "CLUSTERING_MIN_CONCEPTS", 3)
+    add_concepts(db, laboratory, [None] * 3)
+    assert laboratory.id in stale_laboratories(db)
+
+    updated_at = laboratory.updated_at
+    assert cluster_laboratory(db, laboratory.id)["clusters"] == 0
+    db.refresh(laboratory)
+    assert laboratory.clustered_at is not None
+    assert laboratory.updated_at == updated_at  # Clustering is not an edit
+    assert laboratory.id not in stale_laboratories(db)
+    assert client.get(f"/api/v1/graph/{laboratory.id}/clusters").json()["clustered_at"] is not None
+
+    add_concepts(db, laboratory, [None], "Newer")
+    assert laboratory.id in stale_laboratories(db)
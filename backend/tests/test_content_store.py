@@ -0,0 +1,84 @@
+import os
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.core.database import engine
+from app.core.migrations import split_shared_work_directories
+from app.models import Source
+from app.models.source import SourceChunk, SourceType
+from app.services.archive import WORK_MEMBER, _restore_work_directories
+from app.services.content_store import reuse_duplicate
+from app.services.passages import read_passage, source_directory
+
+TEXT = "Radium emits heat.\fPolonium was named after Poland."
+
+
+def new_source(db, laboratory, content_hash, **fields) -> Source:
+    source = Source(title="Traité de radioactivité", source_type=SourceType.BOOK, laboratory_id=laboratory.id,
+                    file_path="objects/ab/traite.pdf", content_hash=content_hash, **fields)
+    db.add(source)
+    db.commit()
+    return source
+
+
+@pytest.fixture
+def content_hash():
+    return os.urandom(32).hex()
+
+
+@pytest.fixture
+def processed(db, laboratory, content_hash):
+    """A processed source with text and one passage in its working directory."""
+    source = new_source(db, laboratory, content_hash, is_processed=True, page_count=2)
+    (source_directory(source) / "text.txt").write_bytes(TEXT.encode("utf-8"))
+    (source_directory(source) / "embeddings.f32").write_bytes(b"\0" * 16)
+    db.add(SourceChunk(source_id=source.id, laboratory_id=laboratory.id, chunk_index=0,
+                       byte_start=0, byte_end=18, token_count=4, page=1))
+    db.commit()
+    return source
+
+
+def test_duplicates_get_their_own_working_files(db, laboratory, content_hash, processed):
+    duplicate = new_source(db, laboratory, content_hash)
+    assert reuse_duplicate(db, duplicate).id == processed.id
+    db.commit()
+
+    directory = source_directory(duplicate)
+    assert directory != source_directory(processed)
+    assert (directory / "embeddings.f32").read_bytes() == b"\0" * 16
+    chunk = db.query(SourceChunk).filter_by(source_id=duplicate.id).one()
+    assert duplicate.is_processed and duplicate.page_count == 2
+
+    # Re-running the pipeline on one source rewrites only its own files
+    (source_directory(processed) / "text.txt").write_bytes(b"Rewritten by a later extraction.")
+    assert read_passage(directory, chunk.byte_start, chunk.byte_end) == "Radium emits heat."
+
+
+def test_shared_directories_are_split_between_duplicates(db, laboratory, content_hash):
+    sources = [new_source(db, laboratory, content_hash) for _ in range(3)]
+    shared = Path(settings.UPLOAD_DIR) / "extracted" / content_hash
+    shared.mkdir(parents=True)
+    (shared / "text.txt").write_text(TEXT)
+
+    with engine.begin() as connection:
+        split_shared_work_directories(connection)
+
+    assert not shared.exists()
+    for source in sources:
+        assert (source_directory(source) / "text.txt").read_text() == TEXT
+
+
+@pytest.mark.parametrize("version, key", [(2, "7"), (1, "hash"), (1, "7")])
+def test_archived_working_directories_follow_the_new_source_id(tmp_path, monkeypatch, version, key):
+    monkeypatch.setattr(settings, "UPLOAD_DIR", str(tmp_path))
+    path = tmp_path / "lab.zip"
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr(f"{WORK_MEMBER}/{key}/text.txt", TEXT)
+
+    content_hash = "hash" if key == "hash" else None
+    with zipfile.ZipFile(path) as archive:
+        _restore_work_directories(archive, {7: content_hash}, {7: 42}, version)
+    assert (tmp_path / "extracted" / "42" / "text.txt").read_text() == TEXT
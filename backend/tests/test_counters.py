@@ -0,0 +1,100 @@
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.models import Tag
+from app.services import counters
+from app.services.counters import CounterBuffer, counter_buffer
+
+
+@pytest.fixture
+def buffer():
+    buffer = CounterBuffer()
+    yield buffer
+    buffer.stop()
+
+
+@pytest.fixture
+def tag(db, laboratory):
+    tag = Tag(name="radioactivity", laboratory_id=laboratory.id)
+    db.add(tag)
+    db.commit()
+    return tag
+
+
+def usage(db, tag) -> int:
+    db.refresh(tag)
+    return tag.usage_count
+
+
+def test_increments_are_coalesced_per_row(db, tag, buffer):
+    updated_at = tag.updated_at
+    for _ in range(3):
+        buffer.increment("tag_usage", [tag.id])
+    assert buffer.status()["pending"] == 3
+
+    assert buffer.flush() == 1
+    assert usage(db, tag) == 3
+    assert tag.updated_at == updated_at  # Counting is not an edit
+    assert buffer.flush() == 0
+
+
+def test_unknown_counter_is_rejected(buffer):
+    with pytest.raises(KeyError):
+        buffer.increment("page_views", [1])
+
+
+def test_failed_flush_keeps_the_increments(db, tag, buffer, monkeypatch):
+    class Unavailable:
+        def begin(self):
+            raise RuntimeError("database is locked")
+
+    buffer.increment("tag_usage", [tag.id], 2)
+    with monkeypatch.context() as patched:
+        patched.setattr(counters, "engine", Unavailable())
+        with pytest.raises(RuntimeError):
+            buffer.flush()
+    assert buffer.status()["pending"] == 2
+
+    buffer.flush()
+    assert usage(db, tag) == 2
+
+
+def test_pending_increments_stay_below_the_crash_loss_bound(db, tag, buffer, monkeypatch):
+    # Long before the interval elapses, reaching COUNTER_MAX_PENDING flushes
+    monkeypatch.setattr(settings, "COUNTER_FLUSH_INTERVAL", 3600)
+    monkeypatch.setattr(settings, "COUNTER_MAX_PENDING", 5)
+    buffer.start()
+
+    buffer.increment("tag_usage", [tag.id], 4)
+    time.sleep(0.2)
+    assert buffer.status()["pending"] == 4
+
+    buffer.increment("tag_usage", [tag.id])
+    deadline = time.monotonic() + 5
+    while buffer.status()["pending"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert buffer.status()["pending"] == 0
+    assert usage(db, tag) == 5
+
+
+def test_stopping_flushes_what_is_pending(db, tag, buffer, monkeypatch):
+    monkeypatch.setattr(settings, "COUNTER_FLUSH_INTERVAL", 3600)
+    buffer.start()
+    buffer.increment("tag_usage", [tag.id], 3)
+    buffer.stop()
+    assert usage(db, tag) == 3
+
+
+def test_tags_are_counted_when_applied_not_when_listed(client, db, laboratory, tag):
+    listing = f"/api/v1/concepts/?laboratory_id={laboratory.id}&tag_id={tag.id}"
+    assert client.get(listing).status_code == 200
+    created = client.post("/api/v1/concepts/", json={
+        "title": "Radium", "content": "Element 88", "laboratory_id": laboratory.id, "tag_ids": [tag.id],
+    }).json()
+    client.put(f"/api/v1/concepts/{created['id']}", json={"tag_ids": [tag.id]})  # Already tagged
+    assert client.get(listing).status_code == 200
+
+    counter_buffer.flush()
+    assert usage(db, tag) == 1
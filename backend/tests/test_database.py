@@ -0,0 +1,30 @@
+import importlib.util
+
+import pytest
+
+from app.core.database import check_driver, to_async_url
+
+
+@pytest.mark.parametrize("url, async_url", [
+    ("sqlite:///./marie.db", "sqlite+aiosqlite:///./marie.db"),
+    ("postgresql://marie@db/marie", "postgresql+asyncpg://marie@db/marie"),
+    ("postgres://marie@db/marie", "postgresql+asyncpg://marie@db/marie"),
+    ("postgresql+asyncpg://marie@db/marie", "postgresql+asyncpg://marie@db/marie"),
+])
+def test_async_url(url, async_url):
+    assert to_async_url(url) == async_url
+
+
+@pytest.mark.parametrize("url, package", [
+    ("postgresql://marie@db/marie", "psycopg2-binary"),
+    ("postgresql+asyncpg://marie@db/marie", "asyncpg"),
+])
+def test_missing_driver_names_the_package(monkeypatch, url, package):
+    monkeypatch.setattr(importlib.util, "find_spec", lambda name: None)
+    with pytest.raises(RuntimeError, match=f"pip install {package}"):
+        check_driver(url)
+
+
+def test_installed_driver_passes():
+    check_driver("sqlite:///./marie.db")
+    check_driver("sqlite+aiosqlite:///./marie.db")
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import uuid
+
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.services.embeddings import EmbeddingService
+
+
+class FakeModel:
+    """Deterministic stand-in for a SentenceTransformer, recording every forward pass."""
+
+    def __init__(self, dim: int = 4):
+        self.dim = dim
+        self.calls = []
+        self.error = None
+
+    def encode(self, texts, **kwargs):
+        self.calls.append(list(texts))
+        if self.error is not None:
+            raise self.error
+        return np.stack([self.vector(text) for text in texts])
+
+    def vector(self, text: str) -> np.ndarray:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return np.frombuffer(digest[:self.dim], dtype=np.uint8).astype(np.float32)
+
+
+@pytest.fixture
+def model():
+    return FakeModel()
+
+
+def service_for(model, model_name: str) -> EmbeddingService:
+    service = EmbeddingService(model_name)
+    service._model = model
+    return service
+
+
+@pytest.fixture
+def service(model):
+    return service_for(model, f"fake-{uuid.uuid4().hex}")  # Own rows in the shared embedding_cache
+
+
+def test_equal_texts_are_encoded_once(service, model):
+    vectors = service.encode(["Radium  emits heat", "Polonium", "Radium emits heat"], persist=False)
+    assert model.calls == [["Radium emits heat", "Polonium"]]
+    assert np.array_equal(vectors[0], vectors[2])
+    assert np.array_equal(vectors[1], model.vector("Polonium"))
+
+    again = service.encode(["Radium emits heat\n"], persist=False)
+    assert len(model.calls) == 1
+    assert np.array_equal(again[0], vectors[0])
+    assert service.stats["cache_hits"] == 2
+
+
+@pytest.mark.usefixtures("db")  # The schema
+def test_persisted_vectors_survive_the_process_cache(service, model):
+    stored = service.encode(["Radium emits heat"])
+
+    restarted = service_for(FakeModel(), service.model_name)
+    assert np.array_equal(restarted.encode(["Radium emits heat"]), stored)
+    assert restarted._model.calls == []
+
+    other_model = service_for(FakeModel(), f"{service.model_name}-other")
+    other_model.encode(["Radium emits heat"])
+    assert other_model._model.calls == [["Radium emits heat"]]  # Cached per model
+
+
+def test_lru_keeps_the_most_recent_texts(service, model, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_CACHE_SIZE", 2)
+    for text in ["Radium", "Polonium", "Radium", "Uranium"]:
+        service.encode([text], persist=False)
+    assert model.calls == [["Radium"], ["Polonium"], ["Uranium"]]
+
+    service.encode(["Radium", "Polonium"], persist=False)
+    assert model.calls[3:] == [["Polonium"]]
+
+
+def test_concurrent_requests_share_a_forward_pass(service, model, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_WINDOW_MS", 50)
+    texts = [f"Element {i}" for i in range(5)]
+
+    async def concurrently():
+        return await asyncio.gather(service.embed_many(texts[:2]), *(service.embed(text) for text in texts[2:]))
+
+    pair, *singles = asyncio.run(concurrently())
+    assert model.calls == [texts]
+    assert np.array_equal(pair, np.stack([model.vector(text) for text in texts[:2]]))
+    assert all(np.array_equal(vector, model.vector(text)) for vector, text in zip(singles, texts[2:]))
+
+
+def test_full_batches_flush_without_waiting(service, model, monkeypatch):
+    monkeypatch.setattr(settings, "EMBEDDING_BATCH_WINDOW_MS", 60_000)
+    monkeypatch.setattr(settings, "EMBEDDING_MAX_BATCH_SIZE", 2)
+
+    async def concurrently():
+        return await asyncio.wait_for(asyncio.gather(*(service.embed(f"Element {i}") for i in range(4))), 5)
+
+    asyncio.run(concurrently())
+    assert model.calls == [["Element 0", "Element 1"], ["Element 2", "Element 3"]]
+
+
+def test_errors_reach_every_caller_in_the_batch(service, model):
+    model.error = RuntimeError("CUDA out of memory")
+
+    async def concurrently():
+        return await asyncio.gather(service.embed("Radium"), service.embed("Polonium"), return_exceptions=True)
+
+    assert [str(error) for error in asyncio.run(concurrently())] == ["CUDA out of memory"] * 2
+    assert len(model.calls) == 1
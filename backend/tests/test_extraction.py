@@ -0,0 +1,160 @@
+import json
+import random
+
+import pytest
+
+from app.core.config import settings
+from app.services import extraction
+from app.services.content_store import objects_dir
+from app.services.ingestion import stages
+from app.services.ingestion.stages import Chunker, chunk, extract
+from app.utils.extraction_benchmark import write_synthetic_pdf
+
+WORDS = ["radium", "polonium", "pitchblende", "electrometer", "isotope", "Curie,", "décroissance", "a", "[x]"]
+
+
+def no_report(*args):
+    pass
+
+
+@pytest.fixture
+def pdf(tmp_path):
+    path = tmp_path / "book.pdf"
+    write_synthetic_pdf(path, pages=40, lines_per_page=5)
+    return path
+
+
+@pytest.fixture
+def stored_pdf():
+    path = objects_dir() / "te" / "stored-book.pdf"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    write_synthetic_pdf(path, pages=5, lines_per_page=3)
+    yield path
+    cache = extraction.text_cache_path(path)
+    cache.unlink(missing_ok=True)
+
+
+@pytest.fixture
+def chunk_settings(monkeypatch):
+    # The WordPiece estimate: token counts do not depend on installed models
+    monkeypatch.setattr(stages, "_tokenizer", False)
+    monkeypatch.setattr(settings, "CHUNK_SIZE_TOKENS", 20)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP_TOKENS", 5)
+
+
+def write_text(work_dir, pages):
+    (work_dir / "text.txt").write_bytes("\f".join(pages).encode("utf-8"))
+
+
+def random_pages(count, words, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def test_pooled_extraction_gives_the_serial_pages(pdf, monkeypatch):
+    monkeypatch.setattr(settings, "EXTRACTION_PAGES_PER_TASK", 7)  # Uneven ranges
+    serial = list(extraction.iter_pages(pdf, workers=1, use_cache=False))
+    try:
+        pooled = list(extraction.iter_pages(pdf, workers=2, use_cache=False))
+    finally:
+        extraction.shutdown()
+
+    assert len(serial) == 40
+    assert pooled == serial
+    assert all("\f" not in page for page in serial)
+
+
+def test_stored_objects_are_read_from_the_text_cache(stored_pdf, monkeypatch):
+    first = list(extraction.iter_pages(stored_pdf, workers=1))
+    cache = extraction.text_cache_path(stored_pdf)
+    assert cache.read_text(encoding="utf-8") == "\f".join(first)
+
+    def no_parsing(*args):
+        raise AssertionError("cached text was extracted again")
+
+    monkeypatch.setattr(extraction, "_iter_pdf", no_parsing)
+    assert list(extraction.iter_pages(stored_pdf)) == first
+
+
+def test_files_outside_the_store_are_not_cached(pdf):
+    assert extraction.text_cache_path(pdf) is None
+
+
+def test_interrupted_extraction_is_not_cached(stored_pdf):
+    pages = extraction.iter_pages(stored_pdf, workers=1)
+    next(pages)
+    pages.close()
+    assert not extraction.text_cache_path(stored_pdf).exists()
+
+
+def test_docx_pages_split_on_page_breaks(tmp_path):
+    docx = pytest.importorskip("docx")
+    document = docx.Document()
+    document.add_paragraph("radium")
+    document.add_page_break()
+    document.add_paragraph("polonium")
+    document.add_paragraph("uranium").paragraph_format.page_break_before = True
+    path = tmp_path / "notes.docx"
+    document.save(path)
+
+    pages = [page.strip() for page in extraction.iter_pages(path)]
+    assert pages == ["radium", "polonium", "uranium"]
+
+
+def test_unsupported_suffix(tmp_path):
+    with pytest.raises(ValueError):
+        extraction.iter_pages(tmp_path / "notes.odt")
+
+
+def test_extract_stage_writes_pages_and_chunks(pdf, tmp_path, chunk_settings):
+    work_dir = tmp_path / "work"
+    work_dir.mkdir()
+    result = extract({"id": 1, "file_path": str(pdf), "source_type": "pdf", "title": "Book"}, work_dir, no_report)
+
+    text = (work_dir / "text.txt").read_text(encoding="utf-8")
+    assert result["page_count"] == 40 == text.count("\f") + 1
+    assert result["chunk_count"] == chunk({}, work_dir, no_report)["chunk_count"]
+
+
+@pytest.mark.parametrize("page_count", [1, 4])
+def test_chunks_fed_page_by_page_match_the_whole_text(tmp_path, page_count, chunk_settings):
+    pages = random_pages(page_count, 120, seed=page_count)
+    write_text(tmp_path, pages)
+    chunk({}, tmp_path, no_report)
+    whole = (tmp_path / "chunks.jsonl").read_text()
+
+    streamed = tmp_path / "streamed"
+    streamed.mkdir()
+    with Chunker(streamed) as chunker, open(streamed / "text.txt", "wb") as f:
+        for number, page in enumerate(pages):
+            data = ("\f" if number else "").encode() + page.encode("utf-8")
+            f.write(data)
+            chunker.feed(data)
+        chunker.finish()
+    assert (streamed / "chunks.jsonl").read_text() == whole
+
+
+def test_chunk_stage_reuses_current_chunks(tmp_path, monkeypatch, chunk_settings):
+    write_text(tmp_path, random_pages(2, 100))
+    count = chunk({}, tmp_path, no_report)["chunk_count"]
+    stamp = json.loads((tmp_path / "chunks.stamp").read_text())
+    assert stamp["chunk_count"] == count
+
+    monkeypatch.setattr(stages, "Chunker", None)  # Would fail if chunking ran again
+    assert chunk({}, tmp_path, no_report) == {"chunk_count": count}
+
+
+def test_chunk_stage_rechunks_after_settings_change(tmp_path, monkeypatch, chunk_settings):
+    write_text(tmp_path, random_pages(2, 100))
+    count = chunk({}, tmp_path, no_report)["chunk_count"]
+    monkeypatch.setattr(settings, "CHUNK_SIZE_TOKENS", 40)
+    assert chunk({}, tmp_path, no_report)["chunk_count"] < count
+
+
+def test_interrupted_chunking_leaves_no_stamp(tmp_path, chunk_settings):
+    write_text(tmp_path, random_pages(1, 50))
+    with pytest.raises(RuntimeError):
+        with Chunker(tmp_path) as chunker:
+            chunker.feed((tmp_path / "text.txt").read_bytes())
+            raise RuntimeError("extraction failed")
+    assert not (tmp_path / "chunks.stamp").exists()
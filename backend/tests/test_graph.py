@@ -0,0 +1,93 @@
+import pytest
+
+from app.models.relationships import RelationshipType
+from app.services.graph import LaboratoryGraph
+
+
+def edge(relationship_id, source, target, strength=0.5, bidirectional=False,
+         relationship_type=RelationshipType.SEMANTIC, active=True):
+    return {
+        "id": relationship_id,
+        "source_concept_id": source,
+        "target_concept_id": target,
+        "strength": strength,
+        "confidence": 0.5,
+        "relationship_type": relationship_type,
+        "is_bidirectional": bidirectional,
+        "is_active": active,
+    }
+
+
+@pytest.fixture
+def graph():
+    # 10 -> 20 -> 30 -> 40, plus a weak shortcut 10 -> 40 and 20 <-> 50
+    graph = LaboratoryGraph(laboratory_id=1)
+    graph.upsert_edges([
+        edge(1, 10, 20, 0.9),
+        edge(2, 20, 30, 0.9),
+        edge(3, 30, 40, 0.9),
+        edge(4, 10, 40, 0.1),
+        edge(5, 20, 50, 0.6, bidirectional=True, relationship_type=RelationshipType.CAUSAL),
+    ])
+    return graph
+
+
+def neighbours(graph, concept_id):
+    offsets, targets, *_ = graph.csr()
+    node = graph.node_ids.index(concept_id)
+    return sorted(graph.node_ids[t] for t in targets[offsets[node]:offsets[node + 1]])
+
+
+def test_csr_rows_hold_outgoing_and_bidirectional_edges(graph):
+    assert neighbours(graph, 10) == [20, 40]
+    assert neighbours(graph, 20) == [30, 50]
+    assert neighbours(graph, 50) == [20]
+    assert neighbours(graph, 40) == []
+    offsets = graph.csr()[0]
+    assert offsets[-1] == 6  # Five edges, one of them stored in both directions
+
+
+def test_csr_is_recompiled_after_changes(graph):
+    graph.remove_edges([4])
+    assert neighbours(graph, 10) == [20]
+    graph.upsert_edges([edge(4, 10, 30, 0.5)])
+    assert neighbours(graph, 10) == [20, 30]
+    graph.remove_nodes([20])
+    assert neighbours(graph, 10) == [30]
+    assert graph.edge_count == 2
+
+
+def test_neighborhood_distances(graph):
+    distances, edges = graph.neighborhood(10, hops=2)
+    assert distances == {10: 0, 20: 1, 40: 1, 30: 2, 50: 2}
+    assert {e["relationship_id"] for e in edges} == {1, 4, 2, 5}
+
+
+def test_neighborhood_filters(graph):
+    distances, _ = graph.neighborhood(10, hops=3, min_strength=0.5)
+    assert distances == {10: 0, 20: 1, 30: 2, 50: 2, 40: 3}
+    distances, _ = graph.neighborhood(20, hops=1, types=[RelationshipType.CAUSAL])
+    assert distances == {20: 0, 50: 1}
+
+
+def test_neighborhood_of_unknown_concept(graph):
+    assert graph.neighborhood(99) == ({99: 0}, [])
+
+
+def test_shortest_path_prefers_strong_edges(graph):
+    path = graph.shortest_path(10, 40)
+    assert path["concept_ids"] == [10, 20, 30, 40]
+    assert path["relationship_ids"] == [1, 2, 3]
+    assert path["strength"] == pytest.approx(0.9 ** 3)
+
+
+def test_shortest_path_within_hop_limit(graph):
+    path = graph.shortest_path(10, 40, max_hops=2)
+    assert path["concept_ids"] == [10, 40]
+    assert path["strength"] == pytest.approx(0.1)
+
+
+def test_shortest_path_follows_direction(graph):
+    assert graph.shortest_path(40, 10) is None
+    assert graph.shortest_path(50, 30)["concept_ids"] == [50, 20, 30]
+    assert graph.shortest_path(10, 99) is None
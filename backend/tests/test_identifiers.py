@@ -0,0 +1,50 @@
+import pytest
+
+from app.utils.identifiers import normalize_doi, normalize_isbn, normalize_url
+
+
+@pytest.mark.parametrize("url", [
+    "https://example.org/papers/radium",
+    "http://example.org/papers/radium",
+    "HTTPS://WWW.Example.org/papers/radium/",
+    "example.org/papers/radium",
+    "https://example.org:443/papers/radium",
+    "https://example.org/papers/radium#section-2",
+    "https://example.org/papers/radium?utm_source=news&fbclid=abc",
+])
+def test_variants_of_a_url_normalise_alike(url):
+    assert normalize_url(url) == "https://example.org/papers/radium"
+
+
+def test_query_is_sorted_and_kept():
+    assert normalize_url("https://example.org/search?q=curie&a=1&ref=feed") == "https://example.org/search?a=1&q=curie"
+
+
+def test_path_case_and_non_default_port_are_kept():
+    assert normalize_url("http://Example.org:8080/Papers") == "https://example.org:8080/Papers"
+
+
+@pytest.mark.parametrize("value", [None, "", "   "])
+def test_empty_values_normalise_to_none(value):
+    assert normalize_url(value) is None
+    assert normalize_doi(value) is None
+    assert normalize_isbn(value) is None
+
+
+@pytest.mark.parametrize("doi", ["10.1000/XYZ123", "doi: 10.1000/xyz123", "https://doi.org/10.1000/xyz123",
+                                 "http://dx.doi.org/10.1000/XYZ123"])
+def test_doi_resolver_prefixes_are_stripped(doi):
+    assert normalize_doi(doi) == "10.1000/xyz123"
+
+
+@pytest.mark.parametrize("isbn", ["978-0-306-40615-7", "9780306406157", "0-306-40615-2", "0306406152"])
+def test_isbn10_and_isbn13_normalise_to_isbn13(isbn):
+    assert normalize_isbn(isbn) == "9780306406157"
+
+
+def test_isbn10_with_x_check_digit():
+    assert normalize_isbn("0-8044-2957-X") == "9780804429573"
+
+
+def test_invalid_isbn_is_kept_as_typed():
+    assert normalize_isbn(" not-an-isbn ") == "not-an-isbn"
@@ -0,0 +1,149 @@
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.models import Source
+from app.models.job import IngestionJob, JobStatus
+from app.models.source import SourceType
+from app.services.ingestion import worker as worker_module
+from app.services.ingestion.queue import (
+    cancel_source_jobs, claim_jobs, complete_job, enqueue_source, fail_job, recover_abandoned,
+)
+from app.services.ingestion.worker import IngestionWorker
+
+# Above anything else in the shared test database, so these jobs are claimed first
+PRIORITY = 10_000
+
+
+@pytest.fixture
+def source(db, laboratory):
+    source = Source(title="Recherches sur les substances radioactives", source_type=SourceType.BOOK,
+                    laboratory_id=laboratory.id)
+    db.add(source)
+    db.commit()
+    yield source
+    cancel_source_jobs(db, source.id)  # Leave nothing claimable for the next test
+
+
+def claim(db, stage, source, limit=1):
+    job = enqueue_source(db, source.id, stage, priority=PRIORITY)
+    claimed = claim_jobs(db, stage, limit, "test-worker")
+    assert [payload["job_id"] for payload in claimed] == [job.id]
+    db.refresh(job)
+    return job, claimed[0]
+
+
+def finished(result=None, error=None) -> Future:
+    future = Future()
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+    return future
+
+
+def test_a_source_has_one_active_job(db, source):
+    job = enqueue_source(db, source.id, "extract", priority=PRIORITY)
+    assert enqueue_source(db, source.id, "chunk").id == job.id
+
+
+def test_claimed_jobs_are_not_claimed_again(db, source):
+    job, payload = claim(db, "summarise", source, limit=3)
+    assert job.status == JobStatus.RUNNING and job.attempts == 1
+    assert payload["source"]["id"] == source.id
+    assert claim_jobs(db, "summarise", 1, "other-worker") == []
+
+
+def test_completion_chains_the_next_stage(db, source):
+    job, _ = claim(db, "summarise", source)
+    following = complete_job(db, job.id)
+    db.commit()
+    assert job.status == JobStatus.SUCCEEDED
+    assert (following.stage, following.status, following.priority) == ("tag", JobStatus.PENDING, PRIORITY)
+
+    job, _ = claim(db, "tag", source)
+    assert complete_job(db, job.id) is None
+
+
+def test_failures_retry_with_backoff_then_give_up(db, source, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_RETRY_BACKOFF", 10)
+    job, _ = claim(db, "summarise", source)
+    job.max_attempts = 2
+    db.commit()
+
+    fail_job(db, job.id, "boom")
+    assert job.status == JobStatus.PENDING and job.error == "boom"
+    assert job.run_after > datetime.utcnow() + timedelta(seconds=5)
+    assert claim_jobs(db, "summarise", 1, "test-worker") == []  # Not before the backoff
+
+    job.run_after = None
+    db.commit()
+    assert claim_jobs(db, "summarise", 1, "test-worker")[0]["attempt"] == 2
+    fail_job(db, job.id, "boom again")
+    db.refresh(job)
+    assert job.status == JobStatus.FAILED and job.finished_at is not None
+
+
+def test_expired_leases_are_recovered(db, source):
+    job, _ = claim(db, "summarise", source)
+    assert recover_abandoned(db, lock_timeout=60) == 0
+
+    job.locked_at = datetime.utcnow() - timedelta(seconds=120)
+    db.commit()
+    assert recover_abandoned(db, lock_timeout=60) == 1
+    db.refresh(job)
+    assert job.status == JobStatus.PENDING and job.locked_by is None
+
+
+def test_finish_records_the_result(db, source):
+    job, payload = claim(db, "summarise", source)
+    IngestionWorker()._finish(payload, finished({"summary": "Polonium and radium."}))
+
+    db.expire_all()
+    assert job.status == JobStatus.SUCCEEDED
+    assert source.summary == "Polonium and radium."
+
+
+def test_finish_retries_a_failed_stage(db, source):
+    job, payload = claim(db, "summarise", source)
+    IngestionWorker()._finish(payload, finished(error=ValueError("unreadable")))
+
+    db.expire_all()
+    assert job.status == JobStatus.PENDING
+    assert "unreadable" in job.error
+
+
+def test_finish_fails_the_job_when_the_result_cannot_be_applied(db, source, monkeypatch):
+    def apply_result(db, stage, source_id, result):
+        db.get(Source, source_id).summary = "half written"
+        raise RuntimeError("disk full")
+
+    monkeypatch.setattr(worker_module, "apply_result", apply_result)
+    job, payload = claim(db, "summarise", source)
+    ingestion = IngestionWorker()
+    ingestion._running["summarise"] = 1
+    ingestion._finish(payload, finished({"summary": "Polonium and radium."}))
+
+    db.expire_all()
+    assert job.status == JobStatus.PENDING  # Retried rather than left RUNNING
+    assert "disk full" in job.error
+    assert source.summary is None  # The partial write was rolled back
+    assert db.query(IngestionJob).filter_by(source_id=source.id, stage="tag").count() == 0
+    assert ingestion._running["summarise"] == 0
+
+
+def test_dispatcher_sweeps_abandoned_jobs_while_running(db, source, monkeypatch):
+    monkeypatch.setattr(settings, "INGESTION_RECOVER_INTERVAL", 0)
+    monkeypatch.setattr(settings, "INGESTION_LOCK_TIMEOUT", 60)
+    job, _ = claim(db, "summarise", source)
+    job.locked_at = datetime.utcnow() - timedelta(seconds=120)
+    db.commit()
+
+    ingestion = IngestionWorker()
+    monkeypatch.setattr(ingestion, "_dispatch_once", ingestion._stop.set)
+    ingestion._dispatch_loop()
+
+    db.refresh(job)
+    assert job.status == JobStatus.PENDING
@@ -0,0 +1,76 @@
+from sqlalchemy import update
+
+from app.models import Concept, Laboratory, NotebookEntry, Source
+from app.models.notebook import EntryType
+from app.models.source import SourceType
+from app.services.lab_stats import reconcile_laboratory_stats
+
+
+def counters(db, laboratory):
+    db.refresh(laboratory)
+    return laboratory.concept_count, laboratory.source_count, laboratory.study_hours
+
+
+def test_counters_follow_inserts_updates_and_deletes(db, laboratory):
+    concepts = [Concept(title=f"Concept {i}", content="content", laboratory_id=laboratory.id) for i in range(3)]
+    source = Source(title="Radioactive Substances", source_type=SourceType.BOOK, laboratory_id=laboratory.id)
+    entry = NotebookEntry(title="Session", content="notes", entry_type=EntryType.NOTE,
+                          laboratory_id=laboratory.id, time_spent=25)
+    db.add_all([*concepts, source, entry])
+    db.commit()
+    assert counters(db, laboratory) == (3, 1, 25)
+
+    concepts[0].is_active = False
+    source.is_archived = True
+    entry.time_spent = 40
+    db.delete(concepts[1])
+    db.commit()
+    assert counters(db, laboratory) == (1, 0, 40)
+
+
+def test_moving_a_concept_moves_its_count(db, laboratory):
+    other = Laboratory(name=f"{laboratory.name}-other")
+    concept = Concept(title="Polonium", content="content", laboratory_id=laboratory.id)
+    db.add_all([other, concept])
+    db.commit()
+
+    concept.laboratory_id = other.id
+    db.commit()
+    assert counters(db, laboratory)[0] == 0
+    assert counters(db, other)[0] == 1
+
+
+def test_rolled_back_changes_leave_the_counters(db, laboratory):
+    db.add(Concept(title="Radium", content="content", laboratory_id=laboratory.id))
+    db.flush()
+    db.rollback()
+    assert counters(db, laboratory)[0] == 0
+
+
+def test_reconcile_fixes_drift_from_bulk_statements(db, laboratory):
+    db.add_all(Concept(title=f"Concept {i}", content="content", laboratory_id=laboratory.id) for i in range(2))
+    db.add(NotebookEntry(title="Session", content="notes", entry_type=EntryType.NOTE,
+                         laboratory_id=laboratory.id, time_spent=15))
+    db.commit()
+    reconcile_laboratory_stats(db)  # Other tests' bulk inserts may have drifted too
+
+    # Bulk SQL bypasses the mapper events
+    db.execute(update(Concept).where(Concept.laboratory_id == laboratory.id).values(is_active=False))
+    db.execute(update(Laboratory).where(Laboratory.id == laboratory.id).values(study_hours=None))
+    db.commit()
+    assert counters(db, laboratory) == (2, 0, None)
+
+    assert reconcile_laboratory_stats(db) == 1
+    assert counters(db, laboratory) == (0, 0, 15)
+    assert reconcile_laboratory_stats(db) == 0
+
+
+def test_reconciled_counters_reach_cached_responses(client, db, laboratory):
+    db.add(Concept(title="Radium", content="content", laboratory_id=laboratory.id))
+    db.commit()
+    db.execute(update(Laboratory).where(Laboratory.id == laboratory.id).values(concept_count=7))
+    db.commit()
+    assert client.get(f"/api/v1/laboratories/{laboratory.id}").json()["concept_count"] == 7
+
+    reconcile_laboratory_stats(db)
+    assert client.get(f"/api/v1/laboratories/{laboratory.id}").json()["concept_count"] == 1
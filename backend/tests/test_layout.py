@@ -0,0 +1,118 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.models import Concept
+from app.models.relationships import ConceptRelationship, RelationshipType
+from app.services.graph import graph_store
+from app.services.layout import detail_levels, layout_store
+
+BUDGET = 4
+
+
+def test_tiles_never_carry_more_than_the_budget():
+    rng = np.random.default_rng(3)
+    unit = rng.uniform(0.0, 1.0, (500, 2))
+    priority = rng.uniform(0.0, 1.0, 500)
+    levels = detail_levels(unit, priority, BUDGET, max_zoom=8)
+
+    assert levels[priority.argmax()] == 0
+    assert (levels == 0).sum() == BUDGET
+    for zoom in range(8):
+        scale = 1 << zoom
+        tiles = np.minimum((unit * scale).astype(np.int64), scale - 1)
+        visible = levels <= zoom
+        _, per_tile = np.unique(tiles[visible, 0] * scale + tiles[visible, 1], return_counts=True)
+        assert per_tile.max() <= BUDGET
+
+
+def test_small_maps_show_everything_at_zoom_zero():
+    unit = np.random.default_rng(0).uniform(0.0, 1.0, (BUDGET, 2))
+    assert detail_levels(unit, np.zeros(BUDGET), BUDGET, max_zoom=8).tolist() == [0] * BUDGET
+
+
+@pytest.fixture
+def small_tiles(monkeypatch):
+    monkeypatch.setattr(settings, "LAYOUT_TILE_NODES", BUDGET)
+    monkeypatch.setattr(settings, "LAYOUT_ITERATIONS", 30)
+
+
+@pytest.fixture
+def mapped(db, laboratory, small_tiles):
+    """A laboratory of 40 linked concepts and its layout."""
+    rng = np.random.default_rng(5)
+    concepts = [Concept(title=f"Concept {i}", content="content", laboratory_id=laboratory.id,
+                        importance_score=float(rng.uniform())) for i in range(40)]
+    db.add_all(concepts)
+    db.flush()
+    pairs = [(i, (i + 1) % 40) for i in range(40)] + [tuple(rng.choice(40, 2, replace=False)) for _ in range(20)]
+    db.add_all(ConceptRelationship(source_concept_id=concepts[a].id, target_concept_id=concepts[b].id,
+                                   relationship_type=RelationshipType.SEMANTIC) for a, b in pairs)
+    db.commit()
+    return concepts, layout_store.compute(db, laboratory.id)
+
+
+def tiles(layout, graph, zoom):
+    return [layout.tile(graph, zoom, x, y) for x in range(1 << zoom) for y in range(1 << zoom)]
+
+
+def test_tiles_partition_the_nodes_at_every_zoom(db, laboratory, mapped):
+    concepts, layout = mapped
+    graph = graph_store.get(db, laboratory.id)
+    assert ((layout.unit >= 0) & (layout.unit <= 1)).all()
+
+    for zoom in range(4):
+        shown, hidden = [], 0
+        for tile in tiles(layout, graph, zoom):
+            assert len(tile["nodes"]) <= BUDGET
+            assert all(node["level"] <= zoom for node in tile["nodes"] + tile["neighbours"])
+            ends = {node["id"] for node in tile["nodes"] + tile["neighbours"]}
+            assert all({edge["source_id"], edge["target_id"]} <= ends for edge in tile["edges"])
+            shown += [node["id"] for node in tile["nodes"]]
+            hidden += sum(cluster["count"] for cluster in tile["clusters"])
+        assert len(shown) == len(set(shown)) == (layout.levels <= zoom).sum()
+        assert len(shown) + hidden == len(concepts)
+
+    deepest = {node["id"] for tile in tiles(layout, graph, int(layout.levels.max())) for node in tile["nodes"]}
+    assert deepest == {concept.id for concept in concepts}
+
+
+def test_new_concepts_are_placed_without_moving_the_others(db, laboratory, mapped):
+    concepts, layout = mapped
+    before = dict(zip(layout.concept_ids.tolist(), layout.positions.tolist()))
+    version = layout.version
+
+    new = Concept(title="Concept 40", content="content", laboratory_id=laboratory.id, importance_score=0.5)
+    db.add(new)
+    db.flush()
+    db.add(ConceptRelationship(source_concept_id=concepts[0].id, target_concept_id=new.id,
+                               relationship_type=RelationshipType.SEMANTIC))
+    db.commit()
+
+    layout = layout_store.get(db, laboratory.id)
+    assert (layout.incremental_nodes, layout.version) == (1, version + 1)
+    assert new.id in layout.concept_ids
+    after = dict(zip(layout.concept_ids.tolist(), layout.positions.tolist()))
+    assert all(after[concept_id] == position for concept_id, position in before.items())
+
+
+def test_adding_many_concepts_lays_the_map_out_again(db, laboratory, mapped, monkeypatch):
+    monkeypatch.setattr(settings, "LAYOUT_RELAYOUT_FRACTION", 0.1)
+    db.add_all(Concept(title=f"Late {i}", content="content", laboratory_id=laboratory.id) for i in range(5))
+    db.commit()
+    layout = layout_store.get(db, laboratory.id)
+    assert layout is not mapped[1]
+    assert (len(layout.concept_ids), layout.incremental_nodes) == (45, 0)
+
+
+@pytest.mark.parametrize("zoom, x, y, status", [
+    (0, 0, 0, 200),
+    (2, 3, 3, 200),
+    (2, 4, 0, 404),
+    (2, 0, -1, 404),
+    (-1, 0, 0, 400),
+    (settings.LAYOUT_MAX_ZOOM + 1, 0, 0, 400),
+])
+def test_tile_coordinates_are_checked(client, laboratory, small_tiles, zoom, x, y, status):
+    response = client.get(f"/api/v1/graph/{laboratory.id}/layout/tiles/{zoom}/{x}/{y}")
+    assert response.status_code == status
@@ -0,0 +1,181 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import httpx
+import pytest
+import pytest_asyncio
+
+from app.core.config import settings
+from app.services.llm import LLMScheduler, LLMUnavailable, Priority, _ModelLane, route
+
+pytestmark = pytest.mark.asyncio
+
+
+class StubOllama:
+    """``POST /api/generate`` handler; a prompt's answer waits until it is released."""
+
+    def __init__(self, hold: bool = False, status_code: int = 200):
+        self.hold = hold
+        self.status_code = status_code
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+        self._gates = {}
+
+    def gate(self, prompt: str) -> asyncio.Event:
+        return self._gates.setdefault(prompt, asyncio.Event())
+
+    def release(self, prompt: str):
+        self.gate(prompt).set()
+
+    def release_all(self):
+        self.hold = False
+        for gate in self._gates.values():
+            gate.set()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        payload = json.loads(request.content)
+        self.prompts.append(payload["prompt"])
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            if self.hold:
+                await self.gate(payload["prompt"]).wait()
+            return httpx.Response(self.status_code, json={"response": f"answer to {payload['prompt']}"})
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def stub():
+    return StubOllama()
+
+
+@pytest_asyncio.fixture
+async def scheduler(stub):
+    scheduler = LLMScheduler(base_url="http://ollama.test", transport=httpx.MockTransport(stub))
+    yield scheduler
+    await scheduler.close()
+
+
+async def settle():
+    # Let every ready task run up to its next wait
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+async def test_answers_are_cached(scheduler, stub):
+    assert await scheduler.generate("radium", model="m") == "answer to radium"
+    assert await scheduler.generate("radium", model="m") == "answer to radium"
+    assert stub.prompts == ["radium"]
+    assert scheduler.stats["cache_hits"] == 1
+
+
+async def test_cache_evicts_least_recently_used(scheduler, stub, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_CACHE_SIZE", 2)
+    for prompt in ("a", "b", "a", "c"):  # "a" is used again, so "b" is the oldest
+        await scheduler.generate(prompt, model="m")
+    await scheduler.generate("a", model="m")
+    await scheduler.generate("b", model="m")
+    assert stub.prompts == ["a", "b", "c", "b"]
+
+
+async def test_identical_requests_in_flight_share_one_call(scheduler, stub):
+    stub.hold = True
+    calls = [asyncio.create_task(scheduler.generate("radium", model="m")) for _ in range(3)]
+    await settle()
+    stub.release("radium")
+    assert await asyncio.gather(*calls) == ["answer to radium"] * 3
+    assert stub.prompts == ["radium"]
+    assert scheduler.stats["coalesced"] == 2
+
+
+async def test_model_slots_bound_parallel_calls(scheduler, stub, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MODEL_CONCURRENCY", {"small": 2})
+    stub.hold = True
+    calls = [asyncio.create_task(scheduler.generate(f"p{i}", model="small")) for i in range(5)]
+    other = asyncio.create_task(scheduler.generate("other", model="large"))
+    await settle()
+    assert stub.active == 3  # Two "small" slots plus the other model's lane
+    assert scheduler.status()["models"]["small"] == {"limit": 2, "active": 2, "waiting": 3}
+
+    stub.release_all()
+    await asyncio.gather(*calls, other)
+    assert stub.peak == 3
+    assert scheduler.status()["models"]["small"]["active"] == 0
+
+
+async def test_waiters_are_served_by_priority_then_arrival(scheduler, stub, monkeypatch):
+    monkeypatch.setattr(settings, "LLM_MODEL_CONCURRENCY", {"m": 1})
+    stub.hold = True
+    first = asyncio.create_task(scheduler.generate("first", model="m"))
+    await settle()
+    queued = []
+    for prompt, priority in [("batch 1", Priority.BACKGROUND), ("batch 2", Priority.BACKGROUND),
+                             ("user", Priority.INTERACTIVE)]:
+        queued.append(asyncio.create_task(scheduler.generate(prompt, model="m", priority=priority)))
+        await settle()
+
+    stub.release_all()
+    await asyncio.gather(first, *queued)
+    assert stub.prompts == ["first", "user", "batch 1", "batch 2"]
+
+
+async def test_errors_reach_every_waiter_and_are_not_cached(scheduler, stub):
+    stub.hold, stub.status_code = True, 500
+    calls = [asyncio.create_task(scheduler.generate("radium", model="m")) for _ in range(2)]
+    await settle()
+    stub.release_all()
+    results = await asyncio.gather(*calls, return_exceptions=True)
+    assert all(isinstance(result, LLMUnavailable) for result in results)
+
+    stub.status_code = 200
+    assert await scheduler.generate("radium", model="m") == "answer to radium"
+    assert len(stub.prompts) == 2
+
+
+async def test_unreachable_server():
+    def refuse(request):
+        raise httpx.ConnectError("connection refused", request=request)
+
+    scheduler = LLMScheduler(base_url="http://ollama.test", transport=httpx.MockTransport(refuse))
+    with pytest.raises(LLMUnavailable):
+        await scheduler.generate("radium", model="m")
+    assert scheduler._lane("m").active == 0
+    await scheduler.close()
+
+
+async def test_cancelled_waiter_gives_back_a_handed_over_slot():
+    lane = _ModelLane(1)
+    await lane.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(lane.acquire(Priority.BACKGROUND))
+    await settle()
+
+    lane.release()  # The slot passes to the waiter...
+    waiter.cancel()  # ...which is cancelled before it runs
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+    assert lane.active == 0
+    await asyncio.wait_for(lane.acquire(Priority.INTERACTIVE), timeout=1)
+
+
+async def test_cancelled_waiter_leaves_the_queue():
+    lane = _ModelLane(1)
+    await lane.acquire(Priority.INTERACTIVE)
+    waiter = asyncio.create_task(lane.acquire(Priority.BACKGROUND))
+    await settle()
+    waiter.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await waiter
+
+    assert lane.waiting == 0
+    lane.release()
+    assert lane.active == 0
+
+
+async def test_route_honours_laboratory_models():
+    laboratory = SimpleNamespace(lightweight_model="tiny", deep_model=None)
+    assert route("concept_summary", laboratory) == "tiny"
+    assert route("source_summary", laboratory) == settings.DEEP_MODEL
+    assert route("unknown task") == settings.DEEP_MODEL
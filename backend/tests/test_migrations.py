@@ -0,0 +1,79 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import LargeBinary, create_engine, inspect, text
+
+from app.core.config import settings
+from app.core.migrations import _migrate_sqlite_vectors, _migrate_vector_column_type, migrate_embedding_vectors
+from app.utils.vectors import unpack_vector
+
+VECTORS = {
+    1: (1, [0.25, -1.5, 3.0]),
+    2: (1, [1e-3, 2.0, 0.1]),
+    3: (2, []),  # Empty and unparseable values are cleared
+    4: (2, "not json"),
+}
+
+
+@pytest.fixture
+def legacy_database(tmp_path):
+    """A concepts table as written before embeddings were stored as blobs."""
+    engine = create_engine(f"sqlite:///{tmp_path}/legacy.db")
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TABLE concepts (id INTEGER PRIMARY KEY, laboratory_id INTEGER, "
+            "embedding_vector TEXT, embedding_dim INTEGER, embedding_model VARCHAR(200))"
+        ))
+        connection.execute(
+            text("INSERT INTO concepts (id, laboratory_id, embedding_vector) VALUES (:id, :lab, :vector)"),
+            [
+                {"id": concept_id, "lab": lab, "vector": vector if isinstance(vector, str) else json.dumps(vector)}
+                for concept_id, (lab, vector) in VECTORS.items()
+            ],
+        )
+        connection.execute(text("UPDATE concepts SET embedding_model = 'older-model' WHERE id = 2"))
+    yield engine
+    engine.dispose()
+
+
+def stored(engine) -> dict:
+    with engine.connect() as connection:
+        rows = connection.execute(
+            text("SELECT id, embedding_vector, embedding_dim, embedding_model FROM concepts ORDER BY id")
+        ).fetchall()
+    return {row.id: row for row in rows}
+
+
+@pytest.mark.parametrize("migrate", [_migrate_sqlite_vectors, _migrate_vector_column_type])
+def test_json_vectors_round_trip_as_blobs(legacy_database, migrate):
+    with legacy_database.begin() as connection:
+        laboratory_ids, migrated = migrate(connection, "current-model", batch_size=3)
+    assert (laboratory_ids, migrated) == ({1}, 4)
+
+    rows = stored(legacy_database)
+    for concept_id in (1, 2):
+        expected = np.asarray(VECTORS[concept_id][1], dtype=np.float32)
+        row = rows[concept_id]
+        assert row.embedding_dim == len(expected)
+        np.testing.assert_array_equal(unpack_vector(row.embedding_vector, row.embedding_dim), expected)
+    assert rows[1].embedding_model == "current-model"
+    assert rows[2].embedding_model == "older-model"  # A recorded model is kept
+    assert all(rows[i].embedding_vector is None and rows[i].embedding_model is None for i in (3, 4))
+
+    with legacy_database.begin() as connection:
+        assert migrate(connection, "current-model", batch_size=3) == (set(), 0)
+
+
+def test_column_type_becomes_binary(legacy_database):
+    with legacy_database.begin() as connection:
+        _migrate_vector_column_type(connection, "current-model", batch_size=500)
+        columns = {column["name"]: column["type"] for column in inspect(connection).get_columns("concepts")}
+    assert isinstance(columns["embedding_vector"], LargeBinary)
+    assert "embedding_blob" not in columns
+
+
+def test_startup_migration_records_the_configured_model(legacy_database):
+    with legacy_database.begin() as connection:
+        assert migrate_embedding_vectors(connection) == {1}
+    assert stored(legacy_database)[1].embedding_model == settings.EMBEDDING_MODEL
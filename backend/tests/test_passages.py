@@ -0,0 +1,76 @@
+import random
+
+import pytest
+
+from app.core.config import settings
+from app.services.ingestion import stages
+from app.services.ingestion.stages import chunk, read_chunks
+from app.services.passages import read_passage
+
+WORDS = ["radium", "polonium", "pitchblende", "electrometer", "isotope", "Curie,", "décroissance", "a", "[x]"]
+
+
+def no_report(*args):
+    pass
+
+
+@pytest.fixture(autouse=True)
+def chunk_settings(monkeypatch):
+    # The WordPiece estimate: token counts do not depend on installed models
+    monkeypatch.setattr(stages, "_tokenizer", False)
+    monkeypatch.setattr(settings, "CHUNK_SIZE_TOKENS", 20)
+    monkeypatch.setattr(settings, "CHUNK_OVERLAP_TOKENS", 5)
+
+
+def write_text(work_dir, pages):
+    (work_dir / "text.txt").write_bytes("\f".join(pages).encode("utf-8"))
+
+
+def random_pages(count, words, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(WORDS) for _ in range(words)) for _ in range(count)]
+
+
+def test_anchors_point_at_the_chunk_text(tmp_path):
+    write_text(tmp_path, random_pages(3, 80))
+    chunk({}, tmp_path, no_report)
+
+    for record in read_chunks(tmp_path):
+        passage = read_passage(tmp_path, record["byte_start"], record["byte_end"])
+        assert " ".join(passage.split()) == record["text"]
+
+
+def test_windows_respect_the_budget_and_overlap(tmp_path):
+    write_text(tmp_path, random_pages(1, 300))
+    chunk({}, tmp_path, no_report)
+    chunks = read_chunks(tmp_path)
+
+    assert len(chunks) > 1
+    assert [c["index"] for c in chunks] == list(range(len(chunks)))
+    assert all(c["token_count"] <= settings.CHUNK_SIZE_TOKENS for c in chunks)
+    for previous, following in zip(chunks, chunks[1:]):
+        assert previous["byte_start"] < following["byte_start"] < previous["byte_end"]
+    text = (tmp_path / "text.txt").read_bytes()
+    assert chunks[0]["byte_start"] == 0
+    assert chunks[-1]["byte_end"] == len(text)
+
+
+def test_word_longer_than_the_budget_gets_its_own_chunk(tmp_path):
+    write_text(tmp_path, ["short " + "x" * 200 + " tail"])
+    chunk({}, tmp_path, no_report)
+    assert [c["text"] for c in read_chunks(tmp_path)] == ["short", "x" * 200, "tail"]
+
+
+def test_pages_and_timestamps(tmp_path):
+    write_text(tmp_path, ["[0s] intro " + "radium " * 30, "[754s] " + "polonium " * 30])
+    chunk({}, tmp_path, no_report)
+    chunks = read_chunks(tmp_path)
+
+    assert chunks[0]["page"] == 1 and chunks[0]["start_seconds"] == 0
+    assert chunks[-1]["page"] == 2 and chunks[-1]["start_seconds"] == 754
+
+
+def test_single_page_text_has_no_page_numbers(tmp_path):
+    write_text(tmp_path, random_pages(1, 100))
+    chunk({}, tmp_path, no_report)
+    assert {c["page"] for c in read_chunks(tmp_path)} == {None}
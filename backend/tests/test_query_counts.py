@@ -0,0 +1,94 @@
+"""
+N+1 checks for the list and detail endpoints: every endpoint is called for
+a small and a large laboratory, and must issue the same number of queries
+for both, within its budget.
+"""
+
+import pytest
+
+from app.core.config import settings
+from app.core.query_counter import count_queries
+
+# endpoint template -> maximum number of queries
+ENDPOINTS = {
+    "/api/v1/laboratories/": 1,
+    "/api/v1/laboratories/{lab}/tags": 2,
+    "/api/v1/concepts/?laboratory_id={lab}&limit=200": 2,
+    "/api/v1/concepts/?laboratory_id={lab}&limit=200&sort=importance&fields=id,title,mastery_level": 1,
+    "/api/v1/concepts/{concept}": 4,
+    "/api/v1/sources/?laboratory_id={lab}&limit=200": 1,
+    "/api/v1/sources/{source}": 1,
+    "/api/v1/notebook/?laboratory_id={lab}&limit=200": 1,
+    "/api/v1/notebook/?laboratory_id={lab}&limit=200&fields=title,entry_type": 1,
+}
+
+SIZES = {"small": 5, "large": 60}
+
+
+def seed(db, name: str, size: int) -> dict:
+    """A laboratory with ``size`` tagged concepts, relationships and notebook entries."""
+    from app.models import Concept, ConceptRelationship, Laboratory, NotebookEntry, Source, Tag
+    from app.models.notebook import EntryType
+    from app.models.relationships import RelationshipType
+    from app.models.source import SourceType
+
+    laboratory = Laboratory(name=name)
+    db.add(laboratory)
+    db.flush()
+
+    parent = Tag(name=f"{name}-root", laboratory_id=laboratory.id)
+    tags = [Tag(name=f"{name}-tag-{i}", laboratory_id=laboratory.id, parent=parent) for i in range(size)]
+    source = Source(title=f"{name} source", source_type=SourceType.BOOK, laboratory_id=laboratory.id)
+    db.add_all([parent, source, *tags])
+    db.flush()
+
+    concepts = [
+        Concept(
+            title=f"{name} concept {i}", content="content", laboratory_id=laboratory.id,
+            source_id=source.id, tags=[tags[i], tags[(i + 1) % size]],
+        )
+        for i in range(size)
+    ]
+    db.add_all(concepts)
+    db.flush()
+    db.add_all(
+        ConceptRelationship(
+            source_concept_id=concepts[i].id, target_concept_id=concepts[(i + 1) % size].id,
+            relationship_type=RelationshipType.SEMANTIC,
+        )
+        for i in range(size)
+    )
+    db.add_all(
+        NotebookEntry(title=f"entry {i}", content="notes", entry_type=EntryType.NOTE, laboratory_id=laboratory.id)
+        for i in range(size)
+    )
+    db.commit()
+    return {"lab": laboratory.id, "concept": concepts[0].id, "source": source.id}
+
+
+@pytest.fixture(scope="module")
+def laboratories(client):
+    from app.core.database import SessionLocal
+
+    with SessionLocal() as db:
+        return {size: seed(db, f"queries-{size}", count) for size, count in SIZES.items()}
+
+
+@pytest.fixture
+def uncached(monkeypatch):
+    # Count the queries, not the response cache
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+
+
+@pytest.mark.usefixtures("uncached")
+@pytest.mark.parametrize("template, budget", ENDPOINTS.items())
+def test_query_count_is_constant(client, laboratories, template, budget):
+    counts = {}
+    for size, ids in laboratories.items():
+        with count_queries() as statements:
+            response = client.get(template.format(**ids))
+        assert response.status_code == 200, response.text
+        counts[size] = len(statements)
+
+    assert counts["small"] == counts["large"], f"query count grows with rows: {counts}"
+    assert counts["large"] <= budget, f"{counts['large']} queries, budget {budget}"
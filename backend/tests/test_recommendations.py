@@ -0,0 +1,157 @@
+import random
+
+import pytest
+from sqlalchemy import update
+
+from app.models import Concept
+from app.models.relationships import ConceptRelationship, RelationshipType
+from app.services.recommendations import (
+    LaboratoryFrontier, RecommendationStore, recommendation_store, update_mastery_on_commit,
+)
+
+
+def scores(frontier: LaboratoryFrontier) -> dict:
+    return {concept_id: pytest.approx(score) for concept_id, score in frontier.top(len(frontier.mastery))}
+
+
+def test_scores_follow_the_formula():
+    frontier = LaboratoryFrontier(1)
+    for concept_id, mastery_level in [(1, 3), (2, 0), (3, 0), (4, 0)]:
+        frontier.set_concept(concept_id, mastery_level, 0.0)
+    frontier.set_edge(10, 1, 2, 1.0, 0.5, RelationshipType.SEMANTIC)
+    frontier.set_edge(11, 1, 3, 1.0, 1.0, RelationshipType.SEMANTIC)
+    frontier.set_edge(12, 4, 3, 1.0, 1.0, RelationshipType.HIERARCHICAL)  # 4 is a prerequisite of 3
+    assert frontier.top(5) == [(2, pytest.approx(0.5))]  # 3 is not ready yet
+
+    frontier.set_concept(4, 3, 0.0)
+    assert frontier.top(5) == [(3, pytest.approx(2.0)), (2, pytest.approx(0.5))]
+    assert frontier.explain(3)["prerequisite_readiness"] == 1.0
+
+    frontier.set_concept(2, 1, 1.0)  # A third learned, and important
+    assert frontier.top(5) == [(3, pytest.approx(2.0)), (2, pytest.approx(0.5 * (2 / 3) * 2))]
+    frontier.remove_edge(11)
+    assert dict(frontier.top(5))[3] == pytest.approx(1.0)
+    frontier.remove_concept(4)
+    assert frontier.top(5) == [(2, pytest.approx(0.5 * (2 / 3) * 2))]
+
+
+def test_random_updates_match_a_rebuild():
+    rng = random.Random(7)
+    concepts = {concept_id: (rng.randint(0, 3), rng.random()) for concept_id in range(1, 41)}
+    edges = {}
+    frontier = LaboratoryFrontier(1)
+    for concept_id, (mastery_level, importance) in concepts.items():
+        frontier.set_concept(concept_id, mastery_level, importance)
+
+    for step in range(600):
+        action = rng.random()
+        if action < 0.4:
+            edge = (rng.choice(list(concepts)), rng.choice(list(concepts)), rng.random(), rng.random(),
+                    rng.choice(list(RelationshipType)))
+            relationship_id = rng.randint(1, 80)
+            edges[relationship_id] = edge
+            frontier.set_edge(relationship_id, *edge)
+        elif action < 0.55 and edges:
+            relationship_id = rng.choice(list(edges))
+            del edges[relationship_id]
+            frontier.remove_edge(relationship_id)
+        elif action < 0.95:
+            concept_id = rng.choice(list(concepts))
+            concepts[concept_id] = (rng.randint(0, 3), concepts[concept_id][1])
+            frontier.set_concept(concept_id, *concepts[concept_id])
+        else:
+            concept_id = rng.choice(list(concepts))
+            del concepts[concept_id]
+            edges = {r: e for r, e in edges.items() if concept_id not in e[:2]}
+            frontier.remove_concept(concept_id)
+
+        if step % 50 == 0:
+            rebuilt = LaboratoryFrontier(1)
+            for concept_id, (mastery_level, importance) in concepts.items():
+                rebuilt.set_concept(concept_id, mastery_level, importance, rescore=False)
+            for relationship_id, edge in edges.items():
+                rebuilt.set_edge(relationship_id, *edge, rescore=False)
+            rebuilt.rescore_all()
+            assert scores(frontier) == scores(rebuilt)
+            assert [c for c, _ in frontier.top(5)] == [c for c, _ in rebuilt.top(5)]
+
+
+@pytest.fixture
+def graph(db, laboratory):
+    """A learned concept with prerequisites and neighbours, and the laboratory's loaded frontier."""
+    concepts = [Concept(title=f"Concept {i}", content="content", laboratory_id=laboratory.id,
+                        mastery_level=level, importance_score=0.1 * i)
+                for i, level in enumerate([3, 2, 0, 0, 1, 0])]
+    db.add_all(concepts)
+    db.flush()
+    links = [
+        ConceptRelationship(source_concept_id=concepts[source].id, target_concept_id=concepts[target].id,
+                            relationship_type=relationship_type, strength=0.8, confidence=0.9)
+        for source, target, relationship_type in [
+            (0, 2, RelationshipType.SEMANTIC), (1, 2, RelationshipType.HIERARCHICAL),
+            (3, 0, RelationshipType.CAUSAL), (4, 5, RelationshipType.HIERARCHICAL), (0, 5, RelationshipType.SEMANTIC),
+        ]
+    ]
+    db.add_all(links)
+    db.commit()
+    recommendation_store.invalidate(laboratory.id)
+    return concepts, links, recommendation_store.get(db, laboratory.id)
+
+
+def assert_matches_a_full_load(db, laboratory, frontier):
+    assert recommendation_store.get(db, laboratory.id) is frontier  # Patched, not reloaded
+    loaded = RecommendationStore().load(db, laboratory.id)
+    assert scores(frontier) == scores(loaded)
+    assert frontier.top(3) == [(c, pytest.approx(s)) for c, s in loaded.top(3)]
+
+
+def test_mastery_changes_patch_the_loaded_frontier(db, laboratory, graph):
+    concepts, _, frontier = graph
+    before = dict(frontier.top(6))
+    concepts[1].mastery_level = 3  # Its HIERARCHICAL child becomes ready
+    concepts[3].mastery_level = 2
+    db.commit()
+    assert dict(frontier.top(6)) != before
+    assert_matches_a_full_load(db, laboratory, frontier)
+
+    # Bulk UPDATEs bypass the commit hooks and are reported explicitly
+    db.execute(update(Concept).where(Concept.id == concepts[4].id).values(mastery_level=3))
+    update_mastery_on_commit(db, {concepts[4].id: (laboratory.id, 3)})
+    db.commit()
+    assert_matches_a_full_load(db, laboratory, frontier)
+
+
+def test_rolled_back_mastery_changes_are_not_applied(db, laboratory, graph):
+    concepts, _, frontier = graph
+    before = scores(frontier)
+    db.execute(update(Concept).where(Concept.id == concepts[2].id).values(mastery_level=3))
+    update_mastery_on_commit(db, {concepts[2].id: (laboratory.id, 3)})
+    db.rollback()
+    assert scores(frontier) == before
+    assert_matches_a_full_load(db, laboratory, frontier)
+
+
+def test_edge_changes_patch_the_loaded_frontier(db, laboratory, graph):
+    concepts, links, frontier = graph
+    links[0].strength = 0.2
+    links[3].is_active = False
+    db.delete(links[4])
+    db.add(ConceptRelationship(source_concept_id=concepts[1].id, target_concept_id=concepts[3].id,
+                               relationship_type=RelationshipType.SEMANTIC, strength=1.0, confidence=1.0))
+    db.commit()
+    assert_matches_a_full_load(db, laboratory, frontier)
+
+
+def test_concept_changes_patch_the_loaded_frontier(db, laboratory, graph):
+    concepts, _, frontier = graph
+    concepts[0].is_active = False  # Takes its edges along
+    concepts[5].importance_score = 0.9
+    new = Concept(title="Concept 6", content="content", laboratory_id=laboratory.id, mastery_level=0)
+    db.add(new)
+    db.flush()
+    db.add(ConceptRelationship(source_concept_id=concepts[1].id, target_concept_id=new.id,
+                               relationship_type=RelationshipType.SEMANTIC))
+    db.commit()
+    assert concepts[0].id not in frontier
+    assert new.id in dict(frontier.top(7))
+    assert_matches_a_full_load(db, laboratory, frontier)
@@ -0,0 +1,145 @@
+import pytest
+from sqlalchemy import select
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import Concept, DirtyRecord, Source
+from app.models.source import SourceType
+from app.services import ingestion
+from app.services.embeddings import embedding_service
+from app.services.reindex import ReindexWorker
+
+
+def dirty(db, entity, entity_id):
+    db.expire_all()
+    return db.scalar(select(DirtyRecord).where(DirtyRecord.entity == entity, DirtyRecord.entity_id == entity_id))
+
+
+def add_concept(db, laboratory) -> Concept:
+    # Text of its own, so the shared embedding caches do not answer for the model
+    concept = Concept(title="Radium", content=f"Element 88 in {laboratory.name}", laboratory_id=laboratory.id)
+    db.add(concept)
+    db.commit()
+    return concept
+
+
+class FakeModel:
+    def __init__(self, on_encode=None):
+        self.on_encode = on_encode
+        self.texts = []
+
+    def encode(self, texts, **kwargs):
+        self.texts.extend(texts)
+        if self.on_encode is not None:
+            self.on_encode()
+        return [[float(len(text)), 1.0, 0.0] for text in texts]
+
+
+@pytest.fixture
+def worker(monkeypatch):
+    """A worker embedding with a fake model, recording the sources it re-queues."""
+    monkeypatch.setattr(settings, "REINDEX_BATCH_PAUSE", 0)
+    monkeypatch.setattr(settings, "RELATIONSHIP_SUGGESTIONS_ENABLED", False)
+    monkeypatch.setattr(embedding_service, "_model", FakeModel())
+    queued = []
+    monkeypatch.setattr(ingestion, "enqueue_source", lambda db, source_id, **options: queued.append(source_id))
+    worker = ReindexWorker()
+    worker.queued = queued
+    return worker
+
+
+def test_text_changes_mark_the_concept(db, laboratory):
+    concept = add_concept(db, laboratory)
+    record = dirty(db, "concept", concept.id)
+    assert record.reason == "insert"
+    marked_at = record.marked_at
+
+    concept.importance_score = 0.9
+    db.commit()
+    assert dirty(db, "concept", concept.id).marked_at == marked_at  # Not indexed text
+
+    concept.summary = "Discovered in 1898"
+    db.commit()
+    assert dirty(db, "concept", concept.id).marked_at > marked_at
+    assert db.query(DirtyRecord).filter_by(entity="concept", entity_id=concept.id).count() == 1
+
+
+def test_concepts_embedded_by_their_writer_are_not_marked(db, laboratory):
+    concept = Concept(title="Radium", content="Element 88", laboratory_id=laboratory.id)
+    concept.set_embedding([0.1, 0.2, 0.3], settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+    db.add(concept)
+    db.commit()
+    assert dirty(db, "concept", concept.id) is None
+
+    concept.title = "Radium (Ra)"
+    concept.set_embedding([0.3, 0.2, 0.1], "another-model", settings.EMBEDDING_VERSION)
+    db.commit()
+    assert dirty(db, "concept", concept.id).reason == "update"
+
+
+def test_content_changes_mark_the_source(db, laboratory):
+    source = Source(title="Radioactive Substances", source_type=SourceType.BOOK, laboratory_id=laboratory.id)
+    db.add(source)
+    db.commit()
+    assert dirty(db, "source", source.id) is None  # Queued by the API instead
+
+    source.file_path = "objects/ab/thesis.pdf"
+    db.commit()
+    record = dirty(db, "source", source.id)
+    assert record.reason == "update"
+    db.delete(record)
+    db.commit()
+
+
+def test_dirty_concepts_are_re_embedded_and_unmarked(db, laboratory, worker):
+    concept = add_concept(db, laboratory)
+    worker.process_dirty()
+
+    db.refresh(concept)
+    assert concept.get_embedding() is not None
+    assert (concept.embedding_model, concept.embedding_version) == (settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+    assert dirty(db, "concept", concept.id) is None
+    assert worker.stats["concepts"] >= 1
+
+
+def test_rows_marked_again_while_processing_stay_dirty(db, laboratory, worker):
+    concept = add_concept(db, laboratory)
+
+    def edit():
+        with SessionLocal() as other:
+            other.get(Concept, concept.id).summary = "Discovered in 1898"
+            other.commit()
+        embedding_service._model.on_encode = None
+
+    embedding_service._model.on_encode = edit
+    worker.process_dirty()
+    assert dirty(db, "concept", concept.id) is not None
+
+    worker.process_dirty()
+    assert dirty(db, "concept", concept.id) is None
+    assert f"Radium Discovered in 1898 Element 88 in {laboratory.name}" in embedding_service._model.texts
+
+
+def test_dirty_sources_are_queued_again(db, laboratory, worker):
+    source = Source(title="Radioactive Substances", source_type=SourceType.BOOK, laboratory_id=laboratory.id)
+    db.add(source)
+    db.commit()
+    source.url = "https://example.org/thesis"
+    db.commit()
+
+    worker.process_dirty()
+    assert source.id in worker.queued
+    assert dirty(db, "source", source.id) is None
+
+
+def test_rows_from_another_model_are_converted(db, laboratory, worker):
+    concept = Concept(title="Polonium", content="Element 84", laboratory_id=laboratory.id)
+    concept.set_embedding([0.1, 0.2, 0.3], "old-model", 1)
+    db.add(concept)
+    db.commit()
+    assert worker.status()["stale_concepts"] >= 1
+
+    worker.process_stale()
+    db.refresh(concept)
+    assert concept.embedding_model == settings.EMBEDDING_MODEL
+    assert worker.status()["stale_concepts"] == 0
@@ -0,0 +1,132 @@
+import asyncio
+import json
+
+import pytest
+from starlette.requests import Request
+
+from app.core.config import settings
+from app.models import Concept, Laboratory, Tag
+from app.services.response_cache import invalidate_on_commit, response_cache
+
+
+@pytest.fixture
+def listing(laboratory):
+    return f"/api/v1/concepts/?laboratory_id={laboratory.id}"
+
+
+def etag(client, url) -> str:
+    response = client.get(url)
+    assert response.status_code == 200
+    return response.headers["ETag"]
+
+
+def add_concept(db, laboratory, title="Radium") -> Concept:
+    concept = Concept(title=title, content="content", laboratory_id=laboratory.id)
+    db.add(concept)
+    db.commit()
+    return concept
+
+
+def test_repeated_requests_are_served_from_the_cache(client, listing):
+    first = client.get(listing)
+    hits = response_cache.stats["hits"]
+    second = client.get(listing)
+    assert second.headers["ETag"] == first.headers["ETag"]
+    assert second.content == first.content
+    assert response_cache.stats["hits"] == hits + 1
+
+
+@pytest.mark.parametrize("header", ["{etag}", "W/{etag}", '"other", {etag}', "*"])
+def test_matching_if_none_match_is_not_modified(client, listing, header):
+    tag = etag(client, listing)
+    response = client.get(listing, headers={"If-None-Match": header.format(etag=tag)})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["ETag"] == tag
+
+
+def test_stale_if_none_match_gets_the_new_body(client, db, laboratory, listing):
+    tag = etag(client, listing)
+    add_concept(db, laboratory)
+
+    response = client.get(listing, headers={"If-None-Match": tag})
+    assert response.status_code == 200
+    assert response.headers["ETag"] != tag
+    assert [item["title"] for item in response.json()["items"]] == ["Radium"]
+
+
+def test_commits_bump_only_the_tags_they_touch(client, db, laboratory, listing):
+    other = Laboratory(name=f"{laboratory.name}-other")
+    db.add(other)
+    db.commit()
+    tag, laboratory_tag = etag(client, listing), etag(client, f"/api/v1/laboratories/{laboratory.id}")
+
+    add_concept(db, other)
+    assert etag(client, listing) == tag  # concepts:<other> and laboratory:<other> only
+
+    add_concept(db, laboratory)
+    assert etag(client, listing) != tag
+    assert etag(client, f"/api/v1/laboratories/{laboratory.id}") != laboratory_tag  # concept_count changed
+
+
+def test_nothing_is_invalidated_before_commit_or_after_rollback(client, db, laboratory, listing):
+    tag = etag(client, listing)
+    db.add(Concept(title="Polonium", content="content", laboratory_id=laboratory.id))
+    db.flush()
+    assert etag(client, listing) == tag
+    db.rollback()
+    assert etag(client, listing) == tag
+
+
+def test_embedding_updates_do_not_invalidate(client, db, laboratory, listing):
+    concept = add_concept(db, laboratory)
+    tag = etag(client, listing)
+    concept.set_embedding([0.1, 0.2, 0.3], settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+    db.commit()
+    assert etag(client, listing) == tag
+
+    concept.summary = "Element 88"
+    db.commit()
+    assert etag(client, listing) != tag
+
+
+def test_bulk_changes_invalidate_on_commit(client, db, laboratory, listing):
+    tag = etag(client, listing)
+    invalidate_on_commit(db, f"concepts:{laboratory.id}")
+    db.rollback()
+    assert etag(client, listing) == tag
+
+    invalidate_on_commit(db, f"concepts:{laboratory.id}")
+    db.commit()
+    assert etag(client, listing) != tag
+
+
+def test_tag_changes_invalidate_concept_lists(client, db, laboratory, listing):
+    tag = etag(client, listing)
+    db.add(Tag(name="isotopes", laboratory_id=laboratory.id))
+    db.commit()
+    assert etag(client, listing) != tag
+
+
+def test_disabled_cache_sends_no_etag(client, listing, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_CACHE_ENABLED", False)
+    response = client.get(listing, headers={"If-None-Match": "*"})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers
+
+
+def test_body_built_during_a_commit_is_not_served_after_it():
+    request = Request({"type": "http", "method": "GET", "path": "/race", "query_string": b"", "headers": []})
+    bodies = iter([{"version": "old"}, {"version": "new"}])
+
+    async def produce_while_committing():
+        response_cache.invalidate("race")  # A commit lands while the body is being built
+        return next(bodies)
+
+    async def produce():
+        return next(bodies)
+
+    first = asyncio.run(response_cache.respond(request, ["race"], produce_while_committing))
+    second = asyncio.run(response_cache.respond(request, ["race"], produce))
+    assert json.loads(second.body) == {"version": "new"}
+    assert second.headers["ETag"] != first.headers["ETag"]
@@ -0,0 +1,50 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.services.reviews import DEFAULT_EASE, MASTERED_INTERVAL, MIN_EASE, next_schedule
+
+REVIEWED_AT = datetime(2025, 1, 28, 9, 0)
+
+
+def test_first_successful_reviews_follow_sm2_intervals():
+    first = next_schedule(None, None, 4, REVIEWED_AT)
+    assert first["review_interval"] == 1
+    assert first["next_review"] == REVIEWED_AT + timedelta(days=1)
+
+    second = next_schedule(first["ease_factor"], first["review_interval"], 4, REVIEWED_AT)
+    assert second["review_interval"] == 6
+
+    third = next_schedule(second["ease_factor"], second["review_interval"], 4, REVIEWED_AT)
+    assert third["review_interval"] == round(6 * third["ease_factor"])
+
+
+@pytest.mark.parametrize("grade, change", [(5, 0.1), (4, 0.0), (3, -0.14)])
+def test_ease_factor_moves_with_grade(grade, change):
+    schedule = next_schedule(DEFAULT_EASE, 6, grade, REVIEWED_AT)
+    assert schedule["ease_factor"] == pytest.approx(DEFAULT_EASE + change)
+
+
+def test_ease_factor_never_drops_below_minimum():
+    schedule = next_schedule(MIN_EASE, 6, 3, REVIEWED_AT)
+    assert schedule["ease_factor"] == MIN_EASE
+
+
+def test_failed_review_restarts_repetitions_and_keeps_ease():
+    schedule = next_schedule(2.2, 40, 2, REVIEWED_AT)
+    assert schedule["review_interval"] == 1
+    assert schedule["ease_factor"] == 2.2
+    assert schedule["mastery_level"] == 1
+    assert schedule["next_review"] == REVIEWED_AT + timedelta(days=1)
+
+
+@pytest.mark.parametrize("interval, new_interval, mastery_level", [
+    (0, 1, 1),
+    (1, 6, 2),
+    (6, 16, 2),  # round(6 * 2.6)
+    (8, MASTERED_INTERVAL, 3),  # round(8 * 2.6)
+])
+def test_mastery_level_follows_the_new_interval(interval, new_interval, mastery_level):
+    schedule = next_schedule(DEFAULT_EASE, interval, 5, REVIEWED_AT)
+    assert schedule["review_interval"] == new_interval
+    assert schedule["mastery_level"] == mastery_level
@@ -0,0 +1,80 @@
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.models import Concept, Tag
+from app.services.ann import ann_store
+from app.services.search import RRF_K, SearchFilters, reciprocal_rank_fusion, semantic_search
+
+
+def test_items_ranked_by_both_legs_come_first():
+    fused = reciprocal_rank_fusion({"lexical": [1, 2, 3], "semantic": [3, 1, 4]})
+    assert [item_id for item_id, _, _ in fused] == [1, 3, 2, 4]
+
+
+def test_scores_and_ranks_per_leg():
+    fused = dict((item_id, (score, ranks)) for item_id, score, ranks in
+                 reciprocal_rank_fusion({"lexical": [7, 8], "semantic": [8]}))
+    assert fused[7] == (pytest.approx(1 / (RRF_K + 1)), {"lexical": 1})
+    assert fused[8] == (pytest.approx(1 / (RRF_K + 2) + 1 / (RRF_K + 1)), {"lexical": 2, "semantic": 1})
+
+
+def test_weights_scale_each_leg():
+    rankings = {"lexical": [1], "semantic": [2]}
+    assert reciprocal_rank_fusion(rankings, {"semantic": 2.0})[0][0] == 2
+    assert reciprocal_rank_fusion(rankings, {"lexical": 2.0})[0][0] == 1
+
+
+def test_ties_break_on_id():
+    fused = reciprocal_rank_fusion({"lexical": [5], "semantic": [3]})
+    assert [item_id for item_id, _, _ in fused] == [3, 5]
+
+
+def test_no_rankings():
+    assert reciprocal_rank_fusion({}) == []
+    assert reciprocal_rank_fusion({"lexical": []}) == []
+
+
+@pytest.fixture
+def small_lists(monkeypatch):
+    # Index even a small laboratory, in lists of about eight concepts, probing one
+    monkeypatch.setattr(settings, "ANN_MIN_SIZE", 16)
+    monkeypatch.setattr(settings, "ANN_LIST_SIZE", 8)
+    monkeypatch.setattr(settings, "ANN_NPROBE", 1)
+
+
+@pytest.fixture
+def embedded(db, laboratory):
+    """64 embedded concepts: every other one tagged "common", three tagged "rare"."""
+    rng = np.random.default_rng(0)
+    common, rare = Tag(name="common", laboratory_id=laboratory.id), Tag(name="rare", laboratory_id=laboratory.id)
+    concepts = []
+    for i in range(64):
+        concept = Concept(title=f"Concept {i}", content="content", laboratory_id=laboratory.id,
+                          tags=[common] * (i % 2 == 0) + [rare] * (i in (5, 17, 41)))
+        concept.set_embedding(rng.standard_normal(8), settings.EMBEDDING_MODEL, settings.EMBEDDING_VERSION)
+        concepts.append(concept)
+    db.add_all(concepts)
+    db.commit()
+    return concepts
+
+
+@pytest.mark.usefixtures("small_lists")
+def test_unfiltered_semantic_search_goes_through_the_ann_index(db, laboratory, embedded):
+    hits = semantic_search(db, embedded[7].get_embedding(), SearchFilters(laboratory.id), 5)
+    assert hits[0] == (embedded[7].id, pytest.approx(1.0))
+    assert ann_store.get(db, laboratory.id)[1] is not None
+
+
+@pytest.mark.usefixtures("small_lists")
+@pytest.mark.parametrize("tag, expected", [("common", 5), ("rare", 3)])
+def test_filters_mask_semantic_candidates(db, laboratory, embedded, tag, expected):
+    allowed = {concept.id for concept in embedded if any(t.name == tag for t in concept.tags)}
+    # An untagged concept's own list holds too few tagged ones: more lists are probed
+    hits = semantic_search(db, embedded[7].get_embedding(), SearchFilters(laboratory.id, tags=[tag]), 5)
+    assert len(hits) == expected
+    assert {concept_id for concept_id, _ in hits} <= allowed
+
+
+def test_filter_matching_nothing(db, laboratory, embedded):
+    assert semantic_search(db, embedded[0].get_embedding(), SearchFilters(laboratory.id, tags=["absent"]), 5) == []
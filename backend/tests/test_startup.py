@@ -0,0 +1,116 @@
+import threading
+import time
+
+import pytest
+
+from app.core import startup
+from app.core.startup import ComponentRegistry, ComponentUnavailable
+from app.services.embeddings import EmbeddingService, EmbeddingUnavailable
+
+
+class Factory:
+    """Builds a component from the imported module, counting the builds."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.builds = 0
+
+    def __call__(self, module):
+        self.builds += 1
+        time.sleep(self.delay)
+        return {"module": module.__name__, "build": self.builds}
+
+
+@pytest.fixture
+def registry():
+    return ComponentRegistry()
+
+
+def test_components_are_built_on_first_use(registry):
+    factory = Factory()
+    registry.register("parser", "json", factory)
+    assert not registry.is_ready("parser")
+    assert registry.status()["components"]["parser"]["state"] == "idle"
+    assert factory.builds == 0
+
+    instance = registry.get("parser")
+    assert instance == {"module": "json", "build": 1}
+    assert registry.get("parser") is instance
+    status = registry.status()["components"]["parser"]
+    assert status["state"] == "ready"
+    assert status["import_seconds"] >= 0 and status["init_seconds"] >= 0
+
+
+def test_concurrent_first_uses_build_once(registry):
+    factory = Factory(delay=0.05)
+    registry.register("parser", "json", factory)
+    instances = []
+    threads = [threading.Thread(target=lambda: instances.append(registry.get("parser"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert factory.builds == 1
+    assert all(instance is instances[0] for instance in instances)
+
+
+def test_failed_components_are_not_retried(registry):
+    factory = Factory()
+    registry.register("model", "no_such_library", factory)
+    with pytest.raises(ComponentUnavailable, match="Cannot load model"):
+        registry.get("model")
+    with pytest.raises(ComponentUnavailable):
+        registry.get("model")
+    assert registry.status()["components"]["model"]["state"] == "failed"
+    assert factory.builds == 0
+
+
+def test_warm_up_builds_in_the_background(registry):
+    slow, broken = Factory(delay=0.1), Factory()
+    registry.register("parser", "json", slow)
+    registry.register("model", "no_such_library", broken)
+    registry.warm_up(["model", "parser", "unregistered"])
+
+    registry._warm_thread.join(timeout=5)
+    assert registry.is_ready("parser")  # A failure does not stop the others
+    assert registry.status()["components"]["model"]["state"] == "failed"
+    assert slow.builds == 1
+
+
+def test_nothing_to_warm_up_starts_no_thread(registry):
+    registry.register("parser", "json", Factory())
+    registry.warm_up(["unregistered"])
+    assert registry._warm_thread is None
+    assert not registry.is_ready("parser")
+
+
+def test_startup_phases_are_reported(registry):
+    registry.phase("database", time.monotonic() - 0.25)
+    assert registry.status()["ready_after_seconds"] is None
+    registry.mark_ready()
+    status = registry.status()
+    assert status["phases"]["database"] >= 0.25
+    assert 0 <= status["ready_after_seconds"] <= status["uptime_seconds"]
+
+
+def test_shared_embedding_model_is_a_component(registry, monkeypatch):
+    model = object()
+    registry.register("embedding_model", "json", lambda module: model)
+    monkeypatch.setattr(startup, "components", registry)
+    assert EmbeddingService().model is model
+    assert registry.is_ready("embedding_model")
+
+    failing = ComponentRegistry()
+    failing.register("embedding_model", "no_such_library", Factory())
+    monkeypatch.setattr(startup, "components", failing)
+    assert not EmbeddingService().available
+    with pytest.raises(EmbeddingUnavailable):
+        EmbeddingService().model
+
+
+def test_health_reports_components_without_loading_them(client):
+    startup_status = client.get("/health").json()["startup"]
+    assert list(startup_status["components"]) == ["embedding_model"]
+    assert startup_status["components"]["embedding_model"]["state"] in ("idle", "failed")  # Not warmed up here
+    assert {"imports", "database"} <= set(startup_status["phases"])
+    assert startup_status["ready_after_seconds"] is not None